@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同步資料收集服務
+
+與 FinMindDataCollector 相同的資料集 / 參數介面，但改以 asyncio 同時送出多個請求：
+- 所有資料集共用一個 token bucket，平均分配每小時額度（300 / 600 次），
+  不再以固定 sleep 浪費額度
+- 連線錯誤、逾時、429 與 5xx 以指數退避加隨機抖動重試
+- 402（額度用盡）與同步版相同，拋出「API請求限制」例外交由智能等待處理
+
+HTTP 仍使用 requests（以 asyncio.to_thread 執行），不需額外安裝非同步 HTTP 套件。
+"""
+
+import asyncio
+import json
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import requests
+from loguru import logger
+
+from app.services.data_collector import FinMindDataCollector
+
+# 保留的安全餘量（與同步版接近上限前 10 次即等待相同）
+QUOTA_SAFETY_MARGIN = 10
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class QuotaExceededError(Exception):
+    """FinMind 回應 402，本小時額度已用盡"""
+
+
+class TokenBucket:
+    """
+    非同步 token bucket 限流器
+
+    任意 1 小時內的請求數不超過 capacity + rate * 3600，
+    因此以 burst 容量加上 (額度 - burst) / 3600 的補充速率即可用滿但不超過每小時額度。
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            capacity: 最大累積 token 數（瞬間可連發的請求數）
+            refill_per_second: 每秒補充的 token 數
+            clock: 時間來源（測試可替換）
+        """
+        self.capacity = float(capacity)
+        self.rate = float(refill_per_second)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def for_hourly_quota(cls, requests_per_hour: int, burst: Optional[int] = None) -> 'TokenBucket':
+        """依每小時額度建立限流器（預設 burst 為額度的 10%）"""
+        quota = max(requests_per_hour - QUOTA_SAFETY_MARGIN, 1)
+        burst = burst if burst is not None else max(quota // 10, 1)
+        burst = min(burst, quota)
+        return cls(burst, max(quota - burst, 1) / 3600.0)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def drain(self):
+        """清空 token（伺服器回報額度用盡時使用）"""
+        self._refill()
+        self._tokens = 0.0
+
+    async def acquire(self, tokens: float = 1.0):
+        """取得 token，不足時等待（等待者依先後順序取得）"""
+        # asyncio.Lock 綁定第一個使用它的事件迴圈，換了事件迴圈（另一次 asyncio.run）時重建
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AsyncFinMindDataCollector:
+    """非同步 FinMind 資料收集器"""
+
+    def __init__(self, api_url: str = "https://api.finmindtrade.com/api/v4/data",
+                 api_token: Optional[str] = None,
+                 max_concurrency: int = 4,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 max_retries: int = 3,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0,
+                 timeout: float = 30.0):
+        """
+        Args:
+            api_url: FinMind API 網址
+            api_token: API Token（有 Token 時每小時 600 次，否則 300 次）
+            max_concurrency: 同時進行的請求數
+            rate_limiter: 共用的限流器（None 時依額度建立）
+            max_retries: 暫時性錯誤的重試次數
+            backoff_base: 退避基準秒數（第 n 次重試等待 0 ~ base * 2^n 秒）
+            backoff_max: 單次退避上限秒數
+            timeout: 單一請求逾時秒數
+        """
+        self.api_url = api_url
+        self.api_token = api_token
+        self.max_requests_per_hour = 600 if api_token else 300
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or TokenBucket.for_hourly_quota(self.max_requests_per_hour)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.request_count = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        # 沿用同步版的資料清理與股票清單邏輯
+        self._sync = FinMindDataCollector(api_url, api_token)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """目前事件迴圈的 Semaphore（同一收集器可在多次 asyncio.run 中重複使用）"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """指數退避加完整抖動"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _make_request(self, dataset: str, data_id: Optional[str], start_date: str,
+                            end_date: str, **kwargs) -> Dict:
+        """發送 API 請求（與 FinMindDataCollector._make_request 相同的參數與回傳格式）"""
+        params = {
+            "dataset": dataset,
+            "start_date": start_date,
+            "end_date": end_date,
+            **kwargs
+        }
+        if data_id:
+            params["data_id"] = data_id
+        if self.api_token:
+            params["token"] = self.api_token
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            async with self._get_semaphore():
+                try:
+                    response = await asyncio.to_thread(
+                        self.session.get, self.api_url, params=params, timeout=self.timeout)
+                    self.request_count += 1
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                    response = None
+
+            if response is not None:
+                if response.status_code == 402:
+                    self.rate_limiter.drain()
+                    raise QuotaExceededError(f"API請求限制: 402 Payment Required ({dataset} {data_id})")
+                if response.status_code not in RETRYABLE_STATUS:
+                    return self._parse_response(response)
+                error = f"HTTP {response.status_code}"
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"API 請求失敗 ({error})，{delay:.1f} 秒後重試 {attempt + 1}/{self.max_retries}: "
+                               f"{dataset} {data_id}")
+                await asyncio.sleep(delay)
+
+        logger.error(f"API 請求失敗，已重試 {self.max_retries} 次: {dataset} {data_id} ({error})")
+        return {'data': []}
+
+    @staticmethod
+    def _parse_response(response: requests.Response) -> Dict:
+        try:
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"API 請求失敗: {e}")
+            return {'data': []}
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON 解析失敗: {e}")
+            return {'data': []}
+
+        if 'data' not in data:
+            logger.warning(f"API 回應異常: {data}")
+            return {'data': [], 'msg': data.get('msg', ''), 'status': data.get('status')}
+        return data
+
+    async def get_stock_price_data(self, stock_id: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """取得股價資料"""
+        data = await self._make_request(
+            dataset="TaiwanStockPrice",
+            data_id=stock_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+        if not data['data']:
+            logger.warning(f"股票 {stock_id} 無資料")
+            return pd.DataFrame()
+
+        df = self._sync._clean_price_data(pd.DataFrame(data['data']))
+        logger.info(f"股票 {stock_id} 收集到 {len(df)} 筆資料")
+        return df
+
+    async def get_dividend_data(self, stock_id: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """取得配息資料"""
+        data = await self._make_request(
+            dataset="TaiwanStockDividend",
+            data_id=stock_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+        if not data['data']:
+            return pd.DataFrame()
+
+        df = self._sync._clean_dividend_data(pd.DataFrame(data['data']))
+        logger.info(f"股票 {stock_id} 收集到 {len(df)} 筆配息資料")
+        return df
+
+    def get_stock_list(self, use_full_list: bool = False) -> List[Dict[str, str]]:
+        """取得股票清單（同步版）"""
+        return self._sync.get_stock_list(use_full_list)
+
+    async def collect_batch_data(self, stock_list: List[Dict], start_date: str,
+                                 end_date: str, batch_size: Optional[int] = None) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        批量收集資料（同時進行多檔，速度由限流器決定，不再固定休息）
+
+        Args:
+            stock_list: 股票清單（含 stock_id、is_etf）
+            start_date: 開始日期
+            end_date: 結束日期
+            batch_size: 同時處理的股票數（None 時為 max_concurrency 的兩倍）
+
+        Returns:
+            {'price_data': {stock_id: df}, 'dividend_data': {stock_id: df}}，股票順序與 stock_list 相同
+        """
+        logger.info(f"開始非同步批量收集資料: {len(stock_list)} 檔股票")
+        dividend_end_date = datetime.now().strftime("%Y-%m-%d")
+        workers = max(1, batch_size or self.max_concurrency * 2)
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, stock_info in enumerate(stock_list):
+            queue.put_nowait((index, stock_info))
+
+        price_results: Dict[int, pd.DataFrame] = {}
+        dividend_results: Dict[int, pd.DataFrame] = {}
+
+        async def worker():
+            while True:
+                try:
+                    index, stock_info = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                stock_id = stock_info['stock_id']
+                try:
+                    price_df = await self.get_stock_price_data(stock_id, start_date, end_date)
+                    if not price_df.empty:
+                        price_results[index] = price_df
+                    if stock_info.get('is_etf', False):
+                        dividend_df = await self.get_dividend_data(stock_id, start_date, dividend_end_date)
+                        if not dividend_df.empty:
+                            dividend_results[index] = dividend_df
+                except QuotaExceededError:
+                    raise
+                except Exception as e:
+                    logger.error(f"收集股票 {stock_id} 資料失敗: {e}")
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            # 任一工作遇到額度用盡即停止其餘工作，向上拋出以觸發智能等待
+            await asyncio.gather(*tasks)
+        except QuotaExceededError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        all_price_data = {stock_list[i]['stock_id']: price_results[i] for i in sorted(price_results)}
+        all_dividend_data = {stock_list[i]['stock_id']: dividend_results[i] for i in sorted(dividend_results)}
+        logger.info(f"批量收集完成: 股價資料 {len(all_price_data)} 檔, 配息資料 {len(all_dividend_data)} 檔, "
+                    f"請求 {self.request_count} 次")
+
+        return {
+            'price_data': all_price_data,
+            'dividend_data': all_dividend_data
+        }
@@ -6,6 +6,7 @@
 
 import requests
 import pandas as pd
+import threading
 import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
@@ -16,7 +17,14 @@ class FinMindDataCollector:
     """FinMind 資料收集器"""
     
     def __init__(self, api_url: str = "https://api.finmindtrade.com/api/v4/data",
-                 api_token: Optional[str] = None):
+                 api_token: Optional[str] = None, request_ledger=None):
+        """
+        Args:
+            api_url: FinMind API 網址
+            api_token: API Token
+            request_ledger: 選用的請求帳本（scripts/quota_scheduler.RequestLedger），
+                            每次請求都會記錄，供多個收集程式共用額度計算
+        """
         self.api_url = api_url
         self.base_url = api_url  # 為了向後相容
         self.api_token = api_token
@@ -29,6 +37,11 @@ class FinMindDataCollector:
         self.last_request_time = datetime.now()
         # 根據是否有Token設置請求限制
         self.max_requests_per_hour = 600 if api_token else 300
+        self.request_ledger = request_ledger
+        # 多個收集階段共用同一個收集器時，頻率檢查與計數需互斥
+        self._rate_lock = threading.Lock()
+        # 最近一次收到 402 的時間（部分收集腳本會吞掉例外，呼叫端可據此判斷是否遇到額度限制）
+        self.last_quota_error_at: Optional[float] = None
     
     def _check_rate_limit(self):
         """檢查請求頻率限制"""
@@ -48,18 +61,21 @@ class FinMindDataCollector:
                 self.request_count = 0
                 self.last_request_time = datetime.now()
     
-    def _make_request(self, dataset: str, data_id: str, start_date: str, 
+    def _make_request(self, dataset: str, data_id: Optional[str], start_date: str, 
                      end_date: str, **kwargs) -> Dict:
         """發送 API 請求"""
-        self._check_rate_limit()
+        with self._rate_lock:
+            self._check_rate_limit()
         
         params = {
             "dataset": dataset,
-            "data_id": data_id,
             "start_date": start_date,
             "end_date": end_date,
             **kwargs
         }
+        # 不指定 data_id 時 FinMind 依日期回傳全市場資料
+        if data_id:
+            params["data_id"] = data_id
 
         # 如果有API Token，添加到參數中
         if self.api_token:
@@ -67,15 +83,20 @@ class FinMindDataCollector:
         
         try:
             response = self.session.get(self.api_url, params=params, timeout=30)
+            if self.request_ledger is not None:
+                # 402 也會消耗額度，送出即記錄
+                self.request_ledger.record(dataset, data_id)
             response.raise_for_status()
 
-            self.request_count += 1
+            with self._rate_lock:
+                self.request_count += 1
             data = response.json()
 
             if 'data' not in data:
                 logger.warning(f"API 回應異常: {data}")
-                return {'data': []}
+                return {'data': [], 'msg': data.get('msg', ''), 'status': data.get('status')}
 
+            data.setdefault('status', response.status_code)
             return data
 
         except requests.exceptions.RequestException as e:
@@ -84,12 +105,15 @@ class FinMindDataCollector:
 
             # 如果是402錯誤，拋出異常以觸發智能等待
             if "402" in error_msg or "Payment Required" in error_msg:
+                self.last_quota_error_at = time.time()
                 raise Exception(f"API請求限制: {error_msg}")
 
-            return {'data': []}
+            # 失敗的請求帶上 HTTP 狀態碼（連線錯誤為 None），與成功的空資料區分
+            status = e.response.status_code if e.response is not None else None
+            return {'data': [], 'msg': error_msg, 'status': status}
         except json.JSONDecodeError as e:
             logger.error(f"JSON 解析失敗: {e}")
-            return {'data': []}
+            return {'data': [], 'msg': str(e), 'status': None}
     
     def get_stock_price_data(self, stock_id: str, start_date: str, 
                            end_date: str) -> pd.DataFrame:
@@ -115,6 +139,37 @@ class FinMindDataCollector:
         logger.info(f"股票 {stock_id} 收集到 {len(df)} 筆資料")
         return df
     
+    def get_market_price_data(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """
+        取得單一交易日的全市場股價（不指定 data_id，一次請求取得所有股票）
+
+        Args:
+            trade_date: 交易日 (YYYY-MM-DD)
+
+        Returns:
+            清理後的股價資料（含 stock_id），API 成功回應但無資料（非交易日）時為空 DataFrame；
+            請求失敗或 API 拒絕依日期查詢（例如帳號等級不足，HTTP 4xx）時回傳 None
+        """
+        logger.info(f"收集全市場股價資料: {trade_date}")
+
+        data = self._make_request(
+            dataset="TaiwanStockPrice",
+            data_id=None,
+            start_date=trade_date,
+            end_date=trade_date
+        )
+
+        # 假日 FinMind 回傳 status 200、msg "success" 與空的 data，只有這種情況是非交易日
+        if data.get('status') != 200:
+            logger.warning(f"全市場股價查詢失敗 (status={data.get('status')}): {data.get('msg', '')}")
+            return None
+        if not data['data']:
+            return pd.DataFrame()
+
+        df = self._clean_price_data(pd.DataFrame(data['data']))
+        logger.info(f"{trade_date} 全市場收集到 {df['stock_id'].nunique() if not df.empty else 0} 檔股票")
+        return df
+
     def get_dividend_data(self, stock_id: str, start_date: str) -> pd.DataFrame:
         """取得配息資料"""
         logger.info(f"收集配息資料: {stock_id} (從 {start_date})")
@@ -4,16 +4,49 @@
 查詢服務模組
 """
 
+import json
+import logging
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from app.utils.simple_database import SimpleDatabaseManager
+from app.utils.market_summary import ensure_market_summary, sync_market_summary
+from app.utils.table_stats import ensure_table_stats, load_table_stats, refresh_table_stats
+from app.utils.stock_search import StockSearchIndex, ensure_search_index, get_search_version, search_stock_ids
+
+logger = logging.getLogger(__name__)
 
 class StockQueryService:
     """股票查詢服務"""
     
     def __init__(self, db_manager: SimpleDatabaseManager):
         self.db = db_manager
+        self._summary_ready: Optional[bool] = None
+        self._fts_ready: Optional[bool] = None
+        self._search_index: Optional[StockSearchIndex] = None
+    
+    def _use_summary_tables(self) -> bool:
+        """latest_prices / daily_market_summary 是否可用（不存在時先建立一次）"""
+        if self._summary_ready is None:
+            try:
+                with self.db.connection() as conn:
+                    self._summary_ready = ensure_market_summary(conn)
+            except Exception as e:
+                logger.warning(f"市場摘要彙總表無法使用，改查 stock_prices: {e}")
+                self._summary_ready = False
+        return self._summary_ready
+    
+    def _get_latest_date(self) -> Optional[str]:
+        """取得最新交易日"""
+        if self._use_summary_tables():
+            try:
+                # 未經 update_market_summary 的寫入可能讓 latest_prices 落後，先補上
+                with self.db.connection() as conn:
+                    return sync_market_summary(conn)
+            except Exception as e:
+                logger.warning(f"市場摘要同步失敗，改查 stock_prices: {e}")
+        result = self.db.execute_query("SELECT MAX(date) as latest_date FROM stock_prices")
+        return result[0]['latest_date'] if result else None
     
     def get_stock_list(self, market: Optional[str] = None, 
                       is_etf: Optional[bool] = None) -> List[Dict]:
@@ -100,6 +133,16 @@ class StockQueryService:
             return []
         
         placeholders = ','.join(['?' for _ in stock_ids])
+        if self._use_summary_tables():
+            query = f"""
+            SELECT lp.*, s.stock_name, s.market, s.is_etf
+            FROM latest_prices lp
+            JOIN stocks s ON lp.stock_id = s.stock_id
+            WHERE lp.stock_id IN ({placeholders})
+            ORDER BY lp.stock_id
+            """
+            return self.db.execute_query(query, tuple(stock_ids))
+        
         query = f"""
         SELECT sp.*, s.stock_name, s.market, s.is_etf
         FROM stock_prices sp
@@ -115,28 +158,66 @@ class StockQueryService:
         
         return self.db.execute_query(query, tuple(stock_ids))
     
-    def search_stocks(self, keyword: str) -> List[Dict]:
-        """搜尋股票"""
-        query = """
-        SELECT * FROM stocks 
-        WHERE (stock_id LIKE ? OR stock_name LIKE ?) 
-        AND is_active = 1
-        ORDER BY stock_id
-        LIMIT 20
-        """
-        search_term = f"%{keyword}%"
-        return self.db.execute_query(query, (search_term, search_term))
+    def _get_search_index(self, conn) -> StockSearchIndex:
+        """股票搜尋前綴樹（FTS5 索引不存在時先建立；stocks 異動後重新載入）"""
+        if self._fts_ready is None:
+            self._fts_ready = ensure_search_index(conn)
+        version = get_search_version(conn) if self._fts_ready else None
+        if self._search_index is None or version is None or version != self._search_index.version:
+            self._search_index = StockSearchIndex.load(conn)
+        return self._search_index
+    
+    def search_stocks(self, keyword: str, limit: int = 20) -> List[Dict]:
+        """搜尋股票（代碼或名稱，依相關程度排序）"""
+        keyword = (keyword or '').strip()
+        if not keyword:
+            return []
+        
+        try:
+            with self.db.connection() as conn:
+                index = self._get_search_index(conn)
+                stock_ids = search_stock_ids(conn, index, keyword, limit, use_fts=self._fts_ready)
+        except Exception as e:
+            logger.warning(f"股票搜尋索引無法使用，改以 LIKE 查詢: {e}")
+            query = """
+            SELECT * FROM stocks 
+            WHERE (stock_id LIKE ? OR stock_name LIKE ?) 
+            AND is_active = 1
+            ORDER BY stock_id
+            LIMIT ?
+            """
+            search_term = f"%{keyword}%"
+            return self.db.execute_query(query, (search_term, search_term, limit))
+        
+        if not stock_ids:
+            return []
+        rows = self.db.execute_query("SELECT * FROM stocks WHERE stock_id IN (SELECT value FROM json_each(?))",
+                                     (json.dumps(stock_ids),))
+        rank = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+        return sorted(rows, key=lambda row: rank[row['stock_id']])
     
     def get_market_summary(self) -> Dict:
         """取得市場摘要"""
         # 取得最新交易日
-        latest_date_query = "SELECT MAX(date) as latest_date FROM stock_prices"
-        latest_date_result = self.db.execute_query(latest_date_query)
-        latest_date = latest_date_result[0]['latest_date'] if latest_date_result else None
+        latest_date = self._get_latest_date()
         
         if not latest_date:
             return {}
         
+        if self._use_summary_tables():
+            summary = self.db.execute_query("""
+            SELECT total_stocks, total_volume, total_trading_money,
+                   up_stocks, down_stocks, flat_stocks
+            FROM daily_market_summary
+            WHERE date = ?
+            """, (latest_date,))
+            # 彙總表尚未納入的交易日改為即時統計
+            if summary:
+                return {
+                    'latest_date': latest_date,
+                    'summary': summary[0]
+                }
+        
         # 統計資訊
         summary_query = """
         SELECT 
@@ -162,19 +243,19 @@ class StockQueryService:
                           performance_type: str = 'gain') -> List[Dict]:
         """取得表現最佳/最差的股票"""
         # 取得最新交易日
-        latest_date_query = "SELECT MAX(date) as latest_date FROM stock_prices"
-        latest_date_result = self.db.execute_query(latest_date_query)
-        latest_date = latest_date_result[0]['latest_date'] if latest_date_result else None
+        latest_date = self._get_latest_date()
         
         if not latest_date:
             return []
         
         order_by = "DESC" if performance_type == 'gain' else "ASC"
+        # 最新交易日有交易的股票，其最新股價即為該日股價
+        source = 'latest_prices' if self._use_summary_tables() else 'stock_prices'
         
         query = f"""
         SELECT sp.*, s.stock_name, s.market, s.is_etf,
                ROUND((sp.spread / (sp.close_price - sp.spread)) * 100, 2) as change_percent
-        FROM stock_prices sp
+        FROM {source} sp
         JOIN stocks s ON sp.stock_id = s.stock_id
         WHERE sp.date = ? AND s.is_active = 1
         ORDER BY sp.spread {order_by}
@@ -186,16 +267,16 @@ class StockQueryService:
     def get_volume_leaders(self, limit: int = 10) -> List[Dict]:
         """取得成交量排行"""
         # 取得最新交易日
-        latest_date_query = "SELECT MAX(date) as latest_date FROM stock_prices"
-        latest_date_result = self.db.execute_query(latest_date_query)
-        latest_date = latest_date_result[0]['latest_date'] if latest_date_result else None
+        latest_date = self._get_latest_date()
         
         if not latest_date:
             return []
         
-        query = """
+        source = 'latest_prices' if self._use_summary_tables() else 'stock_prices'
+        
+        query = f"""
         SELECT sp.*, s.stock_name, s.market, s.is_etf
-        FROM stock_prices sp
+        FROM {source} sp
         JOIN stocks s ON sp.stock_id = s.stock_id
         WHERE sp.date = ? AND s.is_active = 1
         ORDER BY sp.volume DESC
@@ -229,13 +310,32 @@ class StockQueryService:
         """
         return self.db.execute_query(query)
     
+    def get_table_stats(self) -> Dict[str, Dict]:
+        """取得各資料表統計（table_stats，不存在時先計算一次）"""
+        try:
+            with self.db.connection() as conn:
+                ensure_table_stats(conn)
+                return load_table_stats(conn)
+        except Exception as e:
+            logger.warning(f"資料表統計無法使用: {e}")
+            return {}
+    
+    def refresh_table_stats(self) -> int:
+        """重新計算各資料表統計（每張表掃描一次）"""
+        with self.db.connection() as conn:
+            return refresh_table_stats(conn)
+    
     def get_database_stats(self) -> Dict:
         """取得資料庫統計資訊"""
         stats = {}
+        table_stats = self.get_table_stats()
         
         # 各表記錄數
         tables = ['stocks', 'stock_prices', 'technical_indicators', 'etf_dividends', 'data_updates']
         for table in tables:
+            if table in table_stats:
+                stats[f'{table}_count'] = table_stats[table]['row_count']
+                continue
             try:
                 count = self.db.get_table_count(table)
                 stats[f'{table}_count'] = count
@@ -246,17 +346,21 @@ class StockQueryService:
         stats['database_size'] = self.db.get_database_size()
         
         # 資料日期範圍
-        try:
-            date_range_query = """
-            SELECT 
-                MIN(date) as earliest_date,
-                MAX(date) as latest_date
-            FROM stock_prices
-            """
-            date_range = self.db.execute_query(date_range_query)
-            if date_range:
-                stats.update(date_range[0])
-        except:
-            pass
+        if 'stock_prices' in table_stats:
+            stats['earliest_date'] = table_stats['stock_prices']['min_date']
+            stats['latest_date'] = table_stats['stock_prices']['max_date']
+        else:
+            try:
+                date_range_query = """
+                SELECT 
+                    MIN(date) as earliest_date,
+                    MAX(date) as latest_date
+                FROM stock_prices
+                """
+                date_range = self.db.execute_query(date_range_query)
+                if date_range:
+                    stats.update(date_range[0])
+            except:
+                pass
         
         return stats
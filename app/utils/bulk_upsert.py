@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DataFrame 批次寫入（upsert）工具
+
+收集程式原本以 df.iterrows() 逐筆 INSERT OR REPLACE，十年全市場股價回補
+（數千萬筆）的瓶頸在 Python 迴圈本身。本模組以欄為單位處理整個 DataFrame：
+- FinMind 欄位名稱（max / min / Trading_Volume ...）只在開頭對應一次
+- 依批次大小 executemany 寫入暫存表，再以一條
+  INSERT ... SELECT ... ON CONFLICT DO UPDATE 合併到目標表，每批一個交易
+- 內容未變動的既有資料不會重寫，並回報新增 / 更新 / 略過筆數
+"""
+
+import logging
+import sqlite3
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from app.utils.data_freshness import update_data_freshness
+from app.utils.market_summary import update_market_summary
+from app.utils.table_stats import count_new_stocks, record_table_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+# FinMind 資料集欄位 -> 資料表欄位
+FINMIND_COLUMN_MAPS = {
+    'stock_prices': {
+        'open': 'open_price',
+        'max': 'high_price',
+        'min': 'low_price',
+        'close': 'close_price',
+        'Trading_Volume': 'volume',
+        'Trading_money': 'trading_money',
+        'Trading_turnover': 'trading_turnover',
+    },
+    'dividend_policies': {
+        'StockEarningsDistribution': 'stock_earnings_distribution',
+        'StockStatutorySurplus': 'stock_statutory_surplus',
+        'StockExDividendTradingDate': 'stock_ex_dividend_trading_date',
+        'CashEarningsDistribution': 'cash_earnings_distribution',
+        'CashStatutorySurplus': 'cash_statutory_surplus',
+        'CashExDividendTradingDate': 'cash_ex_dividend_trading_date',
+        'CashDividendPaymentDate': 'cash_dividend_payment_date',
+        'TotalEmployeeStockDividend': 'total_employee_stock_dividend',
+        'TotalEmployeeCashDividend': 'total_employee_cash_dividend',
+        'ParticipateDistributionOfTotalShares': 'participate_distribution_total_shares',
+        'AnnouncementDate': 'announcement_date',
+        'AnnouncementTime': 'announcement_time',
+    },
+}
+
+_UPSERT_SUPPORTED = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_table_schema(conn: sqlite3.Connection, table_name: str) -> List[Dict]:
+    """取得資料表欄位資訊（name / notnull / default / pk）"""
+    rows = conn.execute(f"PRAGMA table_info({_quote(table_name)})").fetchall()
+    return [{'name': r[1], 'notnull': bool(r[3]), 'default': r[4], 'pk': int(r[5])} for r in rows]
+
+
+def find_unique_key(conn: sqlite3.Connection, table_name: str, columns: Sequence[str]) -> Optional[List[str]]:
+    """找出欄位皆在 columns 中的唯一索引（UNIQUE 限制或唯一索引），作為 ON CONFLICT 目標"""
+    available = set(columns)
+    for index in conn.execute(f"PRAGMA index_list({_quote(table_name)})").fetchall():
+        # index_list: seq, name, unique, origin, partial
+        if not index[2] or (len(index) > 4 and index[4]):
+            continue
+        key = [r[2] for r in conn.execute(f"PRAGMA index_info({_quote(index[1])})").fetchall()]
+        if key and all(col in available for col in key):
+            return key
+    return None
+
+
+def prepare_frame(df: pd.DataFrame,
+                  table_columns: Sequence[str],
+                  column_map: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    將 DataFrame 轉為可直接綁定到 SQLite 的欄位與值
+
+    - 依 column_map 改名（資料表欄位已存在時不覆蓋）
+    - 只保留資料表中存在的欄位
+    - 日期欄位轉為字串，NaN 轉為 None，numpy 數值轉為 Python 型別
+    """
+    if column_map:
+        rename = {src: dst for src, dst in column_map.items() if src in df.columns and dst not in df.columns}
+        df = df.rename(columns=rename)
+
+    columns = [col for col in df.columns if col in set(table_columns)]
+    frame = df[columns].copy()
+
+    for col in columns:
+        series = frame[col]
+        if series.dtype == object:
+            sample = series.dropna()
+            if sample.empty or not isinstance(sample.iloc[0], date):
+                continue
+            series = pd.to_datetime(series)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dropna()
+            has_time = (values != values.dt.normalize()).any()
+            frame[col] = series.dt.strftime('%Y-%m-%d %H:%M:%S' if has_time else '%Y-%m-%d')
+
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def bulk_upsert_dataframe(conn: sqlite3.Connection,
+                          table_name: str,
+                          df: pd.DataFrame,
+                          key_columns: Optional[Sequence[str]] = None,
+                          column_map: Optional[Dict[str, str]] = None,
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          timestamp_column: Optional[str] = 'created_at') -> Dict[str, int]:
+    """
+    將 DataFrame 批次 upsert 到資料表
+
+    Args:
+        conn: 資料庫連線（每批提交一次）
+        table_name: 目標資料表
+        df: 資料
+        key_columns: 衝突判斷欄位；None 時自動使用資料表上欄位齊全的唯一索引
+        column_map: 欄位改名對應（例如 FINMIND_COLUMN_MAPS['stock_prices']）
+        batch_size: 每批筆數
+        timestamp_column: 新增資料時填入目前時間的欄位（更新時保留原值）
+
+    Returns:
+        {'inserted', 'updated', 'skipped', 'invalid', 'total'}；
+        skipped 為內容未變動或同批重複鍵的筆數，invalid 為鍵值或必填欄位缺值而未寫入的筆數
+    """
+    result = {'inserted': 0, 'updated': 0, 'skipped': 0, 'invalid': 0, 'total': 0 if df is None else len(df)}
+    if df is None or df.empty:
+        return result
+
+    schema = get_table_schema(conn, table_name)
+    if not schema:
+        raise ValueError(f"資料表不存在: {table_name}")
+
+    # 自動遞增主鍵不由資料提供
+    writable = [col['name'] for col in schema if not (col['pk'] and col['name'] not in df.columns)]
+    frame = prepare_frame(df, writable, column_map)
+    columns = list(frame.columns)
+
+    if key_columns is None:
+        key_columns = find_unique_key(conn, table_name, columns)
+    key_columns = list(key_columns or [])
+    missing_keys = [col for col in key_columns if col not in columns]
+    if missing_keys:
+        raise ValueError(f"資料缺少鍵值欄位: {missing_keys}")
+
+    # 鍵值或必填欄位（無預設值）缺值的資料無法寫入
+    required = set(key_columns) | {col['name'] for col in schema
+                                   if col['notnull'] and col['default'] is None and col['name'] in columns}
+    valid = frame[list(required)].notna().all(axis=1) if required else pd.Series(True, index=frame.index)
+    result['invalid'] = int((~valid).sum())
+    frame = frame[valid]
+
+    if key_columns:
+        deduped = frame.drop_duplicates(subset=key_columns, keep='last')
+        result['skipped'] += len(frame) - len(deduped)
+        frame = deduped
+
+    if timestamp_column and timestamp_column not in columns and any(c['name'] == timestamp_column for c in schema):
+        frame = frame.assign(**{timestamp_column: datetime.now().isoformat()})
+        columns.append(timestamp_column)
+
+    if frame.empty:
+        return result
+
+    new_stocks = _count_new_stocks(conn, table_name, frame)
+    rows = list(frame.itertuples(index=False, name=None))
+    value_columns = [col for col in columns if col not in key_columns and col != timestamp_column]
+
+    if not key_columns:
+        # 沒有唯一鍵可判斷衝突，只能直接新增
+        sql = (f"INSERT INTO {_quote(table_name)} ({', '.join(map(_quote, columns))}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        for start in range(0, len(rows), batch_size):
+            with conn:
+                conn.executemany(sql, rows[start:start + batch_size])
+        result['inserted'] = len(rows)
+        _refresh_freshness(conn, table_name, frame)
+        _refresh_market_summary(conn, table_name, frame)
+        _refresh_table_stats(conn, table_name, frame, result['inserted'], new_stocks)
+        return result
+
+    stage = _quote(f"_bulk_stage_{table_name}")
+    conn.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+    conn.execute(f"CREATE TEMP TABLE {stage} AS SELECT {', '.join(map(_quote, columns))} "
+                 f"FROM {_quote(table_name)} WHERE 0")
+
+    try:
+        for start in range(0, len(rows), batch_size):
+            batch_counts = _upsert_batch(conn, table_name, stage, columns, key_columns,
+                                         value_columns, rows[start:start + batch_size])
+            for key, value in batch_counts.items():
+                result[key] += value
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+
+    if result['inserted'] or result['updated']:
+        _refresh_freshness(conn, table_name, frame)
+        _refresh_market_summary(conn, table_name, frame)
+        _refresh_table_stats(conn, table_name, frame, result['inserted'], new_stocks)
+
+    logger.debug(f"{table_name} 批次寫入: {result}")
+    return result
+
+
+def _refresh_freshness(conn: sqlite3.Connection, table_name: str, frame: pd.DataFrame):
+    """寫入後更新 data_freshness 中相關股票的彙總（失敗不影響寫入結果）"""
+    if 'stock_id' not in frame.columns:
+        return
+    try:
+        update_data_freshness(conn, table_name, frame['stock_id'].unique())
+    except Exception as e:
+        logger.warning(f"更新 data_freshness 失敗 ({table_name}): {e}")
+
+
+def _refresh_market_summary(conn: sqlite3.Connection, table_name: str, frame: pd.DataFrame):
+    """寫入股價後更新 latest_prices 與 daily_market_summary（失敗不影響寫入結果）"""
+    if table_name != 'stock_prices' or 'stock_id' not in frame.columns:
+        return
+    try:
+        dates = frame['date'].unique() if 'date' in frame.columns else None
+        update_market_summary(conn, frame['stock_id'].unique(), dates)
+    except Exception as e:
+        logger.warning(f"更新市場摘要失敗: {e}")
+
+
+def _count_new_stocks(conn: sqlite3.Connection, table_name: str, frame: pd.DataFrame) -> Optional[int]:
+    """寫入前計算尚無資料的股票數，供寫入後更新 table_stats 的股票檔數"""
+    if 'stock_id' not in frame.columns:
+        return None
+    try:
+        return count_new_stocks(conn, table_name, frame['stock_id'].unique())
+    except Exception as e:
+        logger.warning(f"計算新股票數失敗 ({table_name}): {e}")
+        return None
+
+
+def _refresh_table_stats(conn: sqlite3.Connection, table_name: str, frame: pd.DataFrame,
+                         inserted: int, new_stocks: Optional[int]):
+    """寫入後更新 table_stats 的筆數、日期範圍與股票檔數（失敗不影響寫入結果）"""
+    try:
+        record_table_write(conn, table_name, frame, inserted, new_stocks)
+    except Exception as e:
+        logger.warning(f"更新資料表統計失敗 ({table_name}): {e}")
+
+
+def _upsert_batch(conn: sqlite3.Connection, table_name: str, stage: str, columns: List[str],
+                  key_columns: List[str], value_columns: List[str], rows: List[tuple]) -> Dict[str, int]:
+    """寫入單一批次（同一個交易）"""
+    table = _quote(table_name)
+    column_list = ', '.join(map(_quote, columns))
+    join = ' AND '.join(f"t.{_quote(c)} = s.{_quote(c)}" for c in key_columns)
+    changed = ' OR '.join(f"t.{_quote(c)} IS NOT s.{_quote(c)}" for c in value_columns) or '0'
+
+    try:
+        conn.execute(f"DELETE FROM {stage}")
+        conn.executemany(f"INSERT INTO {stage} ({column_list}) VALUES ({', '.join('?' for _ in columns)})", rows)
+
+        existing, updated = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM({changed}), 0) FROM {stage} s JOIN {table} t ON {join}"
+        ).fetchone()
+
+        if _UPSERT_SUPPORTED:
+            if value_columns:
+                assignments = ', '.join(f"{_quote(c)} = excluded.{_quote(c)}" for c in value_columns)
+                differs = ' OR '.join(f"{table}.{_quote(c)} IS NOT excluded.{_quote(c)}" for c in value_columns)
+                on_conflict = f"DO UPDATE SET {assignments} WHERE {differs}"
+            else:
+                on_conflict = "DO NOTHING"
+            conn.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} WHERE 1 "
+                f"ON CONFLICT ({', '.join(map(_quote, key_columns))}) {on_conflict}"
+            )
+        else:
+            # 舊版 SQLite 沒有 UPSERT 語法：只取新增或內容有變動的資料 REPLACE
+            stage_columns = ', '.join(f"s.{_quote(c)}" for c in columns)
+            conn.execute(
+                f"INSERT OR REPLACE INTO {table} ({column_list}) SELECT {stage_columns} FROM {stage} s "
+                f"LEFT JOIN {table} t ON {join} WHERE t.rowid IS NULL OR ({changed})"
+            )
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {
+        'inserted': len(rows) - existing,
+        'updated': int(updated),
+        'skipped': existing - int(updated),
+    }
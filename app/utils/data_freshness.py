@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+各股票資料時效性彙總（data_freshness）
+
+逐股收集模式原本在決定收集對象前，對每檔股票的每張資料表各執行
+存在檢查、COUNT、近期 COUNT、MAX(date) 等查詢，約 1800 檔股票光是預先
+掃描就要數分鐘。本模組把「每檔股票在每張表的筆數與最新日期」彙總到
+data_freshness 小表：
+- rebuild_data_freshness 對每張表執行一次 GROUP BY stock_id 彙總
+- update_data_freshness 只重新彙總剛寫入的股票（bulk_upsert 寫入後自動呼叫）
+- find_stale_stocks 以單一查詢列出缺資料或資料過舊的股票
+"""
+
+import json
+import logging
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (資料表, 說明, 時效天數, 最新日期運算式)
+FRESHNESS_TABLES = [
+    ('stock_prices', '股價資料', 7, "MAX(date)"),
+    # 月營收以該月最後一天計算（次月 10 日前公布）
+    ('monthly_revenues', '月營收資料', 45,
+     "date(MAX(printf('%04d-%02d-01', revenue_year, revenue_month)), '+1 month', '-1 day')"),
+    ('financial_statements', '財務報表資料', 120, "MAX(date)"),
+    ('dividend_policies', '股利政策資料', 365, "MAX(COALESCE(announcement_date, date))"),
+    ('stock_scores', '潛力股分析', 30, "MAX(analysis_date)"),
+]
+
+_TABLE_CONFIG = {table: (desc, days, expr) for table, desc, days, expr in FRESHNESS_TABLES}
+
+FRESHNESS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS data_freshness (
+        stock_id TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        record_count INTEGER NOT NULL,
+        latest_date TEXT,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (stock_id, table_name)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_data_freshness_table_date ON data_freshness(table_name, latest_date)",
+]
+
+# 所有 (股票, 資料表) 組合中沒有彙總或最新日期早於門檻者
+STALE_SQL = """
+WITH targets AS (
+    SELECT value AS stock_id FROM json_each(:stock_ids)
+),
+thresholds AS (
+    SELECT json_extract(value, '$[0]') AS table_name,
+           json_extract(value, '$[1]') AS threshold_date
+    FROM json_each(:thresholds)
+)
+SELECT t.stock_id, h.table_name, f.record_count, f.latest_date
+FROM targets t
+CROSS JOIN thresholds h
+LEFT JOIN data_freshness f ON f.stock_id = t.stock_id AND f.table_name = h.table_name
+WHERE f.stock_id IS NULL OR f.record_count = 0
+   OR f.latest_date IS NULL OR f.latest_date < h.threshold_date
+ORDER BY t.stock_id
+"""
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (table_name,)).fetchone() is not None
+
+
+def _aggregate(conn: sqlite3.Connection, table_name: str, where: str = "", params: tuple = ()):
+    """以 GROUP BY stock_id 彙總單張表並寫入 data_freshness"""
+    expr = _TABLE_CONFIG[table_name][2]
+    conn.execute(f"""
+        INSERT INTO data_freshness (stock_id, table_name, record_count, latest_date, updated_at)
+        SELECT stock_id, ?, COUNT(*), {expr}, ? FROM {table_name} {where} GROUP BY stock_id
+        ON CONFLICT(stock_id, table_name) DO UPDATE SET
+            record_count = excluded.record_count,
+            latest_date = excluded.latest_date,
+            updated_at = excluded.updated_at
+    """, (table_name, datetime.now().isoformat(timespec='seconds')) + params)
+
+
+def rebuild_data_freshness(conn: sqlite3.Connection, tables: Optional[Iterable[str]] = None) -> int:
+    """
+    重建 data_freshness（每張表一次 GROUP BY stock_id）
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+        tables: 要重建的資料表，None 表示 FRESHNESS_TABLES 全部
+
+    Returns:
+        彙總列數
+    """
+    for sql in FRESHNESS_SCHEMA:
+        conn.execute(sql)
+    tables = [t for t in (tables or _TABLE_CONFIG) if t in _TABLE_CONFIG]
+    with conn:
+        for table_name in tables:
+            conn.execute("DELETE FROM data_freshness WHERE table_name = ?", (table_name,))
+            if _table_exists(conn, table_name):
+                _aggregate(conn, table_name)
+    count = conn.execute("SELECT COUNT(*) FROM data_freshness").fetchone()[0]
+    logger.info(f"data_freshness 已重建: {count} 筆")
+    return count
+
+
+def update_data_freshness(conn: sqlite3.Connection, table_name: str, stock_ids: Iterable[str]) -> bool:
+    """
+    重新彙總指定股票在某張表的筆數與最新日期
+
+    data_freshness 尚未建立（從未執行 rebuild）或資料表不在追蹤清單時不做任何事，
+    避免只有部分股票的彙總被誤認為完整報告。
+
+    Returns:
+        是否有更新
+    """
+    stock_ids = [str(s) for s in stock_ids if s is not None]
+    if table_name not in _TABLE_CONFIG or not stock_ids or not _table_exists(conn, 'data_freshness'):
+        return False
+
+    with conn:
+        conn.execute("DELETE FROM data_freshness WHERE table_name = ? AND stock_id IN "
+                     "(SELECT value FROM json_each(?))", (table_name, json.dumps(stock_ids)))
+        _aggregate(conn, table_name, "WHERE stock_id IN (SELECT value FROM json_each(?))",
+                   (json.dumps(stock_ids),))
+    return True
+
+
+def refresh_stock_freshness(conn: sqlite3.Connection, stock_id: str) -> bool:
+    """重新彙總單一股票在所有追蹤資料表的狀態（收集完一檔股票後呼叫）"""
+    if not _table_exists(conn, 'data_freshness'):
+        return False
+    for table_name in _TABLE_CONFIG:
+        if _table_exists(conn, table_name):
+            update_data_freshness(conn, table_name, [stock_id])
+    return True
+
+
+def find_stale_stocks(conn: sqlite3.Connection, stock_ids: Iterable[str],
+                      today: Optional[date] = None) -> Dict[str, List[str]]:
+    """
+    以單一查詢找出需要更新的股票
+
+    Args:
+        conn: 資料庫連線（data_freshness 不存在時會先重建）
+        stock_ids: 候選股票
+        today: 基準日（預設今天）
+
+    Returns:
+        股票代碼 -> 需更新項目說明（例如 "股價資料(過舊:12天前)"）；資料完整的股票不會出現
+    """
+    if not _table_exists(conn, 'data_freshness'):
+        rebuild_data_freshness(conn)
+
+    today = today or date.today()
+    thresholds = [(table, (today - timedelta(days=days)).isoformat())
+                  for table, _, days, _ in FRESHNESS_TABLES]
+    rows = conn.execute(STALE_SQL, {'stock_ids': json.dumps([str(s) for s in stock_ids]),
+                                    'thresholds': json.dumps(thresholds)}).fetchall()
+
+    stale: Dict[str, List[str]] = {}
+    for stock_id, table_name, record_count, latest_date in rows:
+        desc = _TABLE_CONFIG[table_name][0]
+        if not record_count:
+            reason = f"{desc}(無資料)"
+        elif not latest_date:
+            reason = f"{desc}(無有效日期)"
+        else:
+            days_old = (today - datetime.fromisoformat(latest_date[:10]).date()).days
+            reason = f"{desc}(過舊:{days_old}天前)"
+        stale.setdefault(stock_id, []).append(reason)
+    return stale
+
+
+def describe_completeness(stock_id: str, stock_name: str, reasons: List[str]) -> Tuple[bool, str]:
+    """依需更新項目產生 (是否完整, 說明) ，格式與逐股收集模式的輸出一致"""
+    if not reasons:
+        return True, f"{stock_id}({stock_name}) 資料完整且時效性良好"
+    total = len(FRESHNESS_TABLES)
+    completeness = (total - len(reasons)) / total * 100
+    return False, f"{stock_id}({stock_name}) 需更新: {', '.join(reasons)} (完整度: {completeness:.1f}%)"
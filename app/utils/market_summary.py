@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+最新股價與每日市場摘要彙總表（latest_prices / daily_market_summary）
+
+儀表板每次重新執行都會呼叫市場摘要、漲跌排行、成交量排行，
+原本每個方法都先對 stock_prices 執行 MAX(date)，多檔最新價格則對每一列
+執行相關子查詢，都要掃描資料庫中最大的資料表。本模組維護兩張小表：
+- latest_prices：每檔股票一列，為該股票最新交易日的股價
+- daily_market_summary：每個交易日一列，上市中股票的漲跌家數與成交量 / 成交金額
+bulk_upsert 寫入 stock_prices 後以 update_market_summary 只重新彙總寫入的股票與日期，
+彙總表不存在時 ensure_market_summary 會先完整重建。其他直接寫入 stock_prices
+而未更新彙總表的新交易日，由 sync_market_summary 在查詢最新交易日時補上。
+"""
+
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# latest_prices 由 stock_prices 複製的欄位
+LATEST_PRICE_COLUMNS = ['date', 'open_price', 'high_price', 'low_price', 'close_price',
+                        'volume', 'trading_money', 'trading_turnover', 'spread']
+
+MARKET_SUMMARY_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS latest_prices (
+        stock_id TEXT PRIMARY KEY,
+        date DATE NOT NULL,
+        open_price REAL,
+        high_price REAL,
+        low_price REAL,
+        close_price REAL,
+        volume INTEGER,
+        trading_money REAL,
+        trading_turnover INTEGER,
+        spread REAL,
+        updated_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_latest_prices_date ON latest_prices(date)",
+    """
+    CREATE TABLE IF NOT EXISTS daily_market_summary (
+        date DATE PRIMARY KEY,
+        total_stocks INTEGER NOT NULL,
+        total_volume INTEGER,
+        total_trading_money REAL,
+        up_stocks INTEGER NOT NULL,
+        down_stocks INTEGER NOT NULL,
+        flat_stocks INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """,
+]
+
+# 與原本 get_market_summary 相同的統計（只計上市中的股票）
+DAILY_SUMMARY_SQL = """
+INSERT INTO daily_market_summary (date, total_stocks, total_volume, total_trading_money,
+                                  up_stocks, down_stocks, flat_stocks, updated_at)
+SELECT sp.date,
+       COUNT(DISTINCT sp.stock_id),
+       SUM(sp.volume),
+       SUM(sp.trading_money),
+       COUNT(CASE WHEN sp.spread > 0 THEN 1 END),
+       COUNT(CASE WHEN sp.spread < 0 THEN 1 END),
+       COUNT(CASE WHEN sp.spread = 0 THEN 1 END),
+       :updated_at
+FROM stock_prices sp
+JOIN stocks s ON sp.stock_id = s.stock_id
+WHERE s.is_active = 1 {where}
+GROUP BY sp.date
+ON CONFLICT(date) DO UPDATE SET
+    total_stocks = excluded.total_stocks,
+    total_volume = excluded.total_volume,
+    total_trading_money = excluded.total_trading_money,
+    up_stocks = excluded.up_stocks,
+    down_stocks = excluded.down_stocks,
+    flat_stocks = excluded.flat_stocks,
+    updated_at = excluded.updated_at
+"""
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (table_name,)).fetchone() is not None
+
+
+def _latest_prices_sql(conn: sqlite3.Connection, where: str = "") -> str:
+    """各股票最新交易日的股價（stock_prices 缺少的欄位以 NULL 代替）"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(stock_prices)")}
+    selected = ', '.join(f"sp.{col}" if col in existing else "NULL" for col in LATEST_PRICE_COLUMNS)
+    columns = ', '.join(LATEST_PRICE_COLUMNS)
+    updates = ',\n            '.join(f"{col} = excluded.{col}" for col in LATEST_PRICE_COLUMNS + ['updated_at'])
+    return f"""
+        INSERT INTO latest_prices (stock_id, {columns}, updated_at)
+        SELECT sp.stock_id, {selected}, :updated_at
+        FROM stock_prices sp
+        JOIN (SELECT stock_id, MAX(date) AS date FROM stock_prices {where} GROUP BY stock_id) m
+          ON sp.stock_id = m.stock_id AND sp.date = m.date
+        WHERE 1  -- INSERT ... SELECT 接 ON CONFLICT 時需有 WHERE 以避免語法歧義
+        ON CONFLICT(stock_id) DO UPDATE SET
+            {updates}
+    """
+
+
+def rebuild_market_summary(conn: sqlite3.Connection) -> int:
+    """
+    重建 latest_prices 與 daily_market_summary（各掃描 stock_prices 一次）
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+
+    Returns:
+        latest_prices 筆數
+    """
+    for sql in MARKET_SUMMARY_SCHEMA:
+        conn.execute(sql)
+    params = {'updated_at': datetime.now().isoformat(timespec='seconds')}
+    with conn:
+        conn.execute("DELETE FROM latest_prices")
+        conn.execute("DELETE FROM daily_market_summary")
+        if _table_exists(conn, 'stock_prices'):
+            conn.execute(_latest_prices_sql(conn), params)
+            if _table_exists(conn, 'stocks'):
+                conn.execute(DAILY_SUMMARY_SQL.format(where=""), params)
+    count = conn.execute("SELECT COUNT(*) FROM latest_prices").fetchone()[0]
+    days = conn.execute("SELECT COUNT(*) FROM daily_market_summary").fetchone()[0]
+    logger.info(f"市場摘要已重建: latest_prices {count} 筆，daily_market_summary {days} 個交易日")
+    return count
+
+
+def ensure_market_summary(conn: sqlite3.Connection) -> bool:
+    """彙總表不存在時先完整重建；回傳彙總表是否可用"""
+    if _table_exists(conn, 'latest_prices') and _table_exists(conn, 'daily_market_summary'):
+        return True
+    if not _table_exists(conn, 'stock_prices'):
+        return False
+    rebuild_market_summary(conn)
+    return True
+
+
+def update_market_summary(conn: sqlite3.Connection, stock_ids: Iterable[str],
+                          dates: Optional[Iterable[str]] = None) -> bool:
+    """
+    重新彙總指定股票的最新股價與指定交易日的市場摘要（寫入 stock_prices 後呼叫）
+
+    彙總表尚未建立時不做任何事，留待 ensure_market_summary 完整重建。
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+        stock_ids: 寫入的股票
+        dates: 寫入的交易日（與 stock_prices.date 相同格式，None 表示不更新每日摘要）
+
+    Returns:
+        是否有更新
+    """
+    stock_ids = [str(s) for s in stock_ids if s is not None]
+    dates = sorted({str(d) for d in dates if d is not None}) if dates is not None else []
+    if not stock_ids or not _table_exists(conn, 'latest_prices'):
+        return False
+
+    params = {'updated_at': datetime.now().isoformat(timespec='seconds'),
+              'stock_ids': json.dumps(stock_ids), 'dates': json.dumps(dates)}
+    with conn:
+        conn.execute(_latest_prices_sql(
+            conn, "WHERE stock_id IN (SELECT value FROM json_each(:stock_ids))"), params)
+        if dates and _table_exists(conn, 'daily_market_summary') and _table_exists(conn, 'stocks'):
+            conn.execute(DAILY_SUMMARY_SQL.format(
+                where="AND sp.date IN (SELECT value FROM json_each(:dates))"), params)
+    return True
+
+
+
+def sync_market_summary(conn: sqlite3.Connection) -> Optional[str]:
+    """
+    補上 stock_prices 中比 latest_prices 更新的交易日，回傳最新交易日
+
+    兩邊的 MAX(date) 都走索引；只有未經 update_market_summary 的寫入
+    （例如舊收集腳本直接 INSERT）留下較新的交易日時才重新彙總。
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+    """
+    latest = conn.execute("SELECT MAX(date) FROM latest_prices").fetchone()[0]
+    source = conn.execute("SELECT MAX(date) FROM stock_prices").fetchone()[0]
+    if source is None or (latest is not None and source <= latest):
+        return latest
+    newer = "FROM stock_prices WHERE date > ?" if latest is not None else "FROM stock_prices WHERE date >= ?"
+    since = latest if latest is not None else source
+    stock_ids = [row[0] for row in conn.execute(f"SELECT DISTINCT stock_id {newer}", (since,))]
+    dates = [row[0] for row in conn.execute(f"SELECT DISTINCT date {newer}", (since,))]
+    logger.info(f"latest_prices 落後 stock_prices（{latest} < {source}），補上 {len(dates)} 個交易日")
+    update_market_summary(conn, stock_ids, dates)
+    return source
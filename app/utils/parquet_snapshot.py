@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+核心資料表的 Parquet 欄式快照
+
+各分析子系統都以 pd.read_sql_query 逐列讀取 data/taiwan_stock.db，
+載入全市場十年股價面板要數十秒。本模組把核心資料表匯出為依年度分區的
+Parquet 快照（data/snapshots/<資料表>/partition_year=YYYY/part-0.parquet），並提供讀取 API：
+- 每個年度分區記錄簽章（筆數 / 最大 rowid / 內容雜湊），增量更新時只重寫
+  簽章有變動的年度，歷史年度不必重新匯出；內容雜湊涵蓋所有非鍵值欄位，
+  原地更新（ON CONFLICT DO UPDATE、成長率 UPDATE）不改變筆數與 rowid 也會被偵測
+- 讀取時以 pyarrow.dataset 依年度裁剪分區並以記憶體映射開檔，
+  只讀需要的欄位與股票
+
+需要 pyarrow；未安裝時 PYARROW_AVAILABLE 為 False，匯出會拋出 ImportError，
+讀取端（SnapshotReader.available）則回報不可用，呼叫端應退回 SQLite 查詢。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+
+from app.utils.bulk_upsert import find_unique_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_ds
+    import pyarrow.fs as pa_fs
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '_manifest.json'
+# 年度分區欄位（dividend_policies 本身已有 year 欄位，因此不使用 year）
+PARTITION_FIELD = 'partition_year'
+
+# 資料表 -> (年度運算式, 年度範圍條件)
+SNAPSHOT_TABLES = {
+    'stock_prices': ("CAST(substr(date, 1, 4) AS INTEGER)", "date >= :start AND date < :end"),
+    'monthly_revenues': ("revenue_year", "revenue_year = :year"),
+    'financial_statements': ("CAST(substr(date, 1, 4) AS INTEGER)", "date >= :start AND date < :end"),
+    'balance_sheets': ("CAST(substr(date, 1, 4) AS INTEGER)", "date >= :start AND date < :end"),
+    'cash_flow_statements': ("CAST(substr(date, 1, 4) AS INTEGER)", "date >= :start AND date < :end"),
+    'dividend_policies': ("CAST(substr(date, 1, 4) AS INTEGER)", "date >= :start AND date < :end"),
+}
+
+# 內容雜湊的模數：每筆的雜湊值小於此值，以整數 SUM 合計不會溢位，且結果與掃描順序無關
+CHECKSUM_MODULUS = 2147483647
+# 寫入時間欄位只在新增時變動（新增一定會改變 rowid），不納入內容雜湊
+_TIMESTAMP_COLUMNS = {'created_at', 'updated_at'}
+
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Parquet 快照需要 pyarrow，請執行 pip install pyarrow")
+
+
+def _table_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+
+def _arrow_type(declared: str):
+    """依 SQLite 宣告型別決定 Arrow 型別（各年度分區使用一致的 schema）"""
+    declared = (declared or '').upper()
+    if 'DATE' in declared or 'TIME' in declared:
+        return pa.string()
+    if 'INT' in declared or 'BOOL' in declared:
+        return pa.int64()
+    if any(key in declared for key in ('REAL', 'FLOA', 'DOUB', 'NUMERIC', 'DECIMAL')):
+        return pa.float64()
+    return pa.string()
+
+
+def _arrow_schema(conn: sqlite3.Connection, table_name: str):
+    return pa.schema([(row[1], _arrow_type(row[2]))
+                      for row in conn.execute(f"PRAGMA table_info({table_name})")])
+
+
+def _text_crc(value) -> Optional[int]:
+    """文字欄位的 CRC32（SQLite 沒有內建雜湊函數）"""
+    return None if value is None else zlib.crc32(str(value).encode('utf-8'))
+
+
+def _row_checksum_expr(conn: sqlite3.Connection, table_name: str) -> str:
+    """
+    單筆資料內容雜湊的 SQL 運算式（小於 CHECKSUM_MODULUS）
+
+    涵蓋自動遞增主鍵、唯一鍵與寫入時間以外的所有欄位：數值欄以整數運算混合
+    （股價表全為數值欄，不需呼叫 Python 函數），文字欄以 snapshot_crc()；
+    各欄乘上不同係數、整筆再乘上 rowid 權重，欄位或資料列之間互換數值也會改變雜湊
+    """
+    schema = list(conn.execute(f"PRAGMA table_info({table_name})"))
+    names = [row[1] for row in schema]
+    keys = set(find_unique_key(conn, table_name, names) or [])
+    terms = []
+    for row in schema:
+        name, declared, pk = row[1], row[2], row[5]
+        if pk or name in keys or name in _TIMESTAMP_COLUMNS:
+            continue
+        if _arrow_type(declared) in (pa.int64(), pa.float64()):
+            value = f"CAST(ROUND({name} * 10000) AS INTEGER) % {CHECKSUM_MODULUS}"
+        else:
+            value = f"snapshot_crc({name}) % {CHECKSUM_MODULUS}"
+        # NULL 與 0 視為不同內容
+        terms.append(f"COALESCE({value}, 7919) * {len(terms) + 1}")
+    if not terms:
+        return "0"
+    row_value = f"(({' + '.join(terms)}) % {CHECKSUM_MODULUS})"
+    return f"({row_value} * (rowid % {CHECKSUM_MODULUS} + 1) % {CHECKSUM_MODULUS})"
+
+
+def _partition_signatures(conn: sqlite3.Connection, table_name: str) -> Dict[int, List]:
+    """各年度的 [筆數, 最大 rowid, 內容雜湊]"""
+    year_expr, _ = SNAPSHOT_TABLES[table_name]
+    conn.create_function('snapshot_crc', 1, _text_crc, deterministic=True)
+    rows = conn.execute(f"""
+        SELECT {year_expr} AS year, COUNT(*), MAX(rowid), SUM({_row_checksum_expr(conn, table_name)})
+        FROM {table_name}
+        GROUP BY year
+    """).fetchall()
+    return {int(year): [count, max_rowid, checksum]
+            for year, count, max_rowid, checksum in rows if year is not None}
+
+
+def _read_partition(conn: sqlite3.Connection, table_name: str, year: int) -> pd.DataFrame:
+    _, condition = SNAPSHOT_TABLES[table_name]
+    params = {'year': year, 'start': f"{year:04d}-01-01", 'end': f"{year + 1:04d}-01-01"}
+    order = "stock_id, date" if 'date' in _table_columns(conn, table_name) else "stock_id"
+    return pd.read_sql_query(f"SELECT * FROM {table_name} WHERE {condition} ORDER BY {order}",
+                             conn, params=params)
+
+
+def _write_partition(df: pd.DataFrame, schema, path: Path):
+    """寫入暫存檔後再換名，讀取端不會讀到寫到一半的檔案"""
+    df = df.copy()
+    for field in schema:
+        if field.type == pa.string():
+            # SQLite 欄位可能混存數值與文字
+            column = df[field.name]
+            df[field.name] = column.where(column.isna(), column.astype(str))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.parquet.tmp')
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def _load_manifest(snapshot_dir: Path) -> Dict:
+    path = snapshot_dir / MANIFEST_NAME
+    if path.exists():
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except Exception as e:
+            logger.warning(f"快照清單讀取失敗，將完整重建: {e}")
+    return {'tables': {}}
+
+
+def _save_manifest(snapshot_dir: Path, manifest: Dict):
+    path = snapshot_dir / MANIFEST_NAME
+    tmp_path = path.with_suffix('.json.tmp')
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def export_snapshots(db_path: Union[str, Path],
+                     snapshot_dir: Union[str, Path],
+                     tables: Optional[Iterable[str]] = None,
+                     full: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    匯出（或增量更新）Parquet 快照
+
+    Args:
+        db_path: SQLite 資料庫路徑
+        snapshot_dir: 快照根目錄
+        tables: 要匯出的資料表（None 表示 SNAPSHOT_TABLES 全部）
+        full: 忽略簽章，重寫所有年度
+
+    Returns:
+        資料表 -> {'written', 'skipped', 'removed', 'rows'}（年度分區數與寫入筆數）
+    """
+    _require_pyarrow()
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(snapshot_dir)
+    results: Dict[str, Dict[str, int]] = {}
+
+    conn = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+    try:
+        for table_name in tables or SNAPSHOT_TABLES:
+            if table_name not in SNAPSHOT_TABLES:
+                logger.warning(f"不支援的快照資料表: {table_name}")
+                continue
+            if not _table_columns(conn, table_name):
+                logger.warning(f"資料表不存在，略過快照: {table_name}")
+                continue
+
+            result = {'written': 0, 'skipped': 0, 'removed': 0, 'rows': 0}
+            table_dir = snapshot_dir / table_name
+            schema = _arrow_schema(conn, table_name)
+            recorded = manifest['tables'].get(table_name, {})
+            # 欄位變動時所有年度都需以新 schema 重寫
+            if full or recorded.get('columns') != schema.names:
+                previous = {}
+            else:
+                previous = recorded.get('partitions', {})
+            signatures = _partition_signatures(conn, table_name)
+
+            for year, signature in sorted(signatures.items()):
+                path = table_dir / f"{PARTITION_FIELD}={year}" / "part-0.parquet"
+                if previous.get(str(year)) == signature and path.exists():
+                    result['skipped'] += 1
+                    continue
+                df = _read_partition(conn, table_name, year)
+                _write_partition(df, schema, path)
+                result['written'] += 1
+                result['rows'] += len(df)
+
+            # 資料庫中已不存在的年度
+            for year in set(previous) - {str(y) for y in signatures}:
+                path = table_dir / f"{PARTITION_FIELD}={year}" / "part-0.parquet"
+                if path.exists():
+                    path.unlink()
+                    path.parent.rmdir()
+                result['removed'] += 1
+
+            manifest['tables'][table_name] = {
+                'columns': schema.names,
+                'partitions': {str(year): signature for year, signature in signatures.items()},
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            _save_manifest(snapshot_dir, manifest)
+            results[table_name] = result
+            logger.info(f"{table_name} 快照: 寫入 {result['written']} 個年度 ({result['rows']} 筆)，"
+                        f"略過 {result['skipped']} 個未變動年度")
+    finally:
+        conn.close()
+
+    return results
+
+
+class SnapshotReader:
+    """Parquet 快照讀取器"""
+
+    def __init__(self, snapshot_dir: Union[str, Path]):
+        self.snapshot_dir = Path(snapshot_dir)
+        self._datasets: Dict[str, object] = {}
+        self._tables: Optional[set] = None
+
+    def __getstate__(self):
+        """序列化到子行程時不攜帶已開啟的 dataset"""
+        return {'snapshot_dir': self.snapshot_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state['snapshot_dir'])
+
+    def available(self, table_name: str) -> bool:
+        """該資料表是否有可讀取的快照"""
+        if not PYARROW_AVAILABLE:
+            return False
+        if self._tables is None:
+            self._tables = set(_load_manifest(self.snapshot_dir)['tables'])
+        return table_name in self._tables and (self.snapshot_dir / table_name).is_dir()
+
+    def _dataset(self, table_name: str):
+        dataset = self._datasets.get(table_name)
+        if dataset is None:
+            dataset = pa_ds.dataset(str(self.snapshot_dir / table_name), format='parquet',
+                                    partitioning='hive', filesystem=pa_fs.LocalFileSystem(use_mmap=True))
+            self._datasets[table_name] = dataset
+        return dataset
+
+    def refresh(self):
+        """快照更新後重新探索分區檔案"""
+        self._datasets.clear()
+        self._tables = None
+
+    def read_table(self,
+                   table_name: str,
+                   columns: Optional[List[str]] = None,
+                   stock_ids: Optional[Iterable[str]] = None,
+                   start_date: Optional[str] = None,
+                   end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        讀取快照
+
+        Args:
+            table_name: 資料表
+            columns: 只讀取這些欄位（None 表示全部）
+            stock_ids: 只讀取這些股票
+            start_date: 開始日期（含，YYYY-MM-DD；月營收以年月比較）
+            end_date: 結束日期（含）
+
+        Returns:
+            DataFrame（依 stock_id、日期排序）
+        """
+        _require_pyarrow()
+        dataset = self._dataset(table_name)
+        names = set(dataset.schema.names)
+        by_month = 'date' not in names and {'revenue_year', 'revenue_month'} <= names
+
+        expr = None
+
+        def add(condition):
+            nonlocal expr
+            expr = condition if expr is None else expr & condition
+
+        if stock_ids is not None:
+            add(pa_ds.field('stock_id').isin([str(s) for s in stock_ids]))
+        # 年度分區裁剪
+        if start_date:
+            add(pa_ds.field(PARTITION_FIELD) >= int(str(start_date)[:4]))
+        if end_date:
+            add(pa_ds.field(PARTITION_FIELD) <= int(str(end_date)[:4]))
+        if by_month:
+            period = pa_ds.field('revenue_year') * 100 + pa_ds.field('revenue_month')
+            if start_date:
+                add(period >= int(str(start_date)[:4]) * 100 + int(str(start_date)[5:7] or 1))
+            if end_date:
+                add(period <= int(str(end_date)[:4]) * 100 + int(str(end_date)[5:7] or 12))
+        elif 'date' in names:
+            if start_date:
+                add(pa_ds.field('date') >= str(start_date)[:10])
+            if end_date:
+                next_day = (pd.Timestamp(str(end_date)[:10]) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+                add(pa_ds.field('date') < next_day)
+
+        if columns is not None:
+            columns = [c for c in columns if c in names]
+        table = dataset.to_table(columns=columns, filter=expr)
+        df = table.to_pandas()
+        if PARTITION_FIELD in df.columns:
+            df = df.drop(columns=PARTITION_FIELD)
+
+        sort_keys = [c for c in ('stock_id', 'date', 'revenue_year', 'revenue_month') if c in df.columns]
+        if sort_keys:
+            df = df.sort_values(sort_keys).reset_index(drop=True)
+        return df
+
+
+def get_default_snapshot_dir(db_path: Union[str, Path]) -> Path:
+    """資料庫同目錄下的 snapshots 目錄"""
+    return Path(db_path).resolve().parent / 'snapshots'
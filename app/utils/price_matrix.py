@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記憶體映射的股價矩陣（交易日 x 股票）
+
+各回測引擎每個期間、每檔股票都重新從 SQLite 讀取收盤價，每個行程也各自
+持有一份 DataFrame。本模組把 stock_prices 排成稠密矩陣（價格為 float32），
+每個欄位一個 .npy 檔（open / high / low / close / volume），另存日期索引與股票索引：
+
+    data/price_matrix/
+        dates.npy        datetime64[D]，依交易日曆排序
+        stocks.npy       股票代碼（欄順序固定，新股票附加在最後）
+        close.npy ...    shape = (交易日數, 股票數)，無資料為 NaN
+        meta.json
+
+讀取端以 np.load(mmap_mode='r') 開啟，切片不複製資料，多個行程共用
+作業系統的頁面快取。增量更新只讀取最後幾個交易日之後的股價，
+並把新交易日附加到矩陣末端（最近 REFILL_DAYS 個交易日會重新填入，
+補上當天只收集到部分股票的情況）。
+
+meta.json 另記錄每檔股票在重新填入範圍之前的筆數與最大 rowid；
+下次增量更新時比對，之後才回補的歷史（新收集股票的十年資料、
+續傳收集補上的舊缺口）會整欄重新讀取，不會只留下最近幾天。
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.utils.sqlite_pool import pooled_connection
+from app.utils.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# 欄位 -> (stock_prices 欄位, 儲存型別)
+# 價格以 float32 儲存；成交量常超過 float32 可精確表示的 2^24，改用 float64
+FIELDS = {
+    'open': ('open_price', np.float32),
+    'high': ('high_price', np.float32),
+    'low': ('low_price', np.float32),
+    'close': ('close_price', np.float32),
+    'volume': ('volume', np.float64),
+}
+# float32 還原為 float64 時四捨五入的小數位數（台股價格最多兩位小數）
+PRICE_DECIMALS = 4
+
+# 增量更新時重新填入的最近交易日數
+REFILL_DAYS = 5
+READ_CHUNK_ROWS = 500_000
+
+
+def get_default_matrix_dir(db_path: Union[str, Path]) -> Path:
+    """資料庫同目錄下的 price_matrix 目錄"""
+    return Path(db_path).resolve().parent / 'price_matrix'
+
+
+def _save_npy(path: Path, array: np.ndarray):
+    """寫入暫存檔後再換名，已開啟的記憶體映射仍指向舊檔案"""
+    tmp_path = path.with_name(path.stem + '.tmp.npy')
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _load_meta(matrix_dir: Path) -> Dict:
+    try:
+        return json.loads((matrix_dir / 'meta.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _history_signatures(conn, before: str) -> Dict[str, List[int]]:
+    """每檔股票 before 之前的 [筆數, 最大 rowid]（回補或以 INSERT OR REPLACE 重寫都會改變）"""
+    return {str(stock_id): [count, max_rowid] for stock_id, count, max_rowid in conn.execute(
+        "SELECT stock_id, COUNT(*), MAX(rowid) FROM stock_prices WHERE date < ? GROUP BY stock_id", (before,))}
+
+
+def build_price_matrix(db_path: Union[str, Path],
+                       out_dir: Union[str, Path, None] = None,
+                       full: bool = False) -> Dict[str, int]:
+    """
+    建立或增量更新股價矩陣
+
+    Args:
+        db_path: SQLite 資料庫路徑
+        out_dir: 輸出目錄（預設為資料庫同目錄下的 price_matrix）
+        full: 忽略既有矩陣完整重建
+
+    Returns:
+        {'days', 'stocks', 'new_days', 'new_stocks', 'refilled_stocks', 'rows'}
+    """
+    out_dir = Path(out_dir) if out_dir is not None else get_default_matrix_dir(db_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    old = None if full else PriceMatrix.open(out_dir, missing_ok=True)
+    calendar = get_trading_calendar(db_path)
+    calendar.refresh()
+
+    with pooled_connection(db_path, read_only=True) as conn:
+        first_date, last_date = conn.execute("SELECT MIN(date), MAX(date) FROM stock_prices").fetchone()
+        if first_date is None:
+            logger.warning("stock_prices 沒有資料，略過股價矩陣建立")
+            return {'days': 0, 'stocks': 0, 'new_days': 0, 'new_stocks': 0, 'refilled_stocks': 0, 'rows': 0}
+
+        # 保留的既有列數（最近 REFILL_DAYS 個交易日重新填入）
+        keep = 0 if old is None else max(0, len(old.dates) - REFILL_DAYS)
+        old_meta = _load_meta(out_dir) if keep else {}
+        if keep and (old_meta.get('history_before') != str(old.dates[keep])
+                     or first_date[:10] < str(old.dates[0])
+                     or calendar.trading_days(str(old.dates[0]), str(old.dates[keep - 1]))
+                     != old.dates[:keep].astype(str).tolist()):
+            # 沒有比對基準、回補了更早的歷史或保留範圍的交易日曆已變動，完整重建
+            logger.info("股價矩陣保留範圍無法沿用，完整重建")
+            keep = 0
+        refill_from = first_date[:10] if keep == 0 else str(old.dates[keep])
+
+        # 保留範圍內筆數或最大 rowid 有變動的股票（含保留範圍內才出現的新股票）整欄重新讀取
+        if keep:
+            recorded = old_meta.get('history', {})
+            current = _history_signatures(conn, refill_from)
+            changed = sorted(sid for sid in set(current) | set(recorded) if current.get(sid) != recorded.get(sid))
+        else:
+            current, changed = {}, []
+        dates = np.array(calendar.trading_days(refill_from, last_date[:10]), dtype='datetime64[D]')
+        if old is not None and keep:
+            dates = np.concatenate([old.dates[:keep], dates])
+
+        existing_stocks = [] if old is None else old.stocks.tolist()
+        known = set(existing_stocks)
+        recent = {row[0] for row in conn.execute(
+            "SELECT DISTINCT stock_id FROM stock_prices WHERE date >= ?", (refill_from,))}
+        new_stocks = sorted((recent | set(current)) - known)
+        stocks = np.array(existing_stocks + new_stocks, dtype=str)
+
+        shape = (len(dates), len(stocks))
+        arrays = {field: np.full(shape, np.nan, dtype=dtype) for field, (_, dtype) in FIELDS.items()}
+        if old is not None and keep:
+            refilled = set(changed)
+            stale = [i for i, sid in enumerate(existing_stocks) if sid in refilled]
+            for field in FIELDS:
+                arrays[field][:keep, :len(existing_stocks)] = old.field(field)[:keep]
+                arrays[field][:keep, stale] = np.nan
+
+        date_index = pd.Index(dates.astype(str))
+        stock_index = pd.Index(stocks)
+        columns = ', '.join(f"{column} AS {field}" for field, (column, _) in FIELDS.items())
+        select = f"SELECT stock_id, substr(date, 1, 10) AS date, {columns} FROM stock_prices"
+        queries = [(f"{select} WHERE date >= ?", (refill_from,))]
+        if changed:
+            queries.append((f"{select} WHERE date < ? AND stock_id IN (SELECT value FROM json_each(?))",
+                            (refill_from, json.dumps(changed))))
+        rows = 0
+        for sql, params in queries:
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=READ_CHUNK_ROWS):
+                row_idx = date_index.get_indexer(chunk['date'])
+                col_idx = stock_index.get_indexer(chunk['stock_id'].astype(str))
+                # 非交易日（個別股票的零星錯誤資料）不放入矩陣
+                valid = (row_idx >= 0) & (col_idx >= 0)
+                for field, (_, dtype) in FIELDS.items():
+                    values = pd.to_numeric(chunk[field], errors='coerce').to_numpy(dtype=dtype)
+                    arrays[field][row_idx[valid], col_idx[valid]] = values[valid]
+                rows += int(valid.sum())
+
+        # 下次增量更新的比對基準（屆時會保留到此日之前）
+        history_before = str(dates[len(dates) - REFILL_DAYS]) if len(dates) > REFILL_DAYS else None
+        history = _history_signatures(conn, history_before) if history_before else {}
+
+    # 先寫矩陣與索引，最後寫 meta.json
+    for field, array in arrays.items():
+        _save_npy(out_dir / f"{field}.npy", array)
+    _save_npy(out_dir / 'dates.npy', dates)
+    _save_npy(out_dir / 'stocks.npy', stocks)
+    meta = {
+        'shape': list(shape),
+        'fields': list(FIELDS),
+        'first_date': str(dates[0]) if len(dates) else None,
+        'last_date': str(dates[-1]) if len(dates) else None,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'history_before': history_before,
+        'history': history,
+    }
+    (out_dir / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    result = {'days': shape[0], 'stocks': shape[1],
+              'new_days': shape[0] - (0 if old is None else len(old.dates)),
+              'new_stocks': len(new_stocks) if old is not None else shape[1],
+              'refilled_stocks': len(changed), 'rows': rows}
+    logger.info(f"股價矩陣已更新: {shape[0]} 個交易日 x {shape[1]} 檔股票，讀取 {rows} 筆")
+    return result
+
+
+class PriceMatrix:
+    """唯讀的記憶體映射股價矩陣"""
+
+    def __init__(self, matrix_dir: Union[str, Path]):
+        self.matrix_dir = Path(matrix_dir)
+        self.version = _meta_version(self.matrix_dir)
+        self.dates: np.ndarray = np.load(self.matrix_dir / 'dates.npy')
+        self.stocks: np.ndarray = np.load(self.matrix_dir / 'stocks.npy')
+        self._stock_pos = {stock_id: i for i, stock_id in enumerate(self.stocks.tolist())}
+        self._fields: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def open(cls, matrix_dir: Union[str, Path], missing_ok: bool = False) -> Optional['PriceMatrix']:
+        """開啟矩陣；missing_ok 時目錄不存在或不完整回傳 None"""
+        try:
+            return cls(matrix_dir)
+        except (FileNotFoundError, OSError, ValueError):
+            if missing_ok:
+                return None
+            raise
+
+    def __getstate__(self):
+        """序列化到子行程時只攜帶路徑，子行程自行映射同一份檔案"""
+        return {'matrix_dir': self.matrix_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state['matrix_dir'])
+
+    def field(self, name: str) -> np.ndarray:
+        """欄位矩陣（np.memmap，shape = (交易日數, 股票數)）"""
+        array = self._fields.get(name)
+        if array is None:
+            array = np.load(self.matrix_dir / f"{name}.npy", mmap_mode='r')
+            self._fields[name] = array
+        return array
+
+    def has_stock(self, stock_id: str) -> bool:
+        return str(stock_id) in self._stock_pos
+
+    def stock_index(self, stock_id: str) -> Optional[int]:
+        return self._stock_pos.get(str(stock_id))
+
+    def date_slice(self, start_date=None, end_date=None) -> slice:
+        """start_date~end_date（含）對應的列範圍"""
+        lo = 0 if start_date is None else int(np.searchsorted(self.dates, np.datetime64(str(start_date)[:10], 'D'), 'left'))
+        hi = len(self.dates) if end_date is None else int(
+            np.searchsorted(self.dates, np.datetime64(str(end_date)[:10], 'D'), 'right'))
+        return slice(lo, hi)
+
+    def covers(self, start_date=None, end_date=None) -> bool:
+        """查詢期間是否在矩陣涵蓋範圍內（超出時呼叫端應改查資料庫）"""
+        if not len(self.dates):
+            return False
+        if end_date is not None and np.datetime64(str(end_date)[:10], 'D') > self.dates[-1]:
+            return False
+        return True
+
+    def series(self, stock_id: str, start_date=None, end_date=None, field: str = 'close') -> np.ndarray:
+        """單一股票的欄位序列（不複製資料的 view，含 NaN）"""
+        col = self.stock_index(stock_id)
+        if col is None:
+            return np.empty(0, dtype=np.float32)
+        return self.field(field)[self.date_slice(start_date, end_date), col]
+
+    def panel(self, stock_ids: Iterable[str], start_date=None, end_date=None,
+              field: str = 'close') -> pd.DataFrame:
+        """多檔股票的寬表（index 為日期，columns 為股票；矩陣外的股票為 NaN）"""
+        stock_ids = [str(s) for s in stock_ids]
+        rows = self.date_slice(start_date, end_date)
+        block = self.field(field)[rows]
+        cols = [self.stock_index(s) for s in stock_ids]
+        data = np.full((block.shape[0], len(stock_ids)), np.nan, dtype=block.dtype)
+        present = [i for i, c in enumerate(cols) if c is not None]
+        if present:
+            data[:, present] = block[:, [cols[i] for i in present]]
+        return pd.DataFrame(data, index=pd.DatetimeIndex(self.dates[rows]), columns=stock_ids)
+
+    def frame(self, stock_id: str, start_date=None, end_date=None,
+              fields: Iterable[str] = ('open', 'high', 'low', 'close', 'volume')) -> pd.DataFrame:
+        """單一股票有資料的交易日（欄位: date + fields），與 SQLite 查詢結果格式相同"""
+        col = self.stock_index(stock_id)
+        fields = list(fields)
+        if col is None:
+            return pd.DataFrame(columns=['date'] + fields)
+        rows = self.date_slice(start_date, end_date)
+        values = {field: self._as_float64(field, self.field(field)[rows, col]) for field in fields}
+        mask = ~np.isnan(values[fields[0]]) if fields else np.ones(rows.stop - rows.start, dtype=bool)
+        dates = self.dates[rows][mask].astype('datetime64[ns]')
+        return pd.DataFrame({'date': dates, **{field: values[field][mask] for field in fields}})
+
+    @staticmethod
+    def _as_float64(field: str, values: np.ndarray) -> np.ndarray:
+        """轉為 float64；float32 價格四捨五入去除 523.1 -> 523.0999755 之類的表示誤差"""
+        values = np.asarray(values, dtype=np.float64)
+        if FIELDS.get(field, (None, np.float64))[1] == np.float32:
+            values = values.round(PRICE_DECIMALS)
+        return values
+
+    def value_at(self, stock_id: str, date, field: str = 'close') -> Optional[float]:
+        """指定交易日的值，非交易日或無資料回傳 None"""
+        col = self.stock_index(stock_id)
+        if col is None:
+            return None
+        day = np.datetime64(str(date)[:10], 'D')
+        row = int(np.searchsorted(self.dates, day))
+        if row >= len(self.dates) or self.dates[row] != day:
+            return None
+        value = float(self._as_float64(field, self.field(field)[row, col]))
+        return None if np.isnan(value) else value
+
+
+def _meta_version(matrix_dir: Path) -> Optional[int]:
+    """meta.json 的修改時間（每次建立最後寫入，用來判斷矩陣是否已重建）"""
+    try:
+        return (matrix_dir / 'meta.json').stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+_matrices: Dict[str, PriceMatrix] = {}
+
+
+def open_price_matrix(matrix_dir: Union[str, Path]) -> Optional[PriceMatrix]:
+    """開啟（並於行程內共用）股價矩陣；矩陣重建後重新映射，不存在時回傳 None"""
+    key = str(Path(matrix_dir).resolve())
+    matrix = _matrices.get(key)
+    if matrix is None or matrix.version != _meta_version(matrix.matrix_dir):
+        matrix = PriceMatrix.open(matrix_dir, missing_ok=True)
+        if matrix is not None:
+            _matrices[key] = matrix
+    return matrix
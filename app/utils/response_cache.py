@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web 回應快取（TTL + LRU，依資料版本失效）
+
+每個快取項目記錄產生時的資料版本，版本不同或超過存活時間即視為未命中；
+項目數超過上限時淘汰最久未使用者。ETag 為回應內容的雜湊，
+內容未變動時瀏覽器與反向代理可以 If-None-Match 取得 304。
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, NamedTuple, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    mimetype: str
+    etag: str
+    data_version: str
+    created: float
+
+
+def make_etag(body: bytes) -> str:
+    """回應內容的 ETag（不含引號）"""
+    return hashlib.md5(body).hexdigest()
+
+
+class ResponseCache:
+    """回應快取（執行緒安全）"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, data_version: str) -> Optional[CachedResponse]:
+        """取得快取的回應；資料版本不同或已過期時回傳 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.data_version != data_version or \
+                    time.monotonic() - entry.created > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, data_version: str, body: bytes, mimetype: str) -> CachedResponse:
+        """存入回應並回傳快取項目"""
+        entry = CachedResponse(body, mimetype, make_etag(body), data_version, time.monotonic())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ExpiringValue(Generic[T]):
+    """定期重新讀取的值（例如資料版本，避免每個請求都查詢資料庫）"""
+
+    def __init__(self, loader: Callable[[], T], ttl_seconds: float = 5):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self._value: Optional[T] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                self._value = self.loader()
+                self._loaded_at = time.monotonic()
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+月營收成長率（月增率 / 年增率）集合式重算
+
+原本逐檔股票讀出全部月營收，以巢狀迴圈尋找去年同月，再逐筆 UPDATE。
+本模組以一條 UPDATE 搭配相關子查詢完成：前一個月與去年同月都以
+(stock_id, revenue_year, revenue_month) 唯一索引查找，整張表或指定股票、
+指定月份之後的資料在同一個交易內重算，全市場也只需數秒。
+
+月增率以「前一個日曆月」計算；中間缺月時月增率為 NULL，
+不再與更早的月份比較。
+"""
+
+import json
+import logging
+import sqlite3
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple, Union
+
+from app.utils.table_stats import record_table_update
+
+logger = logging.getLogger(__name__)
+
+# 前一個日曆月與去年同月皆以 (stock_id, revenue_year, revenue_month) 唯一索引查找
+GROWTH_UPDATE_SQL = """
+UPDATE monthly_revenues SET
+    revenue_growth_mom = (
+        SELECT CASE WHEN p.revenue > 0
+                    THEN (monthly_revenues.revenue - p.revenue) * 100.0 / p.revenue END
+        FROM monthly_revenues p
+        WHERE p.stock_id = monthly_revenues.stock_id
+          AND p.revenue_year = monthly_revenues.revenue_year - (monthly_revenues.revenue_month = 1)
+          AND p.revenue_month = CASE WHEN monthly_revenues.revenue_month = 1 THEN 12
+                                     ELSE monthly_revenues.revenue_month - 1 END
+    ),
+    revenue_growth_yoy = (
+        SELECT CASE WHEN p.revenue > 0
+                    THEN (monthly_revenues.revenue - p.revenue) * 100.0 / p.revenue END
+        FROM monthly_revenues p
+        WHERE p.stock_id = monthly_revenues.stock_id
+          AND p.revenue_year = monthly_revenues.revenue_year - 1
+          AND p.revenue_month = monthly_revenues.revenue_month
+    )
+WHERE {where}
+"""
+
+
+def _parse_watermark(since: Union[str, date, datetime, Tuple[int, int], None]) -> Optional[int]:
+    """將 'YYYY-MM' / 'YYYY-MM-DD' / date / (年, 月) 轉為 年*100+月"""
+    if since is None:
+        return None
+    if isinstance(since, tuple):
+        year, month = since
+    elif isinstance(since, (date, datetime)):
+        year, month = since.year, since.month
+    else:
+        year, month = int(str(since)[:4]), int(str(since)[5:7])
+    return year * 100 + month
+
+
+def fetch_start_watermark(start_date: Union[str, date, datetime]) -> Tuple[int, int]:
+    """
+    依 FinMind 抓取起始日算出重算的起始月份
+
+    FinMind 月營收的 date 是營收月份的次月（例如 2024-05-01 為 2024/04 營收），
+    從 start_date 抓取時第一筆資料是前一個月的營收，因此從前一個月開始重算。
+    """
+    watermark = _parse_watermark(start_date)
+    year, month = divmod(watermark, 100)
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def recompute_revenue_growth(conn: sqlite3.Connection,
+                             stock_ids: Optional[Iterable[str]] = None,
+                             since: Union[str, date, datetime, Tuple[int, int], None] = None) -> int:
+    """
+    重算月營收成長率
+
+    Args:
+        conn: 資料庫連線
+        stock_ids: 只重算這些股票（None 表示全部）
+        since: 只重算此月份（含）之後的資料，例如 '2024-05' 或 (2024, 5)；
+               重新收集某月營收後，該月之後的月增率 / 年增率都會一併更新；
+               以抓取起始日重算時請用 fetch_start_watermark(start_date)
+
+    Returns:
+        重算的筆數
+    """
+    conditions, params = [], []
+    if stock_ids is not None:
+        stock_ids = [str(s) for s in stock_ids]
+        if not stock_ids:
+            return 0
+        conditions.append("stock_id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(stock_ids))
+    watermark = _parse_watermark(since)
+    if watermark is not None:
+        conditions.append("revenue_year * 100 + revenue_month >= ?")
+        params.append(watermark)
+
+    where = ' AND '.join(conditions) or '1'
+    try:
+        with conn:
+            updated = conn.execute(GROWTH_UPDATE_SQL.format(where=where), params).rowcount
+    except Exception as e:
+        logger.error(f"重算月營收成長率失敗: {e}")
+        return 0
+
+    if updated:
+        # 就地更新不改變筆數，另外標記 table_stats 讓依資料版本快取的頁面重新組成
+        record_table_update(conn, 'monthly_revenues')
+
+    logger.info(f"月營收成長率重算完成，更新 {updated} 筆")
+    return updated
@@ -11,6 +11,10 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 import pandas as pd
 
+from app.utils.sqlite_pool import get_sqlite_pool
+from app.utils.bulk_upsert import DEFAULT_BATCH_SIZE, bulk_upsert_dataframe
+from app.utils.table_stats import record_stock_write, snapshot_stock_stats
+
 class SimpleDatabaseManager:
     """簡化版資料庫管理器"""
     
@@ -26,9 +30,13 @@ class SimpleDatabaseManager:
             os.makedirs(db_dir)
             print(f"建立資料庫目錄: {db_dir}")
     
-    def get_connection(self):
-        """取得資料庫連接"""
-        return sqlite3.connect(self.database_path)
+    def get_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """取得資料庫連接（來自共用連線池，conn.close() 會歸還連線池）"""
+        return get_sqlite_pool(self.database_path).acquire(read_only=read_only)
+
+    def connection(self, read_only: bool = False):
+        """以上下文管理器取得連接，離開時自動歸還連線池"""
+        return get_sqlite_pool(self.database_path).connection(read_only=read_only)
     
     def create_tables(self):
         """建立所有資料表"""
@@ -303,7 +311,7 @@ class SimpleDatabaseManager:
             ("stock_scores", stock_scores_table)
         ]
         
-        with self.get_connection() as conn:
+        with self.connection() as conn:
             cursor = conn.cursor()
             
             for table_name, table_sql in tables:
@@ -345,7 +353,7 @@ class SimpleDatabaseManager:
             "CREATE INDEX IF NOT EXISTS idx_data_updates_type_date ON data_updates(update_type, last_update_date);",
         ]
         
-        with self.get_connection() as conn:
+        with self.connection() as conn:
             cursor = conn.cursor()
             for index_sql in indexes:
                 try:
@@ -358,7 +366,7 @@ class SimpleDatabaseManager:
     
     def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict]:
         """執行查詢並返回結果"""
-        with self.get_connection() as conn:
+        with self.connection(read_only=True) as conn:
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
@@ -377,7 +385,7 @@ class SimpleDatabaseManager:
     
     def execute_sql(self, sql: str, params: Optional[tuple] = None) -> None:
         """執行 SQL 語句"""
-        with self.get_connection() as conn:
+        with self.connection() as conn:
             cursor = conn.cursor()
             if params:
                 cursor.execute(sql, params)
@@ -411,13 +419,30 @@ class SimpleDatabaseManager:
                 row.append(value)
             values.append(tuple(row))
         
-        with self.get_connection() as conn:
+        with self.connection() as conn:
+            # INSERT OR REPLACE 無法分辨新增或取代，以寫入前後的股票筆數維護 table_stats
+            stats = snapshot_stock_stats(conn, table_name, (record.get('stock_id') for record in data))
             cursor = conn.cursor()
             cursor.executemany(sql, values)
             conn.commit()
+            record_stock_write(conn, stats)
         
         print(f"✅ 批量插入 {len(data)} 筆資料到 {table_name}")
     
+    def bulk_upsert(self, table_name: str, df: pd.DataFrame,
+                    key_columns: Optional[List[str]] = None,
+                    column_map: Optional[Dict[str, str]] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """
+        以 DataFrame 批次新增或更新資料（見 app.utils.bulk_upsert）
+
+        Returns:
+            {'inserted', 'updated', 'skipped', 'invalid', 'total'} 筆數
+        """
+        with self.connection() as conn:
+            return bulk_upsert_dataframe(conn, table_name, df, key_columns=key_columns,
+                                         column_map=column_map, batch_size=batch_size)
+    
     def get_table_count(self, table_name: str) -> int:
         """取得資料表記錄數"""
         query = f"SELECT COUNT(*) as count FROM {table_name}"
@@ -441,17 +466,22 @@ class SimpleDatabaseManager:
     
     def vacuum_database(self):
         """清理資料庫，回收空間"""
-        with self.get_connection() as conn:
+        with self.connection() as conn:
             conn.execute("VACUUM")
             conn.commit()
         print("✅ 資料庫清理完成")
     
     def backup_database(self, backup_path: str):
         """備份資料庫"""
-        import shutil
-        shutil.copy2(self.database_path, backup_path)
+        # WAL 模式下尚未 checkpoint 的資料不在主檔中，改用 backup API 取得一致的快照
+        with self.connection(read_only=True) as conn:
+            backup_conn = sqlite3.connect(backup_path)
+            try:
+                conn.backup(backup_conn)
+            finally:
+                backup_conn.close()
         print(f"✅ 資料庫備份完成: {backup_path}")
     
     def close(self):
-        """關閉資料庫連接 (sqlite3 自動管理連接)"""
-        pass
+        """關閉連線池中的閒置連接"""
+        get_sqlite_pool(self.database_path).close_all()
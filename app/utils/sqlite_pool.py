@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共用 SQLite 連線池
+
+收集程式與分析程式常同時存取 data/taiwan_stock.db，各模組原本每次查詢都重新
+sqlite3.connect（預設 rollback journal），寫入期間讀取端容易出現
+database is locked。本模組提供各子系統共用的連線池：
+- 資料庫切換為 WAL 模式，讀取不再被寫入阻擋
+- 每條連線套用 synchronous / cache_size / mmap_size / busy_timeout 等 PRAGMA
+- 連線重複使用，sqlite3 的 prepared statement 快取（cached_statements）得以生效
+- 分析程式可取得唯讀連線（mode=ro），不會意外持有寫入鎖
+
+取得的連線是 sqlite3.Connection 子類別，可直接交給 pandas.read_sql_query；
+呼叫 close() 時會歸還連線池而非真正關閉，因此舊有
+conn = db.get_connection() ... conn.close() 的寫法不需修改。
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 每條連線開啟時套用的 PRAGMA（journal_mode 另行於寫入連線設定一次）
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',      # WAL 模式下 NORMAL 即可保證一致性
+    'cache_size': -65536,         # 負值單位為 KiB，約 64 MB
+    'mmap_size': 268435456,       # 256 MB 記憶體映射讀取
+    'temp_store': 'MEMORY',
+}
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_IDLE = 8
+DEFAULT_CACHED_STATEMENTS = 256
+
+
+class PooledConnection(sqlite3.Connection):
+    """連線池中的連線：close() 歸還連線池，其餘行為與 sqlite3.Connection 相同"""
+
+    _pool: Optional['SQLitePool'] = None
+    _read_only: bool = False
+    _in_use: bool = False
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+        elif self._in_use:
+            # 重複 close() 不會重複歸還
+            self._in_use = False
+            pool._release(self)
+
+    def close_physical(self):
+        """真正關閉連線"""
+        self._pool = None
+        super().close()
+
+
+class SQLitePool:
+    """單一資料庫檔案的執行緒安全連線池"""
+
+    def __init__(self,
+                 db_path: Union[str, Path],
+                 timeout: float = DEFAULT_TIMEOUT,
+                 max_idle: int = DEFAULT_MAX_IDLE,
+                 pragmas: Optional[Dict[str, Union[str, int]]] = None,
+                 journal_mode: str = 'WAL',
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS):
+        """
+        初始化連線池
+
+        Args:
+            db_path: 資料庫檔案路徑
+            timeout: 等待鎖定的秒數（同時設定 busy_timeout）
+            max_idle: 每種連線（讀寫 / 唯讀）最多保留的閒置連線數，超過的歸還時直接關閉
+            pragmas: 覆寫 DEFAULT_PRAGMAS 的設定
+            journal_mode: 寫入連線第一次開啟時設定的 journal_mode（None 表示不變更）
+            cached_statements: 每條連線快取的 prepared statement 數
+        """
+        self.db_path = str(db_path)
+        self.timeout = float(timeout)
+        self.max_idle = max_idle
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.journal_mode = journal_mode
+        self.cached_statements = cached_statements
+
+        self._lock = threading.Lock()
+        self._idle: Dict[bool, List[PooledConnection]] = {False: [], True: []}
+        self._journal_checked = False
+
+    # ------------------------------------------------------------------
+    # 取得 / 歸還
+    # ------------------------------------------------------------------
+    def acquire(self, read_only: bool = False) -> PooledConnection:
+        """
+        取得一條連線（使用完畢請呼叫 close() 歸還）
+
+        Args:
+            read_only: True 時取得唯讀連線
+        """
+        with self._lock:
+            idle = self._idle[read_only]
+            conn = idle.pop() if idle else None
+
+        if conn is None:
+            conn = self._open(read_only)
+        conn._pool = self
+        conn._in_use = True
+        return conn
+
+    @contextmanager
+    def connection(self, read_only: bool = False, row_factory=None) -> Iterator[PooledConnection]:
+        """
+        以上下文管理器取得連線；離開時歸還，例外時先 rollback
+
+        Args:
+            read_only: True 時取得唯讀連線
+            row_factory: 連線的 row_factory（例如 sqlite3.Row），歸還時會重設
+        """
+        conn = self.acquire(read_only)
+        if row_factory is not None:
+            conn.row_factory = row_factory
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def _release(self, conn: PooledConnection):
+        """歸還連線：未提交的交易一律 rollback（與直接 close 的行為相同）"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            conn.text_factory = str
+        except sqlite3.Error as e:
+            logger.debug(f"重設連線失敗，直接關閉: {e}")
+            conn.close_physical()
+            return
+
+        with self._lock:
+            idle = self._idle[conn._read_only]
+            keep = len(idle) < self.max_idle
+            if keep:
+                idle.append(conn)
+        if not keep:
+            conn.close_physical()
+
+    def close_all(self):
+        """關閉所有閒置連線（借出中的連線不受影響，歸還後仍可重複使用）"""
+        with self._lock:
+            connections = self._idle[False] + self._idle[True]
+            self._idle = {False: [], True: []}
+        for conn in connections:
+            try:
+                conn.close_physical()
+            except sqlite3.Error:
+                pass
+
+    # ------------------------------------------------------------------
+    # 開啟連線
+    # ------------------------------------------------------------------
+    def _open(self, read_only: bool) -> PooledConnection:
+        if read_only:
+            # 先確保資料庫已是 WAL 模式，唯讀連線無法變更 journal_mode
+            self._ensure_journal_mode()
+            target = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+            uri = True
+        else:
+            target = self.db_path
+            uri = False
+
+        conn = sqlite3.connect(
+            target,
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=PooledConnection,
+            cached_statements=self.cached_statements,
+            uri=uri
+        )
+        conn._read_only = read_only
+        self._apply_pragmas(conn)
+
+        if not read_only:
+            self._ensure_journal_mode(conn)
+        return conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                logger.debug(f"設定 PRAGMA {name} 失敗: {e}")
+
+    def _ensure_journal_mode(self, conn: Optional[sqlite3.Connection] = None):
+        """journal_mode 記錄在資料庫檔案中，每個連線池只需設定一次"""
+        if self._journal_checked or not self.journal_mode or self.db_path == ':memory:':
+            return
+        if conn is None and not Path(self.db_path).exists():
+            return
+
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+        try:
+            mode = conn.execute(f"PRAGMA journal_mode = {self.journal_mode}").fetchone()[0]
+            if str(mode).lower() != self.journal_mode.lower():
+                logger.warning(f"無法切換 journal_mode 為 {self.journal_mode}（目前為 {mode}）: {self.db_path}")
+            self._journal_checked = True
+        except sqlite3.Error as e:
+            # 其他連線正持有寫入鎖時無法切換，下次開啟連線再試
+            logger.debug(f"設定 journal_mode 失敗: {e}")
+        finally:
+            if own_conn:
+                conn.close()
+
+
+_pools: Dict[Tuple[int, str], SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(db_path: Union[str, Path]) -> str:
+    if str(db_path) == ':memory:':
+        return ':memory:'
+    return str(Path(db_path).resolve())
+
+
+def get_sqlite_pool(db_path: Union[str, Path], **kwargs) -> SQLitePool:
+    """
+    取得指定資料庫檔案的共用連線池（同一行程內共用；fork 出的子行程會建立自己的連線池）
+
+    Args:
+        db_path: 資料庫檔案路徑
+        **kwargs: 第一次建立連線池時傳給 SQLitePool 的參數
+    """
+    key = (os.getpid(), _pool_key(db_path))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SQLitePool(db_path, **kwargs)
+            _pools[key] = pool
+        return pool
+
+
+@contextmanager
+def pooled_connection(db_path: Union[str, Path],
+                      read_only: bool = False,
+                      row_factory=None,
+                      **kwargs) -> Iterator[PooledConnection]:
+    """get_sqlite_pool(db_path).connection(...) 的簡寫"""
+    with get_sqlite_pool(db_path, **kwargs).connection(read_only=read_only, row_factory=row_factory) as conn:
+        yield conn
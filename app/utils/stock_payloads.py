@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web 介面的股票詳細資料（stock_detail_payloads）
+
+web_app 的 /stock/<stock_id> 原本每次瀏覽都查詢評分、財務比率、月營收、
+股利政策並即時推估 EPS。本模組把每檔股票的詳細資料預先組成 JSON 存入
+stock_detail_payloads，並記錄組成時的資料版本：
+- get_data_version 由相關資料表的 MAX(rowid)、股票清單的 MAX(updated_at) 與 table_stats 組成版本字串
+- rebuild_stock_details 於潛力股分析後重建所有已評分股票的資料
+- load_stock_detail 讀取預先組成的資料，版本不同時重新組成並寫回
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 詳細資料使用的資料表；MAX(rowid) 在任一新增（含 INSERT OR REPLACE）後改變，
+# 刪除與就地 UPDATE 由 table_stats 的筆數與 last_updated 反映
+VERSION_TABLES = ('stocks', 'stock_scores', 'financial_ratios', 'monthly_revenues',
+                  'dividend_policies', 'financial_statements')
+
+STOCK_DETAIL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock_detail_payloads (
+    stock_id TEXT PRIMARY KEY,
+    data_version TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (table_name,)).fetchone() is not None
+
+
+def _max_column(conn: sqlite3.Connection, table_name: str, column: str):
+    """資料表存在且有該欄位時回傳 MAX(column)"""
+    if not _table_exists(conn, table_name):
+        return None
+    if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}:
+        return None
+    return conn.execute(f"SELECT MAX({column}) FROM {table_name}").fetchone()[0]
+
+
+def get_data_version(conn: sqlite3.Connection) -> str:
+    """
+    Web 介面使用資料的版本
+
+    由相關資料表的 MAX(rowid)（rowid 索引查找，不掃描資料表）、股票清單的
+    MAX(updated_at) 與 table_stats 的筆數及 last_updated 組成：新增與
+    INSERT OR REPLACE 改變 MAX(rowid)，刪除與就地 UPDATE（例如重算月營收成長率）
+    由寫入端更新的 table_stats 反映。
+
+    Returns:
+        16 字元的版本字串
+    """
+    parts = [[table_name, conn.execute(f"SELECT MAX(rowid) FROM {table_name}").fetchone()[0]]
+             for table_name in VERSION_TABLES if _table_exists(conn, table_name)]
+    parts.append(_max_column(conn, 'stocks', 'updated_at'))
+    if _table_exists(conn, 'table_stats'):
+        placeholders = ', '.join('?' for _ in VERSION_TABLES)
+        parts.append(conn.execute(f"""
+            SELECT table_name, row_count, last_updated, refreshed_at FROM table_stats
+            WHERE table_name IN ({placeholders}) ORDER BY table_name
+        """, VERSION_TABLES).fetchall())
+    return hashlib.md5(json.dumps(parts, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def predict_eps_for_web(cursor, stock_id, monthly_revenue, financial_ratios):
+    """為Web介面預估EPS"""
+    if not monthly_revenue or len(monthly_revenue) < 3:
+        return None
+
+    try:
+        # 最近3個月營收
+        recent_revenue = sum([row[2] for row in monthly_revenue[:3]])
+
+        # 計算歷史平均淨利率
+        net_margins = [row[3] for row in financial_ratios if row[3] is not None]
+        if not net_margins:
+            return None
+
+        avg_net_margin = sum(net_margins) / len(net_margins)
+
+        # 預估淨利
+        predicted_net_income = recent_revenue * (avg_net_margin / 100)
+
+        # 獲取歷史EPS來推估股數
+        cursor.execute("""
+            SELECT value FROM financial_statements
+            WHERE stock_id = ? AND type = 'EPS' AND value > 0
+            ORDER BY date DESC LIMIT 4
+        """, (stock_id,))
+
+        eps_history = [row[0] for row in cursor.fetchall()]
+
+        if eps_history:
+            # 使用歷史EPS推估股數
+            cursor.execute("""
+                SELECT value FROM financial_statements
+                WHERE stock_id = ? AND type = 'IncomeAfterTaxes'
+                ORDER BY date DESC LIMIT 4
+            """, (stock_id,))
+
+            net_income_history = [row[0] for row in cursor.fetchall()]
+
+            if net_income_history and len(eps_history) == len(net_income_history):
+                avg_shares = sum([ni/eps for ni, eps in zip(net_income_history, eps_history) if eps > 0]) / len(eps_history)
+                predicted_eps = predicted_net_income / avg_shares if avg_shares > 0 else None
+            else:
+                predicted_eps = None
+        else:
+            predicted_eps = None
+
+        return {
+            'quarterly_revenue': recent_revenue / 1000000000,  # 轉換為億元
+            'avg_net_margin': avg_net_margin,
+            'predicted_net_income': predicted_net_income / 1000000000,  # 轉換為億元
+            'predicted_eps': predicted_eps
+        }
+
+    except Exception:
+        return None
+
+
+def build_stock_detail(conn: sqlite3.Connection, stock_id: str) -> Optional[Dict]:
+    """
+    組成單一股票的詳細資料（欄位與 stock_detail.html 使用的相同，列為 list）
+
+    Returns:
+        詳細資料；股票不存在時回傳 None
+    """
+    cursor = conn.cursor()
+
+    # 基本資訊
+    cursor.execute("SELECT stock_name, market FROM stocks WHERE stock_id = ?", (stock_id,))
+    basic_info = cursor.fetchone()
+
+    if not basic_info:
+        return None
+
+    # 評分資訊
+    cursor.execute("""
+        SELECT total_score, grade, financial_health_score, growth_score,
+               dividend_score, score_details, analysis_date
+        FROM stock_scores
+        WHERE stock_id = ?
+        ORDER BY analysis_date DESC
+        LIMIT 1
+    """, (stock_id,))
+
+    score_info = cursor.fetchone()
+
+    # 財務比率
+    cursor.execute("""
+        SELECT date, gross_margin, operating_margin, net_margin, debt_ratio, current_ratio
+        FROM financial_ratios
+        WHERE stock_id = ?
+        ORDER BY date DESC
+        LIMIT 8
+    """, (stock_id,))
+
+    financial_ratios = cursor.fetchall()
+
+    # 月營收成長
+    cursor.execute("""
+        SELECT revenue_year, revenue_month, revenue, revenue_growth_yoy
+        FROM monthly_revenues
+        WHERE stock_id = ?
+        ORDER BY revenue_year DESC, revenue_month DESC
+        LIMIT 12
+    """, (stock_id,))
+
+    monthly_revenue = cursor.fetchall()
+
+    # 股利政策
+    cursor.execute("""
+        SELECT year, cash_earnings_distribution, cash_statutory_surplus,
+               cash_ex_dividend_trading_date
+        FROM dividend_policies
+        WHERE stock_id = ?
+        ORDER BY year DESC
+        LIMIT 5
+    """, (stock_id,))
+
+    dividend_data = cursor.fetchall()
+
+    # EPS預估 (使用之前的邏輯)
+    eps_prediction = predict_eps_for_web(cursor, stock_id, monthly_revenue, financial_ratios)
+
+    return {
+        'stock_id': stock_id,
+        'stock_name': basic_info[0],
+        'market': basic_info[1],
+        'score_info': list(score_info) if score_info else None,
+        'financial_ratios': [list(row) for row in financial_ratios],
+        'monthly_revenue': [list(row) for row in monthly_revenue],
+        'dividend_data': [list(row) for row in dividend_data],
+        'eps_prediction': eps_prediction
+    }
+
+
+def _store_details(conn: sqlite3.Connection, data_version: str, details: List[Dict]):
+    conn.execute(STOCK_DETAIL_SCHEMA)
+    updated_at = datetime.now().isoformat(timespec='seconds')
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO stock_detail_payloads (stock_id, data_version, payload, updated_at)
+            VALUES (?, ?, ?, ?)
+        """, [(d['stock_id'], data_version, json.dumps(d, ensure_ascii=False, default=str), updated_at)
+              for d in details])
+
+
+def rebuild_stock_details(conn: sqlite3.Connection, stock_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    重建股票詳細資料（潛力股分析完成後呼叫）
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+        stock_ids: 要重建的股票，None 表示所有已評分股票
+
+    Returns:
+        重建的股票數
+    """
+    if stock_ids is None:
+        stock_ids = [row[0] for row in conn.execute("SELECT DISTINCT stock_id FROM stock_scores")]
+    data_version = get_data_version(conn)
+    details = []
+    for stock_id in stock_ids:
+        try:
+            detail = build_stock_detail(conn, str(stock_id))
+        except sqlite3.Error as e:
+            logger.warning(f"{stock_id} 詳細資料組成失敗: {e}")
+            continue
+        if detail is not None:
+            details.append(detail)
+    _store_details(conn, data_version, details)
+    logger.info(f"股票詳細資料已重建: {len(details)} 檔")
+    return len(details)
+
+
+def load_stock_detail(conn: sqlite3.Connection, stock_id: str,
+                      data_version: Optional[str] = None) -> Optional[Dict]:
+    """
+    讀取股票詳細資料；未預先組成或資料版本已變更時重新組成並寫回
+
+    Args:
+        conn: 資料庫連線
+        stock_id: 股票代碼
+        data_version: 目前的資料版本（None 時重新計算）
+
+    Returns:
+        詳細資料；股票不存在時回傳 None
+    """
+    data_version = data_version or get_data_version(conn)
+    if _table_exists(conn, 'stock_detail_payloads'):
+        row = conn.execute("SELECT data_version, payload FROM stock_detail_payloads WHERE stock_id = ?",
+                           (stock_id,)).fetchone()
+        if row is not None and row[0] == data_version:
+            return json.loads(row[1])
+
+    detail = build_stock_detail(conn, stock_id)
+    if detail is not None:
+        try:
+            _store_details(conn, data_version, [detail])
+        except sqlite3.OperationalError as e:
+            # 唯讀連線只回傳即時組成的資料
+            logger.debug(f"無法寫回 {stock_id} 詳細資料: {e}")
+    return detail
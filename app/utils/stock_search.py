@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票搜尋索引（FTS5 trigram + 記憶體前綴樹）
+
+search_stocks 原本以 LIKE '%關鍵字%' 比對 stock_id 與 stock_name，無法使用索引。
+本模組提供兩層索引：
+- stocks_fts：FTS5 虛擬表（trigram 斷詞，中文名稱可做任意位置的子字串比對），
+  涵蓋 stock_id / stock_name / industry，以 bm25 排序；stocks 的觸發器保持同步，
+  並遞增 stock_search_meta 的版本
+- StockSearchIndex：上市中股票的代碼 / 名稱前綴樹，供逐字輸入時的自動完成；
+  版本變更時重新載入
+
+trigram 至少需要三個字元，較短的關鍵字以前綴樹及 stocks 小表的 LIKE 比對補足。
+"""
+
+import logging
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'stocks_fts'
+TRIGRAM_MIN_LENGTH = 3
+# bm25 欄位權重（stock_id, stock_name, industry）
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_SYNC_SQL = """
+    DELETE FROM stocks_fts WHERE stock_id = {ref}.stock_id;
+    INSERT INTO stocks_fts (stock_id, stock_name, industry)
+    VALUES ({ref}.stock_id, {ref}.stock_name, COALESCE({ref}.industry, ''));
+"""
+
+# INSERT OR REPLACE 在未開啟 recursive_triggers 時不會觸發 DELETE 觸發器，
+# 因此新增與更新都先刪除同代碼的索引列
+SEARCH_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE}
+    USING fts5(stock_id, stock_name, industry, tokenize = 'trigram')
+    """,
+    "CREATE TABLE IF NOT EXISTS stock_search_meta (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO stock_search_meta (id, version) VALUES (1, 0)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stocks_search_insert AFTER INSERT ON stocks BEGIN
+        {_SYNC_SQL.format(ref='new')}
+        UPDATE stock_search_meta SET version = version + 1 WHERE id = 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS stocks_search_update AFTER UPDATE ON stocks BEGIN
+        DELETE FROM stocks_fts WHERE stock_id = old.stock_id;
+        {_SYNC_SQL.format(ref='new')}
+        UPDATE stock_search_meta SET version = version + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stocks_search_delete AFTER DELETE ON stocks BEGIN
+        DELETE FROM stocks_fts WHERE stock_id = old.stock_id;
+        UPDATE stock_search_meta SET version = version + 1 WHERE id = 1;
+    END
+    """,
+]
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table_name,)).fetchone() is not None
+
+
+def rebuild_search_index(conn: sqlite3.Connection) -> int:
+    """
+    建立搜尋索引與同步觸發器，並以 stocks 重新填入
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+
+    Returns:
+        索引的股票數
+    """
+    with conn:
+        for sql in SEARCH_SCHEMA:
+            conn.execute(sql)
+        conn.execute(f"DELETE FROM {SEARCH_TABLE}")
+        conn.execute(f"""
+            INSERT INTO {SEARCH_TABLE} (stock_id, stock_name, industry)
+            SELECT stock_id, stock_name, COALESCE(industry, '') FROM stocks
+        """)
+        conn.execute("UPDATE stock_search_meta SET version = version + 1 WHERE id = 1")
+    count = conn.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}").fetchone()[0]
+    logger.info(f"股票搜尋索引已重建: {count} 檔")
+    return count
+
+
+def ensure_search_index(conn: sqlite3.Connection) -> bool:
+    """搜尋索引不存在時先建立；回傳索引是否可用（SQLite 未編譯 FTS5 時為 False）"""
+    if _table_exists(conn, SEARCH_TABLE) and _table_exists(conn, 'stock_search_meta'):
+        return True
+    if not _table_exists(conn, 'stocks'):
+        return False
+    try:
+        rebuild_search_index(conn)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"無法建立 FTS5 搜尋索引: {e}")
+        return False
+    return True
+
+
+def get_search_version(conn: sqlite3.Connection) -> Optional[int]:
+    """stocks 的異動版本（每次新增 / 更新 / 刪除遞增）"""
+    row = conn.execute("SELECT version FROM stock_search_meta WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+
+def _fts_query(keyword: str) -> str:
+    """關鍵字轉為 FTS5 查詢（各詞為片語，詞之間為 AND）"""
+    return ' AND '.join('"' + term.replace('"', '""') + '"' for term in keyword.split())
+
+
+def search_fts(conn: sqlite3.Connection, keyword: str, limit: int = 20) -> List[str]:
+    """
+    以 FTS5 做子字串搜尋（上市中股票，依 bm25 排序）
+
+    Returns:
+        股票代碼；關鍵字中有少於三個字元的詞時回傳空串列
+    """
+    terms = keyword.split()
+    if not terms or min(len(term) for term in terms) < TRIGRAM_MIN_LENGTH:
+        return []
+    rows = conn.execute(f"""
+        SELECT f.stock_id
+        FROM {SEARCH_TABLE} f
+        JOIN stocks s ON s.stock_id = f.stock_id
+        WHERE {SEARCH_TABLE} MATCH ? AND s.is_active = 1
+        ORDER BY bm25({SEARCH_TABLE}, {', '.join(map(str, BM25_WEIGHTS))}), f.stock_id
+        LIMIT ?
+    """, (_fts_query(keyword), limit)).fetchall()
+    return [row[0] for row in rows]
+
+
+def search_like(conn: sqlite3.Connection, keyword: str, limit: int = 20) -> List[str]:
+    """短關鍵字的子字串比對（stocks 為小表）"""
+    term = f"%{keyword}%"
+    rows = conn.execute("""
+        SELECT stock_id FROM stocks
+        WHERE (stock_id LIKE ? OR stock_name LIKE ?) AND is_active = 1
+        ORDER BY stock_id
+        LIMIT ?
+    """, (term, term, limit)).fetchall()
+    return [row[0] for row in rows]
+
+
+class PrefixTrie:
+    """前綴樹（每個鍵對應多個項目，依加入順序回傳）"""
+
+    def __init__(self):
+        self._root: Dict = {}
+
+    def insert(self, key: str, item: str):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault('', []).append(item)
+
+    def search(self, prefix: str, limit: int = 20) -> List[str]:
+        """以 prefix 開頭的鍵對應的項目（鍵越短越前面）"""
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        results: List[str] = []
+        level = [node]
+        while level and len(results) < limit:
+            next_level = []
+            for current in level:
+                results.extend(current.get('', []))
+                next_level.extend(child for char, child in sorted(current.items()) if char)
+            level = next_level
+        return results[:limit]
+
+
+class StockSearchIndex:
+    """上市中股票的代碼與名稱前綴樹（自動完成用）"""
+
+    def __init__(self, stocks: Iterable[tuple], version: Optional[int] = None):
+        self.version = version
+        self._ids = PrefixTrie()
+        self._names = PrefixTrie()
+        for stock_id, stock_name in stocks:
+            self._ids.insert(str(stock_id).lower(), stock_id)
+            if stock_name:
+                self._names.insert(str(stock_name).lower(), stock_id)
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> 'StockSearchIndex':
+        version = get_search_version(conn) if _table_exists(conn, 'stock_search_meta') else None
+        rows = conn.execute("SELECT stock_id, stock_name FROM stocks WHERE is_active = 1 ORDER BY stock_id")
+        return cls(rows.fetchall(), version)
+
+    def prefix_search(self, keyword: str, limit: int = 20) -> List[str]:
+        """代碼前綴相符者優先，其次為名稱前綴相符者"""
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return []
+        results = self._ids.search(keyword, limit)
+        for stock_id in self._names.search(keyword, limit):
+            if len(results) >= limit:
+                break
+            if stock_id not in results:
+                results.append(stock_id)
+        return results
+
+
+def search_stock_ids(conn: sqlite3.Connection, index: StockSearchIndex,
+                     keyword: str, limit: int = 20, use_fts: bool = True) -> List[str]:
+    """
+    依相關程度排序的搜尋結果
+
+    代碼完全相符 > 代碼前綴 > 名稱前綴（前綴樹），再以 FTS5（關鍵字至少三個字元）
+    或 LIKE 補上代碼、名稱、產業中間相符的股票。
+
+    Args:
+        use_fts: FTS5 索引是否可用（不可用時一律以 LIKE 補足）
+
+    Returns:
+        股票代碼
+    """
+    keyword = keyword.strip()
+    results = index.prefix_search(keyword, limit)
+    if len(results) < limit:
+        if use_fts and min((len(term) for term in keyword.split()), default=0) >= TRIGRAM_MIN_LENGTH:
+            more = search_fts(conn, keyword, limit)
+        else:
+            more = search_like(conn, keyword, limit)
+        results += [stock_id for stock_id in more if stock_id not in results]
+    return results[:limit]
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料表統計（table_stats）
+
+儀表板的資料庫狀態頁每次重新執行都對十多張資料表各執行一次 COUNT(*)，
+再加上 COUNT(DISTINCT stock_id)、MIN/MAX(date)、MAX(created_at)，
+每一個都是整張表掃描。本模組把每張表的統計維護在 table_stats 小表：
+- 筆數、最早 / 最新資料日期、股票檔數、最後寫入時間，每張表一列
+- refresh_table_stats 以每張表一次彙總查詢重新計算（隨時可手動執行）
+- bulk_upsert 寫入後以 record_table_write 依寫入結果累加，不再掃描資料表
+- 直接以 SQL 寫入（INSERT OR REPLACE）的收集腳本以 snapshot_stock_stats /
+  record_stock_write 比對寫入前後這些股票的筆數與日期範圍（走 stock_id 索引）
+- load_table_stats 以單一查詢讀出所有統計
+"""
+
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 月營收沒有日期欄位，以「年-月」表示
+REVENUE_MONTH_EXPR = "printf('%04d-%02d', revenue_year, revenue_month)"
+
+# 資料表 -> (資料日期運算式, 是否統計股票檔數)
+# 股票檔數以寫入前是否已有該股票資料累加，需有以 stock_id 開頭的索引
+STATS_TABLES = {
+    'stocks': (None, False),
+    'stock_prices': ('date', True),
+    'monthly_revenues': (REVENUE_MONTH_EXPR, True),
+    'financial_statements': ('date', True),
+    'balance_sheets': ('date', True),
+    'cash_flow_statements': ('date', True),
+    'dividend_policies': ('date', True),
+    'dividend_results': ('ex_dividend_date', True),
+    'financial_ratios': ('date', True),
+    'market_values': ('date', True),
+    'stock_splits': ('ex_date', True),
+    'stock_scores': ('analysis_date', True),
+    'technical_indicators': ('date', True),
+    'etf_dividends': ('announce_date', True),
+    'data_updates': ('last_update_date', False),
+}
+
+TABLE_STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS table_stats (
+    table_name TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL,
+    min_date TEXT,
+    max_date TEXT,
+    distinct_stocks INTEGER,
+    last_updated TEXT,
+    refreshed_at TEXT NOT NULL
+)
+"""
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (table_name,)).fetchone() is not None
+
+
+def _column_names(conn: sqlite3.Connection, table_name: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+
+
+def _date_sql(conn: sqlite3.Connection, table_name: str, columns: Optional[set] = None) -> str:
+    """資料日期運算式（資料表缺少日期欄位時為 NULL）"""
+    date_expr = STATS_TABLES[table_name][0]
+    columns = columns if columns is not None else _column_names(conn, table_name)
+    if date_expr == REVENUE_MONTH_EXPR:
+        has_date = {'revenue_year', 'revenue_month'} <= columns
+    else:
+        has_date = date_expr in columns
+    return date_expr if date_expr and has_date else "NULL"
+
+
+def _stats_sql(conn: sqlite3.Connection, table_name: str) -> str:
+    """單張表的統計查詢（資料表缺少的欄位以 NULL 代替）"""
+    count_stocks = STATS_TABLES[table_name][1]
+    columns = _column_names(conn, table_name)
+    date_sql = _date_sql(conn, table_name, columns)
+    stocks_sql = "COUNT(DISTINCT stock_id)" if count_stocks and 'stock_id' in columns else "NULL"
+    updated_sql = "MAX(created_at)" if 'created_at' in columns else "NULL"
+    return f"SELECT COUNT(*), MIN({date_sql}), MAX({date_sql}), {stocks_sql}, {updated_sql} FROM {table_name}"
+
+
+def refresh_table_stats(conn: sqlite3.Connection, tables: Optional[Iterable[str]] = None) -> int:
+    """
+    重新計算資料表統計（每張表一次彙總查詢）
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+        tables: 要重新計算的資料表，None 表示 STATS_TABLES 全部
+
+    Returns:
+        更新的資料表數
+    """
+    conn.execute(TABLE_STATS_SCHEMA)
+    tables = [t for t in (tables or STATS_TABLES) if t in STATS_TABLES]
+    refreshed_at = datetime.now().isoformat(timespec='seconds')
+    count = 0
+    with conn:
+        for table_name in tables:
+            if not _table_exists(conn, table_name):
+                conn.execute("DELETE FROM table_stats WHERE table_name = ?", (table_name,))
+                continue
+            row = conn.execute(_stats_sql(conn, table_name)).fetchone()
+            conn.execute("""
+                INSERT OR REPLACE INTO table_stats
+                    (table_name, row_count, min_date, max_date, distinct_stocks, last_updated, refreshed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (table_name,) + tuple(row) + (refreshed_at,))
+            count += 1
+    logger.info(f"資料表統計已更新: {count} 張資料表")
+    return count
+
+
+def ensure_table_stats(conn: sqlite3.Connection) -> bool:
+    """table_stats 不存在時先完整計算一次；回傳統計表是否可用"""
+    if _table_exists(conn, 'table_stats'):
+        return True
+    refresh_table_stats(conn)
+    return True
+
+
+def _tracked(conn: sqlite3.Connection, table_name: str) -> bool:
+    """資料表已有統計列（統計表尚未建立或未追蹤的資料表不做增量更新）"""
+    return (table_name in STATS_TABLES and _table_exists(conn, 'table_stats') and
+            conn.execute("SELECT 1 FROM table_stats WHERE table_name = ?", (table_name,)).fetchone() is not None)
+
+
+def count_new_stocks(conn: sqlite3.Connection, table_name: str, stock_ids: Iterable[str]) -> Optional[int]:
+    """
+    寫入前計算資料表中尚無資料的股票數（寫入後由 record_table_write 累加到股票檔數）
+
+    Returns:
+        新股票數；資料表未追蹤或不統計股票檔數時回傳 None
+    """
+    if not STATS_TABLES.get(table_name, (None, False))[1] or not _tracked(conn, table_name):
+        return None
+    stock_ids = sorted({str(s) for s in stock_ids if s is not None})
+    if not stock_ids:
+        return 0
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM json_each(?) j
+        WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE t.stock_id = j.value)
+    """, (json.dumps(stock_ids),)).fetchone()[0]
+
+
+def _frame_dates(table_name: str, frame: pd.DataFrame) -> Optional[pd.Series]:
+    """寫入資料的日期（與統計查詢的日期運算式相同格式）"""
+    date_expr = STATS_TABLES[table_name][0]
+    if date_expr == REVENUE_MONTH_EXPR:
+        if not {'revenue_year', 'revenue_month'} <= set(frame.columns):
+            return None
+        months = frame[['revenue_year', 'revenue_month']].dropna()
+        return (months['revenue_year'].astype(int).map('{:04d}'.format) + '-' +
+                months['revenue_month'].astype(int).map('{:02d}'.format))
+    if date_expr is None or date_expr not in frame.columns:
+        return None
+    return frame[date_expr].dropna().astype(str)
+
+
+def record_table_write(conn: sqlite3.Connection, table_name: str, frame: pd.DataFrame,
+                       inserted: int, new_stocks: Optional[int] = None) -> bool:
+    """
+    依寫入結果更新統計（寫入資料表後呼叫，不掃描資料表）
+
+    upsert 只會新增或更新資料，筆數加上新增筆數、日期範圍與寫入資料合併即可維持正確。
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+        table_name: 寫入的資料表
+        frame: 寫入的資料
+        inserted: 新增筆數（更新既有資料不影響筆數）
+        new_stocks: 寫入前以 count_new_stocks 計算的新股票數
+
+    Returns:
+        是否有更新
+    """
+    if not _tracked(conn, table_name):
+        return False
+    dates = _frame_dates(table_name, frame)
+    min_date = max_date = None
+    if dates is not None and not dates.empty:
+        min_date, max_date = dates.min(), dates.max()
+    _apply_write(conn, table_name, inserted, new_stocks or 0, min_date, max_date)
+    return True
+
+
+def _apply_write(conn: sqlite3.Connection, table_name: str, added_rows: int, added_stocks: int,
+                 min_date: Optional[str], max_date: Optional[str]):
+    """筆數與股票檔數累加差額，日期範圍與寫入資料合併"""
+    with conn:
+        conn.execute("""
+            UPDATE table_stats SET
+                row_count = row_count + :inserted,
+                min_date = CASE WHEN min_date IS NULL OR :min_date < min_date THEN COALESCE(:min_date, min_date)
+                                ELSE min_date END,
+                max_date = CASE WHEN max_date IS NULL OR :max_date > max_date THEN COALESCE(:max_date, max_date)
+                                ELSE max_date END,
+                distinct_stocks = distinct_stocks + :new_stocks,
+                last_updated = :now
+            WHERE table_name = :table_name
+        """, {'inserted': int(added_rows), 'min_date': min_date, 'max_date': max_date,
+              'new_stocks': int(added_stocks), 'table_name': table_name,
+              'now': datetime.now().isoformat()})
+
+
+def _stock_stats(conn: sqlite3.Connection, table_name: str, stock_ids: str) -> tuple:
+    """指定股票的 (筆數, 有資料的股票數, 最早日期, 最新日期)"""
+    date_sql = _date_sql(conn, table_name)
+    return conn.execute(f"""
+        SELECT COUNT(*), COUNT(DISTINCT stock_id), MIN({date_sql}), MAX({date_sql})
+        FROM {table_name} WHERE stock_id IN (SELECT value FROM json_each(?))
+    """, (stock_ids,)).fetchone()
+
+
+def snapshot_stock_stats(conn: sqlite3.Connection, table_name: str,
+                         stock_ids: Iterable[str]) -> Optional[Dict]:
+    """
+    直接以 SQL 寫入指定股票的資料前呼叫，記錄這些股票目前的筆數
+
+    Returns:
+        交給 record_stock_write 的基準；資料表未追蹤或無法計算時回傳 None
+    """
+    try:
+        if not _tracked(conn, table_name) or 'stock_id' not in _column_names(conn, table_name):
+            return None
+        stock_ids = json.dumps(sorted({str(s) for s in stock_ids if s is not None}))
+        return {'table_name': table_name, 'stock_ids': stock_ids,
+                'before': _stock_stats(conn, table_name, stock_ids)}
+    except Exception as e:
+        logger.warning(f"記錄寫入前統計失敗 ({table_name}): {e}")
+        return None
+
+
+def record_stock_write(conn: sqlite3.Connection, snapshot: Optional[Dict]) -> bool:
+    """
+    直接以 SQL 寫入後（commit 之後）呼叫，把這些股票的筆數與股票數差額累加到 table_stats
+
+    INSERT OR REPLACE 無法分辨新增或取代，因此改以寫入前後的筆數比對；
+    失敗時只記錄警告，不影響寫入結果。
+
+    Args:
+        conn: 寫入使用的資料庫連線
+        snapshot: snapshot_stock_stats 的回傳值
+
+    Returns:
+        是否有更新
+    """
+    if snapshot is None:
+        return False
+    table_name = snapshot['table_name']
+    try:
+        rows_before, stocks_before, _, _ = snapshot['before']
+        rows_after, stocks_after, min_date, max_date = _stock_stats(conn, table_name, snapshot['stock_ids'])
+        added_stocks = stocks_after - stocks_before if STATS_TABLES[table_name][1] else 0
+        _apply_write(conn, table_name, rows_after - rows_before, added_stocks,
+                     None if min_date is None else str(min_date), None if max_date is None else str(max_date))
+        return True
+    except Exception as e:
+        logger.warning(f"更新資料表統計失敗 ({table_name}): {e}")
+        return False
+
+
+def record_table_update(conn: sqlite3.Connection, table_name: str) -> bool:
+    """
+    就地 UPDATE 既有資料後呼叫（筆數與日期範圍不變），只更新 last_updated
+
+    讓以 table_stats 判斷資料版本的快取（例如 Web 股票詳細資料）得知資料已變更。
+
+    Returns:
+        是否有更新
+    """
+    try:
+        if not _tracked(conn, table_name):
+            return False
+        _apply_write(conn, table_name, 0, 0, None, None)
+        return True
+    except Exception as e:
+        logger.warning(f"更新資料表統計失敗 ({table_name}): {e}")
+        return False
+
+
+def load_table_stats(conn: sqlite3.Connection) -> Dict[str, Dict]:
+    """
+    讀取所有資料表統計
+
+    Returns:
+        資料表名稱 -> {'row_count', 'min_date', 'max_date', 'distinct_stocks', 'last_updated', 'refreshed_at'}
+    """
+    if not _table_exists(conn, 'table_stats'):
+        return {}
+    rows = conn.execute("""
+        SELECT table_name, row_count, min_date, max_date, distinct_stocks, last_updated, refreshed_at
+        FROM table_stats
+    """).fetchall()
+    keys = ['row_count', 'min_date', 'max_date', 'distinct_stocks', 'last_updated', 'refreshed_at']
+    return {row[0]: dict(zip(keys, row[1:])) for row in rows}
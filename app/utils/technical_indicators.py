@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技術指標計算與儲存（stock_indicators 寬表）
+
+儀表板原本每次重新執行都以 pandas 重算 MA / RSI / MACD / 布林通道，
+且只用顯示期間的股價計算（期間開頭的指標為空值）。本模組依
+Config.TECHNICAL_INDICATORS 的參數以完整歷史計算指標，每檔股票每個交易日
+一列寫入 stock_indicators，欄位名稱與儀表板相同（MA20、RSI、MACD_signal、BB_upper ...）：
+- 第一次計算使用完整股價歷史
+- 之後只計算新交易日：移動視窗類指標讀取前幾個交易日當暖機資料，
+  EMA / MACD / KD 由上一列的值接續遞迴，結果與完整重算相同
+- 已計算區間的股價被修正（筆數或暖機區間收盤價與計算時不同）時該股票完整重算
+- 參數變更時資料表依新參數重建
+"""
+
+import json
+import logging
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDICATOR_TABLE = 'stock_indicators'
+META_TABLE = 'stock_indicators_meta'
+
+# 股價欄位（計算用）
+PRICE_COLUMNS = ['date', 'high_price', 'low_price', 'close_price']
+
+
+def _ema_periods(params: Dict) -> List[int]:
+    """需要儲存的 EMA 週期（含 MACD 的快慢線，供 MACD 接續計算）"""
+    periods = set(params.get('EMA', []))
+    if params.get('MACD'):
+        periods.update(params['MACD'][:2])
+    return sorted(periods)
+
+
+def _rsi_column(index: int, period: int) -> str:
+    """第一個 RSI 週期沿用儀表板的欄位名稱 RSI"""
+    return 'RSI' if index == 0 else f'RSI{period}'
+
+
+def indicator_columns(params: Dict) -> List[str]:
+    """依參數產生 stock_indicators 的指標欄位"""
+    columns = [f'MA{n}' for n in params.get('MA', [])]
+    columns += [f'EMA{n}' for n in _ema_periods(params)]
+    columns += [_rsi_column(i, n) for i, n in enumerate(params.get('RSI', []))]
+    if params.get('MACD'):
+        columns += ['MACD', 'MACD_signal', 'MACD_histogram']
+    if params.get('BOLLINGER'):
+        columns += ['BB_middle', 'BB_upper', 'BB_lower']
+    if params.get('KD'):
+        columns += ['K', 'D']
+    return columns
+
+
+def _warmup_rows(params: Dict) -> int:
+    """移動視窗類指標需要的前置交易日數"""
+    windows = list(params.get('MA', [])) + [n + 1 for n in params.get('RSI', [])]
+    if params.get('BOLLINGER'):
+        windows.append(params['BOLLINGER'][0])
+    if params.get('KD'):
+        windows.append(params['KD'][0])
+    return max(windows, default=1) - 1
+
+
+def _continue_ema(values: np.ndarray, span: int, prev_value: float, prev_obs: int) -> np.ndarray:
+    """
+    接續 pandas ewm(span=span, adjust=True) 的結果
+
+    adjust=True 時 y_t = Σ β^i x_{t-i} / Σ β^i，分母只與觀測序號 t 有關，
+    因此由上一列的值與序號即可精確接續。
+    """
+    alpha = 2.0 / (span + 1)
+    beta = 1.0 - alpha
+    out = np.empty(len(values))
+    y, t = prev_value, prev_obs
+    den_prev = (1 - beta ** (t + 1)) / alpha
+    for i, x in enumerate(values):
+        t += 1
+        den = (1 - beta ** (t + 1)) / alpha
+        y = (x + beta * y * den_prev) / den
+        out[i] = y
+        den_prev = den
+    return out
+
+
+def _continue_kd(rsv: np.ndarray, k_period: int, d_period: int,
+                 k_prev: float, d_prev: float):
+    """KD 平滑：K = 前一日 K × (k_period-1)/k_period + RSV / k_period，D 以 K 同樣平滑；RSV 未形成前為空值"""
+    k_out = np.full(len(rsv), np.nan)
+    d_out = np.full(len(rsv), np.nan)
+    for i, value in enumerate(rsv):
+        if np.isnan(value):
+            continue
+        k_prev = k_prev * (k_period - 1) / k_period + value / k_period
+        d_prev = d_prev * (d_period - 1) / d_period + k_prev / d_period
+        k_out[i], d_out[i] = k_prev, d_prev
+    return k_out, d_out
+
+
+def compute_indicators(prices: pd.DataFrame, params: Dict,
+                       state: Optional[Dict] = None, warmup: int = 0) -> pd.DataFrame:
+    """
+    計算技術指標
+
+    Args:
+        prices: 依日期排序的股價（date, high_price, low_price, close_price）
+        params: 指標參數（Config.TECHNICAL_INDICATORS）
+        state: 上一個已計算交易日的指標列（含 obs），None 表示從第一個交易日開始
+        warmup: prices 開頭屬於已計算交易日的筆數（只用於移動視窗）
+
+    Returns:
+        prices[warmup:] 各交易日的指標（含 obs 觀測序號）
+    """
+    close = prices['close_price'].astype(float).reset_index(drop=True)
+    high = prices['high_price'].astype(float).reset_index(drop=True)
+    low = prices['low_price'].astype(float).reset_index(drop=True)
+    out = pd.DataFrame({'date': prices['date'].reset_index(drop=True), 'close_price': close})
+    new = slice(warmup, None)
+    first_obs = 0 if state is None else int(state['obs']) + 1
+    out['obs'] = np.arange(len(out)) - warmup + first_obs
+
+    for n in params.get('MA', []):
+        out[f'MA{n}'] = close.rolling(window=n).mean()
+
+    def ema(series: pd.Series, span: int, column: str) -> pd.Series:
+        if state is None or pd.isna(state.get(column)):
+            return series.ewm(span=span).mean()
+        result = pd.Series(np.nan, index=series.index)
+        result.iloc[new] = _continue_ema(series.iloc[new].to_numpy(), span, float(state[column]), int(state['obs']))
+        return result
+
+    for n in _ema_periods(params):
+        out[f'EMA{n}'] = ema(close, n, f'EMA{n}')
+
+    delta = close.diff()
+    for i, n in enumerate(params.get('RSI', [])):
+        gain = delta.where(delta > 0, 0).rolling(window=n).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=n).mean()
+        out[_rsi_column(i, n)] = 100 - (100 / (1 + gain / loss))
+
+    if params.get('MACD'):
+        fast, slow, signal = params['MACD'][:3]
+        out['MACD'] = out[f'EMA{fast}'] - out[f'EMA{slow}']
+        out['MACD_signal'] = ema(out['MACD'], signal, 'MACD_signal')
+        out['MACD_histogram'] = out['MACD'] - out['MACD_signal']
+
+    if params.get('BOLLINGER'):
+        n, k = params['BOLLINGER'][:2]
+        middle = close.rolling(window=n).mean()
+        std = close.rolling(window=n).std()
+        out['BB_middle'] = middle
+        out['BB_upper'] = middle + std * k
+        out['BB_lower'] = middle - std * k
+
+    if params.get('KD'):
+        n, k_period, d_period = params['KD'][:3]
+        lowest = low.rolling(window=n).min()
+        highest = high.rolling(window=n).max()
+        span = highest - lowest
+        # 區間最高價等於最低價時 RSV 視為 50
+        rsv = ((close - lowest) / span.where(span != 0) * 100).where(span != 0, 50.0).where(lowest.notna())
+        seed = lambda column: 50.0 if state is None or pd.isna(state.get(column)) else float(state[column])
+        out['K'] = np.nan
+        out['D'] = np.nan
+        k_values, d_values = _continue_kd(rsv.iloc[new].to_numpy(), k_period, d_period, seed('K'), seed('D'))
+        out.loc[out.index[new], 'K'] = k_values
+        out.loc[out.index[new], 'D'] = d_values
+
+    return out.iloc[new].reset_index(drop=True)
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (table_name,)).fetchone() is not None
+
+
+def ensure_indicator_table(conn: sqlite3.Connection, params: Dict) -> List[str]:
+    """建立 stock_indicators；參數與已儲存的不同時依新參數重建"""
+    columns = indicator_columns(params)
+    params_json = json.dumps(params, sort_keys=True)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = 'params'").fetchone()
+    if row is None or row[0] != params_json:
+        if row is not None:
+            logger.info("技術指標參數已變更，重建 stock_indicators")
+        conn.execute(f"DROP TABLE IF EXISTS {INDICATOR_TABLE}")
+    if not _table_exists(conn, INDICATOR_TABLE):
+        column_sql = ',\n            '.join(f'"{c}" REAL' for c in columns)
+        with conn:
+            conn.execute(f"""
+            CREATE TABLE {INDICATOR_TABLE} (
+                stock_id TEXT NOT NULL,
+                date DATE NOT NULL,
+                obs INTEGER NOT NULL,
+                close_price REAL,
+                {column_sql},
+                PRIMARY KEY (stock_id, date)
+            )
+            """)
+            conn.execute(f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES ('params', ?)", (params_json,))
+    return columns
+
+
+def update_stock_indicators(conn: sqlite3.Connection, stock_id: str, params: Dict) -> int:
+    """
+    計算單一股票尚未計算的交易日指標並寫入 stock_indicators
+
+    Args:
+        conn: 資料庫連線（需可寫入）
+        stock_id: 股票代碼
+        params: 指標參數（Config.TECHNICAL_INDICATORS）
+
+    Returns:
+        寫入筆數
+    """
+    columns = ensure_indicator_table(conn, params)
+    quoted = ', '.join(f'"{c}"' for c in columns)
+    price_sql = f"SELECT {', '.join(PRICE_COLUMNS)} FROM stock_prices WHERE stock_id = ?"
+    last = conn.execute(f"""
+        SELECT date, obs, close_price, {quoted} FROM {INDICATOR_TABLE}
+        WHERE stock_id = ? ORDER BY date DESC LIMIT 1
+    """, (stock_id,)).fetchone()
+    state = dict(zip(['date', 'obs', 'close_price'] + columns, last)) if last else None
+    prices, warmup = None, 0
+
+    if state is not None:
+        count = conn.execute("SELECT COUNT(*) FROM stock_prices WHERE stock_id = ? AND date <= ?",
+                             (stock_id, state['date'])).fetchone()[0]
+        if count != state['obs'] + 1:
+            state = None  # 已計算區間的交易日有增減
+        elif conn.execute("SELECT 1 FROM stock_prices WHERE stock_id = ? AND date > ? LIMIT 1",
+                          (stock_id, state['date'])).fetchone() is None:
+            return 0
+        else:
+            # 暖機區間（含最後一個已計算交易日）的收盤價需與計算時相同
+            history = pd.read_sql_query(f"""
+                SELECT * FROM ({price_sql} AND date <= ? ORDER BY date DESC LIMIT ?) ORDER BY date
+            """, conn, params=(stock_id, state['date'], _warmup_rows(params) + 1))
+            stored = pd.read_sql_query(f"""
+                SELECT close_price FROM {INDICATOR_TABLE} WHERE stock_id = ? AND date >= ? ORDER BY date
+            """, conn, params=(stock_id, history['date'].iloc[0]))
+            if len(stored) != len(history) or not np.allclose(stored['close_price'].to_numpy(float),
+                                                              history['close_price'].to_numpy(float)):
+                state = None
+            else:
+                recent = pd.read_sql_query(f"{price_sql} AND date > ? ORDER BY date", conn,
+                                           params=(stock_id, state['date']))
+                warmup = len(history)
+                prices = pd.concat([history, recent], ignore_index=True)
+
+    if state is None:
+        prices = pd.read_sql_query(f"{price_sql} ORDER BY date", conn, params=(stock_id,))
+
+    result = compute_indicators(prices, params, state=state, warmup=warmup)
+    values = result[['date', 'obs', 'close_price'] + columns].astype(object)
+    values = values.where(values.notna(), None)
+    rows = [(stock_id,) + tuple(row) for row in values.itertuples(index=False, name=None)]
+    with conn:
+        if state is None:
+            conn.execute(f"DELETE FROM {INDICATOR_TABLE} WHERE stock_id = ?", (stock_id,))
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO {INDICATOR_TABLE} (stock_id, date, obs, close_price, {quoted})
+            VALUES ({', '.join('?' for _ in range(len(columns) + 4))})
+        """, rows)
+    return len(rows)
+
+
+def update_indicators(conn: sqlite3.Connection, params: Dict,
+                      stock_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    更新多檔股票的技術指標（預設為最新股價晚於已計算日期的所有股票）
+
+    Returns:
+        {'stocks', 'rows'}
+    """
+    ensure_indicator_table(conn, params)
+    if stock_ids is None:
+        stock_ids = [row[0] for row in conn.execute(f"""
+            SELECT p.stock_id
+            FROM (SELECT stock_id, MAX(date) AS date FROM stock_prices GROUP BY stock_id) p
+            LEFT JOIN (SELECT stock_id, MAX(date) AS date FROM {INDICATOR_TABLE} GROUP BY stock_id) i
+              ON i.stock_id = p.stock_id
+            WHERE i.date IS NULL OR i.date < p.date
+        """)]
+    result = {'stocks': 0, 'rows': 0}
+    for stock_id in stock_ids:
+        try:
+            written = update_stock_indicators(conn, str(stock_id), params)
+        except Exception as e:
+            logger.warning(f"{stock_id} 技術指標計算失敗: {e}")
+            continue
+        if written:
+            result['stocks'] += 1
+            result['rows'] += written
+    logger.info(f"技術指標已更新: {result['stocks']} 檔股票，{result['rows']} 筆")
+    return result
+
+
+def load_indicator_frame(conn: sqlite3.Connection, stock_id: str, params: Dict,
+                         start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    讀取股價與技術指標（先補算尚未計算的交易日）
+
+    Returns:
+        依日期排序的 DataFrame：stock_prices 欄位加上指標欄位（date 為 datetime）
+    """
+    columns = indicator_columns(params)
+    update_stock_indicators(conn, stock_id, params)
+    query = f"""
+        SELECT sp.*, {', '.join(f'i."{c}"' for c in columns)}
+        FROM stock_prices sp
+        LEFT JOIN {INDICATOR_TABLE} i ON i.stock_id = sp.stock_id AND i.date = sp.date
+        WHERE sp.stock_id = ?
+    """
+    query_params = [stock_id]
+    if start_date:
+        query += " AND sp.date >= ?"
+        query_params.append(start_date)
+    if end_date:
+        query += " AND sp.date <= ?"
+        query_params.append(end_date)
+    df = pd.read_sql_query(query + " ORDER BY sp.date", conn, params=query_params)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
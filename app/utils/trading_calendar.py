@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+台股交易日曆與缺漏區間偵測
+
+增量收集原本以「所有週一到週五」推算應有資料的日期，農曆春節、國定假日、
+颱風假都會被當成缺漏而重複呼叫 API。本模組從 stock_prices 中實際觀察到的
+全市場交易日推導交易日曆，並持久化於 trading_calendar 資料表：
+- 某日有交易的股票數未達鄰近交易日最大值的一小部分才視為休市，
+  個別股票的零星錯誤資料不會讓假日變成交易日，只收集到部分股票的日期
+  （例如中斷的收集）仍是交易日，缺漏的股票會由 find_missing_ranges 補抓
+- 最近 REFRESH_OVERLAP_DAYS 天內有資料的週一到週五一律視為交易日（收集尚未完成）
+- 日曆涵蓋範圍外（尚未收集或未來的日期）退回以週一到週五推算
+- find_missing_ranges 以單一 SQL（交易日 x 股票 LEFT JOIN stock_prices，
+  再以 gaps-and-islands 視窗函數合併連續缺漏）一次算出所有股票的缺漏區間
+"""
+
+import bisect
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from app.utils.sqlite_pool import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# 交易股票數低於鄰近交易日最大值的此比例才視為休市
+DEFAULT_MIN_COVERAGE = 0.05
+# 計算鄰近最大值時前後各參考的日曆天數（筆數）
+COVERAGE_WINDOW = 10
+# 增量更新時重新計算最近幾天的交易股票數（最新一天常只收集到部分股票）
+REFRESH_OVERLAP_DAYS = 30
+
+CALENDAR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trading_calendar (
+    date TEXT PRIMARY KEY,
+    stock_count INTEGER NOT NULL,
+    is_trading INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+# 交易日 x 股票，找出 stock_prices 沒有資料的組合，再以
+# 「交易日序號 - 缺漏序號」分組合併為連續區間（gaps-and-islands）
+MISSING_RANGES_SQL = """
+WITH calendar AS (
+    SELECT CAST(key AS INTEGER) AS rn, value AS date FROM json_each(:dates)
+),
+targets AS (
+    SELECT value AS stock_id FROM json_each(:stock_ids)
+),
+missing AS (
+    SELECT t.stock_id, c.rn, c.date
+    FROM targets t
+    CROSS JOIN calendar c
+    LEFT JOIN stock_prices p ON p.stock_id = t.stock_id AND p.date = c.date
+    WHERE p.stock_id IS NULL
+),
+islands AS (
+    SELECT stock_id, date,
+           rn - ROW_NUMBER() OVER (PARTITION BY stock_id ORDER BY rn) AS grp
+    FROM missing
+)
+SELECT stock_id, MIN(date) AS range_start, MAX(date) AS range_end, COUNT(*) AS days
+FROM islands
+GROUP BY stock_id, grp
+ORDER BY stock_id, range_start
+"""
+
+
+def _to_date_str(value) -> str:
+    """將 str / datetime / date / Timestamp 轉為 YYYY-MM-DD"""
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime('%Y-%m-%d')
+
+
+def _is_weekday(date_str: str) -> bool:
+    return datetime.strptime(date_str, '%Y-%m-%d').weekday() < 5
+
+
+def _shift(date_str: str, days: int) -> str:
+    return (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def _weekdays_between(start: str, end: str) -> List[str]:
+    """start~end（含）之間的週一到週五"""
+    days = []
+    current = datetime.strptime(start, '%Y-%m-%d')
+    end_dt = datetime.strptime(end, '%Y-%m-%d')
+    while current <= end_dt:
+        if current.weekday() < 5:
+            days.append(current.strftime('%Y-%m-%d'))
+        current += timedelta(days=1)
+    return days
+
+
+class TradingCalendar:
+    """由 stock_prices 推導並持久化的交易日曆"""
+
+    def __init__(self, db_path: Union[str, Path], min_coverage: float = DEFAULT_MIN_COVERAGE):
+        """
+        Args:
+            db_path: 股票資料庫路徑（trading_calendar 與 stock_prices 位於同一資料庫）
+            min_coverage: 交易股票數低於鄰近交易日最大值的此比例才視為休市
+        """
+        self.db_path = str(db_path)
+        self.min_coverage = min_coverage
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dates: List[str] = []
+        self._date_set = set()
+        self._first: Optional[str] = None
+        self._last: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # 建立 / 更新
+    # ------------------------------------------------------------------
+    def refresh(self, full: bool = False) -> int:
+        """
+        由 stock_prices 更新交易日曆
+
+        預設只重新計算日曆範圍之前與最近 REFRESH_OVERLAP_DAYS 天的日期；
+        回補中間歷史資料後請以 full=True 重建。
+
+        Args:
+            full: 是否重新計算所有日期
+
+        Returns:
+            日曆中的交易日數
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, pooled_connection(self.db_path) as conn:
+            conn.execute(CALENDAR_SCHEMA)
+            has_prices = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stock_prices'"
+            ).fetchone()
+            if not has_prices:
+                conn.commit()
+                self._loaded = False
+                return 0
+
+            first, last = conn.execute("SELECT MIN(date), MAX(date) FROM trading_calendar").fetchone()
+            if full or first is None:
+                where, params = "", ()
+                conn.execute("DELETE FROM trading_calendar")
+            else:
+                where = "WHERE date < ? OR date >= ?"
+                params = (first, _shift(last, -REFRESH_OVERLAP_DAYS))
+
+            conn.execute(f"""
+                INSERT INTO trading_calendar (date, stock_count, is_trading, updated_at)
+                SELECT date, COUNT(*), 0, ? FROM stock_prices {where} GROUP BY date
+                ON CONFLICT(date) DO UPDATE SET
+                    stock_count = excluded.stock_count, updated_at = excluded.updated_at
+            """, (now,) + params)
+
+            # 以前後各 COVERAGE_WINDOW 筆的最大交易股票數為基準判斷是否休市；
+            # 最近 REFRESH_OVERLAP_DAYS 天的週一到週五可能仍在收集，不降為休市
+            latest = conn.execute("SELECT MAX(date) FROM trading_calendar").fetchone()[0]
+            conn.execute(f"""
+                UPDATE trading_calendar SET is_trading = w.is_trading
+                FROM (
+                    SELECT date,
+                           (date >= :recent AND strftime('%w', date) BETWEEN '1' AND '5')
+                           OR stock_count >= MAX(stock_count) OVER (
+                               ORDER BY date ROWS BETWEEN {COVERAGE_WINDOW} PRECEDING
+                                                      AND {COVERAGE_WINDOW} FOLLOWING
+                           ) * :min_coverage AS is_trading
+                    FROM trading_calendar
+                ) AS w
+                WHERE w.date = trading_calendar.date
+            """, {'recent': _shift(latest, -REFRESH_OVERLAP_DAYS) if latest else '',
+                  'min_coverage': self.min_coverage})
+            conn.commit()
+            count = conn.execute("SELECT COUNT(*) FROM trading_calendar WHERE is_trading = 1").fetchone()[0]
+
+        self._loaded = False
+        logger.info(f"交易日曆已更新: {count} 個交易日")
+        return count
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with pooled_connection(self.db_path) as conn:
+            has_calendar = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trading_calendar'"
+            ).fetchone()
+            empty = not has_calendar or conn.execute("SELECT 1 FROM trading_calendar LIMIT 1").fetchone() is None
+        if empty:
+            self.refresh()
+
+        with self._lock, pooled_connection(self.db_path, read_only=True) as conn:
+            try:
+                rows = conn.execute("SELECT date, is_trading FROM trading_calendar ORDER BY date").fetchall()
+            except Exception:
+                rows = []
+            self._dates = [date for date, is_trading in rows if is_trading]
+            self._date_set = set(self._dates)
+            self._first = rows[0][0] if rows else None
+            self._last = rows[-1][0] if rows else None
+            self._loaded = True
+
+    @property
+    def coverage(self) -> Tuple[Optional[str], Optional[str]]:
+        """日曆涵蓋的 (起日, 迄日)，尚無資料時為 (None, None)"""
+        self._ensure_loaded()
+        return self._first, self._last
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def _covers(self, date_str: str) -> bool:
+        return self._first is not None and self._first <= date_str <= self._last
+
+    def is_trading_day(self, date) -> bool:
+        """是否為交易日（日曆範圍外以週一到週五判斷）"""
+        self._ensure_loaded()
+        date_str = _to_date_str(date)
+        if self._covers(date_str):
+            return date_str in self._date_set
+        return _is_weekday(date_str)
+
+    def trading_days(self, start_date, end_date) -> List[str]:
+        """start_date~end_date（含）之間的交易日"""
+        self._ensure_loaded()
+        start, end = _to_date_str(start_date), _to_date_str(end_date)
+        if start > end:
+            return []
+        if self._first is None:
+            return _weekdays_between(start, end)
+
+        days = []
+        if start < self._first:
+            days.extend(_weekdays_between(start, min(end, _shift(self._first, -1))))
+        lo = bisect.bisect_left(self._dates, max(start, self._first))
+        hi = bisect.bisect_right(self._dates, min(end, self._last))
+        days.extend(self._dates[lo:hi])
+        if end > self._last:
+            days.extend(_weekdays_between(max(start, _shift(self._last, 1)), end))
+        return days
+
+    def count_trading_days(self, start_date, end_date) -> int:
+        """start_date~end_date（含）之間的交易日數"""
+        return len(self.trading_days(start_date, end_date))
+
+    def next_trading_day(self, date, n_days: int = 1) -> str:
+        """
+        從 date 起往後第 n_days 個交易日
+
+        Args:
+            date: 基準日期（不計入）
+            n_days: 向後推進的交易日數
+
+        Returns:
+            交易日（YYYY-MM-DD）
+        """
+        self._ensure_loaded()
+        current = _to_date_str(date)
+        remaining = n_days
+
+        # 日曆範圍內直接以索引推進
+        if remaining > 0 and self._first is not None and self._first <= current < self._last:
+            index = bisect.bisect_right(self._dates, current) + remaining - 1
+            if index < len(self._dates):
+                return self._dates[index]
+            remaining -= len(self._dates) - bisect.bisect_right(self._dates, current)
+            current = self._last
+
+        while remaining > 0:
+            current = _shift(current, 1)
+            if self.is_trading_day(current):
+                remaining -= 1
+        return current
+
+    # ------------------------------------------------------------------
+    # 缺漏區間
+    # ------------------------------------------------------------------
+    def find_missing_ranges(self, start_date, end_date,
+                            stock_ids: Optional[Iterable[str]] = None) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        以單一查詢找出各股票在期間內缺少股價資料的連續交易日區間
+
+        Args:
+            start_date: 開始日期
+            end_date: 結束日期
+            stock_ids: 股票代碼（None 表示 stocks 表中所有上市櫃股票）
+
+        Returns:
+            股票代碼 -> [(區間起日, 區間迄日), ...]；沒有缺漏的股票不會出現
+        """
+        days = self.trading_days(start_date, end_date)
+        with pooled_connection(self.db_path, read_only=True) as conn:
+            if stock_ids is None:
+                stock_ids = [row[0] for row in conn.execute(
+                    "SELECT stock_id FROM stocks WHERE is_active = 1 ORDER BY stock_id")]
+            stock_ids = list(stock_ids)
+            if not days or not stock_ids:
+                return {}
+            rows = conn.execute(MISSING_RANGES_SQL, {
+                'dates': json.dumps(days),
+                'stock_ids': json.dumps(stock_ids),
+            }).fetchall()
+
+        ranges: Dict[str, List[Tuple[str, str]]] = {}
+        for stock_id, range_start, range_end, _ in rows:
+            ranges.setdefault(stock_id, []).append((range_start, range_end))
+        return ranges
+
+
+_calendars: Dict[str, TradingCalendar] = {}
+_calendars_lock = threading.Lock()
+
+
+def get_trading_calendar(db_path: Union[str, Path]) -> TradingCalendar:
+    """取得（並快取）指定資料庫的交易日曆"""
+    key = str(Path(db_path).resolve())
+    with _calendars_lock:
+        calendar = _calendars.get(key)
+        if calendar is None:
+            calendar = TradingCalendar(db_path)
+            _calendars[key] = calendar
+        return calendar
@@ -19,6 +19,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager
 from app.services.query_service import StockQueryService
+from app.utils.technical_indicators import load_indicator_frame
+from app.utils.data_freshness import rebuild_data_freshness
 
 # 頁面配置
 st.set_page_config(
@@ -893,6 +895,15 @@ def calculate_technical_indicators(df):
 
     return df
 
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_price_indicators(_db_manager, stock_id, start_date, end_date, last_date):
+    """讀取股價與預先計算的技術指標（last_date 只作為快取鍵：有新股價時重新讀取）"""
+    with _db_manager.connection() as conn:
+        df = load_indicator_frame(conn, stock_id, Config.TECHNICAL_INDICATORS, start_date, end_date)
+    df['price_change'] = df['close_price'].pct_change()
+    df['price_change_abs'] = df['close_price'].diff()
+    return df
+
 def show_overview_tab(df, stock_info, stock_id, db_manager):
     """顯示總覽標籤頁"""
     st.markdown('<div class="tab-container">', unsafe_allow_html=True)
@@ -1857,7 +1868,7 @@ def show_stock_analysis(db_manager, query_service):
     col1, col2, col3 = st.columns([3, 2, 2])
 
     with col1:
-        stock_id = st.text_input("🔍 輸入股票代碼", placeholder="例如: 2330, 2317, 2454", help="輸入台股代碼進行分析")
+        stock_id = st.text_input("🔍 輸入股票代碼或名稱", placeholder="例如: 2330, 2317, 台積電", help="輸入台股代碼或名稱進行分析")
 
     with col2:
         # 時間範圍選擇
@@ -1880,8 +1891,15 @@ def show_stock_analysis(db_manager, query_service):
         stock_info = query_service.get_stock_info(stock_id)
 
         if not stock_info:
-            st.error("❌ 找不到該股票，請檢查股票代碼是否正確")
-            return
+            # 輸入不是股票代碼時以搜尋索引列出符合的股票（代碼 / 名稱前綴優先）
+            matches = query_service.search_stocks(stock_id, limit=10)
+            if not matches:
+                st.error("❌ 找不到該股票，請檢查股票代碼是否正確")
+                return
+            labels = [f"{m['stock_id']} {m['stock_name']}" for m in matches]
+            selected = st.selectbox(f"🔎 符合「{stock_id}」的股票", labels)
+            stock_id = matches[labels.index(selected)]['stock_id']
+            stock_info = query_service.get_stock_info(stock_id)
 
         # 股票標題區域
         st.markdown(f"""
@@ -1895,22 +1913,29 @@ def show_stock_analysis(db_manager, query_service):
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
 
-        prices = query_service.get_stock_prices(
-            stock_id,
-            start_date.isoformat(),
-            end_date.isoformat()
-        )
+        latest_price = query_service.get_latest_price(stock_id)
 
-        if not prices:
+        if not latest_price:
             st.warning("⚠️ 該股票暫無股價資料")
             return
 
-        df = pd.DataFrame(prices)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
+        # 技術指標已預先計算（只補算新交易日），同一股票同一最新交易日直接取用快取
+        try:
+            df = load_price_indicators(db_manager, stock_id, start_date.isoformat(),
+                                       end_date.isoformat(), latest_price['date'])
+        except Exception as e:
+            st.warning(f"⚠️ 讀取預先計算的技術指標失敗，改為即時計算: {e}")
+            prices = query_service.get_stock_prices(stock_id, start_date.isoformat(), end_date.isoformat())
+            df = pd.DataFrame(prices)
+            if df.empty:
+                st.warning("⚠️ 該股票暫無股價資料")
+                return
+            df['date'] = pd.to_datetime(df['date'])
+            df = calculate_technical_indicators(df.sort_values('date'))
 
-        # 計算技術指標
-        df = calculate_technical_indicators(df)
+        if df.empty:
+            st.warning("⚠️ 該股票暫無股價資料")
+            return
 
         # 創建標籤頁
         tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -1936,6 +1961,18 @@ def show_database_status(db_manager, query_service):
     """顯示資料庫狀態頁面"""
     st.header("📊 資料庫狀態")
 
+    # 筆數、日期範圍、股票檔數由 table_stats 一次讀出，寫入資料時已同步更新
+    if st.button("🔄 重新計算統計", help="重新掃描各資料表計算筆數與日期範圍"):
+        with st.spinner("重新計算資料表統計..."):
+            query_service.refresh_table_stats()
+            with db_manager.connection() as refresh_conn:
+                rebuild_data_freshness(refresh_conn)
+
+    table_stats = query_service.get_table_stats()
+
+    def stat(table_name, key='row_count'):
+        return table_stats.get(table_name, {}).get(key) or 0
+
     conn = db_manager.get_connection()
     cursor = conn.cursor()
 
@@ -1943,56 +1980,10 @@ def show_database_status(db_manager, query_service):
         # 獲取各類資料統計
         st.subheader("📈 資料收集統計")
 
-        # 股票基本資料
-        cursor.execute("SELECT COUNT(*) FROM stocks")
-        stocks_count = cursor.fetchone()[0]
-
-        # 股價資料
-        cursor.execute("SELECT COUNT(*), MIN(date), MAX(date) FROM stock_prices")
-        price_stats = cursor.fetchone()
-
-        # 月營收資料
-        cursor.execute("SELECT COUNT(*) FROM monthly_revenues")
-        revenue_count = cursor.fetchone()[0]
-
-        # 綜合損益表
-        cursor.execute("SELECT COUNT(*) FROM financial_statements")
-        financial_count = cursor.fetchone()[0]
-
-        # 資產負債表
-        cursor.execute("SELECT COUNT(*) FROM balance_sheets")
-        balance_count = cursor.fetchone()[0]
-
-        # 股利政策
-        cursor.execute("SELECT COUNT(*) FROM dividend_policies")
-        dividend_count = cursor.fetchone()[0]
-
-        # 財務比率
-        cursor.execute("SELECT COUNT(*) FROM financial_ratios")
-        ratio_count = cursor.fetchone()[0]
-
-        # 潛力股評分
-        cursor.execute("SELECT COUNT(*) FROM stock_scores")
-        score_count = cursor.fetchone()[0]
-
-        # 新增表統計
-        cursor.execute("SELECT COUNT(*) FROM cash_flow_statements")
-        cash_flow_count = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM market_values")
-        market_value_count = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM stock_splits")
-        split_count = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM dividend_results")
-        dividend_result_count = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM technical_indicators")
-        tech_indicator_count = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM etf_dividends")
-        etf_dividend_count = cursor.fetchone()[0]
+        stocks_count = stat('stocks')
+        price_count = stat('stock_prices')
+        revenue_count = stat('monthly_revenues')
+        score_count = stat('stock_scores')
 
         # 顯示統計資訊
         col1, col2, col3, col4 = st.columns(4)
@@ -2000,63 +1991,58 @@ def show_database_status(db_manager, query_service):
         with col1:
             st.metric("股票基本資料", f"{stocks_count:,}筆")
             st.metric("月營收資料", f"{revenue_count:,}筆")
-            st.metric("現金流量表", f"{cash_flow_count:,}筆")
+            st.metric("現金流量表", f"{stat('cash_flow_statements'):,}筆")
 
         with col2:
-            st.metric("股價資料", f"{price_stats[0]:,}筆")
-            st.metric("綜合損益表", f"{financial_count:,}筆")
-            st.metric("市值資料", f"{market_value_count:,}筆")
+            st.metric("股價資料", f"{price_count:,}筆")
+            st.metric("綜合損益表", f"{stat('financial_statements'):,}筆")
+            st.metric("市值資料", f"{stat('market_values'):,}筆")
 
         with col3:
-            st.metric("資產負債表", f"{balance_count:,}筆")
-            st.metric("股利政策", f"{dividend_count:,}筆")
-            st.metric("股票分割", f"{split_count:,}筆")
+            st.metric("資產負債表", f"{stat('balance_sheets'):,}筆")
+            st.metric("股利政策", f"{stat('dividend_policies'):,}筆")
+            st.metric("股票分割", f"{stat('stock_splits'):,}筆")
 
         with col4:
-            st.metric("財務比率", f"{ratio_count:,}筆")
+            st.metric("財務比率", f"{stat('financial_ratios'):,}筆")
             st.metric("潛力股評分", f"{score_count:,}筆")
-            st.metric("技術指標", f"{tech_indicator_count:,}筆")
+            st.metric("技術指標", f"{stat('technical_indicators'):,}筆")
 
         # 額外資料統計
         st.subheader("📊 額外資料統計")
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.metric("股利發放結果", f"{dividend_result_count:,}筆")
+            st.metric("股利發放結果", f"{stat('dividend_results'):,}筆")
 
         with col2:
-            st.metric("ETF配息", f"{etf_dividend_count:,}筆")
+            st.metric("ETF配息", f"{stat('etf_dividends'):,}筆")
 
         with col3:
-            # 資料更新記錄
-            cursor.execute("SELECT COUNT(*) FROM data_updates")
-            update_count = cursor.fetchone()[0]
-            st.metric("資料更新記錄", f"{update_count:,}筆")
+            st.metric("資料更新記錄", f"{stat('data_updates'):,}筆")
 
         # 資料日期範圍
-        if price_stats[1] and price_stats[2]:
+        price_stats = table_stats.get('stock_prices', {})
+        if price_stats.get('min_date') and price_stats.get('max_date'):
             st.subheader("📅 股價資料範圍")
             col1, col2 = st.columns(2)
 
             with col1:
-                st.metric("最早日期", price_stats[1])
+                st.metric("最早日期", price_stats['min_date'])
 
             with col2:
-                st.metric("最新日期", price_stats[2])
+                st.metric("最新日期", price_stats['max_date'])
 
         # 資料完整性分析
         st.subheader("🔍 資料完整性分析")
 
         # 更實際的完整度計算
         # 計算有資料的股票數量
-        cursor.execute("SELECT COUNT(DISTINCT stock_id) FROM stock_prices")
-        stocks_with_prices = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(DISTINCT stock_id) FROM monthly_revenues")
-        stocks_with_revenue = cursor.fetchone()[0]
+        stocks_with_prices = stat('stock_prices', 'distinct_stocks')
+        stocks_with_revenue = stat('monthly_revenues', 'distinct_stocks')
 
         # 計算平均每檔股票的資料量
-        avg_price_per_stock = price_stats[0] / stocks_with_prices if stocks_with_prices > 0 else 0
+        avg_price_per_stock = price_count / stocks_with_prices if stocks_with_prices > 0 else 0
         avg_revenue_per_stock = revenue_count / stocks_with_revenue if stocks_with_revenue > 0 else 0
 
         col1, col2, col3 = st.columns(3)
@@ -2079,6 +2065,10 @@ def show_database_status(db_manager, query_service):
         # 資料品質分析
         st.subheader("📈 資料品質分析")
 
+        # 每檔股票的筆數由 data_freshness 提供，不再對股價、營收、財報做 JOIN 彙總
+        if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'data_freshness'").fetchone():
+            rebuild_data_freshness(conn)
+
         col1, col2, col3 = st.columns(3)
 
         with col1:
@@ -2101,21 +2091,11 @@ def show_database_status(db_manager, query_service):
             # 計算有完整資料的股票數量
             cursor.execute("""
                 SELECT
-                    COUNT(CASE WHEN price_count >= 1000 THEN 1 END) as good_price,
-                    COUNT(CASE WHEN revenue_count >= 50 THEN 1 END) as good_revenue,
-                    COUNT(CASE WHEN financial_count >= 20 THEN 1 END) as good_financial
-                FROM (
-                    SELECT
-                        s.stock_id,
-                        COUNT(sp.date) as price_count,
-                        COUNT(mr.revenue_year) as revenue_count,
-                        COUNT(fs.date) as financial_count
-                    FROM stocks s
-                    LEFT JOIN stock_prices sp ON s.stock_id = sp.stock_id
-                    LEFT JOIN monthly_revenues mr ON s.stock_id = mr.stock_id
-                    LEFT JOIN financial_statements fs ON s.stock_id = fs.stock_id
-                    GROUP BY s.stock_id
-                ) as stats
+                    COUNT(CASE WHEN f.table_name = 'stock_prices' AND f.record_count >= 1000 THEN 1 END) as good_price,
+                    COUNT(CASE WHEN f.table_name = 'monthly_revenues' AND f.record_count >= 50 THEN 1 END) as good_revenue,
+                    COUNT(CASE WHEN f.table_name = 'financial_statements' AND f.record_count >= 20 THEN 1 END) as good_financial
+                FROM data_freshness f
+                JOIN stocks s ON s.stock_id = f.stock_id
             """)
             completeness = cursor.fetchone()
 
@@ -2127,10 +2107,10 @@ def show_database_status(db_manager, query_service):
             st.write("**🎯 熱門股票**")
             # 顯示資料量最多的前5檔股票
             cursor.execute("""
-                SELECT s.stock_name, COUNT(sp.date) as price_count
-                FROM stocks s
-                JOIN stock_prices sp ON s.stock_id = sp.stock_id
-                GROUP BY s.stock_id, s.stock_name
+                SELECT s.stock_name, f.record_count as price_count
+                FROM data_freshness f
+                JOIN stocks s ON s.stock_id = f.stock_id
+                WHERE f.table_name = 'stock_prices'
                 ORDER BY price_count DESC
                 LIMIT 5
             """)
@@ -2148,18 +2128,18 @@ def show_database_status(db_manager, query_service):
 
         with col1:
             st.write("**📈 近期資料增長**")
-            # 計算最近7天的資料增長
+            # 計算最近7天交易日的股價筆數（以日期索引範圍查詢，不掃描整張表）
             cursor.execute("""
                 SELECT
-                    COUNT(CASE WHEN created_at >= date('now', '-7 days') THEN 1 END) as week_count,
-                    COUNT(CASE WHEN created_at >= date('now', '-1 day') THEN 1 END) as day_count,
-                    COUNT(*) as total_count
+                    COUNT(*) as week_count,
+                    COUNT(CASE WHEN date >= date('now', '-1 day') THEN 1 END) as day_count
                 FROM stock_prices
+                WHERE date >= date('now', '-7 days')
             """)
             growth_stats = cursor.fetchone()
 
-            if growth_stats and growth_stats[2] > 0:
-                week_growth = (growth_stats[0] / growth_stats[2] * 100) if growth_stats[2] > 0 else 0
+            if growth_stats and price_count > 0:
+                week_growth = growth_stats[0] / price_count * 100
                 st.metric("近7天新增", f"{growth_stats[0]:,}筆", f"{week_growth:.1f}%")
                 st.metric("近1天新增", f"{growth_stats[1]:,}筆")
             else:
@@ -2186,26 +2166,20 @@ def show_database_status(db_manager, query_service):
         # 最後更新時間
         st.subheader("⏰ 最後更新時間")
 
-        # 獲取各類資料的最後更新時間
-        cursor.execute("SELECT MAX(created_at) FROM stock_prices")
-        last_price_update = cursor.fetchone()[0]
-
-        cursor.execute("SELECT MAX(created_at) FROM monthly_revenues")
-        last_revenue_update = cursor.fetchone()[0]
-
-        cursor.execute("SELECT MAX(analysis_date) FROM stock_scores")
-        last_score_update = cursor.fetchone()[0]
-
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.metric("股價資料", last_price_update or "無資料")
+            st.metric("股價資料", table_stats.get('stock_prices', {}).get('last_updated') or "無資料")
 
         with col2:
-            st.metric("營收資料", last_revenue_update or "無資料")
+            st.metric("營收資料", table_stats.get('monthly_revenues', {}).get('last_updated') or "無資料")
 
         with col3:
-            st.metric("潛力分析", last_score_update or "無資料")
+            st.metric("潛力分析", table_stats.get('stock_scores', {}).get('max_date') or "無資料")
+
+        refreshed = [row['refreshed_at'] for row in table_stats.values() if row.get('refreshed_at')]
+        if refreshed:
+            st.caption(f"統計最後重新計算時間: {min(refreshed)}")
 
         # 資料庫大小資訊
         st.subheader("💾 資料庫資訊")
@@ -8,9 +8,15 @@ import sys
 import subprocess
 import sqlite3
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 
+from app.utils.data_freshness import (
+    describe_completeness,
+    find_stale_stocks,
+    refresh_stock_freshness,
+)
+
 # 導入簡單進度記錄系統
 try:
     from scripts.simple_progress import SimpleProgress
@@ -247,106 +253,68 @@ def get_all_stock_list():
         print(f"[ERROR] 獲取股票清單失敗: {e}")
         return []
 
-def check_stock_data_completeness(stock_id, logger):
-    """檢查股票資料完整性和時效性"""
+def load_stale_report(stock_ids, logger):
+    """以 data_freshness 一次找出所有需要更新的股票（股票代碼 -> 需更新項目）"""
     db_path = Path('data/taiwan_stock.db')
     if not db_path.exists():
-        return False, "資料庫不存在"
+        return None
 
     try:
         conn = sqlite3.connect(str(db_path))
-        cursor = conn.cursor()
+        try:
+            return find_stale_stocks(conn, stock_ids)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"資料時效性掃描失敗: {e}")
+        return None
+
+def refresh_stock_data_freshness(stock_id, logger):
+    """收集完一檔股票後更新其 data_freshness 彙總"""
+    db_path = Path('data/taiwan_stock.db')
+    if not db_path.exists():
+        return
 
-        # 檢查股票是否存在
-        cursor.execute("SELECT stock_name FROM stocks WHERE stock_id = ?", (stock_id,))
-        stock_info = cursor.fetchone()
-        if not stock_info:
+    try:
+        conn = sqlite3.connect(str(db_path))
+        try:
+            refresh_stock_freshness(conn, stock_id)
+        finally:
             conn.close()
-            return False, "股票不存在"
-
-        stock_name = stock_info[0]
-
-        # 獲取當前日期和時間閾值
-        current_date = datetime.now().date()
-
-        # 定義各資料表的時效性要求
-        tables_to_check = [
-            ('stock_prices', '股價資料', 7),        # 股價資料：7天內
-            ('monthly_revenues', '月營收資料', 45),  # 月營收：45天內 (考慮公布時間)
-            ('financial_statements', '財務報表資料', 120),  # 財報：120天內 (季報)
-            ('dividend_policies', '股利政策資料', 365),      # 股利政策：365天內 (年度)
-            ('stock_scores', '潛力股分析', 30)       # 潛力股分析：30天內
-        ]
-
-        missing_or_outdated = []
-        total_tables = len(tables_to_check)
-
-        for table_name, table_desc, days_threshold in tables_to_check:
-            # 檢查資料表是否存在
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-            if not cursor.fetchone():
-                missing_or_outdated.append(f"{table_desc}(表不存在)")
-                continue
-
-            # 檢查該股票是否有資料
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE stock_id = ?", (stock_id,))
-            record_count = cursor.fetchone()[0]
-
-            if record_count == 0:
-                missing_or_outdated.append(f"{table_desc}(無資料)")
-                continue
-
-            # 檢查資料時效性
-            threshold_date = current_date - timedelta(days=days_threshold)
-
-            # 根據不同資料表使用不同的日期欄位
-            date_column = 'date'
-            if table_name == 'stock_scores':
-                date_column = 'analysis_date'
-            elif table_name == 'dividend_policies':
-                date_column = 'announcement_date'
+    except Exception as e:
+        logger.warning(f"更新 {stock_id} 資料時效性失敗: {e}")
 
-            try:
-                # 檢查是否有在時效範圍內的資料
-                cursor.execute(f"""
-                    SELECT COUNT(*) FROM {table_name}
-                    WHERE stock_id = ? AND {date_column} >= ?
-                """, (stock_id, threshold_date.isoformat()))
-
-                recent_count = cursor.fetchone()[0]
-
-                if recent_count == 0:
-                    # 獲取最新資料日期
-                    cursor.execute(f"""
-                        SELECT MAX({date_column}) FROM {table_name}
-                        WHERE stock_id = ?
-                    """, (stock_id,))
-
-                    latest_date = cursor.fetchone()[0]
-                    if latest_date:
-                        days_old = (current_date - datetime.fromisoformat(latest_date).date()).days
-                        missing_or_outdated.append(f"{table_desc}(過舊:{days_old}天前)")
-                    else:
-                        missing_or_outdated.append(f"{table_desc}(無有效日期)")
-
-            except Exception as e:
-                # 如果日期欄位不存在或其他錯誤，降級為只檢查是否有資料
-                logger.warning(f"無法檢查 {table_name} 的時效性: {e}")
-                if record_count == 0:
-                    missing_or_outdated.append(f"{table_desc}(無資料)")
+def check_stock_data_completeness(stock_id, logger, stale_report=None, stock_name=None):
+    """
+    檢查股票資料完整性和時效性
 
-        conn.close()
+    stale_report 為 load_stale_report 預先批次掃描的結果；未提供時只查詢這一檔股票。
+    """
+    db_path = Path('data/taiwan_stock.db')
+    if not db_path.exists():
+        return False, "資料庫不存在"
 
-        # 計算完整度
-        completeness = ((total_tables - len(missing_or_outdated)) / total_tables) * 100
+    try:
+        conn = sqlite3.connect(str(db_path))
+        try:
+            if stock_name is None:
+                # 檢查股票是否存在
+                stock_info = conn.execute("SELECT stock_name FROM stocks WHERE stock_id = ?", (stock_id,)).fetchone()
+                if not stock_info:
+                    return False, "股票不存在"
+                stock_name = stock_info[0]
+
+            if stale_report is None:
+                stale_report = find_stale_stocks(conn, [stock_id])
+        finally:
+            conn.close()
 
-        if missing_or_outdated:
-            missing_info = f"{stock_id}({stock_name}) 需更新: {', '.join(missing_or_outdated)} (完整度: {completeness:.1f}%)"
-            logger.warning(f"資料需更新 - {missing_info}")
-            return False, missing_info
+        is_complete, info = describe_completeness(stock_id, stock_name, stale_report.get(stock_id, []))
+        if is_complete:
+            logger.info(info)
         else:
-            logger.info(f"{stock_id}({stock_name}) 資料完整且時效性良好")
-            return True, f"{stock_id}({stock_name}) 資料完整且時效性良好"
+            logger.warning(f"資料需更新 - {info}")
+        return is_complete, info
 
     except Exception as e:
         error_msg = f"{stock_id} 檢查失敗: {e}"
@@ -401,25 +369,27 @@ def run_stock_by_stock_collection(test_mode=True, auto_mode=False, resume_mode=F
         logger.error("股票清單為空")
         return False
 
-    # 準備股票清單格式（包含股票名稱）
-    stock_list_with_names = []
-    for stock_id in all_stocks:
-        # 從資料庫獲取股票名稱
-        try:
-            db_path = Path('data/taiwan_stock.db')
-            if db_path.exists():
-                conn = sqlite3.connect(str(db_path))
-                cursor = conn.cursor()
-                cursor.execute("SELECT stock_name FROM stocks WHERE stock_id = ?", (stock_id,))
-                result = cursor.fetchone()
-                stock_name = result[0] if result else stock_id
-                conn.close()
-            else:
-                stock_name = stock_id
-        except:
-            stock_name = stock_id
+    # 準備股票清單格式（包含股票名稱，一次查詢）
+    stock_names = {}
+    try:
+        db_path = Path('data/taiwan_stock.db')
+        if db_path.exists():
+            conn = sqlite3.connect(str(db_path))
+            stock_names = dict(conn.execute("SELECT stock_id, stock_name FROM stocks").fetchall())
+            conn.close()
+    except Exception:
+        stock_names = {}
+
+    stock_list_with_names = [{'stock_id': stock_id, 'stock_name': stock_names.get(stock_id, stock_id)}
+                             for stock_id in all_stocks]
 
-        stock_list_with_names.append({'stock_id': stock_id, 'stock_name': stock_name})
+    # 預先掃描所有股票的資料時效性（data_freshness 單一查詢）
+    stale_report = None
+    if not test_mode:
+        stale_report = load_stale_report(all_stocks, logger)
+        if stale_report is not None:
+            print(f"[FRESHNESS] 需更新 {len(stale_report)} 檔，資料完整 {len(all_stocks) - len(stale_report)} 檔")
+            logger.info(f"資料時效性掃描: 需更新 {len(stale_report)} 檔")
 
     # 找到續傳位置
     start_index = 0
@@ -460,7 +430,9 @@ def run_stock_by_stock_collection(test_mode=True, auto_mode=False, resume_mode=F
         if progress:
             progress.save_current_stock(stock_id, stock_name, len(stock_list_with_names), current_index)
 
-        is_complete, completeness_info = check_stock_data_completeness(stock_id, logger)
+        is_complete, completeness_info = check_stock_data_completeness(
+            stock_id, logger, stale_report=stale_report,
+            stock_name=stock_name if stock_id in stock_names else None)
 
         if is_complete and not test_mode:  # 測試模式總是執行收集
             print(f"[SKIP] {completeness_info} - 跳過")
@@ -473,6 +445,7 @@ def run_stock_by_stock_collection(test_mode=True, auto_mode=False, resume_mode=F
 
         # 為每支股票執行完整收集流程
         stock_success = run_single_stock_complete_collection(stock_id, test_mode, logger)
+        refresh_stock_data_freshness(stock_id, logger)
 
         if stock_success:
             success_stocks += 1
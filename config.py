@@ -42,6 +42,8 @@ class Config:
     # 快取配置
     CACHE_TYPE = "simple"
     CACHE_DEFAULT_TIMEOUT = 300  # 5分鐘
+    WEB_CACHE_MAX_ENTRIES = 512  # web_app 回應快取項目上限
+    WEB_DATA_VERSION_CHECK_SECONDS = 5  # web_app 重新檢查資料版本的間隔
     
     # 日誌配置
     LOG_LEVEL = "INFO"
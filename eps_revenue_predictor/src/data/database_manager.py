@@ -14,6 +14,19 @@ from datetime import datetime
 from config.settings import DATABASE_CONFIG
 from src.utils.logger import get_logger, log_execution
 
+try:
+    from app.utils.sqlite_pool import get_sqlite_pool
+except ImportError:
+    # 於子專案目錄內執行時，主專案根目錄不在 sys.path 上
+    import sys as _sys
+    _main_root = str(Path(__file__).resolve().parents[3])
+    if _main_root not in _sys.path:
+        _sys.path.append(_main_root)
+    try:
+        from app.utils.sqlite_pool import get_sqlite_pool
+    except ImportError:
+        get_sqlite_pool = None
+
 logger = get_logger('database_manager')
 
 class DatabaseManager:
@@ -30,7 +43,7 @@ class DatabaseManager:
             raise FileNotFoundError(f"Database not found: {self.db_path}")
         
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
                 tables = [row[0] for row in cursor.fetchall()]
@@ -48,15 +61,23 @@ class DatabaseManager:
             raise
     
     @contextmanager
-    def get_connection(self):
-        """獲取資料庫連接 (上下文管理器)"""
+    def get_connection(self, read_only: bool = False):
+        """
+        獲取資料庫連接 (上下文管理器)
+
+        Args:
+            read_only: True 時取得共用連線池的唯讀連線（僅查詢時使用）
+        """
         conn = None
         try:
-            conn = sqlite3.connect(
-                self.db_path,
-                timeout=self.timeout,
-                check_same_thread=DATABASE_CONFIG['check_same_thread']
-            )
+            if get_sqlite_pool is not None:
+                conn = get_sqlite_pool(self.db_path, timeout=self.timeout).acquire(read_only=read_only)
+            else:
+                conn = sqlite3.connect(
+                    self.db_path,
+                    timeout=self.timeout,
+                    check_same_thread=DATABASE_CONFIG['check_same_thread']
+                )
             conn.row_factory = sqlite3.Row  # 使結果可以按列名訪問
             yield conn
         except Exception as e:
@@ -88,7 +109,7 @@ class DatabaseManager:
         LIMIT ?
         """
         
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             df = pd.read_sql_query(query, conn, params=[stock_id, months])
         
         if not df.empty:
@@ -144,7 +165,7 @@ class DatabaseManager:
             """
             params.append(months)
 
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 df = pd.read_sql_query(query, conn, params=params)
 
             if not df.empty:
@@ -187,7 +208,7 @@ class DatabaseManager:
         LIMIT ?
         """
         
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             df = pd.read_sql_query(query, conn, params=[stock_id, quarters])
         
         if not df.empty:
@@ -221,7 +242,7 @@ class DatabaseManager:
         LIMIT ?
         """
         
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             df = pd.read_sql_query(query, conn, params=[stock_id, quarters])
         
         if not df.empty:
@@ -252,7 +273,7 @@ class DatabaseManager:
         WHERE stock_id = ?
         """
         
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             cursor.execute(query, [stock_id])
             result = cursor.fetchone()
@@ -369,7 +390,7 @@ class DatabaseManager:
         """檢查股票是否存在"""
         query = "SELECT 1 FROM stocks WHERE stock_id = ? LIMIT 1"
         
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             cursor.execute(query, [stock_id])
             result = cursor.fetchone()
@@ -392,7 +413,7 @@ class DatabaseManager:
         if limit:
             query += f" LIMIT {limit}"
 
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             stocks = [row[0] for row in cursor.fetchall()]
@@ -415,7 +436,7 @@ class DatabaseManager:
             包含歷史月營收的DataFrame
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 query = """
                     SELECT
                         date,
@@ -466,7 +487,7 @@ class DatabaseManager:
             包含歷史季度財務資料的DataFrame
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 query = """
                     SELECT
                         date,
@@ -519,7 +540,7 @@ class DatabaseManager:
             包含資料範圍的字典
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(read_only=True) as conn:
                 # 月營收資料範圍
                 revenue_query = """
                     SELECT MIN(date) as min_date, MAX(date) as max_date, COUNT(*) as count
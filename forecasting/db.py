@@ -4,6 +4,11 @@ import sqlite3
 from typing import Optional
 from contextlib import contextmanager
 
+try:
+    from app.utils.sqlite_pool import get_sqlite_pool
+except ImportError:  # 非專案根目錄執行時退回一般連線
+    get_sqlite_pool = None
+
 
 def _dict_factory(cursor, row):
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
@@ -16,7 +21,11 @@ def get_db_path() -> str:
 
 @contextmanager
 def get_conn(dict_rows: bool = True):
-    conn = sqlite3.connect(get_db_path())
+    # 共用連線池（WAL），close() 會歸還連線而非關閉
+    if get_sqlite_pool is not None:
+        conn = get_sqlite_pool(get_db_path()).acquire()
+    else:
+        conn = sqlite3.connect(get_db_path())
     if dict_rows:
         conn.row_factory = _dict_factory
     try:
@@ -22,6 +22,11 @@ from src.features.feature_engineering import FeatureEngineer
 from src.features.target_generator import TargetGenerator
 import pickle
 
+try:
+    from app.utils.price_matrix import get_default_matrix_dir, open_price_matrix
+except ImportError:  # 未從專案根目錄執行時一律查詢資料庫
+    open_price_matrix = None
+
 # 設置日誌 - 使用 UTF-8 編碼支援中文顯示
 logging.basicConfig(
     level=logging.INFO,
@@ -58,6 +63,11 @@ class BacktestingSystem:
         self.backtest_results = []
         self.portfolio_performance = []
 
+        # 記憶體映射股價矩陣（scripts/build_price_matrix.py 建立，不存在時查詢資料庫）
+        self.price_matrix = None
+        if open_price_matrix is not None:
+            self.price_matrix = open_price_matrix(get_default_matrix_dir(db_manager.db_path))
+
     def clean_feature_data(self, X, feature_cols, log_prefix=""):
         """清理特徵資料，處理無限值和異常值"""
         logging.info(f"{log_prefix}資料清理前: {X.shape}")
@@ -371,24 +381,11 @@ class BacktestingSystem:
         for _, row in predictions.iterrows():
             stock_id = row['stock_id']
             
-            # 獲取股價資料
-            query = """
-            SELECT date, close_price 
-            FROM stock_prices 
-            WHERE stock_id = ? 
-            AND date BETWEEN ? AND ?
-            ORDER BY date
-            """
-            
-            with self.db_manager.get_connection() as conn:
-                price_df = pd.read_sql_query(
-                    query, conn, 
-                    params=[stock_id, start_date, end_date]
-                )
+            # 獲取期初、期末收盤價
+            prices = self._period_close_prices(stock_id, start_date, end_date)
             
-            if len(price_df) >= 2:
-                start_price = price_df.iloc[0]['close_price']
-                end_price = price_df.iloc[-1]['close_price']
+            if prices is not None:
+                start_price, end_price = prices
                 
                 if start_price > 0:
                     return_pct = (end_price - start_price) / start_price * 100
@@ -759,8 +756,16 @@ class BacktestingSystem:
 
         return result.iloc[0]['count'] > 100  # 至少要有100筆資料
 
-    def get_stock_return(self, stock_id, start_date, end_date):
-        """計算股票在指定期間的報酬率"""
+    def _period_close_prices(self, stock_id, start_date, end_date):
+        """期間內第一個與最後一個交易日的收盤價，不足兩筆時回傳 None"""
+        matrix = self.price_matrix
+        if matrix is not None and matrix.has_stock(stock_id) and matrix.covers(start_date, end_date):
+            closes = matrix.series(stock_id, start_date, end_date, 'close')
+            closes = closes[~np.isnan(closes)]
+            if len(closes) >= 2:
+                return round(float(closes[0]), 4), round(float(closes[-1]), 4)
+            return None
+
         query = """
         SELECT date, close_price
         FROM stock_prices
@@ -773,8 +778,15 @@ class BacktestingSystem:
             price_df = pd.read_sql_query(query, conn, params=[stock_id, start_date, end_date])
 
         if len(price_df) >= 2:
-            start_price = price_df.iloc[0]['close_price']
-            end_price = price_df.iloc[-1]['close_price']
+            return price_df.iloc[0]['close_price'], price_df.iloc[-1]['close_price']
+        return None
+
+    def get_stock_return(self, stock_id, start_date, end_date):
+        """計算股票在指定期間的報酬率"""
+        prices = self._period_close_prices(stock_id, start_date, end_date)
+
+        if prices is not None:
+            start_price, end_price = prices
 
             if start_price > 0:
                 return (end_price - start_price) / start_price * 100
@@ -21,6 +21,19 @@ except ImportError:
     sys.path.insert(0, project_root)
     from config.config import DATABASE_CONFIG
 
+try:
+    from app.utils.sqlite_pool import get_sqlite_pool
+except ImportError:
+    # 於子專案目錄內執行時，主專案根目錄不在 sys.path 上
+    import sys as _sys
+    _main_root = str(Path(__file__).resolve().parents[3])
+    if _main_root not in _sys.path:
+        _sys.path.append(_main_root)
+    try:
+        from app.utils.sqlite_pool import get_sqlite_pool
+    except ImportError:
+        get_sqlite_pool = None
+
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
@@ -40,11 +53,19 @@ class DatabaseManager:
             raise FileNotFoundError(f"資料庫檔案不存在: {self.db_path}")
     
     @contextmanager
-    def get_connection(self):
-        """獲取資料庫連接（上下文管理器）"""
+    def get_connection(self, read_only: bool = False):
+        """
+        獲取資料庫連接（上下文管理器）
+
+        Args:
+            read_only: True 時取得共用連線池的唯讀連線（僅查詢時使用）
+        """
         conn = None
         try:
-            conn = sqlite3.connect(str(self.db_path), timeout=self.timeout)
+            if get_sqlite_pool is not None:
+                conn = get_sqlite_pool(self.db_path, timeout=self.timeout).acquire(read_only=read_only)
+            else:
+                conn = sqlite3.connect(str(self.db_path), timeout=self.timeout)
             conn.row_factory = sqlite3.Row  # 使結果可以用欄位名稱存取
             yield conn
         except Exception as e:
@@ -67,7 +88,7 @@ class DatabaseManager:
         Returns:
             查詢結果列表
         """
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
             columns = [description[0] for description in cursor.description]
@@ -87,7 +108,7 @@ class DatabaseManager:
         Returns:
             查詢結果DataFrame
         """
-        with self.get_connection() as conn:
+        with self.get_connection(read_only=True) as conn:
             try:
                 # 嘗試使用 params 參數
                 if params:
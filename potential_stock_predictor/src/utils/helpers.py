@@ -40,17 +40,51 @@ def calculate_trading_days(start_date: str, end_date: str,
     
     return len(weekdays)
 
-def get_next_trading_day(date: str, n_days: int = 1) -> str:
+def _get_trading_calendar(db_path: Optional[str] = None):
+    """取得股票資料庫的交易日曆，無法使用時返回 None"""
+    try:
+        if db_path is None:
+            try:
+                from ...config.config import DATABASE_CONFIG
+            except ImportError:
+                from config.config import DATABASE_CONFIG
+            db_path = DATABASE_CONFIG['path']
+        if not Path(db_path).exists():
+            return None
+
+        try:
+            from app.utils.trading_calendar import get_trading_calendar
+        except ImportError:
+            # 於子專案目錄內執行時，主專案根目錄不在 sys.path 上
+            import sys
+            sys.path.append(str(Path(__file__).resolve().parents[3]))
+            from app.utils.trading_calendar import get_trading_calendar
+        return get_trading_calendar(db_path)
+    except Exception:
+        return None
+
+def get_next_trading_day(date: str, n_days: int = 1, db_path: Optional[str] = None) -> str:
     """
     獲取下一個交易日
     
+    優先使用由 stock_prices 推導的交易日曆（排除國定假日），
+    日曆範圍外或資料庫不可用時只排除週末。
+    
     Args:
         date: 基準日期
         n_days: 向前推進的交易日數
+        db_path: 股票資料庫路徑（預設使用 DATABASE_CONFIG）
         
     Returns:
         下一個交易日
     """
+    calendar = _get_trading_calendar(db_path)
+    if calendar is not None:
+        try:
+            return calendar.next_trading_day(date, n_days)
+        except Exception:
+            pass
+
     current_date = pd.to_datetime(date)
     trading_days = 0
     
@@ -8,6 +8,11 @@ from typing import Dict, List
 from .utils import get_conn, OUTPUT_DIR, safe_write_csv, safe_write_json, log
 import datetime
 
+try:
+    from app.utils.price_matrix import get_default_matrix_dir, open_price_matrix
+except ImportError:  # 未從專案根目錄執行時一律查詢 SQLite
+    open_price_matrix = None
+
 
 def load_quality_list(profile: str = 'conservative') -> pd.DataFrame:
     json_path = os.path.join(OUTPUT_DIR, f'quality_list_{profile}.json')
@@ -40,6 +45,46 @@ def _first_last_prices(df: pd.DataFrame) -> pd.DataFrame:
     return rep[['stock_id','year','close_price_first','close_price_last','year_return_raw']]
 
 
+def _load_close_prices(conn, db_path: str, stock_ids: List[str], year: int | None = None) -> pd.DataFrame:
+    """載入收盤價（columns = [stock_id, date, close_price]）。
+    資料庫同目錄有股價矩陣（scripts/build_price_matrix.py）且涵蓋查詢期間時直接切片矩陣，
+    矩陣中沒有的股票或矩陣落後資料庫時改查 SQLite。
+    """
+    matrix = open_price_matrix(get_default_matrix_dir(db_path)) if open_price_matrix is not None else None
+    start = f'{year}-01-01' if year is not None else None
+    end = f'{year}-12-31' if year is not None else None
+    frames = []
+    if matrix is not None and len(matrix.dates):
+        last_matrix = str(matrix.dates[-1])
+        if year is None or end > last_matrix:
+            row = conn.execute('SELECT MAX(date) FROM stock_prices').fetchone()
+            latest = str(row[0])[:10] if row and row[0] else ''
+            if latest > last_matrix:
+                matrix = None  # 矩陣尚未納入查詢期間的最新股價
+    if matrix is not None:
+        in_matrix = [s for s in stock_ids if matrix.has_stock(s)]
+        if in_matrix:
+            panel = matrix.panel(in_matrix, start, end, 'close')
+            long = panel.stack().rename('close_price').reset_index()
+            long.columns = ['date', 'stock_id', 'close_price']
+            long['date'] = long['date'].dt.strftime('%Y-%m-%d')
+            long['close_price'] = long['close_price'].astype(float).round(4)
+            frames.append(long[['stock_id', 'date', 'close_price']])
+        stock_ids = [s for s in stock_ids if not matrix.has_stock(s)]
+    if stock_ids:
+        q_marks = ','.join(['?'] * len(stock_ids))
+        sql = f"SELECT stock_id, date, close_price FROM stock_prices WHERE stock_id IN ({q_marks})"
+        params = list(stock_ids)
+        if year is not None:
+            sql += " AND strftime('%Y', date)=?"
+            params.append(str(year))
+        frames.append(pd.read_sql_query(sql, conn, params=params))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=['stock_id', 'date', 'close_price'])
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
 def _load_dividends(conn, stock_ids: List[str], year: int) -> pd.DataFrame:
     """載入指定年度的股利資料（現金股利、股票股利）。
     回傳：
@@ -375,11 +420,7 @@ def run_equal_weight_backtest(db_path: str,
                     continue
                 # 使用「隔年」的報酬：以 y 年清單在 y+1 年一開年買進、年底賣出
                 trading_year = y + 1
-                q_marks = ','.join(['?']*len(ids))
-                prices = pd.read_sql_query(
-                    f"SELECT stock_id, date, close_price FROM stock_prices WHERE stock_id IN ({q_marks}) AND strftime('%Y', date)=?",
-                    conn, params=(ids + [str(trading_year)])
-                )
+                prices = _load_close_prices(conn, db_path, ids, trading_year)
                 if prices.empty:
                     continue
                 # 應用停損與（含息）報酬計算
@@ -413,11 +454,7 @@ def run_equal_weight_backtest(db_path: str,
         stock_ids = top_df['stock_id'].tolist()
         with get_conn(db_path) as conn:
             # 只抓取清單中的股票收盤價
-            q_marks = ','.join(['?'] * len(stock_ids))
-            prices = pd.read_sql_query(
-                f"SELECT stock_id, date, close_price FROM stock_prices WHERE stock_id IN ({q_marks})",
-                conn, params=stock_ids
-            )
+            prices = _load_close_prices(conn, db_path, stock_ids)
         if prices.empty:
             raise ValueError('無股價資料可供回測')
         # 個股年度報酬（含停損/含息）
@@ -13,6 +13,11 @@ import sqlite3
 import datetime
 from contextlib import contextmanager
 
+try:
+    from app.utils.sqlite_pool import get_sqlite_pool
+except ImportError:  # not running from project root: fall back to plain connections
+    get_sqlite_pool = None
+
 # Ensure stdout encoding (avoid cp950 crash)
 try:
     sys.stdout.reconfigure(encoding='utf-8', errors='ignore')  # type: ignore[attr-defined]
@@ -29,7 +34,11 @@ os.makedirs(LOG_DIR, exist_ok=True)
 
 @contextmanager
 def get_conn(db_path: str = DEFAULT_DB):
-    conn = sqlite3.connect(db_path)
+    # shared WAL connection pool; close() returns the connection to the pool
+    if get_sqlite_pool is not None:
+        conn = get_sqlite_pool(db_path).acquire()
+    else:
+        conn = sqlite3.connect(db_path)
     try:
         yield conn
     finally:
@@ -21,6 +21,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
+from app.utils.stock_payloads import rebuild_stock_details
+from app.utils.table_stats import record_stock_write, snapshot_stock_stats
 from loguru import logger
 
 def init_logging():
@@ -336,6 +338,7 @@ def save_stock_score(db_manager, score_data):
     """儲存股票評分"""
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'stock_scores', [score_data['stock_id']])
     
     try:
         cursor.execute("""
@@ -356,6 +359,7 @@ def save_stock_score(db_manager, score_data):
         ))
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f"股票 {score_data['stock_id']} 評分儲存成功")
         return True
         
@@ -366,6 +370,15 @@ def save_stock_score(db_manager, score_data):
     finally:
         conn.close()
 
+def rebuild_web_details(db_manager, stock_ids):
+    """重建 Web 介面的股票詳細資料（評分更新後的資料版本）"""
+    try:
+        with db_manager.connection() as conn:
+            count = rebuild_stock_details(conn, stock_ids)
+        logger.info(f"Web 股票詳細資料已重建: {count} 檔")
+    except Exception as e:
+        logger.warning(f"重建 Web 股票詳細資料失敗: {e}")
+
 def main():
     """主函數"""
     parser = argparse.ArgumentParser(description='潛力股評分分析')
@@ -389,6 +402,7 @@ def main():
             result = analyze_stock_potential(db_manager, args.stock_id)
             if result:
                 save_stock_score(db_manager, result)
+                rebuild_web_details(db_manager, [args.stock_id])
                 print(f"\n {result['stock_id']} ({result['stock_name']}) 評分結果:")
                 print(f"財務健康度: {result['financial_health_score']:.1f}分")
                 print(f"成長潛力: {result['growth_score']:.1f}分")
@@ -429,6 +443,8 @@ def main():
                     results.append(result)
                     print(f" {stock_id} ({result['stock_name']}) - {result['grade']} ({result['total_score']:.1f}分)")
             
+            rebuild_web_details(db_manager, [result['stock_id'] for result in results])
+
             # 顯示排行榜
             if results:
                 results.sort(key=lambda x: x['total_score'], reverse=True)
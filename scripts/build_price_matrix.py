@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+建立記憶體映射股價矩陣（供回測引擎以 np.load(mmap_mode='r') 讀取）
+
+預設只附加新交易日，可在每日股價更新後執行：
+    python scripts/build_price_matrix.py
+    python scripts/build_price_matrix.py --full
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app.utils.price_matrix import build_price_matrix, get_default_matrix_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='建立股價矩陣')
+    parser.add_argument('--output', help='矩陣目錄（預設為資料庫同目錄下的 price_matrix）')
+    parser.add_argument('--full', action='store_true', help='忽略既有矩陣完整重建')
+    args = parser.parse_args()
+
+    matrix_dir = args.output or get_default_matrix_dir(Config.DATABASE_PATH)
+    print(f"資料庫: {Config.DATABASE_PATH}")
+    print(f"矩陣目錄: {matrix_dir}")
+
+    started = time.time()
+    result = build_price_matrix(Config.DATABASE_PATH, matrix_dir, full=args.full)
+    print(f"  交易日 {result['days']:,}（新增 {result['new_days']}），"
+          f"股票 {result['stocks']:,}（新增 {result['new_stocks']}，歷史回補 {result['refilled_stocks']}），"
+          f"讀取 {result['rows']:,} 筆")
+    print(f"完成，耗時 {time.time() - started:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
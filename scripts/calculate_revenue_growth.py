@@ -6,13 +6,15 @@
 
 import sys
 import os
-from datetime import datetime
+import time
+import argparse
 
 # 添加專案根目錄到 Python 路徑
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
+from app.utils.revenue_growth import recompute_revenue_growth
 from loguru import logger
 
 def init_logging():
@@ -28,70 +30,20 @@ def init_logging():
         level="INFO"
     )
 
-def calculate_growth_rates_for_stock(db_manager, stock_id):
+def calculate_growth_rates_for_stock(db_manager, stock_id, since=None):
     """計算單一股票的月營收成長率"""
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # 獲取該股票的月營收資料，按年月排序
-        cursor.execute("""
-            SELECT revenue_year, revenue_month, revenue
-            FROM monthly_revenues 
-            WHERE stock_id = ?
-            ORDER BY revenue_year, revenue_month
-        """, (stock_id,))
-        
-        data = cursor.fetchall()
-        
-        if len(data) < 2:
-            return 0
-        
-        updated_count = 0
-        
-        # 計算月增率和年增率
-        for i in range(len(data)):
-            year, month, revenue = data[i]
-            
-            # 計算月增率 (MoM)
-            mom_growth = None
-            if i > 0:
-                prev_revenue = data[i-1][2]
-                if prev_revenue and prev_revenue > 0:
-                    mom_growth = ((revenue - prev_revenue) / prev_revenue) * 100
-            
-            # 計算年增率 (YoY)
-            yoy_growth = None
-            # 找去年同月的資料
-            for j in range(i):
-                prev_year, prev_month, prev_revenue = data[j]
-                if prev_year == year - 1 and prev_month == month:
-                    if prev_revenue and prev_revenue > 0:
-                        yoy_growth = ((revenue - prev_revenue) / prev_revenue) * 100
-                    break
-            
-            # 更新成長率資料
-            if mom_growth is not None or yoy_growth is not None:
-                cursor.execute("""
-                    UPDATE monthly_revenues 
-                    SET revenue_growth_mom = ?, revenue_growth_yoy = ?
-                    WHERE stock_id = ? AND revenue_year = ? AND revenue_month = ?
-                """, (mom_growth, yoy_growth, stock_id, year, month))
-                updated_count += 1
-        
-        conn.commit()
-        logger.info(f"股票 {stock_id} 成長率計算完成，更新 {updated_count} 筆記錄")
-        return updated_count
-        
-    except Exception as e:
-        logger.error(f"計算成長率失敗 {stock_id}: {e}")
-        conn.rollback()
-        return 0
-    finally:
-        conn.close()
+    with db_manager.connection() as conn:
+        updated_count = recompute_revenue_growth(conn, [stock_id], since=since)
+    logger.info(f"股票 {stock_id} 成長率計算完成，更新 {updated_count} 筆記錄")
+    return updated_count
 
 def main():
     """主函數"""
+    parser = argparse.ArgumentParser(description='計算月營收成長率')
+    parser.add_argument('--since', help='只重算此月份（含）之後的資料 (YYYY-MM)')
+    parser.add_argument('--stock-id', help='只計算指定股票')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("台股月營收成長率計算系統")
     print("=" * 60)
@@ -104,42 +56,24 @@ def main():
         # 建立資料庫管理器
         db_manager = DatabaseManager(Config.DATABASE_PATH)
         
-        # 獲取有月營收資料的股票清單
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT DISTINCT stock_id 
-            FROM monthly_revenues 
-            ORDER BY stock_id
-        """)
-        stock_ids = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        
-        if not stock_ids:
-            print(" 未找到月營收資料")
-            return
-        
-        print(f" 找到 {len(stock_ids)} 檔股票有月營收資料")
-        print("開始計算成長率...")
-        
-        total_updated = 0
-        
-        for i, stock_id in enumerate(stock_ids, 1):
-            print(f"[{i:3d}/{len(stock_ids)}] 計算 {stock_id} 成長率...")
-            
-            updated_count = calculate_growth_rates_for_stock(db_manager, stock_id)
-            total_updated += updated_count
-            
-            if updated_count > 0:
-                print(f" {stock_id} 完成，更新 {updated_count} 筆記錄")
-            else:
-                print(f"  {stock_id} 無需更新")
+        if args.stock_id:
+            print(f"計算 {args.stock_id} 成長率...")
+            total_updated = calculate_growth_rates_for_stock(db_manager, args.stock_id, since=args.since)
+        else:
+            scope = f"{args.since} 起" if args.since else "全部"
+            print(f"以集合式 SQL 重算{scope}月營收成長率...")
+            started = time.time()
+            with db_manager.connection() as conn:
+                stock_count = conn.execute("SELECT COUNT(DISTINCT stock_id) FROM monthly_revenues").fetchone()[0]
+                if not stock_count:
+                    print(" 未找到月營收資料")
+                    return
+                total_updated = recompute_revenue_growth(conn, since=args.since)
+            print(f" 處理股票: {stock_count} 檔，耗時 {time.time() - started:.1f} 秒")
         
         print("\n" + "=" * 60)
         print(" 月營收成長率計算完成")
         print("=" * 60)
-        print(f" 處理股票: {len(stock_ids)} 檔")
         print(f" 總更新筆數: {total_updated}")
         
         # 顯示一些統計資訊
@@ -8,6 +8,7 @@ import sys
 import os
 import time
 import argparse
+import pandas as pd
 import sqlite3
 from datetime import datetime, timedelta
 
@@ -20,7 +21,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
+from app.utils.bulk_upsert import FINMIND_COLUMN_MAPS
 from app.services.data_collector import FinMindDataCollector
+from app.utils.table_stats import record_stock_write, snapshot_stock_stats
 from loguru import logger
 
 # 精選10檔股票
@@ -110,38 +113,22 @@ def save_stock_prices(db_manager, stock_id, data):
     if not data:
         return 0
 
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
     try:
-        saved_count = 0
-        for record in data:
-            # 適應清理後的資料格式
-            cursor.execute("""
-                INSERT OR REPLACE INTO stock_prices
-                (stock_id, date, open_price, high_price, low_price, close_price, volume, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                stock_id,
-                record.get('date'),
-                record.get('open_price', record.get('open')),
-                record.get('high_price', record.get('max')),
-                record.get('low_price', record.get('min')),
-                record.get('close_price', record.get('close')),
-                record.get('volume', record.get('Trading_Volume')),
-                datetime.now()
-            ))
-            saved_count += 1
-
-        conn.commit()
-        return saved_count
+        # 適應清理後的資料格式（亦接受 FinMind 原始欄位名稱）
+        columns = ['stock_id', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
+        df = pd.DataFrame(data)
+        df = df.rename(columns={src: dst for src, dst in FINMIND_COLUMN_MAPS['stock_prices'].items()
+                                if src in df.columns and dst not in df.columns})
+        df = df.assign(stock_id=stock_id).reindex(columns=columns)
+
+        result = db_manager.bulk_upsert('stock_prices', df)
+        logger.debug(f"{stock_id} 股價寫入: 新增 {result['inserted']}、更新 {result['updated']}、"
+                     f"略過 {result['skipped']}、無效 {result['invalid']}")
+        return result['total'] - result['invalid']
 
     except Exception as e:
         logger.error(f"儲存 {stock_id} 股價資料失敗: {e}")
-        conn.rollback()
         return 0
-    finally:
-        conn.close()
 
 def save_cash_flow_data(db_manager, data, stock_id):
     """儲存現金流量表資料"""
@@ -150,6 +137,7 @@ def save_cash_flow_data(db_manager, data, stock_id):
 
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'cash_flow_statements', [stock_id])
     saved_count = 0
 
     try:
@@ -169,6 +157,7 @@ def save_cash_flow_data(db_manager, data, stock_id):
             saved_count += 1
 
         conn.commit()
+        record_stock_write(conn, stats)
 
     except Exception as e:
         conn.rollback()
@@ -186,6 +175,7 @@ def save_dividend_result_data(db_manager, data, stock_id):
 
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'dividend_results', [stock_id])
     saved_count = 0
 
     try:
@@ -212,6 +202,7 @@ def save_dividend_result_data(db_manager, data, stock_id):
             saved_count += 1
 
         conn.commit()
+        record_stock_write(conn, stats)
 
     except Exception as e:
         conn.rollback()
@@ -334,6 +325,7 @@ def ensure_stocks_in_database(db_manager):
     """確保股票資訊存在於資料庫中"""
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'stocks', [stock['stock_id'] for stock in SELECTED_STOCKS])
 
     try:
         for stock in SELECTED_STOCKS:
@@ -350,6 +342,7 @@ def ensure_stocks_in_database(db_manager):
             ))
 
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info("股票資訊已更新到資料庫")
 
     except Exception as e:
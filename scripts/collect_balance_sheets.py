@@ -21,6 +21,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
 from app.services.data_collector import FinMindDataCollector
+from app.utils.table_stats import record_stock_write, snapshot_stock_stats
 from loguru import logger
 
 # 簡化的API狀態檢查
@@ -124,6 +125,7 @@ def save_balance_sheet_data(db_manager, df, stock_id):
     
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'balance_sheets', [stock_id])
     
     saved_count = 0
     
@@ -149,6 +151,7 @@ def save_balance_sheet_data(db_manager, df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f"股票 {stock_id} 成功儲存 {saved_count} 筆資產負債表資料")
         
     except Exception as e:
@@ -164,6 +167,7 @@ def calculate_balance_sheet_ratios(db_manager, stock_id):
     """計算資產負債表相關比率"""
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'financial_ratios', [stock_id])
     
     try:
         cursor.execute("""
@@ -218,6 +222,7 @@ def calculate_balance_sheet_ratios(db_manager, stock_id):
                 updated_count += 1
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f"股票 {stock_id} 資產負債表比率計算完成，更新 {updated_count} 筆記錄")
         return updated_count
         
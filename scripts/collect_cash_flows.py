@@ -19,6 +19,7 @@ try:
     from config import Config
     from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
     from app.services.data_collector import FinMindDataCollector
+    from app.utils.table_stats import record_stock_write, snapshot_stock_stats
     from loguru import logger
 except ImportError as e:
     print(f"模組導入失敗: {e}")
@@ -79,6 +80,7 @@ def save_cash_flow_data(db_manager, df, stock_id):
     
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'cash_flow_statements', [stock_id])
     
     saved_count = 0
     
@@ -104,6 +106,7 @@ def save_cash_flow_data(db_manager, df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f" {stock_id}  {saved_count} ")
         
     except Exception as e:
@@ -119,6 +122,7 @@ def calculate_cash_flow_ratios(db_manager, stock_id):
     """"""
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'financial_ratios', [stock_id])
     
     try:
         # 
@@ -202,6 +206,7 @@ def calculate_cash_flow_ratios(db_manager, stock_id):
             ratio_count += 1
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f" {stock_id}  {ratio_count} ")
         
     except Exception as e:
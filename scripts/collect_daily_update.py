@@ -7,10 +7,10 @@
 import os
 import sys
 import argparse
-import subprocess
-import time
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
+import pandas as pd
 from loguru import logger
 from tqdm import tqdm
 
@@ -19,24 +19,57 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
 from app.utils.simple_database import SimpleDatabaseManager
+from app.utils.bulk_upsert import FINMIND_COLUMN_MAPS
+from app.utils.technical_indicators import update_indicators
+from app.utils.table_stats import refresh_table_stats
+from app.utils.revenue_growth import fetch_start_watermark
+from app.utils.stock_payloads import rebuild_stock_details
+from app.utils.trading_calendar import get_trading_calendar
+from app.services.data_collector import FinMindDataCollector
 from config import Config
+from scripts.daily_update_pipeline import DailyUpdatePipeline, PipelineStage
+from scripts.quota_scheduler import RequestLedger
+from scripts.smart_wait import SmartWaitManager
 
 class DailyUpdateCollector:
     """每日增量資料收集器"""
 
-    def __init__(self, batch_size=5, days_back=7, test_mode=False):
+    def __init__(self, batch_size=5, days_back=7, test_mode=False, price_mode='by_date', max_workers=3):
         self.batch_size = batch_size
         self.days_back = days_back
         self.test_mode = test_mode
+        # 股價收集模式: by_date 每個交易日一次請求取得全市場；per_stock 逐檔收集
+        self.price_mode = price_mode
+        self.max_workers = max_workers
         self.db_manager = SimpleDatabaseManager(Config.DATABASE_PATH)
         self.today = datetime.now().date()
         self.stats = {
             'stock_prices': 0,
             'monthly_revenues': 0,
             'financial_statements': 0,
+            'balance_sheets': 0,
+            'cash_flows': 0,
+            'dividend_results': 0,
             'dividend_policies': 0,
+            'stock_scores': 0,
             'updated_stocks': set()
         }
+        self._stats_lock = threading.Lock()
+
+        # 所有收集階段在同一行程內執行，共用收集器（HTTP session 與請求計數）、
+        # 請求帳本與股票清單快取
+        self.collector = FinMindDataCollector(Config.FINMIND_API_URL, Config.FINMIND_API_TOKEN)
+        ledger_path = Path(Config.DATABASE_PATH).parent / "collection_scheduler.db"
+        self.collector.request_ledger = RequestLedger(ledger_path, self.collector.max_requests_per_hour)
+        self.pipeline = DailyUpdatePipeline(
+            self.collector,
+            wait_manager=SmartWaitManager(ledger=self.collector.request_ledger),
+            max_workers=max_workers,
+            output=tqdm.write
+        )
+        self._stock_list = None
+        self._price_stock_ids = None
+        self._stock_list_lock = threading.RLock()
 
         # 設定日誌
         log_file = project_root / "logs" / "collect_daily_update.log"
@@ -111,6 +144,49 @@ class DailyUpdateCollector:
         finally:
             conn.close()
 
+    def get_stock_list(self):
+        """
+        各收集階段共用的股票清單（上市櫃 4 位數普通股），整個執行過程只查詢一次
+
+        Returns:
+            [{'stock_id', 'stock_name'}]；測試模式只取前3檔
+        """
+        with self._stock_list_lock:
+            if self._stock_list is None:
+                try:
+                    with self.db_manager.connection(read_only=True) as conn:
+                        rows = conn.execute("""
+                            SELECT stock_id, stock_name
+                            FROM stocks
+                            WHERE is_etf = 0
+                            AND LENGTH(stock_id) = 4
+                            AND stock_id GLOB '[0-9][0-9][0-9][0-9]'
+                            AND market IN ('TWSE', 'TPEx')
+                            ORDER BY stock_id
+                        """).fetchall()
+                    stock_list = [{'stock_id': row[0], 'stock_name': row[1]} for row in rows]
+                except Exception as e:
+                    logger.error(f"獲取股票清單失敗: {e}")
+                    return []
+
+                if self.test_mode:
+                    stock_list = stock_list[:3]
+                self._stock_list = stock_list
+            return self._stock_list
+
+    def _run_stage(self, name, key, process, stocks=None):
+        """在行程內執行一個收集階段並累計統計"""
+        stage = PipelineStage(
+            name=name,
+            key=key,
+            stocks=self.get_stock_list() if stocks is None else stocks,
+            process=process
+        )
+        result = self.pipeline.run_stage(stage)
+        with self._stats_lock:
+            self.stats[key] += result.saved
+        return result
+
     def collect_stock_prices(self):
         """收集股價資料"""
         print(" 檢查股價資料更新需求...")
@@ -125,39 +201,101 @@ class DailyUpdateCollector:
             return
 
         print(f" 需要收集期間: {start_date} 到 {self.today}")
-        print(" 啟動股價收集腳本...")
         logger.info(f" 收集期間: {start_date} 到 {self.today}")
 
-        # 執行股價收集腳本
-        cmd = [
-            "python", "scripts/collect_stock_prices_smart.py",
-            "--start-date", start_date.isoformat(),
-            "--end-date", self.today.isoformat(),
-            "--batch-size", str(self.batch_size)
-        ]
+        if self.price_mode == 'by_date':
+            remaining_start = self._collect_stock_prices_by_date(start_date)
+            if remaining_start is None:
+                print(f" 股價資料收集完成，新增 {self.stats['stock_prices']:,} 筆資料")
+                logger.info(f" 股價資料收集完成，新增 {self.stats['stock_prices']:,} 筆資料")
+                return
+            print(f" 依日期查詢不可用，自 {remaining_start} 起改用逐檔收集")
+            logger.warning(f" 依日期查詢不可用，自 {remaining_start} 起改用逐檔收集")
+            start_date = remaining_start
 
-        if self.test_mode:
-            cmd.append("--test")
+        self._collect_stock_prices_per_stock(start_date)
 
-        try:
-            print(" 執行中，請稍候...")
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=1800)  # 30分鐘超時
-
-            if result.returncode == 0:
-                new_records = self._count_new_records('stock_prices', start_date)
-                print(f" 股價資料收集完成，新增 {new_records:,} 筆資料")
-                logger.info(f" 股價資料收集完成，新增 {new_records:,} 筆資料")
-                self.stats['stock_prices'] = new_records
-            else:
-                print(f" 股價資料收集失敗")
-                logger.error(f" 股價資料收集失敗: {result.stderr}")
+    def get_price_stock_ids(self):
+        """股價收集的股票清單（與 collect_stock_prices_smart.py 相同：上市櫃普通股），只查詢一次"""
+        with self._stock_list_lock:
+            if self._price_stock_ids is not None:
+                return self._price_stock_ids
 
-        except subprocess.TimeoutExpired:
-            print(" 股價收集超時，可能遇到API限制")
-            logger.warning(" 股價收集超時")
-        except Exception as e:
-            print(f" 執行股價收集腳本失敗: {e}")
-            logger.error(f" 執行股價收集腳本失敗: {e}")
+            try:
+                with self.db_manager.connection(read_only=True) as conn:
+                    rows = conn.execute("""
+                        SELECT stock_id FROM stocks
+                        WHERE is_etf = 0 AND LENGTH(stock_id) = 4
+                        ORDER BY stock_id
+                    """).fetchall()
+                stock_ids = [row[0] for row in rows]
+            except Exception as e:
+                logger.warning(f"獲取股價收集股票清單失敗: {e}")
+                return []
+
+            if self.test_mode:
+                stock_ids = stock_ids[:3]
+            self._price_stock_ids = stock_ids
+            return stock_ids
+
+    def _collect_stock_prices_by_date(self, start_date):
+        """
+        依交易日收集全市場股價：每個交易日一次 API 請求（不指定 data_id），
+        在記憶體中依 stock_id 篩選後批次寫入
+
+        Returns:
+            None 表示完成；API 不支援依日期查詢時回傳尚未收集的起始日期
+        """
+        stock_ids = set(self.get_price_stock_ids())
+
+        # 依交易日曆略過週末與已知的休市日，不浪費請求
+        calendar = get_trading_calendar(self.db_manager.database_path)
+        trade_dates = [datetime.strptime(d, '%Y-%m-%d').date()
+                       for d in calendar.trading_days(start_date, self.today)]
+
+        print(f" 依日期收集全市場股價: {len(trade_dates)} 個交易日（每日 1 次請求）")
+        logger.info(f" 依日期收集全市場股價: {len(trade_dates)} 個交易日")
+
+        for trade_date in tqdm(trade_dates, desc=" 股價(依日期)", unit="日"):
+            df = self.collector.get_market_price_data(trade_date.isoformat())
+            if df is None:
+                return trade_date
+            if df.empty:
+                logger.info(f" {trade_date} 無股價資料（非交易日）")
+                continue
+
+            if stock_ids:
+                df = df[df['stock_id'].isin(stock_ids)]
+            if df.empty:
+                continue
+
+            result = self.db_manager.bulk_upsert('stock_prices', df)
+            with self._stats_lock:
+                self.stats['stock_prices'] += result['inserted']
+                self.stats['updated_stocks'].update(df['stock_id'].unique())
+            logger.info(f" {trade_date} 股價: {df['stock_id'].nunique()} 檔，新增 {result['inserted']} 筆、"
+                        f"更新 {result['updated']} 筆、略過 {result['skipped']} 筆")
+
+        return None
+
+    def _collect_stock_prices_per_stock(self, start_date):
+        """逐檔收集股價（在行程內使用 collect_stock_prices_smart.py 的增量收集）"""
+        from scripts import collect_stock_prices_smart as price_script
+
+        start, end = start_date.isoformat(), self.today.isoformat()
+
+        def process(stock):
+            _, collected = price_script.collect_stock_prices_incremental(
+                self.db_manager, self.collector, stock['stock_id'], start, end)
+            if collected:
+                with self._stats_lock:
+                    self.stats['updated_stocks'].add(stock['stock_id'])
+            return collected
+
+        stocks = [{'stock_id': stock_id} for stock_id in self.get_price_stock_ids()]
+        result = self._run_stage(" [股價]", 'stock_prices', process, stocks)
+        print(f" 股價資料收集完成，新增 {result.saved:,} 筆資料")
+        logger.info(f" 股價資料收集完成，新增 {result.saved:,} 筆資料")
 
     def collect_monthly_revenues(self):
         """收集月營收資料"""
@@ -168,116 +306,99 @@ class DailyUpdateCollector:
         current_month = self.today.replace(day=1)
         last_month = (current_month - timedelta(days=1)).replace(day=1)
 
-        # 檢查上個月的資料是否完整
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("""
-                SELECT COUNT(DISTINCT stock_id)
-                FROM monthly_revenues
-                WHERE revenue_year = ? AND revenue_month = ?
-            """, (last_month.year, last_month.month))
-
-            last_month_count = cursor.fetchone()[0]
+            # 檢查上個月的資料是否完整
+            with self.db_manager.connection(read_only=True) as conn:
+                last_month_count = conn.execute("""
+                    SELECT COUNT(DISTINCT stock_id)
+                    FROM monthly_revenues
+                    WHERE revenue_year = ? AND revenue_month = ?
+                """, (last_month.year, last_month.month)).fetchone()[0]
 
             print(f" {last_month.year}-{last_month.month:02d} 月營收資料: {last_month_count} 檔股票")
 
             # 如果上個月資料少於100檔股票，則需要更新
             if last_month_count < 100:
                 print(f" 需要更新 {last_month.year}-{last_month.month:02d} 月營收資料")
-                print(" 啟動月營收收集腳本...")
                 logger.info(f" 需要更新 {last_month.year}-{last_month.month:02d} 月營收資料")
 
-                # 執行月營收收集腳本
-                start_date = last_month.isoformat()
-                end_date = self.today.isoformat()
-
-                cmd = [
-                    "python", "scripts/collect_monthly_revenue.py",
-                    "--start-date", start_date,
-                    "--end-date", end_date,
-                    "--batch-size", str(self.batch_size)
-                ]
-
-                if self.test_mode:
-                    cmd.append("--test")
-
-                print(" 執行中，請稍候...")
-                result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=1200)  # 20分鐘超時
-
-                if result.returncode == 0:
-                    new_records = self._count_new_records('monthly_revenues', last_month)
-                    print(f" 月營收資料收集完成，新增 {new_records:,} 筆資料")
-                    logger.info(f" 月營收資料收集完成，新增 {new_records:,} 筆資料")
-                    self.stats['monthly_revenues'] = new_records
-                else:
-                    print(" 月營收資料收集失敗")
-                    logger.error(f" 月營收資料收集失敗: {result.stderr}")
+                from scripts import collect_monthly_revenue as revenue_script
+                start_date, end_date = last_month.isoformat(), self.today.isoformat()
+
+                def process(stock):
+                    stock_id = stock['stock_id']
+                    df = revenue_script.get_monthly_revenue_data(self.collector, stock_id, start_date, end_date)
+                    if df is None or df.empty:
+                        return 0
+                    return revenue_script.save_monthly_revenue_data(self.db_manager, df, stock_id)
+
+                result = self._run_stage(" [月營收]", 'monthly_revenues', process)
+                if result.saved:
+                    revenue_script.calculate_growth_rates(self.db_manager,
+                                                          since=fetch_start_watermark(start_date))
+                print(f" 月營收資料收集完成，新增 {result.saved:,} 筆資料")
+                logger.info(f" 月營收資料收集完成，新增 {result.saved:,} 筆資料")
             else:
                 print(" 月營收資料已充足，無需更新")
                 logger.info(" 月營收資料已是最新，無需更新")
 
-        except subprocess.TimeoutExpired:
-            print(" 月營收收集超時")
-            logger.warning(" 月營收收集超時")
         except Exception as e:
             print(f" 檢查月營收資料失敗: {e}")
             logger.error(f" 檢查月營收資料失敗: {e}")
-        finally:
-            conn.close()
+
+    def _count_current_year_stocks(self, table_name, column='date'):
+        """當年度已有資料的股票數"""
+        with self.db_manager.connection(read_only=True) as conn:
+            return conn.execute(f"""
+                SELECT COUNT(DISTINCT stock_id)
+                FROM {table_name}
+                WHERE {column} LIKE ?
+            """, (f"{self.today.year}%",)).fetchone()[0]
+
+    def _statement_stage_process(self, fetch, save, post_process=None):
+        """財報類階段的單檔處理：取得當年度資料、儲存、計算衍生指標"""
+        start_date, end_date = f"{self.today.year}-01-01", self.today.isoformat()
+
+        def process(stock):
+            stock_id = stock['stock_id']
+            df = fetch(self.collector, stock_id, start_date, end_date)
+            if df is None or df.empty:
+                return 0
+            saved = save(self.db_manager, df, stock_id)
+            if post_process is not None:
+                post_process(self.db_manager, stock_id)
+            return saved
+
+        return process
 
     def collect_financial_statements(self):
         """收集財務報表資料"""
         logger.info(" 檢查財務報表資料...")
 
-        # 檢查是否有新的季報需要收集
-        current_quarter = (self.today.month - 1) // 3 + 1
         current_year = self.today.year
 
         # 如果是季度的第二個月之後，檢查該季度資料
         if self.today.month % 3 >= 2:  # 2月、5月、8月、11月之後
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
             try:
                 # 檢查當前季度的資料完整性
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT stock_id)
-                    FROM financial_statements
-                    WHERE date LIKE ?
-                """, (f"{current_year}%",))
-
-                current_year_count = cursor.fetchone()[0]
+                current_year_count = self._count_current_year_stocks('financial_statements')
 
                 if current_year_count < 500:  # 如果當年資料少於500檔
                     logger.info(f" 需要更新 {current_year} 年財務報表資料")
 
-                    cmd = [
-                        "python", "scripts/collect_financial_statements.py",
-                        "--start-date", f"{current_year}-01-01",
-                        "--end-date", self.today.isoformat(),
-                        "--batch-size", str(max(3, self.batch_size // 2))  # 財務報表用較小批次
-                    ]
-
-                    if self.test_mode:
-                        cmd.append("--test")
-
-                    result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root)
-
-                    if result.returncode == 0:
-                        logger.info(" 財務報表資料收集完成")
-                        self.stats['financial_statements'] = self._count_new_records('financial_statements',
-                                                                                   datetime(current_year, 1, 1).date())
-                    else:
-                        logger.error(f" 財務報表資料收集失敗: {result.stderr}")
+                    from scripts import collect_financial_statements as statements_script
+                    process = self._statement_stage_process(
+                        statements_script.get_financial_statements_data,
+                        statements_script.save_financial_statements_data,
+                        statements_script.calculate_financial_ratios
+                    )
+                    self._run_stage(" [財務報表]", 'financial_statements', process)
+                    logger.info(" 財務報表資料收集完成")
                 else:
                     logger.info(" 財務報表資料已是最新，無需更新")
 
             except Exception as e:
                 logger.error(f" 檢查財務報表資料失敗: {e}")
-            finally:
-                conn.close()
         else:
             logger.info(" 非財報更新期間，跳過財務報表收集")
 
@@ -286,59 +407,34 @@ class DailyUpdateCollector:
         print("[資產負債表] 檢查資產負債表資料更新需求...")
         logger.info("[資產負債表] 檢查資產負債表資料...")
 
-        # 檢查是否有新的季報需要收集
         current_year = self.today.year
 
         # 如果是季度的第二個月之後，檢查該季度資料
         if self.today.month % 3 >= 2:  # 2月、5月、8月、11月之後
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
             try:
                 # 檢查當前年度的資產負債表資料完整性
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT stock_id)
-                    FROM balance_sheets
-                    WHERE date LIKE ?
-                """, (f"{current_year}%",))
-
-                current_year_count = cursor.fetchone()[0]
+                current_year_count = self._count_current_year_stocks('balance_sheets')
 
                 if current_year_count < 500:  # 如果當年資料少於500檔
                     print(f"[資產負債表] 需要更新 {current_year} 年資產負債表資料")
                     logger.info(f"[資產負債表] 需要更新 {current_year} 年資產負債表資料")
 
-                    cmd = [
-                        "python", "scripts/collect_balance_sheets.py",
-                        "--start-date", f"{current_year}-01-01",
-                        "--end-date", self.today.isoformat(),
-                        "--batch-size", str(max(3, self.batch_size // 2))
-                    ]
-
-                    if self.test_mode:
-                        cmd.append("--test")
-
-                    print("[資產負債表] 執行中，請稍候...")
-                    result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=900)
-
-                    if result.returncode == 0:
-                        print("[資產負債表] 資產負債表資料收集完成")
-                        logger.info("[資產負債表] 資產負債表資料收集完成")
-                    else:
-                        print("[資產負債表] 資產負債表資料收集失敗")
-                        logger.error(f"[資產負債表] 資產負債表資料收集失敗: {result.stderr}")
+                    from scripts import collect_balance_sheets as balance_script
+                    process = self._statement_stage_process(
+                        balance_script.get_balance_sheet_data,
+                        balance_script.save_balance_sheet_data,
+                        balance_script.calculate_balance_sheet_ratios
+                    )
+                    self._run_stage("[資產負債表]", 'balance_sheets', process)
+                    print("[資產負債表] 資產負債表資料收集完成")
+                    logger.info("[資產負債表] 資產負債表資料收集完成")
                 else:
                     print("[資產負債表] 資產負債表資料已是最新，無需更新")
                     logger.info("[資產負債表] 資產負債表資料已是最新，無需更新")
 
-            except subprocess.TimeoutExpired:
-                print("[資產負債表] 資產負債表收集超時")
-                logger.warning("[資產負債表] 資產負債表收集超時")
             except Exception as e:
                 print(f"[資產負債表] 檢查資產負債表資料失敗: {e}")
                 logger.error(f"[資產負債表] 檢查資產負債表資料失敗: {e}")
-            finally:
-                conn.close()
         else:
             print("[資產負債表] 非財報更新期間，跳過資產負債表收集")
             logger.info("[資產負債表] 非財報更新期間，跳過資產負債表收集")
@@ -353,54 +449,30 @@ class DailyUpdateCollector:
 
         # 如果是季度的第二個月之後，檢查該季度資料
         if self.today.month % 3 >= 2:  # 2月、5月、8月、11月之後
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
             try:
                 # 檢查當前年度的現金流量表資料完整性
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT stock_id)
-                    FROM cash_flow_statements
-                    WHERE date LIKE ?
-                """, (f"{current_year}%",))
-
-                current_year_count = cursor.fetchone()[0]
+                current_year_count = self._count_current_year_stocks('cash_flow_statements')
 
                 if current_year_count < 300:  # 如果當年資料少於300檔
                     print(f"[現金流量表] 需要更新 {current_year} 年現金流量表資料")
                     logger.info(f"[現金流量表] 需要更新 {current_year} 年現金流量表資料")
 
-                    cmd = [
-                        "python", "scripts/collect_cash_flows.py",
-                        "--start-date", f"{current_year}-01-01",
-                        "--end-date", self.today.isoformat(),
-                        "--batch-size", str(max(3, self.batch_size // 2))
-                    ]
-
-                    if self.test_mode:
-                        cmd.append("--test")
-
-                    print("[現金流量表] 執行中，請稍候...")
-                    result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=900)
-
-                    if result.returncode == 0:
-                        print("[現金流量表] 現金流量表資料收集完成")
-                        logger.info("[現金流量表] 現金流量表資料收集完成")
-                    else:
-                        print("[現金流量表] 現金流量表資料收集失敗")
-                        logger.error(f"[現金流量表] 現金流量表資料收集失敗: {result.stderr}")
+                    from scripts import collect_cash_flows as cash_flow_script
+                    process = self._statement_stage_process(
+                        cash_flow_script.get_cash_flow_data,
+                        cash_flow_script.save_cash_flow_data,
+                        cash_flow_script.calculate_cash_flow_ratios
+                    )
+                    self._run_stage("[現金流量表]", 'cash_flows', process)
+                    print("[現金流量表] 現金流量表資料收集完成")
+                    logger.info("[現金流量表] 現金流量表資料收集完成")
                 else:
                     print("[現金流量表] 現金流量表資料已是最新，無需更新")
                     logger.info("[現金流量表] 現金流量表資料已是最新，無需更新")
 
-            except subprocess.TimeoutExpired:
-                print("[現金流量表] 現金流量表收集超時")
-                logger.warning("[現金流量表] 現金流量表收集超時")
             except Exception as e:
                 print(f"[現金流量表] 檢查現金流量表資料失敗: {e}")
                 logger.error(f"[現金流量表] 檢查現金流量表資料失敗: {e}")
-            finally:
-                conn.close()
         else:
             print("[現金流量表] 非財報更新期間，跳過現金流量表收集")
             logger.info("[現金流量表] 非財報更新期間，跳過現金流量表收集")
@@ -414,58 +486,35 @@ class DailyUpdateCollector:
         if 3 <= self.today.month <= 8:  # 除權除息期間
             current_year = self.today.year
 
-            # 先檢查當年度除權除息結果資料的完整性
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
             try:
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT stock_id)
-                    FROM dividend_results
-                    WHERE date LIKE ?
-                """, (f"{current_year}%",))
-
-                current_year_count = cursor.fetchone()[0]
+                # 先檢查當年度除權除息結果資料的完整性
+                current_year_count = self._count_current_year_stocks('dividend_results')
 
                 # 如果當年度除權除息結果資料少於30檔股票，才執行收集
                 if current_year_count < 30:
                     print(f"[除權除息] 需要更新 {current_year} 年除權除息結果資料")
                     logger.info(f"[除權除息] 需要更新 {current_year} 年除權除息結果資料")
 
-                    cmd = [
-                        "python", "scripts/collect_dividend_results.py",
-                        "--start-date", f"{current_year}-01-01",
-                        "--end-date", self.today.isoformat(),
-                        "--batch-size", str(max(3, self.batch_size // 2))
-                    ]
-
-                    if self.test_mode:
-                        cmd.append("--test")
-
-                    print("[除權除息] 執行中，請稍候...")
-                    result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=600)
-
-                    if result.returncode == 0:
-                        print("[除權除息] 除權除息結果資料收集完成")
-                        logger.info("[除權除息] 除權除息結果資料收集完成")
-                    else:
-                        print("[除權除息] 除權除息結果資料收集失敗")
-                        logger.error(f"[除權除息] 除權除息結果資料收集失敗: {result.stderr}")
+                    from scripts import collect_dividend_results as dividend_result_script
+                    process = self._statement_stage_process(
+                        dividend_result_script.get_dividend_result_data,
+                        dividend_result_script.save_dividend_result_data,
+                        dividend_result_script.analyze_dividend_performance
+                    )
+                    self._run_stage("[除權除息]", 'dividend_results', process)
+                    print("[除權除息] 除權除息結果資料收集完成")
+                    logger.info("[除權除息] 除權除息結果資料收集完成")
                 else:
                     print(f"[除權除息] {current_year} 年除權除息結果資料已充足 ({current_year_count} 檔)，跳過收集")
                     logger.info(f"[除權除息] {current_year} 年除權除息結果資料已充足 ({current_year_count} 檔)，跳過收集")
 
-            except subprocess.TimeoutExpired:
-                print("[除權除息] 除權除息結果收集超時")
-                logger.warning("[除權除息] 除權除息結果收集超時，跳過此步驟")
             except Exception as e:
                 print(f"[除權除息] 執行除權除息結果收集失敗: {e}")
                 logger.error(f"[除權除息] 執行除權除息結果收集失敗: {e}")
-            finally:
-                conn.close()
         else:
             print("[除權除息] 非除權除息期間，跳過除權除息結果收集")
             logger.info("[除權除息] 非除權除息期間，跳過除權除息結果收集")
+
     def collect_dividend_policies(self):
         """收集股利政策資料"""
         logger.info(" 檢查股利政策資料...")
@@ -474,50 +523,36 @@ class DailyUpdateCollector:
         if 3 <= self.today.month <= 8:  # 股利公布期間
             current_year = self.today.year
 
-            # 先檢查當年度股利資料的完整性
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
             try:
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT stock_id)
-                    FROM dividend_policies
-                    WHERE year LIKE ?
-                """, (f"{current_year}%",))
-
-                current_year_dividend_count = cursor.fetchone()[0]
+                # 先檢查當年度股利資料的完整性
+                current_year_dividend_count = self._count_current_year_stocks('dividend_policies', 'year')
 
                 # 如果當年度股利資料少於50檔股票，才執行收集
                 if current_year_dividend_count < 50:
                     logger.info(f" 需要更新 {current_year} 年股利政策資料")
-
-                    cmd = [
-                        "python", "scripts/collect_dividend_data.py",
-                        "--start-date", f"{current_year}-01-01",
-                        "--end-date", self.today.isoformat(),
-                        "--batch-size", str(max(3, self.batch_size // 2))
-                    ]
-
-                    if self.test_mode:
-                        cmd.append("--test")
-
-                    result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=300)  # 5分鐘超時
-
-                    if result.returncode == 0:
-                        logger.info(" 股利政策資料收集完成")
-                        self.stats['dividend_policies'] = self._count_new_records('dividend_policies',
-                                                                                datetime(current_year, 1, 1).date())
-                    else:
-                        logger.error(f" 股利政策資料收集失敗: {result.stderr}")
+                    start_date, end_date = f"{current_year}-01-01", self.today.isoformat()
+
+                    def process(stock):
+                        data = self.collector._make_request(
+                            dataset="TaiwanStockDividend",
+                            data_id=stock['stock_id'],
+                            start_date=start_date,
+                            end_date=end_date
+                        )
+                        if not data['data']:
+                            return 0
+                        result = self.db_manager.bulk_upsert(
+                            'dividend_policies', pd.DataFrame(data['data']),
+                            column_map=FINMIND_COLUMN_MAPS['dividend_policies'])
+                        return result['inserted'] + result['updated']
+
+                    self._run_stage(" [股利政策]", 'dividend_policies', process)
+                    logger.info(" 股利政策資料收集完成")
                 else:
                     logger.info(f" {current_year} 年股利政策資料已充足 ({current_year_dividend_count} 檔)，跳過收集")
 
-            except subprocess.TimeoutExpired:
-                logger.warning(" 股利政策收集超時，跳過此步驟")
             except Exception as e:
                 logger.error(f" 執行股利政策收集失敗: {e}")
-            finally:
-                conn.close()
         else:
             logger.info(" 非股利公布期間，跳過股利政策收集")
 
@@ -552,31 +587,69 @@ class DailyUpdateCollector:
         logger.info(" 更新潛力股分析...")
 
         try:
-            print(" 啟動潛力股分析...")
-            cmd = [
-                "python", "scripts/analyze_potential_stocks.py",
-                "--top", "100"
-            ]
+            from scripts import analyze_potential_stocks as potential_script
+
+            top = 5 if self.test_mode else 100  # 測試模式只分析前5名
+            with self.db_manager.connection(read_only=True) as conn:
+                rows = conn.execute("""
+                    SELECT DISTINCT fs.stock_id
+                    FROM financial_statements fs
+                    JOIN stocks s ON fs.stock_id = s.stock_id
+                    WHERE s.is_etf = 0
+                    AND LENGTH(s.stock_id) = 4
+                    ORDER BY fs.stock_id
+                    LIMIT ?
+                """, (top,)).fetchall()
+
+            def process(stock):
+                result = potential_script.analyze_stock_potential(self.db_manager, stock['stock_id'])
+                if result and potential_script.save_stock_score(self.db_manager, result):
+                    return 1
+                return 0
+
+            stocks = [{'stock_id': row[0]} for row in rows]
+            result = self._run_stage("[潛力股分析]", 'stock_scores', process, stocks)
+            print(f" 潛力股分析更新完成，更新 {result.saved} 檔評分")
+            logger.info(f" 潛力股分析更新完成，更新 {result.saved} 檔評分")
 
-            if self.test_mode:
-                cmd.extend(["--top", "5"])  # 測試模式只分析前5名
+        except Exception as e:
+            print(f" 執行潛力股分析失敗: {e}")
+            logger.error(f" 執行潛力股分析失敗: {e}")
 
-            print(" 分析中，請稍候...")
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=600)  # 10分鐘超時
+    def update_technical_indicators(self):
+        """只計算新交易日的技術指標（供儀表板直接讀取）"""
+        print(" 更新技術指標...")
+        logger.info(" 更新技術指標...")
 
-            if result.returncode == 0:
-                print(" 潛力股分析更新完成")
-                logger.info(" 潛力股分析更新完成")
-            else:
-                print(" 潛力股分析更新失敗")
-                logger.error(f" 潛力股分析更新失敗: {result.stderr}")
+        try:
+            with self.db_manager.connection() as conn:
+                result = update_indicators(conn, Config.TECHNICAL_INDICATORS)
+            print(f" 技術指標更新完成，{result['stocks']} 檔股票新增 {result['rows']:,} 筆")
+            logger.info(f" 技術指標更新完成，{result['stocks']} 檔股票新增 {result['rows']:,} 筆")
 
-        except subprocess.TimeoutExpired:
-            print(" 潛力股分析超時")
-            logger.warning(" 潛力股分析超時")
         except Exception as e:
-            print(f" 執行潛力股分析失敗: {e}")
-            logger.error(f" 執行潛力股分析失敗: {e}")
+            print(f" 更新技術指標失敗: {e}")
+            logger.error(f" 更新技術指標失敗: {e}")
+
+    def refresh_table_stats(self):
+        """重新計算資料表統計（部分收集腳本不經過 bulk_upsert，收集完成後校正一次）"""
+        try:
+            with self.db_manager.connection() as conn:
+                count = refresh_table_stats(conn)
+            logger.info(f" 資料表統計已更新: {count} 張資料表")
+
+        except Exception as e:
+            logger.error(f" 更新資料表統計失敗: {e}")
+
+    def rebuild_stock_details(self):
+        """重建 Web 介面的股票詳細資料（需在分析與資料表統計更新之後）"""
+        try:
+            with self.db_manager.connection() as conn:
+                count = rebuild_stock_details(conn)
+            logger.info(f" Web 股票詳細資料已重建: {count} 檔")
+
+        except Exception as e:
+            logger.error(f" 重建 Web 股票詳細資料失敗: {e}")
 
     def run(self):
         """執行每日增量收集"""
@@ -593,6 +666,7 @@ class DailyUpdateCollector:
         print(f" 目標日期: {self.today}")
         print(f" 批次大小: {self.batch_size}")
         print(f" 回溯天數: {self.days_back}")
+        print(f" 同時執行階段數: {self.max_workers}")
         print("=" * 60)
 
         # 日誌記錄
@@ -608,7 +682,7 @@ class DailyUpdateCollector:
         logger.info(f" 回溯天數: {self.days_back}")
         logger.info("=" * 60)
 
-        # 定義收集任務
+        # 定義收集任務（同時執行）
         tasks = [
             (" 股價資料收集", self.collect_stock_prices),
             (" 月營收資料收集", self.collect_monthly_revenues),
@@ -617,32 +691,32 @@ class DailyUpdateCollector:
             ("[現金流量表] 現金流量表檢查", self.collect_cash_flows),
             ("[除權除息] 除權除息結果檢查", self.collect_dividend_results),
             (" 股利政策檢查", self.collect_dividend_policies),
-            ("[潛力股分析] 潛力股分析更新", self.update_potential_analysis)
+        ]
+        # 潛力股分析與技術指標需等所有資料收集完成
+        analysis_tasks = [
+            ("[潛力股分析] 潛力股分析更新", self.update_potential_analysis),
+            ("[技術指標] 技術指標更新", self.update_technical_indicators),
         ]
 
         try:
-            # 使用進度條執行任務
-            with tqdm(total=len(tasks), desc=" 總體進度", unit="任務",
+            # 使用進度條顯示完成的任務數，各階段的逐檔進度即時輸出在進度條上方
+            with tqdm(total=len(tasks) + len(analysis_tasks), desc=" 總體進度", unit="任務",
                      bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]") as pbar:
 
-                for i, (task_name, task_func) in enumerate(tasks, 1):
-                    print(f"\n 任務 {i}/{len(tasks)}: {task_name}")
-                    print("-" * 40)
-
-                    pbar.set_description(f" 執行中: {task_name}")
+                def on_done(task_name, error):
+                    if error is None:
+                        self.pipeline.emit(f" {task_name} 完成")
+                    else:
+                        self.pipeline.emit(f" {task_name} 失敗: {error}")
+                    pbar.update(1)
 
-                    try:
-                        task_func()
-                        print(f" {task_name} 完成")
-                    except Exception as e:
-                        print(f" {task_name} 失敗: {e}")
-                        logger.error(f" {task_name} 失敗: {e}")
+                self.pipeline.run_concurrently(tasks, on_done)
 
-                    pbar.update(1)
+                pbar.set_description(" 執行中: 分析更新")
+                self.pipeline.run_concurrently(analysis_tasks, on_done)
 
-                    # 任務間短暫休息
-                    if i < len(tasks):
-                        time.sleep(1)
+            self.refresh_table_stats()
+            self.rebuild_stock_details()
 
             # 顯示統計摘要
             self.show_summary(start_time)
@@ -668,6 +742,9 @@ class DailyUpdateCollector:
         print(f"  股價資料         : +{self.stats['stock_prices']:,} 筆")
         print(f"  月營收資料       : +{self.stats['monthly_revenues']:,} 筆")
         print(f"  財務報表資料     : +{self.stats['financial_statements']:,} 筆")
+        print(f"  資產負債表資料   : +{self.stats['balance_sheets']:,} 筆")
+        print(f"  現金流量表資料   : +{self.stats['cash_flows']:,} 筆")
+        print(f"  除權除息結果     : +{self.stats['dividend_results']:,} 筆")
         print(f"  股利政策資料     : +{self.stats['dividend_policies']:,} 筆")
         print()
         print(" 每日增量收集成功完成！")
@@ -685,6 +762,9 @@ class DailyUpdateCollector:
         logger.info(f"  股價資料         : +{self.stats['stock_prices']:,} 筆")
         logger.info(f"  月營收資料       : +{self.stats['monthly_revenues']:,} 筆")
         logger.info(f"  財務報表資料     : +{self.stats['financial_statements']:,} 筆")
+        logger.info(f"  資產負債表資料   : +{self.stats['balance_sheets']:,} 筆")
+        logger.info(f"  現金流量表資料   : +{self.stats['cash_flows']:,} 筆")
+        logger.info(f"  除權除息結果     : +{self.stats['dividend_results']:,} 筆")
         logger.info(f"  股利政策資料     : +{self.stats['dividend_policies']:,} 筆")
         logger.info("")
         logger.info(" 每日增量收集成功完成！")
@@ -696,6 +776,9 @@ def main():
     parser.add_argument("--batch-size", type=int, default=5, help="批次大小 (預設: 5)")
     parser.add_argument("--days-back", type=int, default=7, help="往前收集天數 (預設: 7)")
     parser.add_argument("--test", action="store_true", help="測試模式：只處理前3檔股票")
+    parser.add_argument("--price-mode", choices=["by_date", "per_stock"], default="by_date",
+                        help="股價收集模式：by_date 每日一次請求取得全市場 (預設)；per_stock 逐檔收集")
+    parser.add_argument("--workers", type=int, default=3, help="同時執行的收集階段數 (預設: 3)")
 
     args = parser.parse_args()
 
@@ -703,7 +786,9 @@ def main():
         collector = DailyUpdateCollector(
             batch_size=args.batch_size,
             days_back=args.days_back,
-            test_mode=args.test
+            test_mode=args.test,
+            price_mode=args.price_mode,
+            max_workers=args.workers
         )
         collector.run()
 
@@ -17,6 +17,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
 from app.services.data_collector import FinMindDataCollector
+from app.utils.market_summary import update_market_summary
 from loguru import logger
 
 def init_logging():
@@ -170,6 +171,8 @@ def save_price_data(db_manager: DatabaseManager, price_data: dict):
             # 批量插入
             db_manager.bulk_insert('stock_prices', records)
             total_records += len(records)
+            with db_manager.connection() as conn:
+                update_market_summary(conn, [stock_id], df['date'].astype(str).unique())
             
             logger.info(f"股票 {stock_id}: 儲存 {len(records)} 筆資料")
             
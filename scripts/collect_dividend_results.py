@@ -24,6 +24,7 @@ try:
     from config import Config
     from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
     from app.services.data_collector import FinMindDataCollector
+    from app.utils.table_stats import record_stock_write, snapshot_stock_stats
     from loguru import logger
 except ImportError as e:
     print(f"模組導入失敗: {e}")
@@ -32,7 +33,8 @@ except ImportError as e:
 
 # 導入智能等待模組
 try:
-    from scripts.smart_wait import reset_execution_timer, smart_wait_for_api_reset, is_api_limit_error
+    from scripts.smart_wait import (reset_execution_timer, smart_wait_for_api_reset, is_api_limit_error,
+                                    get_request_ledger)
 except ImportError:
     print("[WARNING] 無法導入智能等待模組，使用本地版本")
 
@@ -79,6 +81,9 @@ except ImportError:
         api_limit_keywords = ["402", "Payment Required", "API請求限制", "rate limit", "quota exceeded"]
         return any(keyword.lower() in error_msg.lower() for keyword in api_limit_keywords)
 
+    def get_request_ledger():
+        return None
+
 
 
 def get_dividend_result_data(collector, stock_id, start_date, end_date):
@@ -127,6 +132,7 @@ def save_dividend_result_data(db_manager, df, stock_id):
     
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'dividend_results', [stock_id])
     
     saved_count = 0
     
@@ -159,6 +165,7 @@ def save_dividend_result_data(db_manager, df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f" {stock_id}  {saved_count} ")
         
     except Exception as e:
@@ -247,7 +254,8 @@ def collect_dividend_result_batch(stock_list, start_date, end_date, batch_size=3
     db_manager = DatabaseManager(Config.DATABASE_PATH)
     collector = FinMindDataCollector(
         api_url=Config.FINMIND_API_URL,
-        api_token=Config.FINMIND_API_TOKEN
+        api_token=Config.FINMIND_API_TOKEN,
+        request_ledger=get_request_ledger()
     )
     
     total_saved = 0
@@ -22,6 +22,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
 from app.services.data_collector import FinMindDataCollector
+from app.utils.table_stats import record_stock_write, snapshot_stock_stats
 from loguru import logger
 
 # 簡化的API狀態檢查
@@ -123,6 +124,7 @@ def save_financial_statements_data(db_manager, df, stock_id):
     
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'financial_statements', [stock_id])
     
     saved_count = 0
     
@@ -148,6 +150,7 @@ def save_financial_statements_data(db_manager, df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f"股票 {stock_id} 成功儲存 {saved_count} 筆綜合損益表資料")
         
     except Exception as e:
@@ -163,6 +166,7 @@ def calculate_financial_ratios(db_manager, stock_id):
     """計算財務比率"""
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'financial_ratios', [stock_id])
     
     try:
         # 獲取該股票的綜合損益表資料，按日期分組
@@ -220,6 +224,7 @@ def calculate_financial_ratios(db_manager, stock_id):
                 updated_count += 1
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f"股票 {stock_id} 財務比率計算完成，更新 {updated_count} 筆記錄")
         return updated_count
         
@@ -18,6 +18,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
 from app.services.data_collector import FinMindDataCollector
+from app.utils.revenue_growth import fetch_start_watermark, recompute_revenue_growth
+from app.utils.table_stats import record_stock_write, snapshot_stock_stats
 from loguru import logger
 
 def init_logging():
@@ -88,6 +90,7 @@ def save_monthly_revenue_data(db_manager, df, stock_id):
     
     conn = db_manager.get_connection()
     cursor = conn.cursor()
+    stats = snapshot_stock_stats(conn, 'monthly_revenues', [stock_id])
     
     saved_count = 0
     
@@ -114,6 +117,7 @@ def save_monthly_revenue_data(db_manager, df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
         logger.info(f"股票 {stock_id} 成功儲存 {saved_count} 筆月營收資料")
         
     except Exception as e:
@@ -125,62 +129,12 @@ def save_monthly_revenue_data(db_manager, df, stock_id):
     
     return saved_count
 
-def calculate_growth_rates(db_manager, stock_id):
-    """計算月營收成長率"""
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # 獲取該股票的月營收資料，按年月排序
-        cursor.execute("""
-            SELECT revenue_year, revenue_month, revenue
-            FROM monthly_revenues 
-            WHERE stock_id = ?
-            ORDER BY revenue_year, revenue_month
-        """, (stock_id,))
-        
-        data = cursor.fetchall()
-        
-        if len(data) < 2:
-            return
-        
-        # 計算月增率和年增率
-        for i in range(len(data)):
-            year, month, revenue = data[i]
-            
-            # 計算月增率 (MoM)
-            mom_growth = None
-            if i > 0:
-                prev_revenue = data[i-1][2]
-                if prev_revenue and prev_revenue > 0:
-                    mom_growth = ((revenue - prev_revenue) / prev_revenue) * 100
-            
-            # 計算年增率 (YoY)
-            yoy_growth = None
-            # 找去年同月的資料
-            for j in range(i):
-                prev_year, prev_month, prev_revenue = data[j]
-                if prev_year == year - 1 and prev_month == month:
-                    if prev_revenue and prev_revenue > 0:
-                        yoy_growth = ((revenue - prev_revenue) / prev_revenue) * 100
-                    break
-            
-            # 更新成長率資料
-            if mom_growth is not None or yoy_growth is not None:
-                cursor.execute("""
-                    UPDATE monthly_revenues 
-                    SET revenue_growth_mom = ?, revenue_growth_yoy = ?
-                    WHERE stock_id = ? AND revenue_year = ? AND revenue_month = ?
-                """, (mom_growth, yoy_growth, stock_id, year, month))
-        
-        conn.commit()
-        logger.info(f"股票 {stock_id} 成長率計算完成")
-        
-    except Exception as e:
-        logger.error(f"計算成長率失敗 {stock_id}: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+def calculate_growth_rates(db_manager, stock_id=None, since=None):
+    """計算月營收成長率（集合式重算，stock_id 為 None 時重算所有股票）"""
+    with db_manager.connection() as conn:
+        updated = recompute_revenue_growth(conn, None if stock_id is None else [stock_id], since=since)
+    logger.info(f"{stock_id or '全部股票'} 成長率計算完成，更新 {updated} 筆")
+    return updated
 
 def collect_monthly_revenue_batch(stock_list, start_date, end_date, batch_size=10):
     """批次收集月營收資料"""
@@ -199,6 +153,7 @@ def collect_monthly_revenue_batch(stock_list, start_date, end_date, batch_size=1
     
     total_saved = 0
     failed_stocks = []
+    saved_stock_ids = []
     
     # 分批處理
     total_batches = (len(stock_list) + batch_size - 1) // batch_size
@@ -220,9 +175,8 @@ def collect_monthly_revenue_batch(stock_list, start_date, end_date, batch_size=1
                     # 儲存資料
                     saved_count = save_monthly_revenue_data(db_manager, df, stock_id)
                     total_saved += saved_count
-                    
-                    # 計算成長率
-                    calculate_growth_rates(db_manager, stock_id)
+                    if saved_count:
+                        saved_stock_ids.append(stock_id)
                     
                     print(f"{stock_id} 完成，儲存 {saved_count} 筆資料")
                 else:
@@ -248,6 +202,12 @@ def collect_monthly_revenue_batch(stock_list, start_date, end_date, batch_size=1
             print(f"批次完成，休息5秒...")
             time.sleep(5)
     
+    # 所有股票收集完成後一次重算成長率（只重算收集到的第一個營收月份起的資料）
+    if saved_stock_ids:
+        with db_manager.connection() as conn:
+            updated = recompute_revenue_growth(conn, saved_stock_ids, since=fetch_start_watermark(start_date))
+        print(f"成長率重算完成，更新 {updated} 筆")
+    
     # 顯示結果
     print("\n" + "=" * 60)
     print("月營收資料收集完成")
@@ -8,6 +8,7 @@ import sys
 import os
 import time
 import argparse
+import pandas as pd
 from datetime import datetime, timedelta
 
 # 添加專案根目錄到 Python 路徑
@@ -16,6 +17,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
     from config import Config
     from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
+    from app.utils.bulk_upsert import FINMIND_COLUMN_MAPS
+    from app.utils.trading_calendar import get_trading_calendar
     from app.services.data_collector import FinMindDataCollector
     from loguru import logger
 except ImportError as e:
@@ -62,7 +65,7 @@ def wait_for_api_reset():
     print("=" * 60)
 
 def check_existing_data(db_manager, stock_id, start_date, end_date):
-    """檢查已存在的資料"""
+    """檢查已存在的資料（預期筆數依交易日曆計算，不含國定假日）"""
     conn = db_manager.get_connection()
     cursor = conn.cursor()
 
@@ -73,10 +76,7 @@ def check_existing_data(db_manager, stock_id, start_date, end_date):
         """, (stock_id, start_date, end_date))
 
         existing_count = cursor.fetchone()[0]
-
-        # 計算預期的交易日數量（大約每年250個交易日）
-        years = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days / 365
-        expected_count = int(years * 250)
+        expected_count = get_trading_calendar(db_manager.database_path).count_trading_days(start_date, end_date)
 
         completion_rate = (existing_count / expected_count) * 100 if expected_count > 0 else 0
 
@@ -89,64 +89,18 @@ def check_existing_data(db_manager, stock_id, start_date, end_date):
         conn.close()
 
 def get_missing_date_ranges(db_manager, stock_id, start_date, end_date):
-    """獲取缺失的日期範圍"""
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
+    """獲取缺失的日期範圍（以交易日曆判斷，連續缺漏的交易日合併為一個範圍）"""
     try:
-        cursor.execute("""
-            SELECT date FROM stock_prices
-            WHERE stock_id = ? AND date BETWEEN ? AND ?
-            ORDER BY date
-        """, (stock_id, start_date, end_date))
-
-        existing_dates = set(row[0] for row in cursor.fetchall())
-
-        # 生成所有日期範圍
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-
-        all_dates = set()
-        current_dt = start_dt
-        while current_dt <= end_dt:
-            # 只包含工作日（週一到週五）
-            if current_dt.weekday() < 5:
-                all_dates.add(current_dt.strftime('%Y-%m-%d'))
-            current_dt += timedelta(days=1)
-
-        missing_dates = all_dates - existing_dates
-
-        # 將缺失日期組織成連續範圍
-        if not missing_dates:
-            return []
-
-        sorted_dates = sorted(missing_dates)
-        ranges = []
-        range_start = sorted_dates[0]
-        range_end = sorted_dates[0]
-
-        for i in range(1, len(sorted_dates)):
-            current_date = datetime.strptime(sorted_dates[i], '%Y-%m-%d')
-            prev_date = datetime.strptime(sorted_dates[i-1], '%Y-%m-%d')
-
-            if (current_date - prev_date).days <= 3:  # 允許週末間隔
-                range_end = sorted_dates[i]
-            else:
-                ranges.append((range_start, range_end))
-                range_start = sorted_dates[i]
-                range_end = sorted_dates[i]
-
-        ranges.append((range_start, range_end))
-        return ranges
+        calendar = get_trading_calendar(db_manager.database_path)
+        return calendar.find_missing_ranges(start_date, end_date, [stock_id]).get(stock_id, [])
 
     except Exception as e:
         logger.error(f"獲取 {stock_id} 缺失日期範圍失敗: {e}")
         return [(start_date, end_date)]  # 如果出錯，返回完整範圍
-    finally:
-        conn.close()
 
-def collect_stock_prices_incremental(db_manager, finmind_collector, stock_id, start_date, end_date, skip_threshold=90):
-    """增量收集股價資料"""
+def collect_stock_prices_incremental(db_manager, finmind_collector, stock_id, start_date, end_date, skip_threshold=90,
+                                     missing_ranges=None):
+    """增量收集股價資料（missing_ranges 可傳入預先批次計算的缺失範圍）"""
 
     # 檢查現有資料
     existing_count, expected_count, completion_rate = check_existing_data(db_manager, stock_id, start_date, end_date)
@@ -162,7 +116,8 @@ def collect_stock_prices_incremental(db_manager, finmind_collector, stock_id, st
         return existing_count, 0
 
     # 獲取缺失的日期範圍
-    missing_ranges = get_missing_date_ranges(db_manager, stock_id, start_date, end_date)
+    if missing_ranges is None:
+        missing_ranges = get_missing_date_ranges(db_manager, stock_id, start_date, end_date)
 
     if not missing_ranges:
         print(f" {stock_id} 無缺失資料", flush=True)
@@ -208,38 +163,22 @@ def save_stock_prices(db_manager, stock_id, data):
     if not data:
         return 0
 
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
     try:
-        saved_count = 0
-        for record in data:
-            # 適應清理後的資料格式
-            cursor.execute("""
-                INSERT OR REPLACE INTO stock_prices
-                (stock_id, date, open_price, high_price, low_price, close_price, volume, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                stock_id,
-                record.get('date'),
-                record.get('open_price', record.get('open')),
-                record.get('high_price', record.get('max')),
-                record.get('low_price', record.get('min')),
-                record.get('close_price', record.get('close')),
-                record.get('volume', record.get('Trading_Volume')),
-                datetime.now()
-            ))
-            saved_count += 1
-
-        conn.commit()
-        return saved_count
+        # 適應清理後的資料格式（亦接受 FinMind 原始欄位名稱）
+        columns = ['stock_id', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
+        df = pd.DataFrame(data)
+        df = df.rename(columns={src: dst for src, dst in FINMIND_COLUMN_MAPS['stock_prices'].items()
+                                if src in df.columns and dst not in df.columns})
+        df = df.assign(stock_id=stock_id).reindex(columns=columns)
+
+        result = db_manager.bulk_upsert('stock_prices', df)
+        logger.debug(f"{stock_id} 股價寫入: 新增 {result['inserted']}、更新 {result['updated']}、"
+                     f"略過 {result['skipped']}、無效 {result['invalid']}")
+        return result['total'] - result['invalid']
 
     except Exception as e:
         logger.error(f"儲存 {stock_id} 股價資料失敗: {e}")
-        conn.rollback()
         return 0
-    finally:
-        conn.close()
 
 def main():
     """主函數"""
@@ -290,6 +229,15 @@ def main():
             print("🧪 測試模式：只收集前3檔股票", flush=True)
         print(f" 準備收集 {len(stock_ids)} 檔股票資料", flush=True)
 
+        # 依交易日曆一次計算所有股票的缺失範圍
+        calendar = get_trading_calendar(Config.DATABASE_PATH)
+        calendar.refresh()
+        try:
+            missing_by_stock = calendar.find_missing_ranges(args.start_date, args.end_date, stock_ids)
+        except Exception as e:
+            logger.error(f"批次計算缺失範圍失敗，改為逐檔計算: {e}")
+            missing_by_stock = None
+
         total_existing = 0
         total_collected = 0
         processed_count = 0
@@ -301,7 +249,8 @@ def main():
             try:
                 existing, collected = collect_stock_prices_incremental(
                     db_manager, finmind_collector, stock_id,
-                    args.start_date, args.end_date, args.skip_threshold
+                    args.start_date, args.end_date, args.skip_threshold,
+                    missing_ranges=None if missing_by_stock is None else missing_by_stock.get(stock_id, [])
                 )
 
                 total_existing += existing
@@ -323,6 +272,9 @@ def main():
                 print(f" {stock_id} 處理失敗: {e}", flush=True)
                 logger.error(f"處理 {stock_id} 失敗: {e}")
 
+        if total_collected:
+            calendar.refresh()
+
         # 最終統計
         print("\n" + "=" * 60, flush=True)
         print(" 智能股價收集完成", flush=True)
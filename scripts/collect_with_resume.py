@@ -19,16 +19,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # 設置編碼
 os.environ['PYTHONIOENCODING'] = 'utf-8'
 
+# 導入批次寫入工具
+from app.utils.sqlite_pool import pooled_connection
+from app.utils.bulk_upsert import FINMIND_COLUMN_MAPS, bulk_upsert_dataframe
+
 # 導入進度管理器
 from scripts.progress_manager import ProgressManager, TaskType, TaskStatus
 
 # 導入智能等待模組
 try:
-    from scripts.smart_wait import reset_execution_timer, smart_wait_for_api_reset, is_api_limit_error
+    from scripts.smart_wait import (reset_execution_timer, smart_wait_for_api_reset, is_api_limit_error,
+                                    record_api_request)
 except ImportError:
     print("[WARNING] 無法導入智能等待模組")
     def reset_execution_timer():
         pass
+    def record_api_request(dataset=None, data_id=None):
+        pass
     def smart_wait_for_api_reset():
         time.sleep(60)
     def is_api_limit_error(error_msg):
@@ -87,6 +94,8 @@ def collect_stock_dataset(stock_id, dataset_name, dataset_config, start_date, en
         }
 
         response = requests.get(url, params=params, timeout=30)
+        # 402 也會消耗額度，送出即記錄到共用請求帳本
+        record_api_request(dataset_config['api_name'], stock_id)
 
         if response.status_code == 200:
             data = response.json()
@@ -169,37 +178,12 @@ def save_stock_prices(df, stock_id):
         return 0
     
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        saved = 0
-        for _, row in df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO stock_prices 
-                    (stock_id, date, open_price, high_price, low_price, close_price, 
-                     volume, trading_money, trading_turnover, spread, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    row['stock_id'],
-                    row['date'],
-                    row['open'],
-                    row['max'],
-                    row['min'],
-                    row['close'],
-                    row['Trading_Volume'],
-                    row['Trading_money'],
-                    row['Trading_turnover'],
-                    row['spread'],
-                    datetime.now().isoformat()
-                ))
-                saved += 1
-            except Exception:
-                continue
-        
-        conn.commit()
-        conn.close()
-        return saved
+        columns = ['stock_id', 'date', 'open', 'max', 'min', 'close',
+                   'Trading_Volume', 'Trading_money', 'Trading_turnover', 'spread']
+        with pooled_connection(DATABASE_PATH) as conn:
+            result = bulk_upsert_dataframe(conn, 'stock_prices', df.reindex(columns=columns),
+                                           column_map=FINMIND_COLUMN_MAPS['stock_prices'])
+        return result['total'] - result['invalid']
         
     except Exception as e:
         print(f"儲存股價失敗: {e}")
@@ -211,32 +195,11 @@ def save_monthly_revenue(df, stock_id):
         return 0
     
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        saved = 0
-        for _, row in df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO monthly_revenues 
-                    (stock_id, date, country, revenue, revenue_month, revenue_year, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    row['stock_id'],
-                    row['date'],
-                    row.get('country', 'Taiwan'),
-                    row['revenue'],
-                    row['revenue_month'],
-                    row['revenue_year'],
-                    datetime.now().isoformat()
-                ))
-                saved += 1
-            except Exception:
-                continue
-        
-        conn.commit()
-        conn.close()
-        return saved
+        data = df.reindex(columns=['stock_id', 'date', 'country', 'revenue', 'revenue_month', 'revenue_year'])
+        data['country'] = data['country'].fillna('Taiwan')
+        with pooled_connection(DATABASE_PATH) as conn:
+            result = bulk_upsert_dataframe(conn, 'monthly_revenues', data)
+        return result['total'] - result['invalid']
         
     except Exception as e:
         print(f"儲存月營收失敗: {e}")
@@ -248,31 +211,11 @@ def save_cash_flow(df, stock_id):
         return 0
     
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        saved = 0
-        for _, row in df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO cash_flow_statements 
-                    (stock_id, date, type, value, origin_name, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    row['stock_id'],
-                    row['date'],
-                    row['type'],
-                    row['value'],
-                    row.get('origin_name', ''),
-                    datetime.now().isoformat()
-                ))
-                saved += 1
-            except Exception:
-                continue
-        
-        conn.commit()
-        conn.close()
-        return saved
+        data = df.reindex(columns=['stock_id', 'date', 'type', 'value', 'origin_name'])
+        data['origin_name'] = data['origin_name'].fillna('')
+        with pooled_connection(DATABASE_PATH) as conn:
+            result = bulk_upsert_dataframe(conn, 'cash_flow_statements', data)
+        return result['total'] - result['invalid']
         
     except Exception as e:
         print(f"儲存現金流失敗: {e}")
@@ -422,9 +365,8 @@ def collect_batch_with_resume(task_type=TaskType.COMPREHENSIVE, test_mode=False,
         stock_id = stock['stock_id']
         
         # 檢查這檔股票的所有資料集收集情況
-        task_progress = progress_manager.load_task_progress(task_id)
-        if task_progress and stock_id in task_progress.stock_progress:
-            stock_progress = task_progress.stock_progress[stock_id]
+        stock_progress = progress_manager.get_stock_progress(task_id, stock_id)
+        if stock_progress:
             
             # 判斷股票完成狀態
             total_datasets = len(datasets)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每日增量收集的行程內管線
+
+原本 DailyUpdateCollector 每個資料集都啟動一個 python scripts/collect_*.py 子行程，
+每次重新載入 pandas / loguru、重新開啟資料庫並重新查詢股票清單，輸出被
+capture_output 緩衝到結束才看得到。本模組讓各收集階段在同一個行程內執行：
+- 所有階段共用一個 FinMindDataCollector（同一個 HTTP session 與請求計數）
+  與同一個資料庫連線池
+- 各階段以執行緒同時進行，請求頻率由共用的收集器控制
+- 任一階段遇到 402 時只有一個執行緒進入等待（依請求帳本計算等待時間），
+  其他階段等待結束後直接重試，不會重複等待
+- 每處理一檔股票即輸出進度，不再緩衝
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from scripts.smart_wait import is_api_limit_error
+
+
+@dataclass
+class PipelineStage:
+    """單一收集階段：對每檔股票執行 process，回傳儲存筆數"""
+    name: str
+    key: str
+    stocks: Sequence[Dict]
+    process: Callable[[Dict], int]
+
+
+@dataclass
+class StageResult:
+    """階段執行結果"""
+    name: str
+    key: str
+    total: int = 0
+    processed: int = 0
+    saved: int = 0
+    quota_waits: int = 0
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+class DailyUpdatePipeline:
+    """行程內收集管線"""
+
+    def __init__(self, collector, wait_manager=None, max_workers: int = 3,
+                 max_quota_retries: int = 2, output: Callable[[str], None] = print,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            collector: 所有階段共用的 FinMindDataCollector
+            wait_manager: 遇到 402 時使用的 SmartWaitManager（None 時使用全局管理器）
+            max_workers: 同時執行的階段數
+            max_quota_retries: 同一檔股票因額度限制重試的次數
+            output: 進度輸出函數（搭配 tqdm 進度條時傳入 tqdm.write）
+            clock: 時間來源（測試可替換）
+        """
+        self.collector = collector
+        self.wait_manager = wait_manager
+        self.max_workers = max(1, max_workers)
+        self.max_quota_retries = max_quota_retries
+        self.output = output
+        self.clock = clock
+
+        self._output_lock = threading.Lock()
+        self._wait_lock = threading.Lock()
+        self._quota_cleared_at = 0.0
+
+    def emit(self, message: str):
+        """輸出一行進度（多個階段同時輸出時不會交錯）"""
+        with self._output_lock:
+            self.output(message)
+
+    # ------------------------------------------------------------------
+    # 額度等待
+    # ------------------------------------------------------------------
+    def _quota_hit_since(self, started_at: float) -> bool:
+        hit_at = getattr(self.collector, 'last_quota_error_at', None)
+        return hit_at is not None and hit_at >= started_at
+
+    def wait_for_quota(self, hit_at: float) -> bool:
+        """
+        等待額度恢復；其他階段已在 hit_at 之後等待完成時直接返回
+
+        Returns:
+            True 表示本次實際進行了等待
+        """
+        with self._wait_lock:
+            if self._quota_cleared_at >= hit_at:
+                return False
+            wait_manager = self.wait_manager
+            if wait_manager is None:
+                from scripts.smart_wait import get_smart_wait_manager
+                wait_manager = get_smart_wait_manager()
+            wait_manager.smart_wait_for_api_reset()
+            self._quota_cleared_at = self.clock()
+            return True
+
+    # ------------------------------------------------------------------
+    # 執行
+    # ------------------------------------------------------------------
+    def run_stage(self, stage: PipelineStage) -> StageResult:
+        """依序處理階段中的每檔股票（可與其他階段同時執行）"""
+        result = StageResult(name=stage.name, key=stage.key, total=len(stage.stocks))
+        started = self.clock()
+        self.emit(f"{stage.name} 開始: {result.total} 檔股票")
+
+        for index, stock in enumerate(stage.stocks, 1):
+            stock_id = stock['stock_id']
+            retries = 0
+            while True:
+                attempt_at = self.clock()
+                try:
+                    saved = stage.process(stock) or 0
+                    error = None
+                except Exception as e:
+                    saved = 0
+                    error = str(e)
+
+                quota_hit = self._quota_hit_since(attempt_at) or (error is not None and is_api_limit_error(error))
+                if quota_hit and retries < self.max_quota_retries:
+                    retries += 1
+                    self.emit(f"{stage.name} {stock_id} 遇到API請求限制，等待額度恢復後重試")
+                    if self.wait_for_quota(attempt_at):
+                        result.quota_waits += 1
+                    continue
+                break
+
+            result.processed += 1
+            if error is not None:
+                result.failed.append((stock_id, error))
+                logger.error(f"{stage.name} {stock_id} 失敗: {error}")
+                self.emit(f"{stage.name} [{index}/{result.total}] {stock_id} 失敗: {error}")
+            else:
+                result.saved += saved
+                self.emit(f"{stage.name} [{index}/{result.total}] {stock_id} +{saved} 筆")
+
+        result.elapsed = self.clock() - started
+        self.emit(f"{stage.name} 完成: {result.processed} 檔，儲存 {result.saved:,} 筆，"
+                  f"失敗 {len(result.failed)} 檔，耗時 {result.elapsed:.1f} 秒")
+        logger.info(f"{stage.name} 完成: 儲存 {result.saved} 筆，失敗 {len(result.failed)} 檔")
+        return result
+
+    def run_concurrently(self, tasks: Sequence[Tuple[str, Callable[[], object]]],
+                         on_done: Optional[Callable[[str, Optional[Exception]], None]] = None) -> Dict[str, object]:
+        """
+        同時執行多個任務（每個任務通常為「檢查是否需要更新 + run_stage」）
+
+        Args:
+            tasks: (任務名稱, 無參數函數)
+            on_done: 每個任務結束時呼叫 (任務名稱, 例外或 None)
+
+        Returns:
+            任務名稱 -> 回傳值（失敗時為例外物件）
+        """
+        results: Dict[str, object] = {}
+
+        def call(name, func):
+            try:
+                results[name] = func()
+                error = None
+            except Exception as e:
+                logger.error(f"{name} 失敗: {e}")
+                results[name] = e
+                error = e
+            if on_done is not None:
+                on_done(name, error)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="daily-update") as executor:
+            futures = [executor.submit(call, name, func) for name, func in tasks]
+            for future in futures:
+                future.result()
+
+        return {name: results[name] for name, _ in tasks}
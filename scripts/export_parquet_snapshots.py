@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+匯出核心資料表的 Parquet 快照（需要 pyarrow）
+
+預設只重寫內容有變動的年度分區，可在每日更新後執行：
+    python scripts/export_parquet_snapshots.py
+    python scripts/export_parquet_snapshots.py --table stock_prices --full
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app.utils.parquet_snapshot import SNAPSHOT_TABLES, export_snapshots, get_default_snapshot_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='匯出 Parquet 快照')
+    parser.add_argument('--output', help='快照目錄（預設為資料庫同目錄下的 snapshots）')
+    parser.add_argument('--table', action='append', choices=sorted(SNAPSHOT_TABLES),
+                        help='只匯出指定資料表，可重複')
+    parser.add_argument('--full', action='store_true', help='忽略簽章，重寫所有年度')
+    args = parser.parse_args()
+
+    snapshot_dir = args.output or get_default_snapshot_dir(Config.DATABASE_PATH)
+    print(f"資料庫: {Config.DATABASE_PATH}")
+    print(f"快照目錄: {snapshot_dir}")
+
+    started = time.time()
+    try:
+        results = export_snapshots(Config.DATABASE_PATH, snapshot_dir, tables=args.table, full=args.full)
+    except ImportError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    for table_name, result in results.items():
+        print(f"  {table_name:<22}: 寫入 {result['written']} 個年度 ({result['rows']:,} 筆)，"
+              f"略過 {result['skipped']}，移除 {result['removed']}")
+    print(f"完成，耗時 {time.time() - started:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,20 @@
 """
 
 import os
+import sys
 import json
 import sqlite3
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any
+from dataclasses import dataclass
 from enum import Enum
 
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.sqlite_pool import pooled_connection
+
 class TaskType(Enum):
     """任務類型枚舉"""
     STOCK_PRICES = "stock_prices"
@@ -70,8 +76,14 @@ class TaskProgress:
             self.parameters = {}
 
 class ProgressManager:
-    """進度管理器"""
-    
+    """
+    進度管理器
+
+    進度儲存在 progress_dir 下的 SQLite 資料庫（collection_progress.db）：
+    每檔股票一列，更新單一股票只寫入該列與任務統計，不再重寫整份 JSON。
+    舊版的 collection_progress.json 會在初始化時自動匯入（檔案有變動才重新匯入）。
+    """
+
     def __init__(self, progress_dir: str = "data/progress"):
         """
         初始化進度管理器
@@ -82,16 +94,59 @@ class ProgressManager:
         self.progress_dir = Path(progress_dir)
         self.progress_dir.mkdir(parents=True, exist_ok=True)
 
-        # 進度檔案路徑
+        # 進度資料庫與舊版 JSON 進度檔案路徑
+        self.db_path = self.progress_dir / "collection_progress.db"
         self.progress_file = self.progress_dir / "collection_progress.json"
-        self.backup_dir = self.progress_dir / "backups"
-        self.backup_dir.mkdir(exist_ok=True)
-
-        # 備份控制
-        self.last_backup_time = None
-        self.backup_interval_minutes = 30  # 30分鐘備份一次
-        self.max_backups = 10  # 最多保留10個備份檔案
-    
+
+        self._init_schema()
+        if self.progress_file.exists():
+            self._auto_import_json()
+
+    def _connection(self, read_only: bool = False):
+        return pooled_connection(self.db_path, read_only=read_only)
+
+    def _init_schema(self):
+        """建立進度資料表"""
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS progress_tasks (
+                    task_id TEXT PRIMARY KEY,
+                    task_type TEXT NOT NULL,
+                    task_name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    total_stocks INTEGER NOT NULL DEFAULT 0,
+                    completed_stocks INTEGER NOT NULL DEFAULT 0,
+                    failed_stocks INTEGER NOT NULL DEFAULT 0,
+                    skipped_stocks INTEGER NOT NULL DEFAULT 0,
+                    start_time TEXT,
+                    last_updated TEXT,
+                    end_time TEXT,
+                    parameters TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS progress_stocks (
+                    task_id TEXT NOT NULL,
+                    stock_id TEXT NOT NULL,
+                    stock_name TEXT,
+                    status TEXT NOT NULL,
+                    completed_datasets TEXT NOT NULL DEFAULT '[]',
+                    failed_datasets TEXT NOT NULL DEFAULT '[]',
+                    retry_count INTEGER NOT NULL DEFAULT 0,
+                    error_message TEXT,
+                    last_updated TEXT,
+                    UNIQUE(task_id, stock_id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_stocks_status ON progress_stocks(task_id, status)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS progress_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            conn.commit()
+
     def _generate_task_id(self, task_type: TaskType, parameters: Dict[str, Any] = None) -> str:
         """生成任務ID（簡化版，避免過長的ID）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -109,26 +164,27 @@ class ProgressManager:
                 return f"{task_type.value}_{param_str}_{timestamp}"
 
         return f"{task_type.value}_{timestamp}"
-    
-    def create_task(self, 
-                   task_type: TaskType, 
+
+    def create_task(self,
+                   task_type: TaskType,
                    task_name: str,
                    stock_list: List[Dict[str, str]],
                    parameters: Dict[str, Any] = None) -> str:
         """
         創建新任務
-        
+
         Args:
             task_type: 任務類型
             task_name: 任務名稱
             stock_list: 股票清單 [{'stock_id': '2330', 'stock_name': '台積電'}, ...]
             parameters: 任務參數
-            
+
         Returns:
             任務ID
         """
         task_id = self._generate_task_id(task_type, parameters)
-        
+        now = datetime.now().isoformat()
+
         # 創建任務進度記錄
         task_progress = TaskProgress(
             task_id=task_id,
@@ -139,23 +195,22 @@ class ProgressManager:
             completed_stocks=0,
             failed_stocks=0,
             skipped_stocks=0,
-            start_time=datetime.now().isoformat(),
-            last_updated=datetime.now().isoformat(),
+            start_time=now,
+            last_updated=now,
             parameters=parameters or {}
         )
-        
+
         # 初始化股票進度
         for stock in stock_list:
-            stock_progress = StockProgress(
+            task_progress.stock_progress[stock['stock_id']] = StockProgress(
                 stock_id=stock['stock_id'],
                 stock_name=stock['stock_name'],
                 status=TaskStatus.NOT_STARTED,
                 completed_datasets=[],
                 failed_datasets=[],
-                last_updated=datetime.now().isoformat()
+                last_updated=now
             )
-            task_progress.stock_progress[stock['stock_id']] = stock_progress
-        
+
         # 儲存進度
         try:
             self._save_task_progress(task_progress)
@@ -167,275 +222,221 @@ class ProgressManager:
             print("📝 任務將在記憶體中繼續，但不會持久化")
 
         return task_id
-    
+
+    @staticmethod
+    def _row_to_stock_progress(row) -> StockProgress:
+        return StockProgress(
+            stock_id=row['stock_id'],
+            stock_name=row['stock_name'] or '',
+            status=TaskStatus(row['status']),
+            completed_datasets=json.loads(row['completed_datasets'] or '[]'),
+            failed_datasets=json.loads(row['failed_datasets'] or '[]'),
+            last_updated=row['last_updated'] or '',
+            retry_count=row['retry_count'] or 0,
+            error_message=row['error_message']
+        )
+
+    @staticmethod
+    def _row_to_task_progress(row) -> TaskProgress:
+        return TaskProgress(
+            task_id=row['task_id'],
+            task_type=TaskType(row['task_type']),
+            task_name=row['task_name'],
+            status=TaskStatus(row['status']),
+            total_stocks=row['total_stocks'],
+            completed_stocks=row['completed_stocks'],
+            failed_stocks=row['failed_stocks'],
+            skipped_stocks=row['skipped_stocks'],
+            start_time=row['start_time'] or '',
+            last_updated=row['last_updated'] or '',
+            end_time=row['end_time'],
+            parameters=json.loads(row['parameters'] or '{}')
+        )
+
     def load_task_progress(self, task_id: str) -> Optional[TaskProgress]:
-        """載入任務進度"""
+        """載入任務進度（含所有股票進度）"""
         try:
-            if not self.progress_file.exists():
-                return None
+            with pooled_connection(self.db_path, read_only=True, row_factory=sqlite3.Row) as conn:
+                row = conn.execute("SELECT * FROM progress_tasks WHERE task_id = ?", (task_id,)).fetchone()
+                if row is None:
+                    return None
+
+                task_progress = self._row_to_task_progress(row)
+                for stock_row in conn.execute(
+                        "SELECT * FROM progress_stocks WHERE task_id = ? ORDER BY rowid", (task_id,)):
+                    task_progress.stock_progress[stock_row['stock_id']] = self._row_to_stock_progress(stock_row)
+
+            return task_progress
 
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
         except KeyboardInterrupt:
             print("\n⚠️ 使用者中斷載入進度")
             raise  # 重新拋出中斷信號
-            
-            if task_id not in data.get('tasks', {}):
-                return None
-            
-            task_data = data['tasks'][task_id]
-            
-            # 重建TaskProgress物件
-            task_progress = TaskProgress(
-                task_id=task_data['task_id'],
-                task_type=TaskType(task_data['task_type']),
-                task_name=task_data['task_name'],
-                status=TaskStatus(task_data['status']),
-                total_stocks=task_data['total_stocks'],
-                completed_stocks=task_data['completed_stocks'],
-                failed_stocks=task_data['failed_stocks'],
-                skipped_stocks=task_data['skipped_stocks'],
-                start_time=task_data['start_time'],
-                last_updated=task_data['last_updated'],
-                end_time=task_data.get('end_time'),
-                parameters=task_data.get('parameters', {})
-            )
-            
-            # 重建股票進度
-            for stock_id, stock_data in task_data.get('stock_progress', {}).items():
-                stock_progress = StockProgress(
-                    stock_id=stock_data['stock_id'],
-                    stock_name=stock_data['stock_name'],
-                    status=TaskStatus(stock_data['status']),
-                    completed_datasets=stock_data['completed_datasets'],
-                    failed_datasets=stock_data['failed_datasets'],
-                    last_updated=stock_data['last_updated'],
-                    retry_count=stock_data.get('retry_count', 0),
-                    error_message=stock_data.get('error_message')
-                )
-                task_progress.stock_progress[stock_id] = stock_progress
-            
-            return task_progress
-            
         except Exception as e:
             print(f"❌ 載入任務進度失敗: {e}")
             return None
-    
-    def _save_task_progress(self, task_progress: TaskProgress):
-        """儲存任務進度"""
-        try:
-            # 載入現有進度資料
-            data = {'tasks': {}, 'last_updated': datetime.now().isoformat()}
-            if self.progress_file.exists():
-                try:
-                    with open(self.progress_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                except json.JSONDecodeError as e:
-                    print(f"⚠️ 進度檔案損壞: {e}")
-                    print("🔧 嘗試從備份恢復...")
-
-                    # 嘗試從最新的備份恢復
-                    backup_restored = self._restore_from_backup()
-                    if backup_restored:
-                        try:
-                            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                                data = json.load(f)
-                            print("✅ 從備份成功恢復進度檔案")
-                        except:
-                            print("❌ 備份檔案也損壞，使用空白進度")
-                            data = {'tasks': {}, 'last_updated': datetime.now().isoformat()}
-                    else:
-                        print("❌ 無法從備份恢復，使用空白進度")
-                        data = {'tasks': {}, 'last_updated': datetime.now().isoformat()}
-            
-            # 轉換為可序列化的格式
-            task_data = asdict(task_progress)
-            task_data['task_type'] = task_progress.task_type.value
-            task_data['status'] = task_progress.status.value
-            
-            # 轉換股票進度
-            for stock_id, stock_progress in task_data['stock_progress'].items():
-                stock_progress['status'] = stock_progress['status'].value
-            
-            # 更新任務資料
-            data['tasks'][task_progress.task_id] = task_data
-            data['last_updated'] = datetime.now().isoformat()
-            
-            # 智能備份：只在需要時備份
-            if self.progress_file.exists() and self._should_backup():
-                self._create_backup()
-
-            # 使用原子寫入避免檔案損壞
-            temp_file = self.progress_file.with_suffix('.tmp')
-            try:
-                # 先寫入臨時檔案
-                with open(temp_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-
-                # 驗證寫入的檔案是否有效
-                with open(temp_file, 'r', encoding='utf-8') as f:
-                    json.load(f)  # 驗證JSON格式
-
-                # 如果驗證成功，原子性地替換原檔案
-                if os.name == 'nt':  # Windows
-                    if self.progress_file.exists():
-                        self.progress_file.unlink()
-                    temp_file.rename(self.progress_file)
-                else:  # Unix/Linux/macOS
-                    temp_file.rename(self.progress_file)
-
-            except Exception as e:
-                # 如果寫入失敗，清理臨時檔案
-                if temp_file.exists():
-                    temp_file.unlink()
-                raise e
-                
-        except Exception as e:
-            print(f"❌ 儲存任務進度失敗: {e}")
-            raise
-
-    def _should_backup(self):
-        """判斷是否需要備份"""
-        if self.last_backup_time is None:
-            return True
-
-        # 檢查是否超過備份間隔
-        elapsed_minutes = (datetime.now() - self.last_backup_time).total_seconds() / 60
-        return elapsed_minutes >= self.backup_interval_minutes
-
-    def _create_backup(self):
-        """創建備份檔案"""
-        try:
-            backup_file = self.backup_dir / f"progress_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-
-            # 使用copy而不是rename，避免Windows檔案鎖定問題
-            import shutil
-            shutil.copy2(self.progress_file, backup_file)
-
-            # 更新最後備份時間
-            self.last_backup_time = datetime.now()
 
-            # 清理舊備份檔案
-            self._cleanup_old_backups()
-
-            print(f"📁 創建備份: {backup_file.name}")
-
-        except Exception as e:
-            print(f"⚠️ 備份失敗: {e}")
-
-    def _cleanup_old_backups(self):
-        """清理舊的備份檔案"""
-        try:
-            # 獲取所有備份檔案，按時間排序
-            backup_files = list(self.backup_dir.glob("progress_backup_*.json"))
-            backup_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-
-            # 刪除超過限制的舊備份
-            if len(backup_files) > self.max_backups:
-                for old_backup in backup_files[self.max_backups:]:
-                    old_backup.unlink()
-                    print(f"🗑️ 清理舊備份: {old_backup.name}")
-
-        except Exception as e:
-            print(f"⚠️ 清理備份失敗: {e}")
-
-    def _restore_from_backup(self):
-        """從備份恢復進度檔案"""
-        try:
-            # 獲取所有備份檔案，按時間排序（最新的在前）
-            backup_files = list(self.backup_dir.glob("progress_backup_*.json"))
-            backup_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
+    def get_stock_progress(self, task_id: str, stock_id: str) -> Optional[StockProgress]:
+        """載入單一股票的進度"""
+        with pooled_connection(self.db_path, read_only=True, row_factory=sqlite3.Row) as conn:
+            row = conn.execute("SELECT * FROM progress_stocks WHERE task_id = ? AND stock_id = ?",
+                               (task_id, stock_id)).fetchone()
+        return self._row_to_stock_progress(row) if row else None
+
+    def _save_task_progress(self, task_progress: TaskProgress, conn: Optional[sqlite3.Connection] = None):
+        """儲存整個任務進度（建立、匯入、重置時使用）"""
+        if conn is None:
+            with self._connection() as conn:
+                self._save_task_progress(task_progress, conn)
+                conn.commit()
+            return
 
-            if not backup_files:
-                print("❌ 沒有找到備份檔案")
-                return False
+        conn.execute("""
+            INSERT OR REPLACE INTO progress_tasks
+            (task_id, task_type, task_name, status, total_stocks, completed_stocks, failed_stocks,
+             skipped_stocks, start_time, last_updated, end_time, parameters)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            task_progress.task_id,
+            task_progress.task_type.value,
+            task_progress.task_name,
+            task_progress.status.value,
+            task_progress.total_stocks,
+            task_progress.completed_stocks,
+            task_progress.failed_stocks,
+            task_progress.skipped_stocks,
+            task_progress.start_time,
+            task_progress.last_updated,
+            task_progress.end_time,
+            json.dumps(task_progress.parameters or {}, ensure_ascii=False)
+        ))
+        conn.execute("DELETE FROM progress_stocks WHERE task_id = ?", (task_progress.task_id,))
+        conn.executemany("""
+            INSERT INTO progress_stocks
+            (task_id, stock_id, stock_name, status, completed_datasets, failed_datasets,
+             retry_count, error_message, last_updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(
+            task_progress.task_id,
+            stock_progress.stock_id,
+            stock_progress.stock_name,
+            stock_progress.status.value,
+            json.dumps(stock_progress.completed_datasets, ensure_ascii=False),
+            json.dumps(stock_progress.failed_datasets, ensure_ascii=False),
+            stock_progress.retry_count,
+            stock_progress.error_message,
+            stock_progress.last_updated
+        ) for stock_progress in task_progress.stock_progress.values()])
+
+    # ------------------------------------------------------------------
+    # 舊版 JSON 進度匯入
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _task_from_json(task_id: str, task_data: Dict[str, Any]) -> TaskProgress:
+        """將 JSON 進度中的單一任務轉為 TaskProgress"""
+        task_progress = TaskProgress(
+            task_id=task_data.get('task_id', task_id),
+            task_type=TaskType(task_data.get('task_type', TaskType.CUSTOM.value)),
+            task_name=task_data.get('task_name', ''),
+            status=TaskStatus(task_data.get('status', TaskStatus.NOT_STARTED.value)),
+            total_stocks=task_data.get('total_stocks', 0),
+            completed_stocks=task_data.get('completed_stocks', 0),
+            failed_stocks=task_data.get('failed_stocks', 0),
+            skipped_stocks=task_data.get('skipped_stocks', 0),
+            start_time=task_data.get('start_time', ''),
+            last_updated=task_data.get('last_updated', ''),
+            end_time=task_data.get('end_time'),
+            parameters=task_data.get('parameters') or {}
+        )
+        for stock_id, stock_data in (task_data.get('stock_progress') or {}).items():
+            task_progress.stock_progress[stock_id] = StockProgress(
+                stock_id=stock_data.get('stock_id', stock_id),
+                stock_name=stock_data.get('stock_name', ''),
+                status=TaskStatus(stock_data.get('status', TaskStatus.NOT_STARTED.value)),
+                completed_datasets=stock_data.get('completed_datasets') or [],
+                failed_datasets=stock_data.get('failed_datasets') or [],
+                last_updated=stock_data.get('last_updated', ''),
+                retry_count=stock_data.get('retry_count', 0),
+                error_message=stock_data.get('error_message')
+            )
+        return task_progress
 
-            # 嘗試從最新的備份恢復
-            for backup_file in backup_files:
-                try:
-                    print(f"🔄 嘗試從備份恢復: {backup_file.name}")
+    def import_json(self, json_path: Optional[str] = None, overwrite: bool = False) -> int:
+        """
+        匯入舊版 JSON 進度檔案
 
-                    # 驗證備份檔案是否有效
-                    with open(backup_file, 'r', encoding='utf-8') as f:
-                        json.load(f)  # 驗證JSON格式
+        Args:
+            json_path: JSON 進度檔案（預設為 progress_dir/collection_progress.json）
+            overwrite: 是否覆蓋資料庫中已存在的同名任務
 
-                    # 如果驗證成功，複製到主檔案
-                    import shutil
-                    shutil.copy2(backup_file, self.progress_file)
-                    print(f"✅ 成功從備份恢復: {backup_file.name}")
-                    return True
+        Returns:
+            匯入的任務數
+        """
+        json_path = Path(json_path) if json_path else self.progress_file
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
 
-                except json.JSONDecodeError:
-                    print(f"⚠️ 備份檔案也損壞: {backup_file.name}")
+        imported = 0
+        with self._connection() as conn:
+            existing = {row[0] for row in conn.execute("SELECT task_id FROM progress_tasks")}
+            for task_id, task_data in data.get('tasks', {}).items():
+                if task_id in existing and not overwrite:
                     continue
-                except Exception as e:
-                    print(f"⚠️ 恢復備份失敗: {backup_file.name}, 錯誤: {e}")
+                try:
+                    task_progress = self._task_from_json(task_id, task_data)
+                except (ValueError, TypeError, AttributeError) as e:
+                    print(f"⚠️ 略過無法解析的任務 {task_id}: {e}")
                     continue
+                self._save_task_progress(task_progress, conn)
+                imported += 1
+            conn.commit()
 
-            print("❌ 所有備份檔案都無法使用")
-            return False
-
-        except Exception as e:
-            print(f"❌ 備份恢復過程失敗: {e}")
-            return False
+        return imported
 
-    def _find_task_by_fuzzy_match(self, target_task_id: str, stock_id: str = None) -> Optional[TaskProgress]:
-        """通過模糊匹配查找任務"""
+    def _auto_import_json(self):
+        """舊版 JSON 進度檔案有變動時自動匯入（已存在的任務不覆蓋）"""
         try:
-            if not self.progress_file.exists():
-                return None
+            signature = f"{self.progress_file.stat().st_size}:{self.progress_file.stat().st_mtime_ns}"
+            with self._connection(read_only=True) as conn:
+                row = conn.execute("SELECT value FROM progress_meta WHERE key = 'imported_json'").fetchone()
+            if row and row[0] == signature:
+                return
 
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            imported = self.import_json()
+            with self._connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO progress_meta (key, value) VALUES ('imported_json', ?)",
+                             (signature,))
+                conn.commit()
+            if imported:
+                print(f"📥 已從 {self.progress_file.name} 匯入 {imported} 個任務")
 
-            # 嘗試不同的匹配策略
-            for task_id, task_data in data.get('tasks', {}).items():
-                # 策略1：檢查是否包含相同的股票ID
-                if stock_id and stock_id in task_data.get('stock_progress', {}):
-                    # 檢查任務類型是否匹配
-                    if target_task_id.startswith(task_data.get('task_type', '')):
+        except Exception as e:
+            print(f"⚠️ 匯入 JSON 進度檔案失敗: {e}")
+
+    # ------------------------------------------------------------------
+    # 進度更新
+    # ------------------------------------------------------------------
+    def _find_task_by_fuzzy_match(self, target_task_id: str, stock_id: str = None) -> Optional[str]:
+        """通過模糊匹配查找任務：同類型且包含該股票的最近任務"""
+        if not stock_id:
+            return None
+        try:
+            with self._connection(read_only=True) as conn:
+                for task_id, task_type in conn.execute("""
+                    SELECT t.task_id, t.task_type
+                    FROM progress_tasks t
+                    JOIN progress_stocks s ON s.task_id = t.task_id
+                    WHERE s.stock_id = ?
+                    ORDER BY t.last_updated DESC
+                """, (stock_id,)):
+                    if target_task_id.startswith(task_type):
                         print(f"✅ 通過股票ID匹配找到任務: {task_id}")
-                        # 直接構造 TaskProgress 對象返回
-                        return TaskProgress(
-                            task_id=task_id,
-                            task_type=TaskType(task_data.get('task_type', 'comprehensive')),
-                            task_name=task_data.get('task_name', ''),
-                            status=TaskStatus(task_data.get('status', 'not_started')),
-                            total_stocks=task_data.get('total_stocks', 0),
-                            completed_stocks=task_data.get('completed_stocks', 0),
-                            failed_stocks=task_data.get('failed_stocks', 0),
-                            skipped_stocks=task_data.get('skipped_stocks', 0),
-                            start_time=task_data.get('start_time', ''),
-                            last_updated=task_data.get('last_updated', ''),
-                            parameters=task_data.get('parameters', {}),
-                            stock_progress={
-                                sid: StockProgress(
-                                    stock_id=sid,
-                                    stock_name=sdata.get('stock_name', ''),
-                                    status=TaskStatus(sdata.get('status', 'not_started')),
-                                    completed_datasets=sdata.get('completed_datasets', []),
-                                    failed_datasets=sdata.get('failed_datasets', []),
-                                    last_updated=sdata.get('last_updated', '')
-                                ) for sid, sdata in task_data.get('stock_progress', {}).items()
-                            }
-                        )
-
-                # 策略2：檢查任務ID的前綴是否匹配
-                target_prefix = target_task_id.split('_')[0]  # 取任務類型部分
-                task_prefix = task_id.split('_')[0]
-                if target_prefix == task_prefix:
-                    # 進一步檢查是否為最近的任務
-                    task_time = task_data.get('created_at', '')
-                    if task_time:  # 如果是最近創建的任務
-                        print(f"✅ 通過類型匹配找到任務: {task_id}")
-                        return self.load_task_progress(task_id)
-
+                        return task_id
             return None
 
         except Exception as e:
             print(f"⚠️ 模糊匹配失敗: {e}")
             return None
-    
+
     def update_stock_progress(self,
                             task_id: str,
                             stock_id: str,
@@ -443,163 +444,169 @@ class ProgressManager:
                             completed_datasets: List[str] = None,
                             failed_datasets: List[str] = None,
                             error_message: str = None):
-        """更新股票進度"""
+        """更新股票進度（只寫入該股票與任務統計）"""
         try:
-            task_progress = self.load_task_progress(task_id)
-            if not task_progress:
-                # 嘗試模糊匹配任務ID
-                task_progress = self._find_task_by_fuzzy_match(task_id, stock_id)
-                if not task_progress:
-                    print(f"⚠️ 找不到任務: {task_id[:50]}...")
+            with self._connection() as conn:
+                conn.row_factory = sqlite3.Row
+                # 讀取與寫入在同一個寫入交易中，多個行程同時更新也不會遺失統計
+                conn.execute("BEGIN IMMEDIATE")
+                task_row = conn.execute("SELECT * FROM progress_tasks WHERE task_id = ?", (task_id,)).fetchone()
+                if task_row is None:
+                    conn.rollback()
+                    # 嘗試模糊匹配任務ID
+                    matched_task_id = self._find_task_by_fuzzy_match(task_id, stock_id)
+                    if not matched_task_id:
+                        print(f"⚠️ 找不到任務: {task_id[:50]}...")
+                        return
+                    task_id = matched_task_id
+                    conn.execute("BEGIN IMMEDIATE")
+                    task_row = conn.execute("SELECT * FROM progress_tasks WHERE task_id = ?", (task_id,)).fetchone()
+
+                stock_row = conn.execute("SELECT * FROM progress_stocks WHERE task_id = ? AND stock_id = ?",
+                                         (task_id, stock_id)).fetchone()
+                if stock_row is None:
+                    conn.rollback()
+                    print(f"❌ 找不到股票: {stock_id}")
                     return
+
+                now = datetime.now().isoformat()
+                stock_progress = self._row_to_stock_progress(stock_row)
+                task_progress = self._row_to_task_progress(task_row)
+                old_status = stock_progress.status
+
+                if completed_datasets:
+                    stock_progress.completed_datasets = list(set(stock_progress.completed_datasets + completed_datasets))
+                if failed_datasets:
+                    stock_progress.failed_datasets = list(set(stock_progress.failed_datasets + failed_datasets))
+                if error_message:
+                    stock_progress.error_message = error_message
+                    stock_progress.retry_count += 1
+
+                # 更新任務統計
+                if old_status != status:
+                    if old_status == TaskStatus.COMPLETED:
+                        task_progress.completed_stocks -= 1
+                    elif old_status == TaskStatus.FAILED:
+                        task_progress.failed_stocks -= 1
+                    elif old_status == TaskStatus.SKIPPED:
+                        task_progress.skipped_stocks -= 1
+
+                    if status == TaskStatus.COMPLETED:
+                        task_progress.completed_stocks += 1
+                    elif status == TaskStatus.FAILED:
+                        task_progress.failed_stocks += 1
+                    elif status == TaskStatus.SKIPPED:
+                        task_progress.skipped_stocks += 1
+
+                # 更新任務狀態
+                finished = task_progress.completed_stocks + task_progress.failed_stocks + task_progress.skipped_stocks
+                if finished >= task_progress.total_stocks:
+                    task_progress.status = TaskStatus.COMPLETED
+                    task_progress.end_time = now
+                elif task_progress.completed_stocks > 0 or task_progress.failed_stocks > 0:
+                    task_progress.status = TaskStatus.IN_PROGRESS
+
+                conn.execute("""
+                    UPDATE progress_stocks
+                    SET status = ?, completed_datasets = ?, failed_datasets = ?,
+                        retry_count = ?, error_message = ?, last_updated = ?
+                    WHERE task_id = ? AND stock_id = ?
+                """, (
+                    status.value,
+                    json.dumps(stock_progress.completed_datasets, ensure_ascii=False),
+                    json.dumps(stock_progress.failed_datasets, ensure_ascii=False),
+                    stock_progress.retry_count,
+                    stock_progress.error_message,
+                    now,
+                    task_id,
+                    stock_id
+                ))
+                conn.execute("""
+                    UPDATE progress_tasks
+                    SET status = ?, completed_stocks = ?, failed_stocks = ?, skipped_stocks = ?,
+                        last_updated = ?, end_time = ?
+                    WHERE task_id = ?
+                """, (
+                    task_progress.status.value,
+                    task_progress.completed_stocks,
+                    task_progress.failed_stocks,
+                    task_progress.skipped_stocks,
+                    now,
+                    task_progress.end_time,
+                    task_id
+                ))
+                conn.commit()
+
         except Exception as e:
-            print(f"⚠️ 載入任務進度失敗: {e}")
-            return
-        
-        if stock_id not in task_progress.stock_progress:
-            print(f"❌ 找不到股票: {stock_id}")
-            return
-        
-        # 更新股票進度
-        stock_progress = task_progress.stock_progress[stock_id]
-        old_status = stock_progress.status
-        stock_progress.status = status
-        stock_progress.last_updated = datetime.now().isoformat()
-        
-        if completed_datasets:
-            stock_progress.completed_datasets.extend(completed_datasets)
-            stock_progress.completed_datasets = list(set(stock_progress.completed_datasets))
-        
-        if failed_datasets:
-            stock_progress.failed_datasets.extend(failed_datasets)
-            stock_progress.failed_datasets = list(set(stock_progress.failed_datasets))
-        
-        if error_message:
-            stock_progress.error_message = error_message
-            stock_progress.retry_count += 1
-        
-        # 更新任務統計
-        if old_status != status:
-            if old_status == TaskStatus.COMPLETED:
-                task_progress.completed_stocks -= 1
-            elif old_status == TaskStatus.FAILED:
-                task_progress.failed_stocks -= 1
-            elif old_status == TaskStatus.SKIPPED:
-                task_progress.skipped_stocks -= 1
-            
-            if status == TaskStatus.COMPLETED:
-                task_progress.completed_stocks += 1
-            elif status == TaskStatus.FAILED:
-                task_progress.failed_stocks += 1
-            elif status == TaskStatus.SKIPPED:
-                task_progress.skipped_stocks += 1
-        
-        # 更新任務狀態
-        task_progress.last_updated = datetime.now().isoformat()
-        if task_progress.completed_stocks + task_progress.failed_stocks + task_progress.skipped_stocks >= task_progress.total_stocks:
-            task_progress.status = TaskStatus.COMPLETED
-            task_progress.end_time = datetime.now().isoformat()
-        elif task_progress.completed_stocks > 0 or task_progress.failed_stocks > 0:
-            task_progress.status = TaskStatus.IN_PROGRESS
-        
-        # 儲存進度
-        self._save_task_progress(task_progress)
-    
+            print(f"❌ 儲存任務進度失敗: {e}")
+            raise
+
     def get_pending_stocks(self, task_id: str) -> List[Dict[str, str]]:
-        """獲取待處理的股票清單"""
-        task_progress = self.load_task_progress(task_id)
-        if not task_progress:
-            return []
+        """獲取待處理的股票清單（未開始、失敗、和進行中但未完成的股票）"""
+        pending_statuses = [TaskStatus.NOT_STARTED.value, TaskStatus.FAILED.value, TaskStatus.IN_PROGRESS.value]
+        with self._connection(read_only=True) as conn:
+            rows = conn.execute(f"""
+                SELECT stock_id, stock_name
+                FROM progress_stocks
+                WHERE task_id = ? AND status IN ({', '.join('?' for _ in pending_statuses)})
+                ORDER BY rowid
+            """, (task_id, *pending_statuses)).fetchall()
+
+        return [{'stock_id': row[0], 'stock_name': row[1]} for row in rows]
 
-        pending_stocks = []
-        for stock_id, stock_progress in task_progress.stock_progress.items():
-            # 包含未開始、失敗、和進行中但未完成的股票
-            if stock_progress.status in [TaskStatus.NOT_STARTED, TaskStatus.FAILED, TaskStatus.IN_PROGRESS]:
-                pending_stocks.append({
-                    'stock_id': stock_progress.stock_id,
-                    'stock_name': stock_progress.stock_name
-                })
-
-        return pending_stocks
-    
     def reset_task(self, task_id: str):
         """重置任務進度"""
-        task_progress = self.load_task_progress(task_id)
-        if not task_progress:
-            print(f"❌ 找不到任務: {task_id}")
-            return
-        
-        # 重置任務狀態
-        task_progress.status = TaskStatus.NOT_STARTED
-        task_progress.completed_stocks = 0
-        task_progress.failed_stocks = 0
-        task_progress.skipped_stocks = 0
-        task_progress.start_time = datetime.now().isoformat()
-        task_progress.last_updated = datetime.now().isoformat()
-        task_progress.end_time = None
-        
-        # 重置所有股票進度
-        for stock_progress in task_progress.stock_progress.values():
-            stock_progress.status = TaskStatus.NOT_STARTED
-            stock_progress.completed_datasets = []
-            stock_progress.failed_datasets = []
-            stock_progress.last_updated = datetime.now().isoformat()
-            stock_progress.retry_count = 0
-            stock_progress.error_message = None
-        
-        # 儲存進度
-        self._save_task_progress(task_progress)
+        now = datetime.now().isoformat()
+        with self._connection() as conn:
+            cursor = conn.execute("""
+                UPDATE progress_tasks
+                SET status = ?, completed_stocks = 0, failed_stocks = 0, skipped_stocks = 0,
+                    start_time = ?, last_updated = ?, end_time = NULL
+                WHERE task_id = ?
+            """, (TaskStatus.NOT_STARTED.value, now, now, task_id))
+            if cursor.rowcount == 0:
+                print(f"❌ 找不到任務: {task_id}")
+                return
+
+            # 重置所有股票進度
+            conn.execute("""
+                UPDATE progress_stocks
+                SET status = ?, completed_datasets = '[]', failed_datasets = '[]',
+                    retry_count = 0, error_message = NULL, last_updated = ?
+                WHERE task_id = ?
+            """, (TaskStatus.NOT_STARTED.value, now, task_id))
+            conn.commit()
+
         print(f"✅ 任務 {task_id} 已重置")
-    
+
     def list_tasks(self) -> List[Dict[str, Any]]:
         """列出所有任務"""
         try:
-            if not self.progress_file.exists():
-                return []
-            
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            tasks = []
-            for task_id, task_data in data.get('tasks', {}).items():
-                tasks.append({
-                    'task_id': task_id,
-                    'task_type': task_data['task_type'],
-                    'task_name': task_data['task_name'],
-                    'status': task_data['status'],
-                    'total_stocks': task_data['total_stocks'],
-                    'completed_stocks': task_data['completed_stocks'],
-                    'failed_stocks': task_data['failed_stocks'],
-                    'start_time': task_data['start_time'],
-                    'last_updated': task_data['last_updated']
-                })
-            
-            return sorted(tasks, key=lambda x: x['last_updated'], reverse=True)
-            
+            with pooled_connection(self.db_path, read_only=True, row_factory=sqlite3.Row) as conn:
+                rows = conn.execute("""
+                    SELECT task_id, task_type, task_name, status, total_stocks, completed_stocks,
+                           failed_stocks, start_time, last_updated
+                    FROM progress_tasks
+                    ORDER BY last_updated DESC
+                """).fetchall()
+            return [dict(row) for row in rows]
+
         except Exception as e:
             print(f"❌ 列出任務失敗: {e}")
             return []
-    
+
     def delete_task(self, task_id: str):
         """刪除任務"""
         try:
-            if not self.progress_file.exists():
-                print(f"❌ 找不到進度檔案")
-                return
-            
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if task_id in data.get('tasks', {}):
-                del data['tasks'][task_id]
-                data['last_updated'] = datetime.now().isoformat()
-                
-                with open(self.progress_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                
+            with self._connection() as conn:
+                cursor = conn.execute("DELETE FROM progress_tasks WHERE task_id = ?", (task_id,))
+                conn.execute("DELETE FROM progress_stocks WHERE task_id = ?", (task_id,))
+                conn.commit()
+
+            if cursor.rowcount:
                 print(f"✅ 任務 {task_id} 已刪除")
             else:
                 print(f"❌ 找不到任務: {task_id}")
-                
+
         except Exception as e:
             print(f"❌ 刪除任務失敗: {e}")
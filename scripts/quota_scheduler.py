@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+額度感知的資料收集排程器
+
+原本各收集腳本各自逐檔處理，遇到 402 就由 SmartWaitManager 盲等最多 70 分鐘。
+本排程器集中管理所有資料集的收集工作：
+- 請求帳本（request ledger）持久化記錄每一次 API 呼叫時間，
+  可精確算出下一個額度釋出的時間，不再盲等
+- 工作佇列持久化於 SQLite，依優先順序（日股價 → 月營收 → 財報 → 股利）交錯處理，
+  中斷後重新啟動會從未完成的工作繼續
+- 提供佇列深度與預估完成時間（ETA）
+
+使用方式:
+    python scripts/quota_scheduler.py enqueue --dataset TaiwanStockPrice --start-date 2024-01-01
+    python scripts/quota_scheduler.py run
+    python scripts/quota_scheduler.py status
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.sqlite_pool import pooled_connection
+from scripts.smart_wait import is_api_limit_error
+
+# 每小時額度的計算窗口（秒）
+QUOTA_WINDOW_SECONDS = 3600
+# 保留的安全餘量（與 FinMindDataCollector 接近上限前 10 次即等待相同）
+QUOTA_SAFETY_MARGIN = 10
+
+# 資料集優先順序（數字越小越優先）
+DATASET_PRIORITIES = {
+    'TaiwanStockPrice': 0,
+    'TaiwanStockMonthRevenue': 1,
+    'TaiwanStockFinancialStatements': 2,
+    'TaiwanStockBalanceSheet': 2,
+    'TaiwanStockCashFlowsStatement': 2,
+    'TaiwanStockDividend': 3,
+    'TaiwanStockDividendResult': 3,
+}
+DEFAULT_PRIORITY = 5
+
+
+class JobStatus(Enum):
+    """工作狀態"""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class CollectionJob:
+    """單一收集工作（對應一次 API 請求）"""
+    job_id: int
+    dataset: str
+    data_id: Optional[str]
+    start_date: str
+    end_date: Optional[str]
+    priority: int
+    attempts: int = 0
+
+
+class RequestLedger:
+    """持久化的 API 請求帳本"""
+
+    def __init__(self, db_path: str, requests_per_hour: int = 600,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            db_path: 帳本 SQLite 檔案
+            requests_per_hour: 每小時額度（有 Token 600 次，否則 300 次）
+            clock: 時間來源（epoch 秒，測試可替換）
+        """
+        self.db_path = str(db_path)
+        self.quota = max(requests_per_hour - QUOTA_SAFETY_MARGIN, 1)
+        self.clock = clock
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with pooled_connection(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS api_request_ledger (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    requested_at REAL NOT NULL,
+                    dataset TEXT,
+                    data_id TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_time ON api_request_ledger(requested_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS api_quota_state (
+                    key TEXT PRIMARY KEY,
+                    value REAL
+                )
+            """)
+            conn.commit()
+
+    def record(self, dataset: Optional[str] = None, data_id: Optional[str] = None,
+               requested_at: Optional[float] = None):
+        """記錄一次請求（並清除超過兩個窗口的舊記錄）"""
+        now = self.clock() if requested_at is None else requested_at
+        with pooled_connection(self.db_path) as conn:
+            conn.execute("INSERT INTO api_request_ledger (requested_at, dataset, data_id) VALUES (?, ?, ?)",
+                         (now, dataset, data_id))
+            conn.execute("DELETE FROM api_request_ledger WHERE requested_at < ?",
+                         (now - 2 * QUOTA_WINDOW_SECONDS,))
+            conn.commit()
+
+    def window_timestamps(self, now: Optional[float] = None) -> List[float]:
+        """最近一個窗口內的請求時間（由舊到新）"""
+        now = self.clock() if now is None else now
+        with pooled_connection(self.db_path, read_only=True) as conn:
+            rows = conn.execute("""
+                SELECT requested_at FROM api_request_ledger
+                WHERE requested_at > ? ORDER BY requested_at
+            """, (now - QUOTA_WINDOW_SECONDS,)).fetchall()
+        return [row[0] for row in rows]
+
+    def used(self, now: Optional[float] = None) -> int:
+        return len(self.window_timestamps(now))
+
+    def blocked_until(self) -> float:
+        with pooled_connection(self.db_path, read_only=True) as conn:
+            row = conn.execute("SELECT value FROM api_quota_state WHERE key = 'blocked_until'").fetchone()
+        return row[0] if row else 0.0
+
+    def mark_exhausted(self, now: Optional[float] = None) -> float:
+        """
+        伺服器回報額度用盡（402）時記錄封鎖時間
+
+        帳本未滿卻收到 402 表示有帳本以外的呼叫，以窗口內最舊的請求到期時間
+        （沒有記錄時為一個完整窗口）作為額度釋出時間
+        """
+        now = self.clock() if now is None else now
+        window = self.window_timestamps(now)
+        until = (window[0] if window else now) + QUOTA_WINDOW_SECONDS
+        with pooled_connection(self.db_path) as conn:
+            conn.execute("INSERT OR REPLACE INTO api_quota_state (key, value) VALUES ('blocked_until', ?)", (until,))
+            conn.commit()
+        return until
+
+    def next_available(self, now: Optional[float] = None) -> float:
+        """下一次可以送出請求的時間（epoch 秒）"""
+        now = self.clock() if now is None else now
+        window = self.window_timestamps(now)
+        available = now
+        if len(window) >= self.quota:
+            # 必須等到使窗口內請求數降到額度以下的那筆記錄過期
+            available = window[len(window) - self.quota] + QUOTA_WINDOW_SECONDS
+        return max(available, self.blocked_until(), now)
+
+    def seconds_until_available(self, now: Optional[float] = None) -> float:
+        now = self.clock() if now is None else now
+        return max(0.0, self.next_available(now) - now)
+
+    def estimate_completion(self, pending_requests: int, now: Optional[float] = None) -> float:
+        """以帳本推算完成 pending_requests 次請求所需秒數（不含請求本身的處理時間）"""
+        now = self.clock() if now is None else now
+        if pending_requests <= 0:
+            return 0.0
+
+        # 依序模擬每次請求的最早送出時間：第 k 次請求需等第 k - quota 次請求過期
+        start = max(now, self.blocked_until())
+        issued = deque(self.window_timestamps(now), maxlen=self.quota)
+        slot = start
+        for _ in range(pending_requests):
+            slot = start
+            if len(issued) >= self.quota:
+                slot = max(start, issued[0] + QUOTA_WINDOW_SECONDS)
+            issued.append(slot)
+        return slot - now
+
+
+class QuotaScheduler:
+    """依額度與優先順序執行收集工作"""
+
+    def __init__(self, state_db: str = "data/collection_scheduler.db",
+                 requests_per_hour: Optional[int] = None,
+                 handlers: Optional[Dict[str, Callable[[CollectionJob], int]]] = None,
+                 max_attempts: int = 3,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            state_db: 工作佇列與請求帳本的 SQLite 檔案
+            requests_per_hour: 每小時額度（None 時依 FINMIND_API_TOKEN 是否設定決定 600 / 300）
+            handlers: 資料集 -> 處理函數（執行一次 API 請求並儲存，回傳儲存筆數）
+            max_attempts: 非額度錯誤的最多嘗試次數
+            clock / sleep: 時間來源與等待函數（測試可替換）
+        """
+        if requests_per_hour is None:
+            requests_per_hour = 600 if os.getenv('FINMIND_API_TOKEN') else 300
+        self.state_db = str(state_db)
+        self.ledger = RequestLedger(state_db, requests_per_hour, clock=clock)
+        self.handlers = dict(handlers or {})
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.sleep = sleep
+
+        with pooled_connection(self.state_db) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS collection_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    dataset TEXT NOT NULL,
+                    data_id TEXT NOT NULL DEFAULT '',
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL DEFAULT '',
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    rows_saved INTEGER,
+                    last_error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    UNIQUE(dataset, data_id, start_date, end_date)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON collection_jobs(status, priority, id)")
+            # 上次執行中斷時仍在處理的工作重新排入佇列
+            conn.execute("UPDATE collection_jobs SET status = ? WHERE status = ?",
+                         (JobStatus.PENDING.value, JobStatus.RUNNING.value))
+            conn.commit()
+
+    # ------------------------------------------------------------------
+    # 佇列
+    # ------------------------------------------------------------------
+    def enqueue(self, dataset: str, data_id: Optional[str], start_date: str,
+                end_date: Optional[str] = None, priority: Optional[int] = None) -> bool:
+        """
+        加入工作（相同資料集 / 股票 / 期間已在佇列中則不重複加入；已完成或失敗的會重新排入）
+
+        Returns:
+            True 表示新加入或重新排入
+        """
+        priority = DATASET_PRIORITIES.get(dataset, DEFAULT_PRIORITY) if priority is None else priority
+        now = datetime.now().isoformat()
+        key = (dataset, data_id or '', start_date, end_date or '')
+        with pooled_connection(self.state_db) as conn:
+            cursor = conn.execute("""
+                INSERT INTO collection_jobs
+                (dataset, data_id, start_date, end_date, priority, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(dataset, data_id, start_date, end_date) DO UPDATE SET
+                    status = excluded.status, priority = excluded.priority,
+                    attempts = 0, last_error = NULL, updated_at = excluded.updated_at
+                WHERE collection_jobs.status IN (?, ?)
+            """, (*key, priority, JobStatus.PENDING.value, now, now, JobStatus.DONE.value, JobStatus.FAILED.value))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def enqueue_many(self, dataset: str, data_ids: List[Optional[str]], start_date: str,
+                     end_date: Optional[str] = None, priority: Optional[int] = None) -> int:
+        """批次加入同一資料集的多檔股票，回傳加入數"""
+        return sum(self.enqueue(dataset, data_id, start_date, end_date, priority) for data_id in data_ids)
+
+    def _next_job(self) -> Optional[CollectionJob]:
+        """取出下一個工作：優先順序 → 重試次數少者 → 先加入者"""
+        with pooled_connection(self.state_db) as conn:
+            row = conn.execute("""
+                SELECT id, dataset, data_id, start_date, end_date, priority, attempts
+                FROM collection_jobs WHERE status = ?
+                ORDER BY priority, attempts, id LIMIT 1
+            """, (JobStatus.PENDING.value,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE collection_jobs SET status = ?, updated_at = ? WHERE id = ?",
+                         (JobStatus.RUNNING.value, datetime.now().isoformat(), row[0]))
+            conn.commit()
+        return CollectionJob(job_id=row[0], dataset=row[1], data_id=row[2] or None, start_date=row[3],
+                             end_date=row[4] or None, priority=row[5], attempts=row[6])
+
+    def _finish_job(self, job: CollectionJob, status: JobStatus, attempts: int,
+                    rows_saved: Optional[int] = None, error: Optional[str] = None):
+        with pooled_connection(self.state_db) as conn:
+            conn.execute("""
+                UPDATE collection_jobs
+                SET status = ?, attempts = ?, rows_saved = ?, last_error = ?, updated_at = ?
+                WHERE id = ?
+            """, (status.value, attempts, rows_saved, error, datetime.now().isoformat(), job.job_id))
+            conn.commit()
+
+    # ------------------------------------------------------------------
+    # 執行
+    # ------------------------------------------------------------------
+    def run(self, max_jobs: Optional[int] = None,
+            on_progress: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+        """
+        執行佇列中的工作直到清空（或達到 max_jobs）
+
+        額度不足時只等待到帳本算出的下一個釋出時間
+
+        Returns:
+            {'done', 'failed', 'retried', 'waited_seconds'}
+        """
+        summary = {'done': 0, 'failed': 0, 'retried': 0, 'waited_seconds': 0}
+        processed = 0
+
+        while max_jobs is None or processed < max_jobs:
+            job = self._next_job()
+            if job is None:
+                break
+
+            handler = self.handlers.get(job.dataset)
+            if handler is None:
+                self._finish_job(job, JobStatus.FAILED, job.attempts, error=f"沒有 {job.dataset} 的處理函數")
+                summary['failed'] += 1
+                continue
+
+            wait = self.ledger.seconds_until_available()
+            if wait > 0:
+                print(f"[SCHEDULER] 額度已滿，等待 {wait / 60:.1f} 分鐘至 "
+                      f"{datetime.fromtimestamp(self.clock() + wait).strftime('%H:%M:%S')}", flush=True)
+                self.sleep(wait)
+                summary['waited_seconds'] += int(wait)
+
+            self.ledger.record(job.dataset, job.data_id)
+            try:
+                rows_saved = handler(job)
+            except Exception as e:
+                error_msg = str(e)
+                if is_api_limit_error(error_msg):
+                    # 額度錯誤不計入嘗試次數，記錄封鎖時間後重新排隊
+                    self.ledger.mark_exhausted()
+                    self._finish_job(job, JobStatus.PENDING, job.attempts, error=error_msg)
+                    summary['retried'] += 1
+                else:
+                    attempts = job.attempts + 1
+                    status = JobStatus.FAILED if attempts >= self.max_attempts else JobStatus.PENDING
+                    self._finish_job(job, status, attempts, error=error_msg)
+                    summary['failed' if status == JobStatus.FAILED else 'retried'] += 1
+            else:
+                self._finish_job(job, JobStatus.DONE, job.attempts + 1, rows_saved=rows_saved)
+                summary['done'] += 1
+
+            processed += 1
+            if on_progress is not None:
+                on_progress(self.status())
+
+        return summary
+
+    def status(self) -> Dict:
+        """佇列深度、額度使用量與預估完成時間"""
+        with pooled_connection(self.state_db, read_only=True) as conn:
+            rows = conn.execute("""
+                SELECT dataset, status, COUNT(*) FROM collection_jobs GROUP BY dataset, status
+            """).fetchall()
+
+        by_status = {status.value: 0 for status in JobStatus}
+        pending_by_dataset: Dict[str, int] = {}
+        for dataset, status, count in rows:
+            by_status[status] = by_status.get(status, 0) + count
+            if status in (JobStatus.PENDING.value, JobStatus.RUNNING.value):
+                pending_by_dataset[dataset] = pending_by_dataset.get(dataset, 0) + count
+
+        now = self.clock()
+        queue_depth = by_status[JobStatus.PENDING.value] + by_status[JobStatus.RUNNING.value]
+        eta_seconds = self.ledger.estimate_completion(queue_depth, now)
+        return {
+            'queue_depth': queue_depth,
+            'pending_by_dataset': pending_by_dataset,
+            'status_counts': by_status,
+            'quota': self.ledger.quota,
+            'used_in_window': self.ledger.used(now),
+            'next_request_at': self.ledger.next_available(now),
+            'eta_seconds': eta_seconds,
+            'eta': datetime.fromtimestamp(now + eta_seconds).isoformat(timespec='seconds'),
+        }
+
+
+def make_table_handler(collector, db_manager, table_name: str, columns: Optional[List[str]] = None,
+                       column_map: Optional[Dict[str, str]] = None,
+                       defaults: Optional[Dict[str, object]] = None,
+                       after_save: Optional[Callable] = None) -> Callable[[CollectionJob], int]:
+    """
+    建立「請求一次 FinMind 並 upsert 到資料表」的處理函數
+
+    Args:
+        collector: FinMindDataCollector
+        db_manager: SimpleDatabaseManager
+        table_name: 目標資料表
+        columns: 要寫入的 FinMind 欄位（None 表示全部）
+        column_map: 欄位改名對應
+        defaults: 缺值時的預設值
+        after_save: 寫入後呼叫的衍生計算 after_save(db_manager, stock_id)，例如財務比率
+    """
+    import pandas as pd
+
+    def handler(job: CollectionJob) -> int:
+        end_date = job.end_date or datetime.now().strftime('%Y-%m-%d')
+        data = collector._make_request(job.dataset, job.data_id, job.start_date, end_date)
+        if data.get('msg') and is_api_limit_error(f"{data.get('status')} {data['msg']}"):
+            raise Exception(f"API請求限制: {data['msg']}")
+        if not data['data']:
+            return 0
+
+        df = pd.DataFrame(data['data'])
+        if columns:
+            df = df.reindex(columns=columns)
+        for col, value in (defaults or {}).items():
+            df[col] = df[col].fillna(value) if col in df.columns else value
+        result = db_manager.bulk_upsert(table_name, df, column_map=column_map)
+        if after_save is not None and job.data_id:
+            after_save(db_manager, job.data_id)
+        return result['inserted'] + result['updated']
+
+    return handler
+
+
+def build_default_handlers(db_path: str, api_url: str, api_token: str) -> Dict[str, Callable[[CollectionJob], int]]:
+    """
+    股價、月營收、綜合損益表、資產負債表、現金流量的預設處理函數
+
+    欄位與 collect_with_resume.py 及各財報收集腳本的儲存函數相同，
+    財報寫入後沿用腳本中的財務比率計算
+    """
+    from app.services.data_collector import FinMindDataCollector
+    from app.utils.bulk_upsert import FINMIND_COLUMN_MAPS
+    from app.utils.simple_database import SimpleDatabaseManager
+    from scripts.collect_balance_sheets import calculate_balance_sheet_ratios
+    from scripts.collect_financial_statements import calculate_financial_ratios
+
+    collector = FinMindDataCollector(api_url, api_token)
+    db_manager = SimpleDatabaseManager(db_path)
+    return {
+        'TaiwanStockPrice': make_table_handler(
+            collector, db_manager, 'stock_prices',
+            columns=['stock_id', 'date', 'open', 'max', 'min', 'close',
+                     'Trading_Volume', 'Trading_money', 'Trading_turnover', 'spread'],
+            column_map=FINMIND_COLUMN_MAPS['stock_prices']),
+        'TaiwanStockMonthRevenue': make_table_handler(
+            collector, db_manager, 'monthly_revenues',
+            columns=['stock_id', 'date', 'country', 'revenue', 'revenue_month', 'revenue_year'],
+            defaults={'country': 'Taiwan'}),
+        'TaiwanStockFinancialStatements': make_table_handler(
+            collector, db_manager, 'financial_statements',
+            columns=['stock_id', 'date', 'type', 'value', 'origin_name'],
+            defaults={'origin_name': ''},
+            after_save=calculate_financial_ratios),
+        'TaiwanStockBalanceSheet': make_table_handler(
+            collector, db_manager, 'balance_sheets',
+            columns=['stock_id', 'date', 'type', 'value', 'origin_name'],
+            defaults={'origin_name': ''},
+            after_save=calculate_balance_sheet_ratios),
+        'TaiwanStockCashFlowsStatement': make_table_handler(
+            collector, db_manager, 'cash_flow_statements',
+            columns=['stock_id', 'date', 'type', 'value', 'origin_name'],
+            defaults={'origin_name': ''}),
+    }
+
+
+def _format_status(status: Dict) -> str:
+    lines = [
+        f"佇列深度: {status['queue_depth']}",
+        f"額度使用: {status['used_in_window']}/{status['quota']} (最近一小時)",
+        f"下次可請求: {datetime.fromtimestamp(status['next_request_at']).strftime('%Y-%m-%d %H:%M:%S')}",
+        f"預估完成: {status['eta']} (約 {status['eta_seconds'] / 60:.1f} 分鐘)",
+    ]
+    for dataset, count in sorted(status['pending_by_dataset'].items(),
+                                 key=lambda item: DATASET_PRIORITIES.get(item[0], DEFAULT_PRIORITY)):
+        lines.append(f"  {dataset}: {count}")
+    return "\n".join(lines)
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='額度感知的資料收集排程器')
+    parser.add_argument('command', choices=['enqueue', 'run', 'status'])
+    parser.add_argument('--state-db', default=os.path.join('data', 'collection_scheduler.db'), help='排程狀態資料庫')
+    parser.add_argument('--dataset', help='資料集名稱 (enqueue)')
+    parser.add_argument('--stock-id', action='append', help='股票代碼，可重複；未指定時使用 stocks 表中的普通股')
+    parser.add_argument('--start-date', help='開始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end-date', help='結束日期 (YYYY-MM-DD)，未指定為執行當天')
+    parser.add_argument('--max-jobs', type=int, help='最多執行工作數 (run)')
+    args = parser.parse_args()
+
+    api_token = Config.FINMIND_API_TOKEN
+    scheduler = QuotaScheduler(
+        args.state_db,
+        requests_per_hour=600 if api_token else 300,
+        handlers=build_default_handlers(Config.DATABASE_PATH, Config.FINMIND_API_URL, api_token),
+    )
+
+    if args.command == 'enqueue':
+        if not args.dataset or not args.start_date:
+            parser.error('enqueue 需要 --dataset 與 --start-date')
+        stock_ids = args.stock_id
+        if not stock_ids:
+            with pooled_connection(Config.DATABASE_PATH, read_only=True) as conn:
+                stock_ids = [row[0] for row in conn.execute(
+                    "SELECT stock_id FROM stocks WHERE is_etf = 0 AND LENGTH(stock_id) = 4 ORDER BY stock_id")]
+        added = scheduler.enqueue_many(args.dataset, stock_ids, args.start_date, args.end_date)
+        print(f"已加入 {added} 個工作")
+    elif args.command == 'run':
+        summary = scheduler.run(max_jobs=args.max_jobs)
+        print(f"完成 {summary['done']}、失敗 {summary['failed']}、重試 {summary['retried']}，"
+              f"等待 {summary['waited_seconds'] / 60:.1f} 分鐘")
+
+    print(_format_status(scheduler.status()))
+
+
+if __name__ == "__main__":
+    main()
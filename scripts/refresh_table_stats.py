@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重新計算資料表統計（table_stats，儀表板資料庫狀態頁讀取）
+
+bulk_upsert 寫入時會同步更新統計；以其他方式寫入或刪除資料後可手動校正：
+    python scripts/refresh_table_stats.py
+    python scripts/refresh_table_stats.py --table stock_prices
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app.utils.sqlite_pool import pooled_connection
+from app.utils.table_stats import STATS_TABLES, load_table_stats, refresh_table_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重新計算資料表統計')
+    parser.add_argument('--table', action='append', choices=sorted(STATS_TABLES),
+                        help='只重新計算指定資料表，可重複')
+    args = parser.parse_args()
+
+    print(f"資料庫: {Config.DATABASE_PATH}")
+    started = time.time()
+    with pooled_connection(Config.DATABASE_PATH) as conn:
+        refresh_table_stats(conn, tables=args.table)
+        stats = load_table_stats(conn)
+
+    for table_name, row in stats.items():
+        if args.table and table_name not in args.table:
+            continue
+        date_range = f"{row['min_date']} ~ {row['max_date']}" if row['min_date'] else "-"
+        stocks = f"{row['distinct_stocks']:,} 檔" if row['distinct_stocks'] is not None else "-"
+        print(f"  {table_name:<22}: {row['row_count']:>12,} 筆  {stocks:>10}  {date_range}")
+    print(f"完成，耗時 {time.time() - started:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
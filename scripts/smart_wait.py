@@ -7,17 +7,23 @@
 import time
 from datetime import datetime, timedelta
 
+# API 額度限制錯誤的關鍵字（各收集程式與排程器共用）
+API_LIMIT_KEYWORDS = ["402", "payment required", "api請求限制", "rate limit", "quota exceeded", "too many requests"]
+
 class SmartWaitManager:
     """智能等待管理器"""
     
-    def __init__(self, api_reset_minutes=70):
+    def __init__(self, api_reset_minutes=70, ledger=None):
         """
         初始化智能等待管理器
 
         Args:
             api_reset_minutes: API重置週期（分鐘）
+            ledger: 選用的請求帳本（quota_scheduler.RequestLedger）；
+                    設定時依帳本算出的額度釋出時間等待，而非固定週期
         """
         self.api_reset_minutes = api_reset_minutes
+        self.ledger = ledger
         self.execution_start_time = None
         # 不在初始化時重置計時器，讓調用方決定何時初始化
     
@@ -34,12 +40,25 @@ class SmartWaitManager:
         elapsed = datetime.now() - self.execution_start_time
         return elapsed.total_seconds() / 60
     
+    def get_remaining_wait_minutes(self):
+        """
+        計算需要等待的分鐘數
+
+        有請求帳本時等到帳本中最早的請求滿一小時（額度開始釋出）；
+        否則沿用 API重置週期 - 總執行時間
+        """
+        if self.ledger is not None:
+            self.ledger.mark_exhausted()
+            return self.ledger.seconds_until_available() / 60
+
+        return max(0, self.api_reset_minutes - self.get_execution_time_minutes())
+
     def smart_wait_for_api_reset(self):
-        """智能等待API限制重置 - 等待時間 = API重置週期 - 總執行時間"""
+        """智能等待API限制重置"""
         executed_minutes = self.get_execution_time_minutes()
         
         # 計算實際需要等待的時間
-        remaining_wait_minutes = max(0, self.api_reset_minutes - executed_minutes)
+        remaining_wait_minutes = self.get_remaining_wait_minutes()
         
         print(f"\n🚫 API請求限制已達上限")
         print("=" * 60)
@@ -69,13 +88,14 @@ class SmartWaitManager:
         
         if total_wait_seconds > 0:
             for remaining in range(total_wait_seconds, 0, -60):
+                step = min(60, remaining)
                 hours = remaining // 3600
                 minutes = (remaining % 3600) // 60
                 current_time = datetime.now().strftime("%H:%M:%S")
                 progress = ((total_wait_seconds - remaining) / total_wait_seconds) * 100
                 
                 print(f"\r⏰ [{current_time}] 剩餘: {hours:02d}:{minutes:02d}:00 | 進度: {progress:.1f}%", end="", flush=True)
-                time.sleep(60)
+                time.sleep(step)
         
         print(f"\n✅ [{datetime.now().strftime('%H:%M:%S')}] 智能等待完成，重置計時器並繼續收集...")
         print("=" * 60)
@@ -85,22 +105,42 @@ class SmartWaitManager:
     
     def is_api_limit_error(self, error_msg):
         """判斷是否為API限制錯誤"""
-        api_limit_keywords = [
-            "402", "Payment Required", "API請求限制", 
-            "rate limit", "quota exceeded", "too many requests"
-        ]
-        
-        error_msg_lower = error_msg.lower()
-        return any(keyword.lower() in error_msg_lower for keyword in api_limit_keywords)
+        return is_api_limit_error(error_msg)
 
-# 全局智能等待管理器實例
+# 全局智能等待管理器與請求帳本實例
 _global_wait_manager = None
+_global_request_ledger = None
+
+def get_request_ledger():
+    """
+    獲取全局請求帳本（data/collection_scheduler.db，與 quota_scheduler、collect_daily_update 共用）
+
+    無法建立帳本時回傳 None，等待改回固定的 API重置週期
+    """
+    global _global_request_ledger
+    if _global_request_ledger is None:
+        try:
+            from pathlib import Path
+            from config import Config
+            from scripts.quota_scheduler import RequestLedger
+            ledger_path = Path(Config.DATABASE_PATH).parent / "collection_scheduler.db"
+            _global_request_ledger = RequestLedger(ledger_path, 600 if Config.FINMIND_API_TOKEN else 300)
+        except Exception as e:
+            print(f"[WARNING] 無法建立請求帳本，使用固定等待週期: {e}")
+            return None
+    return _global_request_ledger
+
+def record_api_request(dataset=None, data_id=None):
+    """直接以 requests 呼叫 FinMind 的收集程式於每次請求後記錄到共用帳本"""
+    ledger = get_request_ledger()
+    if ledger is not None:
+        ledger.record(dataset, data_id)
 
 def get_smart_wait_manager():
-    """獲取全局智能等待管理器"""
+    """獲取全局智能等待管理器（依共用請求帳本計算等待時間）"""
     global _global_wait_manager
     if _global_wait_manager is None:
-        _global_wait_manager = SmartWaitManager()
+        _global_wait_manager = SmartWaitManager(ledger=get_request_ledger())
     return _global_wait_manager
 
 def reset_execution_timer():
@@ -114,9 +154,9 @@ def smart_wait_for_api_reset():
     manager.smart_wait_for_api_reset()
 
 def is_api_limit_error(error_msg):
-    """判斷是否為API限制錯誤（全局函數）"""
-    manager = get_smart_wait_manager()
-    return manager.is_api_limit_error(error_msg)
+    """判斷是否為API限制錯誤（全局函數，不需建立等待管理器）"""
+    error_msg = str(error_msg).lower()
+    return any(keyword in error_msg for keyword in API_LIMIT_KEYWORDS)
 
 def get_execution_time_minutes():
     """獲取總執行時間（全局函數）"""
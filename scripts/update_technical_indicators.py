@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+計算並儲存技術指標（stock_indicators，參數見 Config.TECHNICAL_INDICATORS）
+
+預設只計算新交易日，第一次執行會以完整歷史計算所有股票：
+    python scripts/update_technical_indicators.py
+    python scripts/update_technical_indicators.py --stock-id 2330
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app.utils.sqlite_pool import pooled_connection
+from app.utils.technical_indicators import update_indicators
+
+
+def main():
+    parser = argparse.ArgumentParser(description='更新技術指標')
+    parser.add_argument('--stock-id', action='append', help='只更新指定股票，可重複')
+    args = parser.parse_args()
+
+    print(f"資料庫: {Config.DATABASE_PATH}")
+    started = time.time()
+    with pooled_connection(Config.DATABASE_PATH) as conn:
+        result = update_indicators(conn, Config.TECHNICAL_INDICATORS, stock_ids=args.stock_id)
+    print(f"完成: {result['stocks']} 檔股票寫入 {result['rows']:,} 筆，耗時 {time.time() - started:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
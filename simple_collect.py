@@ -24,6 +24,21 @@ except ImportError:
     print("[WARNING] 無法導入簡單進度記錄系統，進度記錄功能將被停用")
     PROGRESS_ENABLED = False
 
+# 股價寫入後更新最新股價 / 每日市場摘要彙總表
+try:
+    from app.utils.market_summary import update_market_summary
+except ImportError:
+    update_market_summary = None
+
+# 寫入後維護 table_stats（筆數 / 日期範圍 / 股票檔數）
+try:
+    from app.utils.table_stats import record_stock_write, snapshot_stock_stats
+except ImportError:
+    def snapshot_stock_stats(conn, table_name, stock_ids):
+        return None
+    def record_stock_write(conn, snapshot):
+        return False
+
 # 簡化的API狀態檢查
 def is_api_limit_error(error_msg):
     """檢查是否為API限制錯誤"""
@@ -202,6 +217,7 @@ def save_stock_prices(df, stock_id):
     try:
         conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
+        stats = snapshot_stock_stats(conn, 'stock_prices', [stock_id])
         
         saved = 0
         for _, row in df.iterrows():
@@ -229,6 +245,12 @@ def save_stock_prices(df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
+        if saved and update_market_summary is not None:
+            try:
+                update_market_summary(conn, [stock_id], df['date'].astype(str).unique())
+            except Exception as e:
+                print(f"[WARNING] 更新市場摘要失敗: {e}")
         conn.close()
         return saved
         
@@ -244,6 +266,7 @@ def save_monthly_revenue(df, stock_id):
     try:
         conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
+        stats = snapshot_stock_stats(conn, 'monthly_revenues', [stock_id])
         
         saved = 0
         for _, row in df.iterrows():
@@ -266,6 +289,7 @@ def save_monthly_revenue(df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
         conn.close()
         return saved
         
@@ -281,6 +305,7 @@ def save_cash_flow(df, stock_id):
     try:
         conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
+        stats = snapshot_stock_stats(conn, 'cash_flow_statements', [stock_id])
         
         saved = 0
         for _, row in df.iterrows():
@@ -302,6 +327,7 @@ def save_cash_flow(df, stock_id):
                 continue
         
         conn.commit()
+        record_stock_write(conn, stats)
         conn.close()
         return saved
         
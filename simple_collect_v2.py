@@ -24,7 +24,8 @@ except ImportError:
 
 # 導入智能等待模組
 try:
-    from scripts.smart_wait import reset_execution_timer, smart_wait_for_api_reset, is_api_limit_error
+    from scripts.smart_wait import (reset_execution_timer, smart_wait_for_api_reset, is_api_limit_error,
+                                    record_api_request)
 except ImportError:
     print("[WARNING] 無法導入智能等待模組，使用本地版本")
     
@@ -38,6 +39,9 @@ except ImportError:
     def is_api_limit_error(error_msg):
         return "429" in str(error_msg) or "rate limit" in str(error_msg).lower()
 
+    def record_api_request(dataset=None, data_id=None):
+        pass
+
 # 導入股票清單函數
 def get_stock_list(limit=None, stock_id=None):
     """獲取股票清單"""
@@ -90,6 +94,8 @@ def collect_stock_data(stock_id, dataset, start_date, end_date, retry_count=0):
 
         import requests
         resp = requests.get(url, params=parameter, timeout=30)
+        # 402 也會消耗額度，送出即記錄到共用請求帳本
+        record_api_request(dataset, stock_id)
 
         if resp.status_code == 200:
             data = resp.json()
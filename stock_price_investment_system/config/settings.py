@@ -16,7 +16,27 @@ SYSTEM_ROOT = PROJECT_ROOT.parent  # taiwan-stock-system根目錄
 DATABASE_CONFIG = {
     'path': SYSTEM_ROOT / "data" / "taiwan_stock.db",
     'timeout': 30,
-    'check_same_thread': False
+    'check_same_thread': False,
+
+    # 股價面板快取（預設關閉，回測時可開啟以避免重複查詢SQLite）
+    'price_cache': {
+        'enabled': False,
+        'max_memory_mb': 256,          # 超過上限時以LRU淘汰
+    },
+
+    # Parquet 欄式快照（scripts/export_parquet_snapshots.py 匯出，需要 pyarrow）
+    # 啟用後股價、月營收、財報改由快照讀取，快照不存在時自動退回 SQLite
+    'snapshot': {
+        'enabled': False,
+        'path': SYSTEM_ROOT / "data" / "snapshots",
+    },
+
+    # 記憶體映射股價矩陣（scripts/build_price_matrix.py 建立）
+    # 啟用後 get_stock_prices / get_close_price 直接切片矩陣，查詢期間超出矩陣時退回資料庫
+    'price_matrix': {
+        'enabled': False,
+        'path': SYSTEM_ROOT / "data" / "price_matrix",
+    },
 }
 
 # Walk-forward 驗證配置
@@ -35,6 +55,9 @@ WALKFORWARD_CONFIG = {
     # 最小資料要求
     'min_training_samples': 10,  # 進一步降低最小樣本數要求，適合小樣本測試
     'min_stock_history_months': 60,
+
+    # 平行執行：(fold, 股票) 單元分派到行程池（1 為循序，-1 使用全部CPU）
+    'n_jobs': 1,
 }
 
 # 特徵工程配置
@@ -62,7 +85,10 @@ FEATURE_CONFIG = {
         'enable_industry_encoding': True,
         'enable_market_cap_features': True,
         'enable_listing_age_features': True,
-    }
+    },
+
+    # 訓練資料集建構方式：'panel' 每檔一次載入並向量化計算，'row' 逐列呼叫 generate_features
+    'training_dataset_mode': 'panel',
 }
 
 # 模型配置
@@ -100,7 +126,17 @@ MODEL_CONFIG = {
         'enable_quantile_regression': True,
         'quantiles': [0.1, 0.25, 0.5, 0.75, 0.9],
         'ensemble_size': 5,
-    }
+    },
+
+    # 超參數調優
+    'tuning': {
+        'n_jobs': 1,                   # 平行評估參數組合的行程數（-1 使用全部CPU）
+        'successive_halving': {
+            'enabled': False,          # 逐輪淘汰：先以較少樹數量評估，只保留前 1/eta 進入下一輪
+            'eta': 3,
+            'min_fraction': 0.3,       # 第一輪最少使用的樹數量比例
+        },
+    },
 }
 
 # 選股配置
@@ -140,6 +176,7 @@ TRADING_CONFIG = {
         'max_holding_period': 90,      # 最大持有期90天
         'enable_atr_stops': False,     # 是否啟用ATR動態停損
         'atr_multiplier': 2.0,         # ATR倍數
+        'stop_price_basis': 'close',   # 停損停利觸價判斷：'close' 逐日收盤價；'high_low' 盤中最高/最低價
     },
     
     # 交易成本
@@ -155,6 +192,14 @@ BACKTEST_CONFIG = {
     # 初始資金
     'initial_capital': 1000000,        # 初始資金100萬
 
+    # 外層回測每月訓練：保留先前月份的特徵列，只生成新月份（擴張視窗增量訓練）
+    'incremental_training': {
+        'enabled': True,
+        'train_start': '2015-01-01',   # 擴張視窗起點
+        'warm_start': False,           # XGBoost/LightGBM 接續既有樹訓練（關閉時結果與完整重新訓練相同）
+        'warm_start_rounds': 20,       # 每月接續訓練新增的樹數量
+    },
+
     # 報告設定
     'reporting': {
         'enable_html_reports': True,
@@ -7,9 +7,11 @@ Stock Price Investment System - Data Module
 from .data_manager import DataManager
 from .price_data import PriceDataManager
 from .revenue_integration import RevenueIntegration
+from .price_cache import PricePanelCache
 
 __all__ = [
     'DataManager',
     'PriceDataManager', 
-    'RevenueIntegration'
+    'RevenueIntegration',
+    'PricePanelCache'
 ]
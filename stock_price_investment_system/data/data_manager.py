@@ -11,35 +11,154 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime, timedelta
 import logging
+from contextlib import contextmanager
 
 from ..config.settings import get_config
+from .price_cache import PricePanelCache, get_shared_price_cache
+
+try:
+    from app.utils.sqlite_pool import get_sqlite_pool
+except ImportError:  # 未從專案根目錄執行時退回一般連線
+    get_sqlite_pool = None
+
+try:
+    from app.utils.parquet_snapshot import SnapshotReader
+except ImportError:
+    SnapshotReader = None
+
+try:
+    from app.utils.price_matrix import open_price_matrix
+except ImportError:
+    open_price_matrix = None
 
 logger = logging.getLogger(__name__)
 
 class DataManager:
     """資料管理器 - 統一管理所有資料存取"""
     
-    def __init__(self, db_path: Optional[Path] = None):
-        """初始化資料管理器"""
+    def __init__(self, db_path: Optional[Path] = None, use_price_cache: Optional[bool] = None,
+                 use_snapshot: Optional[bool] = None, use_price_matrix: Optional[bool] = None):
+        """
+        初始化資料管理器
+
+        Args:
+            db_path: 資料庫路徑
+            use_price_cache: 是否啟用股價面板快取（None 時依設定檔 database.price_cache.enabled）
+            use_snapshot: 是否改由 Parquet 快照讀取（None 時依設定檔 database.snapshot.enabled）
+            use_price_matrix: 是否改由記憶體映射股價矩陣讀取（None 時依設定檔 database.price_matrix.enabled）
+        """
         self.config = get_config()
         self.db_path = db_path or self.config['database']['path']
         self.timeout = self.config['database']['timeout']
+        self._table_columns: Dict[str, set] = {}
+        self.price_cache: Optional[PricePanelCache] = None
+        self.snapshot = None
+        self.price_matrix = None
         
         # 檢查資料庫是否存在
         if not self.db_path.exists():
             raise FileNotFoundError(f"資料庫檔案不存在: {self.db_path}")
+
+        cache_cfg = self.config['database'].get('price_cache', {})
+        if use_price_cache if use_price_cache is not None else cache_cfg.get('enabled', False):
+            self.enable_price_cache(cache_cfg.get('max_memory_mb', 256))
+
+        snapshot_cfg = self.config['database'].get('snapshot', {})
+        if use_snapshot if use_snapshot is not None else snapshot_cfg.get('enabled', False):
+            self.enable_snapshot(snapshot_cfg.get('path'))
+
+        matrix_cfg = self.config['database'].get('price_matrix', {})
+        if use_price_matrix if use_price_matrix is not None else matrix_cfg.get('enabled', False):
+            self.enable_price_matrix(matrix_cfg.get('path'))
         
         logger.info(f"DataManager initialized with database: {self.db_path}")
-    
-    def get_connection(self) -> sqlite3.Connection:
-        """獲取資料庫連接"""
+
+    def enable_price_cache(self, max_memory_mb: float = None) -> PricePanelCache:
+        """啟用股價面板快取（同一資料庫的 DataManager 共用同一份快取）"""
+        if self.price_cache is None:
+            if max_memory_mb is None:
+                max_memory_mb = self.config['database'].get('price_cache', {}).get('max_memory_mb', 256)
+            self.price_cache = get_shared_price_cache(
+                self.db_path, self._load_full_price_history, max_memory_mb=max_memory_mb)
+            logger.info(f"股價面板快取已啟用（上限 {max_memory_mb} MB）")
+        return self.price_cache
+
+    def disable_price_cache(self):
+        """停用股價面板快取（不清除共用快取內容）"""
+        self.price_cache = None
+
+    def enable_snapshot(self, snapshot_dir: Optional[Path] = None):
+        """改由 Parquet 快照讀取（pyarrow 未安裝時維持 SQLite 查詢）"""
+        if SnapshotReader is None:
+            logger.warning("無法載入 Parquet 快照模組，維持 SQLite 查詢")
+            return None
+        snapshot_dir = Path(snapshot_dir or Path(self.db_path).parent / 'snapshots')
+        self.snapshot = SnapshotReader(snapshot_dir)
+        logger.info(f"Parquet 快照已啟用: {snapshot_dir}")
+        return self.snapshot
+
+    def enable_price_matrix(self, matrix_dir: Optional[Path] = None):
+        """改由記憶體映射股價矩陣讀取（矩陣不存在時維持原查詢方式）"""
+        if open_price_matrix is None:
+            logger.warning("無法載入股價矩陣模組，維持原查詢方式")
+            return None
+        matrix_dir = Path(matrix_dir or Path(self.db_path).parent / 'price_matrix')
+        self.price_matrix = open_price_matrix(matrix_dir)
+        if self.price_matrix is None:
+            logger.warning(f"股價矩陣不存在，維持原查詢方式: {matrix_dir}")
+        else:
+            logger.info(f"股價矩陣已啟用: {matrix_dir}（{len(self.price_matrix.dates)} 個交易日 x "
+                        f"{len(self.price_matrix.stocks)} 檔股票）")
+        return self.price_matrix
+
+    def _read_snapshot(self, table_name: str, **kwargs) -> Optional[pd.DataFrame]:
+        """由快照讀取；未啟用、快照不存在或讀取失敗時回傳 None（呼叫端改查 SQLite）"""
+        if self.snapshot is None or not self.snapshot.available(table_name):
+            return None
+        try:
+            return self.snapshot.read_table(table_name, **kwargs)
+        except Exception as e:
+            logger.warning(f"Parquet 快照讀取失敗，改用資料庫查詢 ({table_name}): {e}")
+            return None
+
+    def __getstate__(self):
+        """序列化到子行程時不攜帶快取（含鎖），子行程自行重建並開啟自己的連線"""
+        state = self.__dict__.copy()
+        cache = state.pop('price_cache', None)
+        state['_price_cache_mb'] = cache.max_memory_bytes / (1024 * 1024) if cache is not None else None
+        return state
+
+    def __setstate__(self, state):
+        cache_mb = state.pop('_price_cache_mb', None)
+        self.__dict__.update(state)
+        self.price_cache = None
+        if cache_mb is not None:
+            self.enable_price_cache(cache_mb)
+
+    @contextmanager
+    def get_connection(self):
+        """
+        獲取資料庫連接（上下文管理器）
+
+        分析程式只讀取資料，使用共用連線池的唯讀連線（WAL 模式下不會被收集程式的寫入阻擋），
+        離開 with 區塊時歸還連線池
+        """
+        if get_sqlite_pool is not None:
+            pool = get_sqlite_pool(self.db_path, timeout=self.timeout)
+            with pool.connection(read_only=True, row_factory=sqlite3.Row) as conn:
+                yield conn
+            return
+
         conn = sqlite3.connect(
             self.db_path,
             timeout=self.timeout,
             check_same_thread=self.config['database']['check_same_thread']
         )
         conn.row_factory = sqlite3.Row
-        return conn
+        try:
+            yield conn
+        finally:
+            conn.close()
     
     def get_available_stocks(self, 
                            start_date: str = None, 
@@ -180,8 +299,14 @@ class DataManager:
         
         query += " ORDER BY revenue_year, revenue_month"
         
-        with self.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=params)
+        df = self._read_snapshot('monthly_revenues', columns=['revenue_year', 'revenue_month', 'revenue'],
+                                 stock_ids=[stock_id], start_date=start_date, end_date=end_date)
+        if df is not None:
+            df['year_month'] = (df['revenue_year'].astype(int).astype(str) + '-'
+                                + df['revenue_month'].astype(int).map('{:02d}'.format))
+        else:
+            with self.get_connection() as conn:
+                df = pd.read_sql_query(query, conn, params=params)
         
         if not df.empty:
             # 建立日期欄位
@@ -199,12 +324,16 @@ class DataManager:
         return df
     
     def _get_table_columns(self, table_name: str) -> set:
-        """查詢資料表欄位名稱集合"""
+        """查詢資料表欄位名稱集合（同一實例只查詢一次）"""
+        if table_name in self._table_columns:
+            return self._table_columns[table_name]
         try:
             with self.get_connection() as conn:
                 cur = conn.execute(f"PRAGMA table_info({table_name})")
                 cols = {row[1] for row in cur.fetchall()}
                 logger.debug(f"資料表 {table_name} 欄位偵測: {sorted(list(cols))}")
+                if cols:
+                    self._table_columns[table_name] = cols
                 return cols
         except Exception as e:
             logger.warning(f"無法讀取資料表結構 {table_name}: {e}")
@@ -227,6 +356,56 @@ class DataManager:
         Returns:
             股價DataFrame（欄位統一為: date, open, high, low, close, volume）
         """
+        if days:
+            # 計算開始日期
+            end_dt = datetime.now()
+            start_dt = end_dt - timedelta(days=days)
+            start_date = start_dt.strftime('%Y-%m-%d')
+
+        matrix = self.price_matrix
+        if matrix is not None and matrix.has_stock(stock_id) and matrix.covers(start_date, end_date):
+            df = matrix.frame(stock_id, start_date, end_date)
+            logger.debug(f"股價矩陣取得 {len(df)} 筆 {stock_id} 價格資料（期間: {start_date or '-'} ~ {end_date or '-'}）")
+            return df
+
+        if self.price_cache is not None:
+            try:
+                df = self.price_cache.get_prices(stock_id, start_date, end_date)
+                logger.debug(f"快取取得 {len(df)} 筆 {stock_id} 價格資料（期間: {start_date or '-'} ~ {end_date or '-'}）")
+                return df
+            except Exception as e:
+                logger.warning(f"股價快取查詢失敗，改用資料庫查詢: {e}")
+
+        return self._query_stock_prices(stock_id, start_date, end_date)
+
+    def get_close_price(self, stock_id: str, date: str) -> Optional[float]:
+        """
+        獲取指定交易日收盤價（啟用快取或股價矩陣時為 O(log n) 單點查詢）
+
+        Returns:
+            收盤價，該日無交易資料時回傳 None
+        """
+        matrix = self.price_matrix
+        if matrix is not None and matrix.has_stock(stock_id) and matrix.covers(date, date):
+            return matrix.value_at(stock_id, date, 'close')
+
+        if self.price_cache is not None:
+            return self.price_cache.get_price(stock_id, date, 'close')
+
+        df = self.get_stock_prices(stock_id, date, date)
+        if df.empty:
+            return None
+        return float(df.iloc[0]['close'])
+
+    def _load_full_price_history(self, stock_id: str) -> pd.DataFrame:
+        """讀取股票完整日線（供股價面板快取載入）"""
+        return self._query_stock_prices(stock_id, None, None)
+
+    def _query_stock_prices(self,
+                            stock_id: str,
+                            start_date: str = None,
+                            end_date: str = None) -> pd.DataFrame:
+        """從資料庫查詢股價資料"""
         # 偵測欄位
         cols = self._get_table_columns('stock_prices')
         if not cols:
@@ -238,6 +417,7 @@ class DataManager:
         sel_low  = 'low'  if 'low'  in cols else ('low_price'  if 'low_price'  in cols else 'NULL')
         sel_close= 'close'if 'close'in cols else ('close_price' if 'close_price' in cols else 'NULL')
         sel_vol  = 'volume' if 'volume' in cols else ('turnover' if 'turnover' in cols else 'NULL')
+        selected = {'open': sel_open, 'high': sel_high, 'low': sel_low, 'close': sel_close, 'volume': sel_vol}
 
         query = f"""
         SELECT date,
@@ -252,12 +432,6 @@ class DataManager:
 
         params = [stock_id]
 
-        if days:
-            # 計算開始日期
-            end_dt = datetime.now()
-            start_dt = end_dt - timedelta(days=days)
-            start_date = start_dt.strftime('%Y-%m-%d')
-
         if start_date:
             query += " AND date >= ?"
             params.append(start_date)
@@ -275,12 +449,19 @@ class DataManager:
             f"欄位映射: open->{sel_open}, high->{sel_high}, low->{sel_low}, close->{sel_close}, volume->{sel_vol}")
         logger.debug(f"SQL: {query.strip()} | 參數: {params}")
 
-        try:
-            with self.get_connection() as conn:
-                df = pd.read_sql_query(query, conn, params=params)
-        except Exception as e:
-            logger.error(f"讀取股價資料失敗: {e}")
-            return pd.DataFrame()
+        df = self._read_snapshot('stock_prices', columns=['date'] + [c for c in selected.values() if c != 'NULL'],
+                                 stock_ids=[stock_id], start_date=start_date, end_date=end_date)
+        if df is not None:
+            df = pd.DataFrame({'date': df['date'],
+                               **{alias: df[column] if column != 'NULL' else None
+                                  for alias, column in selected.items()}})
+        else:
+            try:
+                with self.get_connection() as conn:
+                    df = pd.read_sql_query(query, conn, params=params)
+            except Exception as e:
+                logger.error(f"讀取股價資料失敗: {e}")
+                return pd.DataFrame()
 
         if not df.empty:
             # 正規化欄位型別
@@ -344,8 +525,15 @@ class DataManager:
         
         query += " ORDER BY date, type"
         
-        with self.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=params)
+        df = self._read_snapshot('financial_statements', columns=['date', 'type', 'value'],
+                                 stock_ids=[stock_id], start_date=start_date, end_date=end_date)
+        if df is not None:
+            if statement_type:
+                df = df[df['type'] == statement_type]
+            df = df[['date', 'type', 'value']]
+        else:
+            with self.get_connection() as conn:
+                df = pd.read_sql_query(query, conn, params=params)
         
         if not df.empty:
             df['date'] = pd.to_datetime(df['date'])
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+股價預測與投資建議系統 - 股價面板快取
+Stock Price Investment System - Price Panel Cache
+
+每檔股票的完整日線只從 SQLite 讀取一次，轉為 NumPy 陣列
+（日期為 int64 奈秒、OHLCV 為 float64），之後的區間與單點查詢
+皆以二分搜尋完成。快取具記憶體上限，超過時以 LRU 淘汰。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, Any
+
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def _to_ns(value) -> int:
+    """將日期字串 / Timestamp 轉為 int64 奈秒"""
+    return int(pd.Timestamp(value).value)
+
+
+class PriceSeries:
+    """單一股票的日線序列（欄位式 NumPy 陣列）"""
+
+    __slots__ = ('stock_id', 'dates', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, stock_id: str, df: pd.DataFrame):
+        self.stock_id = stock_id
+        if df is None or df.empty:
+            self.dates = np.empty(0, dtype=np.int64)
+            for col in PRICE_COLUMNS:
+                setattr(self, col, np.empty(0, dtype=np.float64))
+            return
+
+        df = df.sort_values('date')
+        self.dates = pd.to_datetime(df['date']).values.astype('datetime64[ns]').view(np.int64)
+        for col in PRICE_COLUMNS:
+            values = pd.to_numeric(df[col], errors='coerce') if col in df.columns else np.nan
+            setattr(self, col, np.ascontiguousarray(np.asarray(values, dtype=np.float64)))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def nbytes(self) -> int:
+        """序列佔用的記憶體位元組數"""
+        return int(self.dates.nbytes + sum(getattr(self, c).nbytes for c in PRICE_COLUMNS))
+
+    def slice_bounds(self, start_date=None, end_date=None) -> Tuple[int, int]:
+        """回傳 [start_date, end_date] 在陣列中的索引範圍 (lo, hi)"""
+        lo = 0 if start_date is None else int(np.searchsorted(self.dates, _to_ns(start_date), side='left'))
+        hi = len(self.dates) if end_date is None else int(np.searchsorted(self.dates, _to_ns(end_date), side='right'))
+        return lo, max(lo, hi)
+
+    def to_frame(self, start_date=None, end_date=None) -> pd.DataFrame:
+        """取出區間資料，欄位與 DataManager.get_stock_prices 相同"""
+        lo, hi = self.slice_bounds(start_date, end_date)
+        data = {'date': pd.to_datetime(self.dates[lo:hi].view('datetime64[ns]'))}
+        for col in PRICE_COLUMNS:
+            data[col] = getattr(self, col)[lo:hi].copy()
+        return pd.DataFrame(data)
+
+    def value_at(self, date, column: str = 'close') -> Optional[float]:
+        """單點查詢：回傳指定日期的欄位值，無該交易日時回傳 None"""
+        target = _to_ns(date)
+        idx = int(np.searchsorted(self.dates, target, side='left'))
+        if idx < len(self.dates) and self.dates[idx] == target:
+            return float(getattr(self, column)[idx])
+        return None
+
+
+class PricePanelCache:
+    """
+    股價面板快取（執行緒安全、LRU 淘汰）
+
+    loader 為 `stock_id -> DataFrame(date, open, high, low, close, volume)`
+    的完整日線讀取函式，只在快取未命中時呼叫。
+    """
+
+    def __init__(self, loader: Callable[[str], pd.DataFrame], max_memory_mb: float = 256):
+        self.loader = loader
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self._series: "OrderedDict[str, PriceSeries]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_series(self, stock_id: str) -> PriceSeries:
+        """取得股票完整日線（未命中時從資料庫載入）"""
+        with self._lock:
+            series = self._series.get(stock_id)
+            if series is not None:
+                self._series.move_to_end(stock_id)
+                self.hits += 1
+                return series
+            self.misses += 1
+
+        series = PriceSeries(stock_id, self.loader(stock_id))
+
+        with self._lock:
+            existing = self._series.get(stock_id)
+            if existing is not None:
+                # 其他執行緒已先載入
+                self._series.move_to_end(stock_id)
+                return existing
+            self._series[stock_id] = series
+            self._memory_bytes += series.nbytes
+            self._evict_if_needed()
+        logger.debug(f"價格快取載入 {stock_id}: {len(series)} 筆, {series.nbytes / 1024:.1f} KB")
+        return series
+
+    def _evict_if_needed(self):
+        """超過記憶體上限時淘汰最久未使用的股票（至少保留最新一檔）"""
+        while self._memory_bytes > self.max_memory_bytes and len(self._series) > 1:
+            stock_id, series = self._series.popitem(last=False)
+            self._memory_bytes -= series.nbytes
+            self.evictions += 1
+            logger.debug(f"價格快取淘汰 {stock_id}")
+
+    def get_prices(self, stock_id: str, start_date=None, end_date=None) -> pd.DataFrame:
+        """區間查詢"""
+        return self.get_series(stock_id).to_frame(start_date, end_date)
+
+    def get_price(self, stock_id: str, date, column: str = 'close') -> Optional[float]:
+        """單點查詢"""
+        return self.get_series(stock_id).value_at(date, column)
+
+    def invalidate(self, stock_id: str = None):
+        """移除指定股票（或全部）的快取"""
+        with self._lock:
+            if stock_id is None:
+                self._series.clear()
+                self._memory_bytes = 0
+                return
+            series = self._series.pop(stock_id, None)
+            if series is not None:
+                self._memory_bytes -= series.nbytes
+
+    def clear(self):
+        """清空快取與統計"""
+        with self._lock:
+            self.invalidate()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """快取統計（命中率、記憶體用量）"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'stocks': len(self._series),
+                'memory_mb': self._memory_bytes / (1024 * 1024),
+                'max_memory_mb': self.max_memory_bytes / (1024 * 1024),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total > 0 else 0.0,
+            }
+
+
+# 同一資料庫的所有 DataManager 共用一份快取
+_shared_caches: Dict[str, PricePanelCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_price_cache(db_path, loader: Callable[[str], pd.DataFrame],
+                           max_memory_mb: float = 256) -> PricePanelCache:
+    """取得（或建立）指定資料庫的共用價格快取"""
+    key = str(db_path)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = PricePanelCache(loader, max_memory_mb=max_memory_mb)
+            _shared_caches[key] = cache
+        return cache
+
+
+def clear_shared_price_caches():
+    """清空所有共用價格快取（資料更新後呼叫）"""
+    with _shared_lock:
+        for cache in _shared_caches.values():
+            cache.clear()
+        _shared_caches.clear()
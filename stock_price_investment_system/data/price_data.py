@@ -15,6 +15,31 @@ from ..config.settings import get_config
 
 logger = logging.getLogger(__name__)
 
+# 預測特徵：價格變化期間（交易日）
+PRICE_CHANGE_PERIODS = [1, 5, 20]
+
+# 預測特徵：取自技術指標欄位的特徵與缺值預設
+INDICATOR_FEATURE_DEFAULTS = [
+    # 移動平均相關
+    ('price_to_ma_5', 0),
+    ('price_to_ma_20', 0),
+    ('price_to_ma_60', 0),
+
+    # 技術指標
+    ('rsi', 50),
+    ('macd', 0),
+    ('macd_signal', 0),
+    ('macd_histogram', 0),
+
+    # 成交量相關
+    ('volume_ratio', 1),
+    ('price_volume_trend', 0),
+
+    # 波動性
+    ('price_volatility', 0),
+    ('high_low_ratio', 0),
+]
+
 class PriceDataManager:
     """價格資料管理器 - 專門處理股價相關資料"""
     
@@ -181,6 +206,21 @@ class PriceDataManager:
             logger.warning(f"No price data available for {stock_id} up to {as_of_date}")
             return {}
         
+        features = self.extract_prediction_features(price_df)
+        if features:
+            logger.info(f"Generated {len(features)} price features for {stock_id} as of {as_of_date}")
+        return features
+
+    def extract_prediction_features(self, price_df: pd.DataFrame) -> Dict:
+        """
+        由回看視窗內的日線計算預測特徵（取視窗最後一個交易日）
+
+        Args:
+            price_df: 視窗內股價DataFrame（已依日期排序）
+
+        Returns:
+            價格特徵字典
+        """
         # 計算技術指標
         try:
             price_df = self.calculate_technical_indicators(price_df)
@@ -198,34 +238,20 @@ class PriceDataManager:
         features = {
             # 價格相關
             'current_price': latest_data['close'],
-            'price_change_1d': (latest_data['close'] - price_df.iloc[-2]['close']) / price_df.iloc[-2]['close'] if len(price_df) > 1 else 0,
-            'price_change_5d': (latest_data['close'] - price_df.iloc[-6]['close']) / price_df.iloc[-6]['close'] if len(price_df) > 5 else 0,
-            'price_change_20d': (latest_data['close'] - price_df.iloc[-21]['close']) / price_df.iloc[-21]['close'] if len(price_df) > 20 else 0,
-            
-            # 移動平均相關
-            'price_to_ma_5': latest_data.get('price_to_ma_5', 0),
-            'price_to_ma_20': latest_data.get('price_to_ma_20', 0),
-            'price_to_ma_60': latest_data.get('price_to_ma_60', 0),
-            
-            # 技術指標
-            'rsi': latest_data.get('rsi', 50),
-            'macd': latest_data.get('macd', 0),
-            'macd_signal': latest_data.get('macd_signal', 0),
-            'macd_histogram': latest_data.get('macd_histogram', 0),
-            
-            # 成交量相關
-            'volume_ratio': latest_data.get('volume_ratio', 1),
-            'price_volume_trend': latest_data.get('price_volume_trend', 0),
-            
-            # 波動性
-            'price_volatility': latest_data.get('price_volatility', 0),
-            'high_low_ratio': latest_data.get('high_low_ratio', 0),
         }
+        for period in PRICE_CHANGE_PERIODS:
+            features[f'price_change_{period}d'] = (
+                (latest_data['close'] - price_df.iloc[-(period + 1)]['close']) / price_df.iloc[-(period + 1)]['close']
+                if len(price_df) > period else 0
+            )
+
+        # 移動平均、技術指標、成交量、波動性
+        for name, default in INDICATOR_FEATURE_DEFAULTS:
+            features[name] = latest_data.get(name, default)
         
         # 移除NaN值
         features = {k: v if not pd.isna(v) else 0 for k, v in features.items()}
         
-        logger.info(f"Generated {len(features)} price features for {stock_id} as of {as_of_date}")
         return features
     
     def calculate_future_returns(self, 
@@ -75,6 +75,22 @@ class RevenueIntegration:
             logger.warning(f"No revenue data available for {stock_id} up to {as_of_date}")
             return self._get_default_revenue_features()
         
+        features = self.compute_revenue_features(revenue_df, as_of_dt)
+        
+        logger.info(f"Generated {len(features)} revenue features for {stock_id} as of {as_of_date}")
+        return features
+
+    def compute_revenue_features(self, revenue_df: pd.DataFrame, as_of_dt: datetime) -> Dict[str, float]:
+        """
+        由回看視窗內的月營收計算營收特徵
+
+        Args:
+            revenue_df: 視窗內月營收DataFrame（需含 revenue, date，已依日期排序）
+            as_of_dt: 預測時點
+
+        Returns:
+            營收特徵字典
+        """
         # 計算營收特徵
         features = {}
         
@@ -150,7 +166,6 @@ class RevenueIntegration:
         # 移除NaN值
         features = {k: v if not pd.isna(v) else 0 for k, v in features.items()}
         
-        logger.info(f"Generated {len(features)} revenue features for {stock_id} as of {as_of_date}")
         return features
     
     def get_revenue_prediction(self, 
@@ -256,6 +271,24 @@ class RevenueIntegration:
         revenue_features = self.get_revenue_features(stock_id, as_of_date)
         features.update(revenue_features)
         
+        # 獲取營收 / EPS 預測
+        features.update(self.get_prediction_features(stock_id))
+        
+        logger.info(f"Generated {len(features)} combined fundamental features for {stock_id}")
+        return features
+
+    def get_prediction_features(self, stock_id: str) -> Dict[str, float]:
+        """
+        獲取營收與EPS預測特徵（與預測時點無關，同一股票可重複使用）
+
+        Args:
+            stock_id: 股票代碼
+
+        Returns:
+            預測特徵字典
+        """
+        features = {}
+
         # 獲取營收預測
         revenue_prediction = self.get_revenue_prediction(stock_id)
         if revenue_prediction['success']:
@@ -278,7 +311,6 @@ class RevenueIntegration:
             features['eps_prediction_confidence'] = 0.5
             features['eps_prediction_range'] = 0
         
-        logger.info(f"Generated {len(features)} combined fundamental features for {stock_id}")
         return features
     
     def _get_default_revenue_features(self) -> Dict[str, float]:
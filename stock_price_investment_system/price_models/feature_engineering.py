@@ -14,6 +14,7 @@ from ..data.data_manager import DataManager
 from ..data.price_data import PriceDataManager
 from ..data.revenue_integration import RevenueIntegration
 from ..config.settings import get_config
+from .panel_features import PanelFeatureBuilder
 
 logger = logging.getLogger(__name__)
 
@@ -145,7 +146,8 @@ class FeatureEngineer:
                                 start_date: str,
                                 end_date: str,
                                 target_periods: List[int] = [20],
-                                frequency: str = 'monthly') -> Tuple[pd.DataFrame, pd.DataFrame]:
+                                frequency: str = 'monthly',
+                                mode: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         生成訓練資料集
         
@@ -155,20 +157,35 @@ class FeatureEngineer:
             end_date: 結束日期
             target_periods: 目標期間（天數）
             frequency: 頻率 ('monthly' 或 'daily')
+            mode: 'panel'（每檔一次載入、向量化計算）或 'row'（逐列呼叫 generate_features），
+                  None 時依設定檔 feature.training_dataset_mode
             
         Returns:
             (特徵DataFrame, 標籤DataFrame)
         """
         logger.info(f"Generating training dataset for {len(stock_ids)} stocks from {start_date} to {end_date}")
         
-        feature_list = []
-        target_list = []
-        
         # 生成時間序列
         if frequency == 'monthly':
             dates = pd.date_range(start=start_date, end=end_date, freq='M')
         else:
             dates = pd.date_range(start=start_date, end=end_date, freq='D')
+
+        mode = mode or self.feature_config.get('training_dataset_mode', 'row')
+        if mode == 'panel':
+            feature_list, target_list = PanelFeatureBuilder(self).build_rows(stock_ids, dates, target_periods)
+        else:
+            feature_list, target_list = self._build_rows_per_date(stock_ids, dates, target_periods)
+
+        return self._assemble_training_dataset(feature_list, target_list)
+
+    def _build_rows_per_date(self,
+                             stock_ids: List[str],
+                             dates: pd.DatetimeIndex,
+                             target_periods: List[int]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """逐列模式：對每個 (股票, 日期) 呼叫 generate_features 與 _generate_targets"""
+        feature_list = []
+        target_list = []
         
         for stock_id in stock_ids:
             logger.debug(f"Processing {stock_id}")
@@ -199,7 +216,13 @@ class FeatureEngineer:
                 except Exception as e:
                     logger.debug(f"Failed to process {stock_id} on {as_of_date}: {e}")
                     continue
-        
+
+        return feature_list, target_list
+
+    def _assemble_training_dataset(self,
+                                   feature_list: List[Dict[str, Any]],
+                                   target_list: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """將特徵 / 標籤字典清單組成 DataFrame 並清理 NaN 與無限值"""
         if feature_list and target_list:
             feature_df = pd.DataFrame(feature_list)
             target_df = pd.DataFrame(target_list)
@@ -249,8 +272,9 @@ class FeatureEngineer:
             logger.warning("No training data generated")
             return pd.DataFrame(), pd.DataFrame()
     
-    def _generate_industry_features(self, stock_id: str, as_of_date: str) -> Dict[str, float]:
-        """生成產業特徵"""
+    def _generate_industry_features(self, stock_id: str, as_of_date: str,
+                                    basic_info: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+        """生成產業特徵（basic_info 可由呼叫端預先載入以避免重複查詢）"""
         features = {}
         
         if not self.feature_config['industry_features']['enable_industry_encoding']:
@@ -258,7 +282,8 @@ class FeatureEngineer:
         
         try:
             # 獲取股票基本資訊
-            basic_info = self.data_manager.get_stock_basic_info(stock_id)
+            if basic_info is None:
+                basic_info = self.data_manager.get_stock_basic_info(stock_id)
             
             # 產業編碼（這裡需要根據實際資料庫結構調整）
             # 暫時使用股票代碼的前兩位作為產業代碼
@@ -15,23 +15,67 @@ import pandas as pd
 from ..config.settings import get_config
 from ..data.data_manager import DataManager
 from .feature_engineering import FeatureEngineer
+from .incremental_training import IncrementalTrainingCache
+from .stop_level_grid import StopLevelGrid
+from .stop_loss_simulator import StopLossTradeSimulator
 from .stock_price_predictor import StockPricePredictor
 from ..visualization.backtest_charts import BacktestCharts
 
 logger = logging.getLogger(__name__)
 
 class HoldoutBacktester:
-    def __init__(self, feature_engineer: Optional[FeatureEngineer] = None, verbose_logging: bool = False, cli_only_logging: bool = False):
+    def __init__(self, feature_engineer: Optional[FeatureEngineer] = None, verbose_logging: bool = False, cli_only_logging: bool = False,
+                 use_price_cache: Optional[bool] = None, use_price_matrix: Optional[bool] = None):
         self.cfg = get_config()
         self.paths = self.cfg['output']['paths']
         self.wf = self.cfg['walkforward']
         self.trading_cfg = self.cfg['trading']
         self.backtest_cfg = self.cfg['backtest']
         self.fe = feature_engineer or FeatureEngineer()
-        self.dm = DataManager()
+        self.dm = DataManager(use_price_cache=use_price_cache, use_price_matrix=use_price_matrix)
+        if self.dm.price_cache is not None:
+            # 特徵工程（PriceDataManager）也共用同一份股價快取
+            self.fe.data_manager.enable_price_cache()
+        if self.dm.price_matrix is not None and self.fe.data_manager.price_matrix is None:
+            # 特徵工程也映射同一份股價矩陣（同一行程內共用）
+            self.fe.data_manager.enable_price_matrix(self.dm.price_matrix.matrix_dir)
         self.verbose_logging = verbose_logging
         self.cli_only_logging = cli_only_logging
 
+        # 停損停利出場模擬（整批交易共用同一次價格讀取）
+        self.stop_loss_simulator = StopLossTradeSimulator(self.dm)
+
+        # 擴張視窗增量訓練
+        self.incremental_cfg = self.backtest_cfg.get('incremental_training', {})
+        self.training_cache = IncrementalTrainingCache(self.fe) if self.incremental_cfg.get('enabled', False) else None
+
+    def _train_predictor_as_of(self, predictor: StockPricePredictor, stock_id: str, as_of: str) -> Optional[Dict[str, Any]]:
+        """
+        以截至 as_of 的擴張視窗資料訓練個股模型
+
+        Returns:
+            train() 的結果字典；沒有訓練資料時回傳 None
+        """
+        train_start = self.incremental_cfg.get('train_start', '2015-01-01')
+        if self.training_cache is not None:
+            features_df, targets_df = self.training_cache.get_training_dataset(stock_id, train_start, as_of)
+        else:
+            features_df, targets_df = self.fe.generate_training_dataset(
+                stock_ids=[stock_id],
+                start_date=train_start,
+                end_date=as_of
+            )
+
+        if features_df.empty:
+            return None
+
+        return predictor.train(
+            feature_df=features_df,
+            target_df=targets_df,
+            warm_start=self.training_cache is not None and self.incremental_cfg.get('warm_start', False),
+            warm_start_rounds=self.incremental_cfg.get('warm_start_rounds')
+        )
+
     def _log(self, message: str, level: str = "info", force_print: bool = False):
         """
         統一的日誌輸出方法
@@ -371,22 +415,12 @@ class HoldoutBacktester:
                     try:
                         # 生成訓練資料，使用截至預測日期之前的資料
                         # 使用2015年作為訓練開始日期（與內層回測一致）
-                        features_df, targets_df = self.fe.generate_training_dataset(
-                            stock_ids=[stock_id],
-                            start_date='2015-01-01',
-                            end_date=as_of
-                        )
+                        train_result = self._train_predictor_as_of(stock_predictors[stock_id], stock_id, as_of)
 
-                        if features_df.empty:
+                        if train_result is None:
                             logger.warning(f"股票 {stock_id} 在 {as_of} 沒有訓練資料")
                             continue
 
-                        # 訓練模型
-                        train_result = stock_predictors[stock_id].train(
-                            feature_df=features_df,
-                            target_df=targets_df
-                        )
-
                         if not train_result['success']:
                             logger.warning(f"模型訓練失敗 {stock_id} {as_of}: {train_result.get('error', '未知錯誤')}")
                         else:
@@ -737,42 +771,24 @@ class HoldoutBacktester:
 
         stock_predictors = {}
 
-        # 獲取已調優股票資訊
-        tuned_df = HyperparameterTuner.get_tuned_stocks_info()
-
         for stock_id in stocks:
-            # 檢查該股票是否有調優記錄
-            if not tuned_df.empty:
-                try:
-                    stock_id_int = int(stock_id)
-                    stock_tuned = tuned_df[
-                        (tuned_df['股票代碼'] == stock_id_int) &
-                        (tuned_df['是否成功'] == '成功')
-                    ]
-                except ValueError:
-                    stock_tuned = tuned_df[
-                        (tuned_df['股票代碼'].astype(str) == stock_id) &
-                        (tuned_df['是否成功'] == '成功')
-                    ]
-
-                if not stock_tuned.empty:
-                    # 選擇分數最高的模型
-                    best_record = stock_tuned.loc[stock_tuned['最佳分數'].idxmax()]
-                    model_type = best_record['模型類型']
-
-                    # 獲取最佳參數
-                    best_params = HyperparameterTuner.get_stock_best_params(stock_id, model_type)
-
-                    if best_params:
-                        predictor = StockPricePredictor(
-                            self.fe,
-                            model_type=model_type,
-                            override_params=best_params
-)
-                        stock_predictors[stock_id] = predictor
-                        # 僅在詳細模式下輸出
-                        self._log(f"股票 {stock_id} 使用 {model_type} 最佳參數: {best_params}", "info")
-                        continue
+            # 檢查該股票是否有調優記錄（選擇分數最高的模型及其最佳參數）
+            best_model_info = HyperparameterTuner.get_stock_best_model_and_params(stock_id)
+
+            if best_model_info:
+                model_type = best_model_info['model_type']
+                best_params = best_model_info['params']
+
+                if best_params:
+                    predictor = StockPricePredictor(
+                        self.fe,
+                        model_type=model_type,
+                        override_params=best_params
+                    )
+                    stock_predictors[stock_id] = predictor
+                    # 僅在詳細模式下輸出
+                    self._log(f"股票 {stock_id} 使用 {model_type} 最佳參數: {best_params}", "info")
+                    continue
 
             # 沒有調優記錄，使用預設預測器
             predictor = StockPricePredictor(self.fe)
@@ -785,10 +801,7 @@ class HoldoutBacktester:
         """獲取指定日期的股價"""
         try:
             # 獲取該日期的股價資料
-            price_df = self.dm.get_stock_prices(stock_id, date, date)
-            if not price_df.empty:
-                return float(price_df.iloc[0]['close'])
-            return None
+            return self.dm.get_close_price(stock_id, date)
         except Exception as e:
             self._log(f"獲取股價失敗 {stock_id} {date}: {e}", "warning")
             return None
@@ -1343,22 +1356,9 @@ class HoldoutBacktester:
 
                 try:
                     # 訓練模型（使用截至當月的資料）
-                    features_df, targets_df = self.fe.generate_training_dataset(
-                        stock_ids=[stock_id],
-                        start_date='2015-01-01',
-                        end_date=as_of
-                    )
-
-                    if features_df.empty:
-                        continue
-
-                    # 訓練模型
-                    train_result = stock_predictors[stock_id].train(
-                        feature_df=features_df,
-                        target_df=targets_df
-                    )
+                    train_result = self._train_predictor_as_of(stock_predictors[stock_id], stock_id, as_of)
 
-                    if not train_result['success']:
+                    if train_result is None or not train_result['success']:
                         continue
 
                     # 預測
@@ -2005,8 +2005,11 @@ class HoldoutBacktester:
             self._log(f"輸出Excel失敗: {e}", "warning", force_print=True)
 
 
-    def _analyze_optimal_stop_levels(self, trades_df: pd.DataFrame) -> Dict[str, Any]:
-        """分析最佳停損停利點"""
+    def _analyze_optimal_stop_levels(self,
+                                     trades_df: pd.DataFrame,
+                                     stop_loss_candidates: Optional[List[float]] = None,
+                                     take_profit_candidates: Optional[List[float]] = None) -> Dict[str, Any]:
+        """分析最佳停損停利點（整個網格一次向量化計算）"""
         try:
             if trades_df.empty:
                 return {}
@@ -2014,24 +2017,21 @@ class HoldoutBacktester:
             self._log("🎯 開始分析最佳停損停利點...", "info", force_print=True)
 
             # 停損停利候選點（百分比）
-            stop_loss_candidates = [0.02, 0.03, 0.05, 0.08, 0.10, 0.15, 0.20]  # 2%-20%
-            take_profit_candidates = [0.05, 0.08, 0.10, 0.15, 0.20, 0.25, 0.30]  # 5%-30%
+            stop_loss_candidates = stop_loss_candidates or [0.02, 0.03, 0.05, 0.08, 0.10, 0.15, 0.20]  # 2%-20%
+            take_profit_candidates = take_profit_candidates or [0.05, 0.08, 0.10, 0.15, 0.20, 0.25, 0.30]  # 5%-30%
 
             best_combination = None
             best_score = -float('inf')
             analysis_results = []
 
             # 測試所有停損停利組合
-
             total_combinations = len(stop_loss_candidates) * len(take_profit_candidates)
-            current_combination = 0
-
-            for stop_loss in stop_loss_candidates:
-                for take_profit in take_profit_candidates:
-                    current_combination += 1
+            grid_results = StopLevelGrid(trades_df).results(stop_loss_candidates, take_profit_candidates)
 
-                    # 計算該組合的績效
-                    result = self._simulate_stop_levels(trades_df, stop_loss, take_profit)
+            for i, stop_loss in enumerate(stop_loss_candidates):
+                for j, take_profit in enumerate(take_profit_candidates):
+                    # 該組合的績效
+                    result = grid_results[i][j]
                     result['stop_loss'] = stop_loss
                     result['take_profit'] = take_profit
 
@@ -2045,10 +2045,7 @@ class HoldoutBacktester:
                         best_score = score
                         best_combination = result.copy()
 
-                    # 顯示進度
-                    if current_combination % 10 == 0 or current_combination == total_combinations:
-                        progress = (current_combination / total_combinations) * 100
-                        self._log(f"   📊 分析進度: {current_combination}/{total_combinations} ({progress:.1f}%)", "info")
+            self._log(f"   📊 分析進度: {total_combinations}/{total_combinations} (100.0%)", "info")
 
             # 整理分析結果
             analysis_summary = {
@@ -2074,92 +2071,7 @@ class HoldoutBacktester:
     def _simulate_stop_levels(self, trades_df: pd.DataFrame, stop_loss: float, take_profit: float) -> Dict[str, Any]:
         """模擬特定停損停利點的交易結果"""
         try:
-            simulated_trades = []
-
-            for _, trade in trades_df.iterrows():
-                # 嘗試不同的欄位名稱（相容性處理）
-                max_return = trade.get('max_return_20d', trade.get('max_return', 0))
-                min_return = trade.get('min_return_20d', trade.get('min_return', 0))
-                original_return = trade.get('actual_return', 0)
-
-                # 判斷是否觸發停損停利
-                if max_return >= take_profit:
-                    # 觸發停利
-                    simulated_return = take_profit
-                    exit_reason = 'take_profit'
-                elif min_return <= -stop_loss:
-                    # 觸發停損
-                    simulated_return = -stop_loss
-                    exit_reason = 'stop_loss'
-                else:
-                    # 正常到期
-                    simulated_return = original_return
-                    exit_reason = 'normal'
-
-                # 扣除交易成本（處理不同的資料格式）
-                transaction_costs = trade.get('transaction_costs', {})
-                if isinstance(transaction_costs, str):
-                    # 如果是字串，嘗試解析（CSV讀取時可能變成字串）
-                    try:
-                        import ast
-                        transaction_costs = ast.literal_eval(transaction_costs)
-                    except:
-                        transaction_costs = {}
-
-                cost_rate = transaction_costs.get('total_cost_rate', 0.007) if isinstance(transaction_costs, dict) else 0.007
-                net_return = simulated_return - cost_rate
-
-                simulated_trades.append({
-                    'stock_id': trade.get('stock_id', ''),
-                    'entry_date': trade.get('entry_date', ''),
-                    'original_return': original_return,
-                    'simulated_return': net_return,
-                    'exit_reason': exit_reason,
-                    'max_return': max_return,
-                    'min_return': min_return
-                })
-
-            # 計算績效指標
-            simulated_df = pd.DataFrame(simulated_trades)
-
-            if not simulated_df.empty:
-                total_trades = len(simulated_df)
-                winning_trades = len(simulated_df[simulated_df['simulated_return'] > 0])
-                win_rate = winning_trades / total_trades if total_trades > 0 else 0
-
-                avg_return = simulated_df['simulated_return'].mean()
-                total_return = simulated_df['simulated_return'].sum()
-
-                # 計算最大回撤
-                cumulative_returns = (1 + simulated_df['simulated_return']).cumprod()
-                running_max = cumulative_returns.expanding().max()
-                drawdowns = (cumulative_returns - running_max) / running_max
-                max_drawdown = abs(drawdowns.min()) if not drawdowns.empty else 0
-
-                # 統計出場原因
-                exit_reasons = simulated_df['exit_reason'].value_counts()
-
-                return {
-                    'total_trades': total_trades,
-                    'winning_trades': winning_trades,
-                    'win_rate': win_rate,
-                    'avg_return': avg_return,
-                    'total_return': total_return,
-                    'max_drawdown': max_drawdown,
-                    'exit_reasons': exit_reasons.to_dict(),
-                    'simulated_trades': simulated_trades
-                }
-            else:
-                return {
-                    'total_trades': 0,
-                    'winning_trades': 0,
-                    'win_rate': 0,
-                    'avg_return': 0,
-                    'total_return': 0,
-                    'max_drawdown': 0,
-                    'exit_reasons': {},
-                    'simulated_trades': []
-                }
+            return StopLevelGrid(trades_df).results([stop_loss], [take_profit])[0][0]
 
         except Exception as e:
             self._log(f"⚠️  停損停利模擬失敗: {e}", "warning")
@@ -2991,22 +2903,9 @@ class HoldoutBacktester:
                 self._log(f"   進度 [{stock_idx:2d}/{len(stock_list)}] {stock_progress} 訓練 {stock_id}", "info", force_print=True)
                 try:
                     # 訓練模型（使用截至當月的資料）
-                    features_df, targets_df = self.fe.generate_training_dataset(
-                        stock_ids=[stock_id],
-                        start_date='2015-01-01',
-                        end_date=as_of
-                    )
-
-                    if features_df.empty:
-                        continue
-
-                    # 訓練模型
-                    train_result = stock_predictors[stock_id].train(
-                        feature_df=features_df,
-                        target_df=targets_df
-                    )
+                    train_result = self._train_predictor_as_of(stock_predictors[stock_id], stock_id, as_of)
 
-                    if not train_result['success']:
+                    if train_result is None or not train_result['success']:
                         continue
 
                     # 預測
@@ -3035,6 +2934,7 @@ class HoldoutBacktester:
         """執行帶停損停利的交易"""
 
         trades = []
+        pending = []
         investment_per_stock = monthly_investment / len(selected_stocks)
 
         for stock_info in selected_stocks:
@@ -3063,128 +2963,65 @@ class HoldoutBacktester:
             if shares == 0:
                 continue
 
-            # 執行停損停利邏輯
-            trade_result = self._simulate_stop_loss_trade(
-                stock_id, entry_date, entry_price, shares, actual_investment,
-                stop_loss, take_profit, predicted_return
-            )
+            pending.append({
+                'stock_id': stock_id,
+                'entry_date': entry_date,
+                'entry_price': entry_price,
+                'shares': shares,
+                'investment_amount': actual_investment,
+                'predicted_return': predicted_return
+            })
+
+        if not pending:
+            return trades
+
+        # 執行停損停利邏輯（整批交易一次讀取價格並向量化判斷出場）
+        pending_df = pd.DataFrame(pending)
+        exits = self._simulate_stop_loss_exits(pending_df, stop_loss, take_profit)
 
+        for entry, (_, exit_info) in zip(pending, exits.iterrows()):
+            trade_result = self._build_stop_loss_trade_result(entry, exit_info)
             if trade_result:
                 trades.append(trade_result)
 
         return trades
 
-    def _simulate_stop_loss_trade(self, stock_id: str, entry_date: str, entry_price: float,
-                                shares: int, investment_amount: float, stop_loss: float,
-                                take_profit: float, predicted_return: float) -> Dict:
-        """模擬單筆停損停利交易"""
-
-        from datetime import datetime, timedelta
-        import pandas as pd
-
-        # 計算交易成本（注意：需要出場價格，這裡先用進場價格估算）
-        # 實際的交易成本會在確定出場價格後重新計算
-        estimated_exit_price = entry_price * (1 + predicted_return)
-        transaction_costs = self._calculate_transaction_costs(entry_price, estimated_exit_price, shares)
-
-        # 獲取20個交易日的價格資料
-        entry_dt = datetime.strptime(entry_date, '%Y-%m-%d')
-        end_date = entry_dt + timedelta(days=30)  # 最多30天找20個交易日
-
-        # 獲取價格序列
-        price_data = self._get_price_series(stock_id, entry_date, end_date.strftime('%Y-%m-%d'))
+    def _simulate_stop_loss_exits(self, trades_df: pd.DataFrame, stop_loss: float, take_profit: float) -> pd.DataFrame:
+        """
+        批次計算停損停利出場（每檔股票只讀取一次價格）
 
-        if not price_data or len(price_data) < 2:
+        Returns:
+            每筆交易的出場日期、價格、原因、持有天數與期間最大 / 最小報酬
+        """
+        price_basis = self.trading_cfg['risk_management'].get('stop_price_basis', 'close')
+        return self.stop_loss_simulator.simulate(trades_df, stop_loss, take_profit, price_basis=price_basis)
+
+    def _build_stop_loss_trade_result(self, entry: Dict[str, Any], exit_info: pd.Series) -> Dict:
+        """依出場結果組出交易記錄（含交易成本與毛 / 淨報酬）"""
+        stock_id = entry['stock_id']
+        entry_date = entry['entry_date']
+        entry_price = entry['entry_price']
+        shares = entry['shares']
+        investment_amount = entry['investment_amount']
+        predicted_return = entry['predicted_return']
+
+        if exit_info['exit_reason'] == 'no_data':
             # 沒有價格資料，使用預測報酬
             exit_price = entry_price * (1 + predicted_return)
-
-            # 重新計算正確的交易成本（使用實際出場價格）
-            transaction_costs = self._calculate_transaction_costs(entry_price, exit_price, shares)
-
-            gross_value = shares * exit_price
-            final_value = gross_value - transaction_costs['total_cost_amount']
-
-            # 選單5的計算方式（毛報酬，基於股價變化）
-            gross_return = (exit_price - entry_price) / entry_price if entry_price > 0 else 0.0
-            gross_profit_loss = (exit_price - entry_price) * shares
-
-            # 選單5b的計算方式（淨報酬，扣除交易成本）
-            net_profit_loss = final_value - investment_amount
-            net_return = net_profit_loss / investment_amount if investment_amount > 0 else 0.0
-
-            return {
-                'stock_id': stock_id,
-                'entry_date': entry_date,
-                'entry_price': entry_price,
-                'shares': shares,
-                'investment_amount': investment_amount,
-                'exit_date': entry_date,  # 同一天
-                'exit_price': exit_price,
-                'exit_reason': 'no_data',
-                'holding_days': 0,
-                'final_value': final_value,
-                'month_end_value': final_value,
-                'predicted_return': predicted_return,
-                'transaction_costs': transaction_costs,
-                'max_return_20d': predicted_return,
-                'min_return_20d': predicted_return,
-
-                # 選單5的計算結果（毛報酬，無交易成本）
-                'actual_return_gross': gross_return,
-                'profit_loss_gross': gross_profit_loss,
-
-                # 選單5b的計算結果（淨報酬，含交易成本）
-                'actual_return_net': net_return,
-                'profit_loss_net': net_profit_loss,
-                'actual_return': net_return,  # 主要報酬率使用淨報酬
-                'profit_loss': net_profit_loss  # 主要損益使用淨損益
-            }
-
-        # 模擬每日價格變化
-        max_return = 0
-        min_return = 0
-        exit_date = None
-        exit_price = None
-        exit_reason = 'normal'
-
-        for i, (date, price) in enumerate(price_data[1:], 1):  # 跳過第一天（進場日）
-            daily_return = (price - entry_price) / entry_price
-
-            # 更新最大最小報酬
-            max_return = max(max_return, daily_return)
-            min_return = min(min_return, daily_return)
-
-            # 檢查停利條件
-            if daily_return >= take_profit:
-                exit_date = date
-                exit_price = price
-                exit_reason = 'take_profit'
-                break
-
-            # 檢查停損條件
-            if daily_return <= -stop_loss:
-                exit_date = date
-                exit_price = price
-                exit_reason = 'stop_loss'
-                break
-
-            # 最多持有20個交易日
-            if i >= 20:
-                exit_date = date
-                exit_price = price
-                exit_reason = 'normal'
-                break
-
-        # 如果沒有觸發停損停利，使用最後一個價格
-        if not exit_date:
-            exit_date = price_data[-1][0]
-            exit_price = price_data[-1][1]
-            exit_reason = 'normal'
-
-        # 計算最終結果
-        holding_days = len([d for d, p in price_data if d <= exit_date]) - 1
-
-        # 重新計算正確的交易成本（使用實際出場價格）
+            exit_date = entry_date  # 同一天
+            exit_reason = 'no_data'
+            holding_days = 0
+            max_return = predicted_return
+            min_return = predicted_return
+        else:
+            exit_price = float(exit_info['exit_price'])
+            exit_date = exit_info['exit_date']
+            exit_reason = exit_info['exit_reason']
+            holding_days = int(exit_info['holding_days'])
+            max_return = float(exit_info['max_return_20d'])
+            min_return = float(exit_info['min_return_20d'])
+
+        # 計算交易成本（使用實際出場價格）
         transaction_costs = self._calculate_transaction_costs(entry_price, exit_price, shares)
 
         gross_value = shares * exit_price
@@ -3226,42 +3063,6 @@ class HoldoutBacktester:
             'profit_loss': net_profit_loss  # 主要損益使用淨損益
         }
 
-    def _get_price_series(self, stock_id: str, start_date: str, end_date: str) -> List[tuple]:
-        """獲取股票價格序列"""
-        try:
-            from stock_price_investment_system.data.data_manager import DataManager
-
-            dm = DataManager()
-
-            # 獲取價格資料
-            price_df = dm.get_stock_prices(stock_id, start_date, end_date)
-
-            if price_df is None or price_df.empty:
-                return []
-
-            # 確保有日期索引
-            if 'date' in price_df.columns:
-                price_df = price_df.set_index('date')
-
-            # 使用收盤價
-            if 'close' not in price_df.columns:
-                return []
-
-            # 轉換為 (日期, 價格) 的列表
-            price_series = []
-            for date, row in price_df.iterrows():
-                if isinstance(date, str):
-                    date_str = date
-                else:
-                    date_str = date.strftime('%Y-%m-%d')
-                price_series.append((date_str, float(row['close'])))
-
-            return sorted(price_series)  # 確保按日期排序
-
-        except Exception as e:
-            self._log(f"獲取 {stock_id} 價格序列失敗: {e}", "warning")
-            return []
-
     def _get_last_trading_day_of_month(self, month_str: str) -> str:
         """獲取月底最後一個交易日（工作日近似）"""
         try:
@@ -8,16 +8,35 @@ import numpy as np
 from typing import Dict, List, Any, Tuple, Optional
 from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import json
 import logging
+import os
 from itertools import product
 
 from .feature_engineering import FeatureEngineer
 from .stock_price_predictor import StockPricePredictor
+from .tuned_params_registry import TunedParamsRegistry, get_tuned_params_registry
 from ..config.settings import get_config
 
 logger = logging.getLogger(__name__)
 
+# 子行程內的調優器與共用矩陣（由 _init_tuning_worker 設定，唯讀）
+_worker_state = None
+
+
+def _init_tuning_worker(tuner: 'HyperparameterTuner', tuning_data: Dict[str, Any]):
+    """行程池初始化：每個子行程只接收一次特徵矩陣"""
+    global _worker_state
+    _worker_state = (tuner, tuning_data)
+
+
+def _evaluate_in_worker(model_type: str, params: Dict, n_estimators: Optional[int]) -> Dict[str, Any]:
+    """在子行程中評估單一參數組合"""
+    tuner, tuning_data = _worker_state
+    return tuner._evaluate_combination(model_type, params, tuning_data, n_estimators, single_thread=True)
+
+
 class HyperparameterTuner:
     """超參數調優器"""
     
@@ -63,7 +82,9 @@ class HyperparameterTuner:
                        train_end: str = None,
                        test_start: str = None,
                        test_end: str = None,
-                       max_combinations: int = 30) -> Dict[str, Any]:
+                       max_combinations: int = 30,
+                       n_jobs: Optional[int] = None,
+                       successive_halving: Optional[bool] = None) -> Dict[str, Any]:
         """對單檔股票測試所有模型類型"""
         logger.info(f"開始對股票 {stock_id} 進行全模型調優")
 
@@ -75,7 +96,8 @@ class HyperparameterTuner:
             logger.info(f"測試模型: {model_type}")
             result = self.tune_single_stock(
                 stock_id, model_type, train_start, train_end,
-                test_start, test_end, max_combinations
+                test_start, test_end, max_combinations,
+                n_jobs=n_jobs, successive_halving=successive_halving
             )
             all_results[model_type] = result
 
@@ -100,7 +122,9 @@ class HyperparameterTuner:
                          train_end: str = None,
                          test_start: str = None,
                          test_end: str = None,
-                         max_combinations: int = 50) -> Dict[str, Any]:
+                         max_combinations: int = 50,
+                         n_jobs: Optional[int] = None,
+                         successive_halving: Optional[bool] = None) -> Dict[str, Any]:
         """
         對單檔股票進行超參數調優
         
@@ -112,6 +136,8 @@ class HyperparameterTuner:
             test_start: 測試開始日期
             test_end: 測試結束日期
             max_combinations: 最大參數組合數
+            n_jobs: 平行評估的行程數（None 時依設定檔 model.tuning.n_jobs，-1 使用全部CPU）
+            successive_halving: 是否逐輪淘汰（None 時依設定檔 model.tuning.successive_halving.enabled）
             
         Returns:
             調優結果字典
@@ -148,68 +174,25 @@ class HyperparameterTuner:
         logger.info(f"將測試 {len(param_combinations)} 個參數組合")
         
         # 執行網格搜尋 - 記錄所有結果（包含失敗）
-        results = []
+        # 特徵矩陣只準備一次，各參數組合共用（可平行評估，並可選擇逐輪淘汰）
+        tuning_data = self._prepare_tuning_data(train_features, train_targets, test_features, test_targets)
+        results = self._run_grid_search(
+            stock_id, model_type, param_combinations, tuning_data,
+            n_jobs=self._resolve_n_jobs(n_jobs, len(param_combinations)),
+            halving=successive_halving
+        )
+
         best_score = -float('inf')
         best_params = None
+        for result in results:
+            if result['success'] and result['test_score'] > best_score:
+                best_score = result['test_score']
+                best_params = result['parameters'].copy()
 
-        for i, params in enumerate(param_combinations):
-            logger.info(f"測試參數組合 {i+1}/{len(param_combinations)}: {params}")
-
-            result = {
-                'combination_id': i + 1,
-                'stock_id': stock_id,
-                'model_type': model_type,
-                'parameters': params,
-                'success': False,
-                'error_message': None,
-                'train_metrics': {},
-                'test_score': -1.0,
-                'test_metrics': {},
-                'feature_count': 0
-            }
-
-            try:
-                # 訓練模型
-                predictor = StockPricePredictor(self.feature_engineer, model_type)
-                predictor.model = self._create_model_with_params(model_type, params)
-
-                train_result = predictor.train(train_features, train_targets)
-
-                if not train_result['success']:
-                    result['error_message'] = f"訓練失敗: {train_result.get('error', 'Unknown')}"
-                    logger.warning(f"參數組合 {i+1} {result['error_message']}")
-                else:
-                    # 在測試集上評估
-                    test_score, test_metrics = self._evaluate_on_test_set(
-                        predictor, test_features, test_targets, stock_id
-                    )
-
-                    # 更新結果
-                    result.update({
-                        'success': True,
-                        'train_metrics': train_result['validation_metrics'],
-                        'test_score': test_score,
-                        'test_metrics': test_metrics,
-                        'feature_count': train_result['feature_count']
-                    })
-
-                    # 更新最佳參數
-                    if test_score > best_score:
-                        best_score = test_score
-                        best_params = params.copy()
-
-                    logger.info(f"參數組合 {i+1} 測試分數: {test_score:.4f}")
-
-            except Exception as e:
-                result['error_message'] = f"執行異常: {str(e)}"
-                logger.error(f"參數組合 {i+1} 執行失敗: {e}")
-
-            # 不管成功失敗都記錄
-            results.append(result)
-        
         # 統計成功失敗
         successful_results = [r for r in results if r['success']]
-        failed_results = [r for r in results if not r['success']]
+        pruned_results = [r for r in results if r.get('pruned')]
+        failed_results = [r for r in results if not r['success'] and not r.get('pruned')]
 
         # 整理結果 - 不管成功失敗都要有CSV
         results_df = pd.DataFrame(results)
@@ -231,6 +214,7 @@ class HyperparameterTuner:
             'total_combinations': len(param_combinations),
             'successful_combinations': len(successful_results),
             'failed_combinations': len(failed_results),
+            'pruned_combinations': len(pruned_results),
             'failure_analysis': failure_analysis,
             'train_period': f"{train_start} to {train_end}",
             'test_period': f"{test_start} to {test_end}",
@@ -289,6 +273,268 @@ class HyperparameterTuner:
         
         return all_combinations
     
+    def _resolve_n_jobs(self, n_jobs: Optional[int], combination_count: int) -> int:
+        """解析平行行程數（不超過參數組合數）"""
+        if n_jobs is None:
+            n_jobs = self.config['model'].get('tuning', {}).get('n_jobs', 1)
+        if n_jobs is None or n_jobs == 0:
+            n_jobs = 1
+        elif n_jobs < 0:
+            n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+        return max(1, min(int(n_jobs), combination_count))
+
+    def _halving_fractions(self, halving_config: Dict[str, Any]) -> List[float]:
+        """逐輪淘汰各輪使用的樹數量比例，例如 eta=3、min_fraction=0.3 時為 [1/3, 1]"""
+        eta = halving_config.get('eta', 3)
+        min_fraction = halving_config.get('min_fraction', 0.3)
+
+        fractions = [1.0]
+        fraction = 1.0 / eta
+        while fraction >= min_fraction:
+            fractions.insert(0, fraction)
+            fraction /= eta
+        return fractions
+
+    def _prepare_tuning_data(self,
+                             train_features: pd.DataFrame,
+                             train_targets: pd.DataFrame,
+                             test_features: pd.DataFrame,
+                             test_targets: pd.DataFrame,
+                             validation_split: float = 0.2) -> Dict[str, Any]:
+        """
+        準備各參數組合共用的訓練 / 驗證 / 測試矩陣
+
+        清理與切分方式與 StockPricePredictor.train 相同，因此每個組合的評估結果
+        與逐一建立預測器訓練時一致；失敗原因記錄在 error / test_error。
+        """
+        data = {'error': None, 'test_error': None, 'feature_names': None}
+
+        try:
+            X, y, feature_names = StockPricePredictor(self.feature_engineer)._prepare_training_matrices(
+                train_features, train_targets
+            )
+        except Exception as e:
+            data['error'] = str(e)
+            return data
+
+        split_idx = int(len(X) * (1 - validation_split))
+        data.update({
+            'feature_names': feature_names,
+            'X_train': X[:split_idx],
+            'y_train': y[:split_idx],
+            'X_val': X[split_idx:],
+            'y_val': y[split_idx:],
+            'X_test': None,
+            'y_test': None
+        })
+
+        try:
+            test_matrices = self._prepare_test_matrices(feature_names, test_features, test_targets)
+            if test_matrices is not None:
+                data['X_test'], data['y_test'] = test_matrices
+        except Exception as e:
+            data['test_error'] = str(e)
+
+        return data
+
+    def _run_grid_search(self,
+                         stock_id: str,
+                         model_type: str,
+                         param_combinations: List[Dict],
+                         tuning_data: Dict[str, Any],
+                         n_jobs: int = 1,
+                         halving: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        評估所有參數組合，回傳依組合編號排列的結果（不管成功失敗都記錄）
+
+        啟用逐輪淘汰時，前幾輪以較少的樹數量評估全部存活組合，每輪只保留
+        前 1/eta 名；被淘汰的組合標記 pruned，只有存活到最後一輪的組合以完整參數評估。
+        """
+        results = [{
+            'combination_id': i + 1,
+            'stock_id': stock_id,
+            'model_type': model_type,
+            'parameters': params,
+            'success': False,
+            'pruned': False,
+            'error_message': None,
+            'train_metrics': {},
+            'test_score': -1.0,
+            'test_metrics': {},
+            'feature_count': 0
+        } for i, params in enumerate(param_combinations)]
+
+        halving_config = self.config['model'].get('tuning', {}).get('successive_halving', {})
+        if halving is None:
+            halving = halving_config.get('enabled', False)
+        fractions = self._halving_fractions(halving_config) if halving else [1.0]
+        eta = halving_config.get('eta', 3)
+
+        executor = None
+        if n_jobs > 1:
+            logger.info(f"以 {n_jobs} 個行程平行評估參數組合")
+            executor = ProcessPoolExecutor(max_workers=n_jobs,
+                                           initializer=_init_tuning_worker,
+                                           initargs=(self, tuning_data))
+
+        candidates = list(range(len(param_combinations)))
+        total = len(param_combinations)
+
+        try:
+            for rung, fraction in enumerate(fractions):
+                if not candidates:
+                    break
+
+                if rung == 0:
+                    for i in candidates:
+                        logger.info(f"測試參數組合 {i+1}/{total}: {param_combinations[i]}")
+
+                outcomes = self._evaluate_candidates(
+                    executor, model_type, param_combinations, candidates, tuning_data, fraction
+                )
+
+                for i in candidates:
+                    if not outcomes[i]['success']:
+                        results[i].update(outcomes[i])
+                        logger.warning(f"參數組合 {i+1} {outcomes[i]['error_message']}")
+
+                survivors = [i for i in candidates if outcomes[i]['success']]
+
+                if rung == len(fractions) - 1:
+                    for i in survivors:
+                        results[i].update(outcomes[i])
+                        logger.info(f"參數組合 {i+1} 測試分數: {outcomes[i]['test_score']:.4f}")
+                    break
+
+                # 依本輪分數保留前 1/eta（同分時保留組合編號較小者）
+                survivors.sort(key=lambda i: (-outcomes[i]['test_score'], i))
+                keep_count = max(1, int(np.ceil(len(survivors) / eta)))
+                for i in survivors[keep_count:]:
+                    results[i].update({
+                        'pruned': True,
+                        'error_message': f"提前淘汰: 第{rung+1}輪（樹數量 {fraction:.0%}）分數 {outcomes[i]['test_score']:.4f}"
+                    })
+                logger.info(f"第{rung+1}輪淘汰 {len(survivors) - keep_count} 個參數組合，保留 {keep_count} 個")
+                candidates = sorted(survivors[:keep_count])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return results
+
+    def _evaluate_candidates(self,
+                             executor: Optional[ProcessPoolExecutor],
+                             model_type: str,
+                             param_combinations: List[Dict],
+                             candidates: List[int],
+                             tuning_data: Dict[str, Any],
+                             fraction: float) -> Dict[int, Dict[str, Any]]:
+        """以指定樹數量比例評估一批參數組合（有行程池時平行執行）"""
+        n_estimators = {}
+        for i in candidates:
+            full_estimators = param_combinations[i].get('n_estimators')
+            if fraction < 1.0 and full_estimators:
+                n_estimators[i] = max(1, int(round(full_estimators * fraction)))
+            else:
+                n_estimators[i] = None
+
+        if executor is None:
+            return {
+                i: self._evaluate_combination(model_type, param_combinations[i], tuning_data, n_estimators[i])
+                for i in candidates
+            }
+
+        futures = {
+            i: executor.submit(_evaluate_in_worker, model_type, param_combinations[i], n_estimators[i])
+            for i in candidates
+        }
+        outcomes = {}
+        for i, future in futures.items():
+            try:
+                outcomes[i] = future.result()
+            except Exception as e:
+                outcomes[i] = {'success': False, 'error_message': f"執行異常: {str(e)}"}
+        return outcomes
+
+    def _evaluate_combination(self,
+                              model_type: str,
+                              params: Dict,
+                              tuning_data: Dict[str, Any],
+                              n_estimators: Optional[int] = None,
+                              single_thread: bool = False) -> Dict[str, Any]:
+        """
+        以共用矩陣訓練並評估單一參數組合
+
+        Args:
+            model_type: 模型類型
+            params: 參數組合
+            tuning_data: _prepare_tuning_data 的結果
+            n_estimators: 覆蓋樹數量（逐輪淘汰的前幾輪）
+            single_thread: 模型只用單一執行緒（在子行程中平行評估時避免超額訂閱CPU）
+
+        Returns:
+            {'success', 'error_message', 'train_metrics', 'test_score', 'test_metrics', 'feature_count'}
+        """
+        outcome = {
+            'success': False,
+            'error_message': None,
+            'train_metrics': {},
+            'test_score': -1.0,
+            'test_metrics': {},
+            'feature_count': 0
+        }
+
+        if tuning_data['error']:
+            outcome['error_message'] = f"執行異常: {tuning_data['error']}"
+            return outcome
+
+        try:
+            predictor = StockPricePredictor(self.feature_engineer, model_type)
+            predictor.model = self._create_model_with_params(model_type, params)
+            predictor.feature_names = tuning_data['feature_names']
+
+            overrides = {}
+            if n_estimators:
+                overrides['n_estimators'] = n_estimators
+            if single_thread and 'n_jobs' in predictor.model.get_params():
+                overrides['n_jobs'] = 1
+            if overrides:
+                predictor.model.set_params(**overrides)
+
+            # 訓練模型（驗證指標與 StockPricePredictor.train 的 validation_metrics 相同）
+            try:
+                predictor.model.fit(tuning_data['X_train'], tuning_data['y_train'])
+                predictor.is_trained = True
+                val_metrics = predictor._calculate_metrics(
+                    tuning_data['y_val'], predictor.model.predict(tuning_data['X_val'])
+                )
+            except Exception as e:
+                outcome['error_message'] = f"訓練失敗: {str(e)}"
+                return outcome
+
+            # 在測試集上評估
+            if tuning_data['test_error']:
+                raise ValueError(tuning_data['test_error'])
+            if tuning_data['X_test'] is None:
+                test_score, test_metrics = -1.0, {}
+            else:
+                test_score, test_metrics = self._score_test_predictions(
+                    tuning_data['y_test'], predictor.model.predict(tuning_data['X_test'])
+                )
+
+            outcome.update({
+                'success': True,
+                'train_metrics': val_metrics,
+                'test_score': test_score,
+                'test_metrics': test_metrics,
+                'feature_count': len(tuning_data['feature_names'])
+            })
+
+        except Exception as e:
+            outcome['error_message'] = f"執行異常: {str(e)}"
+
+        return outcome
+
     def _create_model_with_params(self, model_type: str, params: Dict) -> Any:
         """根據參數創建模型"""
         try:
@@ -320,6 +566,24 @@ class HyperparameterTuner:
                             test_targets: pd.DataFrame,
                             stock_id: str) -> Tuple[float, Dict]:
         """在測試集上評估模型"""
+        test_matrices = self._prepare_test_matrices(
+            getattr(predictor, 'feature_names', None), test_features, test_targets
+        )
+        if test_matrices is None:
+            return -1.0, {}
+
+        X_test, y_test = test_matrices
+
+        # 預測
+        y_pred = predictor.model.predict(X_test)
+
+        return self._score_test_predictions(y_test, y_pred)
+
+    def _prepare_test_matrices(self,
+                               feature_names: Optional[List[str]],
+                               test_features: pd.DataFrame,
+                               test_targets: pd.DataFrame) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """準備測試集特徵矩陣與目標（特徵順序與訓練時一致），無資料時回傳None"""
         # 合併特徵和目標
         merged_df = test_features.merge(
             test_targets[['stock_id', 'as_of_date', 'target_20d']],
@@ -328,13 +592,12 @@ class HyperparameterTuner:
         )
 
         if merged_df.empty:
-            return -1.0, {}
+            return None
 
         # 使用訓練時的特徵名稱，確保特徵一致性
-        if hasattr(predictor, 'feature_names') and predictor.feature_names:
+        if feature_names:
             # 使用訓練時保存的特徵名稱
-            available_features = [col for col in predictor.feature_names if col in merged_df.columns]
-            missing_features = [col for col in predictor.feature_names if col not in merged_df.columns]
+            missing_features = [col for col in feature_names if col not in merged_df.columns]
 
             if missing_features:
                 logger.warning(f"測試集缺少特徵: {missing_features}")
@@ -342,7 +605,7 @@ class HyperparameterTuner:
                 for feature in missing_features:
                     merged_df[feature] = 0.0
 
-            feature_columns = predictor.feature_names
+            feature_columns = feature_names
         else:
             # 回退到原始邏輯
             feature_columns = [col for col in merged_df.columns
@@ -360,10 +623,10 @@ class HyperparameterTuner:
         # 清理目標變數中的異常值
         y_test = np.nan_to_num(y_test, nan=0.0, posinf=0.0, neginf=0.0)
 
-        # 預測
-        y_pred = predictor.model.predict(X_test)
+        return X_test, y_test
 
-        # 計算指標
+    def _score_test_predictions(self, y_test: np.ndarray, y_pred: np.ndarray) -> Tuple[float, Dict]:
+        """計算測試集評分（方向準確率）與指標"""
         from sklearn.metrics import mean_squared_error, r2_score
         mse = mean_squared_error(y_test, y_pred)
         r2 = r2_score(y_test, y_pred)
@@ -579,24 +842,8 @@ class HyperparameterTuner:
             return False
 
     def _update_tuned_stocks_registry(self, tuning_result: Dict[str, Any]):
-        """更新已調優股票註冊表"""
+        """更新已調優股票註冊表（檔案鎖保護，平行調優時可安全寫入）"""
         try:
-            from pathlib import Path
-            import pandas as pd
-
-            # 註冊表檔案位置
-            registry_dir = Path(self.config['output']['paths']['models']) / 'hyperparameter_tuning'
-            registry_file = registry_dir / 'tuned_stocks_registry.csv'
-
-            # 讀取現有註冊表
-            if registry_file.exists():
-                try:
-                    registry_df = pd.read_csv(registry_file, encoding='utf-8-sig')
-                except:
-                    registry_df = pd.DataFrame()
-            else:
-                registry_df = pd.DataFrame()
-
             # 準備新記錄
             new_record = {
                 '股票代碼': tuning_result['stock_id'],
@@ -609,46 +856,27 @@ class HyperparameterTuner:
                 '總組合數': tuning_result.get('total_combinations', 0)
             }
 
-            # 檢查是否已存在相同股票+模型的記錄
-            if not registry_df.empty:
-                mask = (registry_df.get('股票代碼', '') == tuning_result['stock_id']) & \
-                       (registry_df.get('模型類型', '') == tuning_result['model_type'])
-                has_existing = mask.any()
-            else:
-                has_existing = False
-
-            if has_existing:
-                # 更新現有記錄
-                for col, val in new_record.items():
-                    registry_df.loc[mask, col] = val
+            # 已存在相同股票+模型的記錄時更新，否則新增
+            if self._get_registry().upsert(new_record):
                 logger.info(f"更新已調優股票註冊表: {tuning_result['stock_id']} ({tuning_result['model_type']})")
             else:
-                # 新增記錄
-                new_df = pd.DataFrame([new_record])
-                registry_df = pd.concat([registry_df, new_df], ignore_index=True)
                 logger.info(f"新增已調優股票註冊表: {tuning_result['stock_id']} ({tuning_result['model_type']})")
 
-            # 儲存註冊表
-            registry_df.to_csv(registry_file, index=False, encoding='utf-8-sig')
-
         except Exception as e:
             logger.error(f"更新已調優股票註冊表失敗: {e}")
 
+    @classmethod
+    def _get_registry(cls) -> TunedParamsRegistry:
+        """取得已調優股票註冊表（行程內共用索引，檔案變動時自動重新載入）"""
+        config = get_config()
+        registry_dir = Path(config['output']['paths']['models']) / 'hyperparameter_tuning'
+        return get_tuned_params_registry(registry_dir / 'tuned_stocks_registry.csv')
+
     @classmethod
     def get_tuned_stocks_info(cls) -> pd.DataFrame:
         """獲取已調優股票資訊"""
         try:
-            from pathlib import Path
-            import pandas as pd
-
-            config = get_config()
-            registry_dir = Path(config['output']['paths']['models']) / 'hyperparameter_tuning'
-            registry_file = registry_dir / 'tuned_stocks_registry.csv'
-
-            if registry_file.exists():
-                return pd.read_csv(registry_file, encoding='utf-8-sig')
-            else:
-                return pd.DataFrame()
+            return cls._get_registry().get_dataframe()
 
         except Exception as e:
             logger.error(f"讀取已調優股票註冊表失敗: {e}")
@@ -658,42 +886,10 @@ class HyperparameterTuner:
     def get_stock_best_params(cls, stock_id: str, model_type: str) -> Optional[Dict[str, Any]]:
         """獲取特定股票的最佳參數"""
         try:
-            registry_df = cls.get_tuned_stocks_info()
-
-            if registry_df.empty:
-                return None
-
-            # 查找該股票+模型的記錄（處理股票代碼的類型轉換）
-            try:
-                # 嘗試將股票代碼轉為整數比較
-                stock_id_int = int(stock_id)
-                mask = (registry_df['股票代碼'] == stock_id_int) & \
-                       (registry_df['模型類型'] == model_type) & \
-                       (registry_df['是否成功'] == '成功')
-            except ValueError:
-                # 如果轉換失敗，用字串比較
-                mask = (registry_df['股票代碼'].astype(str) == stock_id) & \
-                       (registry_df['模型類型'] == model_type) & \
-                       (registry_df['是否成功'] == '成功')
-
-            matching_records = registry_df[mask]
-
-            if not matching_records.empty:
-                # 如果有多筆記錄，取分數最高的
-                best_record = matching_records.loc[matching_records['最佳分數'].idxmax()]
-                params_str = best_record['最佳參數']
-
-                # 將字串轉回字典
-                try:
-                    import ast
-                    result = ast.literal_eval(params_str)
-                    logger.debug(f"成功獲取 {stock_id} {model_type} 最佳參數: {result}")
-                    return result
-                except Exception as e:
-                    logger.error(f"解析參數字串失敗: {params_str}, 錯誤: {e}")
-                    return None
-
-            return None
+            result = cls._get_registry().get_best_params(stock_id, model_type)
+            if result is not None:
+                logger.debug(f"成功獲取 {stock_id} {model_type} 最佳參數: {result}")
+            return result
 
         except Exception as e:
             logger.error(f"獲取股票 {stock_id} 最佳參數失敗: {e}")
@@ -717,49 +913,14 @@ class HyperparameterTuner:
             }
         """
         try:
-            registry_df = cls.get_tuned_stocks_info()
+            result = cls._get_registry().get_best_model_and_params(stock_id)
 
-            if registry_df.empty:
-                return None
-
-            # 查找該股票的所有成功記錄
-            try:
-                # 嘗試將股票代碼轉為整數比較
-                stock_id_int = int(stock_id)
-                mask = (registry_df['股票代碼'] == stock_id_int) & \
-                       (registry_df['是否成功'] == '成功')
-            except ValueError:
-                # 如果轉換失敗，用字串比較
-                mask = (registry_df['股票代碼'].astype(str) == stock_id) & \
-                       (registry_df['是否成功'] == '成功')
-
-            matching_records = registry_df[mask]
-
-            if matching_records.empty:
+            if result is None:
                 logger.debug(f"股票 {stock_id} 沒有成功的調優記錄")
                 return None
 
-            # 找出分數最高的記錄
-            best_record = matching_records.loc[matching_records['最佳分數'].idxmax()]
-
-            # 解析參數
-            try:
-                import ast
-                params = ast.literal_eval(best_record['最佳參數'])
-
-                result = {
-                    'model_type': best_record['模型類型'],
-                    'params': params,
-                    'score': float(best_record['最佳分數']),
-                    'success': True
-                }
-
-                logger.debug(f"股票 {stock_id} 最佳模型: {result['model_type']}, 分數: {result['score']:.4f}")
-                return result
-
-            except Exception as e:
-                logger.error(f"解析股票 {stock_id} 最佳參數失敗: {e}")
-                return None
+            logger.debug(f"股票 {stock_id} 最佳模型: {result['model_type']}, 分數: {result['score']:.4f}")
+            return result
 
         except Exception as e:
             logger.error(f"獲取股票 {stock_id} 最佳模型和參數失敗: {e}")
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+股價預測與投資建議系統 - 擴張視窗增量訓練資料快取
+Stock Price Investment System - Incremental Expanding-Window Training Cache
+
+外層回測每月以「訓練起點 ~ 當月月底」的擴張視窗重新訓練。每個樣本列只依賴
+其預測時點，之前月份的特徵 / 標籤列不會改變，因此只需為新月份產生資料並附加，
+每月成本由 O(已經過月數) 降為 O(1)。
+"""
+
+from typing import Dict, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .feature_engineering import FeatureEngineer
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalTrainingCache:
+    """每檔股票保留已生成的特徵 / 標籤列，新月份只生成新增的列"""
+
+    def __init__(self, feature_engineer: FeatureEngineer, target_periods=None):
+        self.fe = feature_engineer
+        self.target_periods = list(target_periods or [20])
+        # (stock_id, start_date) -> (已涵蓋的結束日期, 特徵DataFrame, 標籤DataFrame)
+        self._entries: Dict[Tuple[str, str], Tuple[pd.Timestamp, pd.DataFrame, pd.DataFrame]] = {}
+
+    def get_training_dataset(self, stock_id: str, start_date: str, end_date: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        取得 [start_date, end_date] 的訓練資料集，結果與
+        generate_training_dataset([stock_id], start_date, end_date) 相同
+
+        Args:
+            stock_id: 股票代碼
+            start_date: 訓練起點 (YYYY-MM-DD)
+            end_date: 訓練終點 (YYYY-MM-DD)
+
+        Returns:
+            (特徵DataFrame, 標籤DataFrame)
+        """
+        key = (stock_id, start_date)
+        end_ts = pd.Timestamp(end_date)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            features, targets = self._generate(stock_id, start_date, end_date)
+            self._entries[key] = (end_ts, features, targets)
+            return features.copy(), targets.copy()
+
+        cached_end, features, targets = entry
+
+        if end_ts <= cached_end:
+            # 較早的終點：取已快取列的子集合
+            if features.empty:
+                return features.copy(), targets.copy()
+            mask = pd.to_datetime(features['as_of_date']) <= end_ts
+            return (features[mask].reset_index(drop=True),
+                    targets[mask.values].reset_index(drop=True))
+
+        # 只生成 (cached_end, end_date] 的新列
+        next_start = (cached_end + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        new_features, new_targets = self._generate(stock_id, next_start, end_date)
+        if not new_features.empty:
+            features, targets = self._append(features, targets, new_features, new_targets)
+            logger.debug(f"增量訓練資料 {stock_id}: 新增 {len(new_features)} 列，共 {len(features)} 列")
+
+        self._entries[key] = (end_ts, features, targets)
+        return features.copy(), targets.copy()
+
+    def _generate(self, stock_id: str, start_date: str, end_date: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        features, targets = self.fe.generate_training_dataset(
+            stock_ids=[stock_id],
+            start_date=start_date,
+            end_date=end_date,
+            target_periods=self.target_periods
+        )
+        return features.reset_index(drop=True), targets.reset_index(drop=True)
+
+    def _append(self, features: pd.DataFrame, targets: pd.DataFrame,
+                new_features: pd.DataFrame, new_targets: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """附加新列，並對新舊欄位不一致處套用與 generate_training_dataset 相同的補值規則"""
+        if features.empty:
+            return new_features, new_targets
+
+        features = pd.concat([features, new_features], ignore_index=True, sort=False)
+        targets = pd.concat([targets, new_targets], ignore_index=True, sort=False)
+
+        numeric_columns = features.select_dtypes(include=[np.number]).columns
+        features[numeric_columns] = features[numeric_columns].fillna(0)
+        string_columns = features.select_dtypes(include=['object']).columns
+        features[string_columns] = features[string_columns].fillna('')
+        return features, targets
+
+    def invalidate(self, stock_id: str = None):
+        """清除指定股票（或全部）的快取"""
+        if stock_id is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == stock_id]:
+            del self._entries[key]
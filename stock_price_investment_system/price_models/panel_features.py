@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+股價預測與投資建議系統 - 面板式特徵建構器
+Stock Price Investment System - Panel Feature Builder
+
+每檔股票只讀取一次完整股價與月營收，技術指標與營收 YoY/MoM/MA 以整段序列
+向量化計算，再以二分搜尋一次取出所有月末樣本列。輸出與
+FeatureEngineer.generate_features / _generate_targets 的逐列結果相同。
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, Any, TYPE_CHECKING
+import logging
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ..data.price_data import PRICE_CHANGE_PERIODS, INDICATOR_FEATURE_DEFAULTS
+
+if TYPE_CHECKING:
+    from .feature_engineering import FeatureEngineer
+
+logger = logging.getLogger(__name__)
+
+# EWM（MACD）在視窗起點之前的權重 (1-α)^n 需小到可忽略，視窗筆數低於此值且
+# 視窗並非從序列起點開始時，改用逐視窗計算
+EWM_SATURATION_ROWS = 400
+
+
+def _to_ns(dates) -> np.ndarray:
+    """日期序列轉為 int64 奈秒陣列"""
+    return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[ns]').view(np.int64)
+
+
+def _window_counts(mask: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """計算每個 [lo, hi) 視窗內 mask 為真的筆數"""
+    csum = np.concatenate([[0], np.cumsum(mask.astype(np.int64))])
+    return csum[hi] - csum[lo]
+
+
+def _window_sums(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """計算每個 [lo, hi) 視窗的總和"""
+    csum = np.concatenate([[0.0], np.cumsum(np.nan_to_num(values))])
+    return csum[hi] - csum[lo]
+
+
+def _rolling_last(values: np.ndarray, window: int, end: np.ndarray, func) -> np.ndarray:
+    """以 end 為視窗最後一筆，計算長度 window 的滾動統計（不足長度時為 NaN）"""
+    out = np.full(len(end), np.nan)
+    if len(values) < window:
+        return out
+    windows = sliding_window_view(values, window)
+    idx = end - (window - 1)
+    valid = idx >= 0
+    if valid.any():
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[valid] = func(windows[idx[valid]])
+    return out
+
+
+class PanelFeatureBuilder:
+    """面板式訓練資料建構器（generate_training_dataset 的向量化實作）"""
+
+    def __init__(self, feature_engineer: 'FeatureEngineer'):
+        self.fe = feature_engineer
+        self.data_manager = feature_engineer.data_manager
+        self.price_manager = feature_engineer.price_manager
+        self.revenue_integration = feature_engineer.revenue_integration
+        self.revenue_config = feature_engineer.feature_config['revenue_features']
+        self.tech_config = feature_engineer.feature_config['technical_features']
+
+    def build_rows(self,
+                   stock_ids: List[str],
+                   dates: pd.DatetimeIndex,
+                   target_periods: List[int],
+                   lookback_months: int = 24) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        生成所有 (股票, 日期) 的特徵列與標籤列
+
+        Returns:
+            (特徵字典清單, 標籤字典清單)，順序與逐列模式相同
+        """
+        feature_list = []
+        target_list = []
+        as_of_dates = [d.strftime('%Y-%m-%d') for d in dates]
+
+        for stock_id in stock_ids:
+            logger.debug(f"Panel processing {stock_id}")
+            try:
+                features, targets = self._build_stock_rows(stock_id, as_of_dates, target_periods, lookback_months)
+            except Exception as e:
+                logger.warning(f"面板特徵生成失敗 {stock_id}: {e}")
+                continue
+            feature_list.extend(features)
+            target_list.extend(targets)
+
+        return feature_list, target_list
+
+    def _build_stock_rows(self, stock_id: str, as_of_dates: List[str],
+                          target_periods: List[int], lookback_months: int):
+        """單一股票：一次讀取完整序列，產生所有樣本列"""
+        if not as_of_dates:
+            return [], []
+
+        as_of_dts = [datetime.strptime(d, '%Y-%m-%d') for d in as_of_dates]
+        prices = self.data_manager.get_stock_prices(stock_id)
+        if not prices.empty:
+            prices = prices.reset_index(drop=True)
+
+        revenue_rows = self._revenue_features(stock_id, as_of_dts)
+        technical_rows = self._technical_features(prices, as_of_dts, lookback_months)
+        target_rows = self._targets(prices, as_of_dts, target_periods)
+
+        try:
+            basic_info = self.data_manager.get_stock_basic_info(stock_id)
+        except Exception as e:
+            logger.debug(f"Error loading basic info for {stock_id}: {e}")
+            basic_info = {}
+
+        features_out = []
+        targets_out = []
+        for i, as_of_date in enumerate(as_of_dates):
+            features = {}
+            if revenue_rows is not None:
+                features.update(revenue_rows[i])
+            features.update(technical_rows[i])
+            features.update(self.fe._generate_industry_features(stock_id, as_of_date, basic_info=basic_info))
+            features.update(self.fe._generate_time_features(as_of_date))
+            features.update(self.fe._generate_interaction_features(features))
+            features = self.fe._clean_features(features)
+            if not features:
+                continue
+
+            features['stock_id'] = stock_id
+            features['as_of_date'] = as_of_date
+
+            targets = target_rows[i]
+            targets['stock_id'] = stock_id
+            targets['as_of_date'] = as_of_date
+
+            features_out.append(features)
+            targets_out.append(targets)
+
+        return features_out, targets_out
+
+    # ------------------------------------------------------------------
+    # 營收特徵
+    # ------------------------------------------------------------------
+    def _revenue_features(self, stock_id: str, as_of_dts: List[datetime]):
+        """月營收特徵（對應 RevenueIntegration.get_combined_fundamental_features）"""
+        ri = self.revenue_integration
+        try:
+            revenue_df = self.data_manager.get_monthly_revenue(stock_id)
+            prediction_features = ri.get_prediction_features(stock_id)
+        except Exception as e:
+            logger.warning(f"Failed to generate revenue features: {e}")
+            return None
+
+        n_samples = len(as_of_dts)
+        if revenue_df.empty:
+            default = ri._get_default_revenue_features()
+            return [{**default, **prediction_features} for _ in range(n_samples)]
+
+        revenue_df = revenue_df.reset_index(drop=True)
+        ym = (revenue_df['revenue_year'].astype(np.int64) * 12 + revenue_df['revenue_month'].astype(np.int64) - 1).to_numpy()
+        rev = pd.to_numeric(revenue_df['revenue'], errors='coerce').to_numpy(dtype=np.float64)
+        rev_month = revenue_df['date'].dt.month.to_numpy()
+
+        # 視窗：與 get_revenue_features 相同，回看 24 個月（以 30 天計）至預測月份
+        start_dts = [d - timedelta(days=24 * 30) for d in as_of_dts]
+        start_ym = np.array([d.year * 12 + d.month - 1 for d in start_dts])
+        end_ym = np.array([d.year * 12 + d.month - 1 for d in as_of_dts])
+        lo = np.searchsorted(ym, start_ym, side='left')
+        hi = np.maximum(np.searchsorted(ym, end_ym, side='right'), lo)
+        n = hi - lo
+        t = np.maximum(hi - 1, 0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rets = np.concatenate([[np.nan], rev[1:] / rev[:-1] - 1])
+        # 含缺值的視窗（pct_change/dropna 會改變位置）改用逐視窗計算
+        nan_in_window = _window_counts(np.isnan(rev), lo, hi) > 0
+        nan_ret_in_window = _window_counts(np.isnan(rets), np.minimum(lo + 1, hi), hi) > 0
+        fallback = nan_in_window | nan_ret_in_window
+
+        latest = rev[t]
+        columns = {'latest_revenue': latest}
+
+        def growth(period):
+            past = rev[np.maximum(t - period, 0)]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                value = np.where(past > 0, (latest - past) / past, 0.0)
+            return np.where(n > period, value, 0.0)
+
+        for period in self.revenue_config['yoy_periods']:
+            columns[f'revenue_yoy_{period}m'] = growth(period)
+        for period in self.revenue_config['mom_periods']:
+            columns[f'revenue_mom_{period}m'] = growth(period)
+
+        for period in self.revenue_config['ma_periods']:
+            ma = _rolling_last(rev, period, t, lambda w: w.mean(axis=1))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                to_ma = np.where(ma > 0, latest / ma - 1, 0.0)
+            valid = n >= period
+            columns[f'revenue_ma_{period}m'] = np.where(valid, ma, latest)
+            columns[f'revenue_to_ma_{period}m'] = np.where(valid, to_ma, 0.0)
+
+        # 波動性：視窗內 pct_change 去除首筆後取最後 volatility_window 筆
+        vol_window = self.revenue_config['volatility_window']
+        volatility = np.zeros(n_samples)
+        trend = np.zeros(n_samples)
+        enough = n >= vol_window
+        for count in (vol_window, vol_window - 1):
+            pick = enough & (np.minimum(n - 1, vol_window) == count)
+            if count > 1 and pick.any():
+                volatility[pick] = _rolling_last(rets, count, t[pick], lambda w: w.std(axis=1, ddof=1))
+                trend[pick] = _rolling_last(rets, count, t[pick], lambda w: w.mean(axis=1))
+        columns['revenue_volatility'] = volatility
+        columns['revenue_trend'] = trend
+
+        # 季節性：視窗內同月份營收平均 / 視窗營收平均
+        current_month = np.array([d.month for d in as_of_dts])
+        window_sum = _window_sums(rev, lo, hi)
+        seasonal = np.ones(n_samples)
+        for month in np.unique(current_month):
+            same = rev_month == month
+            pick = (current_month == month) & (n >= 12)
+            if not pick.any():
+                continue
+            same_count = _window_counts(same, lo[pick], hi[pick])
+            same_sum = _window_sums(np.where(same, rev, 0.0), lo[pick], hi[pick])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                factor = (same_sum / same_count) / (window_sum[pick] / n[pick])
+            seasonal[pick] = np.where(same_count > 1, factor, 1.0)
+        columns['seasonal_factor'] = seasonal
+
+        names = list(columns.keys())
+        matrix = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in names])
+        default = ri._get_default_revenue_features()
+
+        rows = []
+        for i, as_of_dt in enumerate(as_of_dts):
+            if n[i] == 0:
+                row = dict(default)
+            elif fallback[i]:
+                row = ri.compute_revenue_features(revenue_df.iloc[lo[i]:hi[i]].reset_index(drop=True), as_of_dt)
+            else:
+                row = {name: (0 if np.isnan(v) else v) for name, v in zip(names, matrix[i].tolist())}
+            row.update(prediction_features)
+            rows.append(row)
+        return rows
+
+    # ------------------------------------------------------------------
+    # 技術特徵
+    # ------------------------------------------------------------------
+    def _technical_features(self, prices: pd.DataFrame, as_of_dts: List[datetime], lookback_months: int):
+        """技術特徵（對應 PriceDataManager.get_price_features_for_prediction）"""
+        n_samples = len(as_of_dts)
+        if prices.empty:
+            return [{} for _ in range(n_samples)]
+
+        try:
+            indicators = self.price_manager.calculate_technical_indicators(prices)
+        except Exception as e:
+            logger.error(f"計算技術指標失敗: {e}")
+            return [{} for _ in range(n_samples)]
+
+        dates = _to_ns(prices['date'])
+        end_ns = _to_ns(as_of_dts)
+        start_ns = _to_ns([d - timedelta(days=lookback_months * 30) for d in as_of_dts])
+        lo = np.searchsorted(dates, start_ns, side='left')
+        hi = np.maximum(np.searchsorted(dates, end_ns, side='right'), lo)
+        n = hi - lo
+        t = np.maximum(hi - 1, 0)
+
+        # 視窗需足夠長、無缺值，且 EWM 不受視窗起點影響，整段序列的指標值才與逐視窗計算一致
+        close = pd.to_numeric(indicators['close'], errors='coerce').to_numpy(dtype=np.float64)
+        volume = pd.to_numeric(indicators['volume'], errors='coerce').to_numpy(dtype=np.float64)
+        min_rows = max(list(self.tech_config['ma_periods']) + [self.tech_config['volume_ma_period'],
+                                                               self.tech_config['rsi_period'] + 1,
+                                                               max(PRICE_CHANGE_PERIODS) + 1])
+        missing = _window_counts(np.isnan(close) | np.isnan(volume), lo, hi) > 0
+        saturated = (n >= min_rows) & ((lo == 0) | (n >= EWM_SATURATION_ROWS)) & ~missing
+
+        columns = {'current_price': close[t]}
+        for period in PRICE_CHANGE_PERIODS:
+            prev = close[np.maximum(t - period, 0)]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns[f'price_change_{period}d'] = np.where(n > period, (close[t] - prev) / prev, 0.0)
+        for name, default in INDICATOR_FEATURE_DEFAULTS:
+            if name in indicators.columns:
+                columns[name] = pd.to_numeric(indicators[name], errors='coerce').to_numpy(dtype=np.float64)[t]
+            else:
+                columns[name] = np.full(n_samples, float(default))
+
+        names = list(columns.keys())
+        matrix = np.column_stack([columns[name] for name in names])
+
+        rows = []
+        for i in range(n_samples):
+            if n[i] == 0:
+                rows.append({})
+            elif saturated[i]:
+                rows.append({name: (0 if np.isnan(v) else v) for name, v in zip(names, matrix[i].tolist())})
+            else:
+                window = prices.iloc[lo[i]:hi[i]].reset_index(drop=True)
+                rows.append(self.price_manager.extract_prediction_features(window))
+        return rows
+
+    # ------------------------------------------------------------------
+    # 標籤
+    # ------------------------------------------------------------------
+    def _targets(self, prices: pd.DataFrame, as_of_dts: List[datetime], target_periods: List[int]):
+        """未來報酬標籤（對應 FeatureEngineer._generate_targets）"""
+        n_samples = len(as_of_dts)
+        result = {f'target_{period}d': np.zeros(n_samples) for period in target_periods}
+
+        if not prices.empty and target_periods:
+            dates = _to_ns(prices['date'])
+            close = pd.to_numeric(prices['close'], errors='coerce').to_numpy(dtype=np.float64)
+            as_of_ns = _to_ns(as_of_dts)
+            # calculate_future_returns 取 [as_of, as_of + max(期間)+30天] 的資料
+            extended_ns = _to_ns([d + timedelta(days=max(target_periods) + 30) for d in as_of_dts])
+
+            # 只有預測日本身為交易日時才有標籤
+            idx = np.searchsorted(dates, as_of_ns, side='left')
+            in_range = idx < len(dates)
+            exact = in_range & (dates[np.minimum(idx, len(dates) - 1)] == as_of_ns)
+
+            for period in target_periods:
+                future_idx = idx + period
+                valid = exact & (future_idx < len(dates))
+                safe_future = np.minimum(future_idx, len(dates) - 1)
+                valid &= dates[safe_future] <= extended_ns
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    raw = close[safe_future] / close[np.minimum(idx, len(dates) - 1)] - 1
+                clean = np.where(np.isfinite(raw), np.clip(raw, -1.0, 1.0), 0.0)
+                result[f'target_{period}d'] = np.where(valid, clean, 0.0)
+
+        return [{name: float(values[i]) for name, values in result.items()} for i in range(n_samples)]
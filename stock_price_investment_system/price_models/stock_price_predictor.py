@@ -109,7 +109,9 @@ class StockPricePredictor:
               feature_df: pd.DataFrame,
               target_df: pd.DataFrame,
               target_column: str = 'target_20d',
-              validation_split: float = 0.2) -> Dict[str, Any]:
+              validation_split: float = 0.2,
+              warm_start: bool = False,
+              warm_start_rounds: Optional[int] = None) -> Dict[str, Any]:
         """
         訓練模型
         
@@ -118,12 +120,91 @@ class StockPricePredictor:
             target_df: 目標DataFrame
             target_column: 目標欄位名稱
             validation_split: 驗證集比例
+            warm_start: 已訓練的 XGBoost/LightGBM 模型是否接續既有樹繼續訓練（而非重新擬合）
+            warm_start_rounds: 接續訓練時新增的樹數量（None 表示沿用 n_estimators）
             
         Returns:
             訓練結果字典
         """
         logger.debug(f"Training model with {len(feature_df)} samples")
+
+        X, y, feature_columns = self._prepare_training_matrices(feature_df, target_df, target_column)
+
+        # 接續訓練需要特徵欄位與上次相同
+        can_warm_start = (
+            warm_start and self.is_trained and self._supports_warm_start()
+            and self.feature_names == feature_columns
+        )
+
+        # 儲存特徵名稱
+        self.feature_names = feature_columns
+        
+        # 分割訓練和驗證集
+        split_idx = int(len(X) * (1 - validation_split))
+        X_train, X_val = X[:split_idx], X[split_idx:]
+        y_train, y_val = y[:split_idx], y[split_idx:]
         
+        # 建立和訓練模型（如果還沒有模型的話）
+        if self.model is None:
+            self.model = self.create_model()
+            logger.debug("創建新模型")
+        else:
+            logger.debug("使用現有模型（可能來自超參數調優）")
+        
+        try:
+            if can_warm_start:
+                self._fit_warm_start(X_train, y_train, warm_start_rounds)
+            else:
+                self.model.fit(X_train, y_train)
+            self.is_trained = True
+            
+            # 驗證模型
+            train_pred = self.model.predict(X_train)
+            val_pred = self.model.predict(X_val)
+            
+            # 計算評估指標
+            train_metrics = self._calculate_metrics(y_train, train_pred)
+            val_metrics = self._calculate_metrics(y_val, val_pred)
+            
+            # 交叉驗證
+            cv_scores = cross_val_score(self.model, X_train, y_train, cv=5, scoring='r2')
+            
+            result = {
+                'success': True,
+                'model_type': self.model_type,
+                'training_samples': len(X_train),
+                'validation_samples': len(X_val),
+                'feature_count': len(feature_columns),
+                'train_metrics': train_metrics,
+                'validation_metrics': val_metrics,
+                'cv_r2_mean': cv_scores.mean(),
+                'cv_r2_std': cv_scores.std(),
+                'feature_names': feature_columns
+            }
+            
+            logger.debug(f"Model training completed successfully")
+            logger.debug(f"Validation R²: {val_metrics['r2']:.4f}, RMSE: {val_metrics['rmse']:.4f}")
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Model training failed: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'model_type': self.model_type
+            }
+    
+    def _prepare_training_matrices(self,
+                                   feature_df: pd.DataFrame,
+                                   target_df: pd.DataFrame,
+                                   target_column: str = 'target_20d') -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        合併特徵與目標並清理，產生訓練用矩陣
+
+        Returns:
+            (特徵矩陣X, 目標向量y, 特徵欄位名稱)
+        """
         # 合併特徵和目標
         merged_df = feature_df.merge(
             target_df[['stock_id', 'as_of_date', target_column]],
@@ -183,63 +264,33 @@ class StockPricePredictor:
                 if len(y) == 0:
                     logger.error("清理後沒有有效的訓練樣本")
                     raise ValueError("No valid training samples after cleaning target variable")
-        
-        # 儲存特徵名稱
-        self.feature_names = feature_columns
-        
-        # 分割訓練和驗證集
-        split_idx = int(len(X) * (1 - validation_split))
-        X_train, X_val = X[:split_idx], X[split_idx:]
-        y_train, y_val = y[:split_idx], y[split_idx:]
-        
-        # 建立和訓練模型（如果還沒有模型的話）
-        if self.model is None:
-            self.model = self.create_model()
-            logger.debug("創建新模型")
-        else:
-            logger.debug("使用現有模型（可能來自超參數調優）")
-        
+
+        return X, y, feature_columns
+
+    def _supports_warm_start(self) -> bool:
+        """目前模型是否可接續訓練（僅 XGBoost / LightGBM）"""
+        if XGBOOST_AVAILABLE and isinstance(self.model, xgb.XGBRegressor):
+            return True
+        if LIGHTGBM_AVAILABLE and isinstance(self.model, lgb.LGBMRegressor):
+            return True
+        return False
+
+    def _fit_warm_start(self, X_train: np.ndarray, y_train: np.ndarray, rounds: Optional[int] = None):
+        """以既有 booster 為起點繼續訓練（XGBoost: xgb_model / LightGBM: init_model）"""
+        original_estimators = self.model.get_params().get('n_estimators')
+        if rounds:
+            self.model.set_params(n_estimators=int(rounds))
+
         try:
-            self.model.fit(X_train, y_train)
-            self.is_trained = True
-            
-            # 驗證模型
-            train_pred = self.model.predict(X_train)
-            val_pred = self.model.predict(X_val)
-            
-            # 計算評估指標
-            train_metrics = self._calculate_metrics(y_train, train_pred)
-            val_metrics = self._calculate_metrics(y_val, val_pred)
-            
-            # 交叉驗證
-            cv_scores = cross_val_score(self.model, X_train, y_train, cv=5, scoring='r2')
-            
-            result = {
-                'success': True,
-                'model_type': self.model_type,
-                'training_samples': len(X_train),
-                'validation_samples': len(X_val),
-                'feature_count': len(feature_columns),
-                'train_metrics': train_metrics,
-                'validation_metrics': val_metrics,
-                'cv_r2_mean': cv_scores.mean(),
-                'cv_r2_std': cv_scores.std(),
-                'feature_names': feature_columns
-            }
-            
-            logger.debug(f"Model training completed successfully")
-            logger.debug(f"Validation R²: {val_metrics['r2']:.4f}, RMSE: {val_metrics['rmse']:.4f}")
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Model training failed: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'model_type': self.model_type
-            }
-    
+            if XGBOOST_AVAILABLE and isinstance(self.model, xgb.XGBRegressor):
+                self.model.fit(X_train, y_train, xgb_model=self.model.get_booster())
+            else:
+                self.model.fit(X_train, y_train, init_model=self.model.booster_)
+        finally:
+            # 還原 n_estimators，避免影響之後的完整重新訓練
+            self.model.set_params(n_estimators=original_estimators)
+        logger.debug(f"{self.model_type} 接續訓練完成")
+
     def predict(self, 
                 stock_id: str,
                 as_of_date: str,
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+股價預測與投資建議系統 - 停損停利網格模擬器
+Stock Price Investment System - Stop-loss / Take-profit Grid Simulator
+
+每筆交易只依賴持有期間的最大 / 最小報酬與到期報酬，因此先把交易轉成陣列，
+再以 NumPy 廣播一次算出整個 停損 × 停利 網格的勝率、總報酬與最大回撤。
+"""
+
+from typing import Any, Dict, List, Sequence
+import ast
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COST_RATE = 0.007
+
+EXIT_REASONS = ('take_profit', 'stop_loss', 'normal')
+
+
+def _column_values(trades_df: pd.DataFrame, columns: Sequence[str], default: Any) -> np.ndarray:
+    """依序取第一個存在的欄位（與 row.get(a, row.get(b, default)) 相同）"""
+    for column in columns:
+        if column in trades_df.columns:
+            return trades_df[column].to_numpy()
+    return np.full(len(trades_df), default, dtype=object)
+
+
+def _cost_rate(transaction_costs: Any) -> float:
+    """解析交易成本（CSV 讀回時可能是字串）"""
+    if isinstance(transaction_costs, str):
+        try:
+            transaction_costs = ast.literal_eval(transaction_costs)
+        except Exception:
+            transaction_costs = {}
+    return transaction_costs.get('total_cost_rate', DEFAULT_COST_RATE) if isinstance(transaction_costs, dict) else DEFAULT_COST_RATE
+
+
+class StopLevelGrid:
+    """停損停利網格模擬器"""
+
+    def __init__(self, trades_df: pd.DataFrame):
+        """
+        將交易記錄轉為陣列（每筆交易的成本字串只解析一次）
+
+        Args:
+            trades_df: 交易記錄，需含 max_return_20d/max_return、min_return_20d/min_return、actual_return
+        """
+        self.stock_ids = _column_values(trades_df, ['stock_id'], '')
+        self.entry_dates = _column_values(trades_df, ['entry_date'], '')
+        self.raw_max = _column_values(trades_df, ['max_return_20d', 'max_return'], 0)
+        self.raw_min = _column_values(trades_df, ['min_return_20d', 'min_return'], 0)
+        self.raw_actual = _column_values(trades_df, ['actual_return'], 0)
+
+        self.max_returns = pd.to_numeric(pd.Series(self.raw_max), errors='coerce').to_numpy(dtype=float)
+        self.min_returns = pd.to_numeric(pd.Series(self.raw_min), errors='coerce').to_numpy(dtype=float)
+        self.actual_returns = pd.to_numeric(pd.Series(self.raw_actual), errors='coerce').to_numpy(dtype=float)
+
+        costs = _column_values(trades_df, ['transaction_costs'], None)
+        self.cost_rates = np.array([_cost_rate(c) for c in costs], dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.actual_returns)
+
+    def simulate(self, stop_losses: Sequence[float], take_profits: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        一次計算整個網格
+
+        Args:
+            stop_losses: 停損比例清單（正數，例如 0.05 表示 -5%）
+            take_profits: 停利比例清單
+
+        Returns:
+            'net_returns' 形狀為 (停損數, 停利數, 交易數)，'exit_codes' 同形狀
+            （0=停利、1=停損、2=到期），其餘指標形狀為 (停損數, 停利數)
+        """
+        sl = np.asarray(stop_losses, dtype=float)[:, None, None]
+        tp = np.asarray(take_profits, dtype=float)[None, :, None]
+
+        # 停利優先於停損（與逐筆判斷順序相同）
+        tp_hit = self.max_returns[None, None, :] >= tp
+        sl_hit = self.min_returns[None, None, :] <= -sl
+        tp_hit, sl_hit = np.broadcast_arrays(tp_hit, sl_hit)
+
+        gross = np.where(tp_hit, tp, np.where(sl_hit, -sl, self.actual_returns[None, None, :]))
+        net_returns = gross - self.cost_rates
+        exit_codes = np.where(tp_hit, 0, np.where(sl_hit, 1, 2)).astype(np.int8)
+
+        valid = ~np.isnan(net_returns)
+        valid_count = valid.sum(axis=-1)
+        total_trades = net_returns.shape[-1]
+        winning_trades = (net_returns > 0).sum(axis=-1)
+        total_return = np.where(valid, net_returns, 0.0).sum(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_return = np.where(valid_count > 0, total_return / valid_count, np.nan)
+
+        return {
+            'net_returns': net_returns,
+            'exit_codes': exit_codes,
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'win_rate': winning_trades / total_trades if total_trades > 0 else np.zeros_like(total_return),
+            'avg_return': avg_return,
+            'total_return': total_return,
+            'max_drawdown': self._max_drawdown(net_returns, valid),
+        }
+
+    @staticmethod
+    def _max_drawdown(net_returns: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """沿交易順序的最大回撤（NaN 報酬略過，與 pandas cumprod/expanding 相同）"""
+        growth = np.where(valid, 1 + net_returns, 1.0)
+        cumulative = np.cumprod(growth, axis=-1)
+        running_max = np.maximum.accumulate(cumulative, axis=-1)
+        drawdowns = np.where(valid, (cumulative - running_max) / running_max, np.nan)
+        worst = np.where(valid, drawdowns, np.inf).min(axis=-1)
+        return np.where(valid.any(axis=-1), np.abs(worst), np.nan)
+
+    def results(self,
+                stop_losses: Sequence[float],
+                take_profits: Sequence[float],
+                include_trades: bool = True) -> List[List[Dict[str, Any]]]:
+        """
+        以網格計算結果組出與 HoldoutBacktester._simulate_stop_levels 相同格式的字典
+
+        Returns:
+            results[i][j] 對應 (stop_losses[i], take_profits[j])
+        """
+        grid = self.simulate(stop_losses, take_profits)
+        exit_counts = np.stack([(grid['exit_codes'] == code).sum(axis=-1) for code in range(len(EXIT_REASONS))], axis=-1)
+
+        output = []
+        for i in range(len(stop_losses)):
+            row = []
+            for j in range(len(take_profits)):
+                row.append(self._pair_result(grid, exit_counts, i, j, include_trades))
+            output.append(row)
+        return output
+
+    def _pair_result(self, grid: Dict[str, np.ndarray], exit_counts: np.ndarray,
+                     i: int, j: int, include_trades: bool) -> Dict[str, Any]:
+        total_trades = grid['total_trades']
+        if total_trades == 0:
+            return {
+                'total_trades': 0,
+                'winning_trades': 0,
+                'win_rate': 0,
+                'avg_return': 0,
+                'total_return': 0,
+                'max_drawdown': 0,
+                'exit_reasons': {},
+                'simulated_trades': []
+            }
+
+        # 出場原因依次數由多到少（同 value_counts）
+        counts = [(EXIT_REASONS[k], int(exit_counts[i, j, k])) for k in range(len(EXIT_REASONS))]
+        exit_reasons = dict(sorted([c for c in counts if c[1] > 0], key=lambda c: -c[1]))
+
+        winning_trades = int(grid['winning_trades'][i, j])
+        result = {
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'win_rate': winning_trades / total_trades,
+            'avg_return': float(grid['avg_return'][i, j]),
+            'total_return': float(grid['total_return'][i, j]),
+            'max_drawdown': float(grid['max_drawdown'][i, j]),
+            'exit_reasons': exit_reasons,
+            'simulated_trades': []
+        }
+
+        if include_trades:
+            net_returns = grid['net_returns'][i, j]
+            exit_codes = grid['exit_codes'][i, j]
+            result['simulated_trades'] = [
+                {
+                    'stock_id': stock_id,
+                    'entry_date': entry_date,
+                    'original_return': original_return,
+                    'simulated_return': float(net_return),
+                    'exit_reason': EXIT_REASONS[code],
+                    'max_return': max_return,
+                    'min_return': min_return
+                }
+                for stock_id, entry_date, original_return, net_return, code, max_return, min_return in zip(
+                    self.stock_ids, self.entry_dates, self.raw_actual, net_returns,
+                    exit_codes, self.raw_max, self.raw_min
+                )
+            ]
+
+        return result
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+股價預測與投資建議系統 - 批次停損停利交易模擬器
+Stock Price Investment System - Batched Stop-loss Trade Simulator
+
+一次接收整批交易（例如一個月或整段回測），每檔股票只讀取一次涵蓋所有進場日的
+日線，將每筆交易持有期間的價格排成 (交易數, 持有交易日數+1) 的矩陣，再以向量化
+運算找出第一個觸及停利 / 停損 / 到期的交易日。
+"""
+
+from typing import Sequence, Union
+import logging
+
+import numpy as np
+import pandas as pd
+
+from ..data.data_manager import DataManager
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = [
+    'stock_id', 'entry_date', 'entry_price', 'exit_date', 'exit_price', 'exit_reason',
+    'holding_days', 'max_return_20d', 'min_return_20d'
+]
+
+
+class StopLossTradeSimulator:
+    """批次停損停利交易模擬器"""
+
+    def __init__(self, data_manager: DataManager, holding_days: int = 20, window_days: int = 30):
+        """
+        初始化模擬器
+
+        Args:
+            data_manager: 資料管理器（啟用股價快取時不會再查詢SQLite）
+            holding_days: 最多持有交易日數
+            window_days: 進場後讀取價格的日曆天數（需足以涵蓋 holding_days 個交易日）
+        """
+        self.dm = data_manager
+        self.holding_days = holding_days
+        self.window_days = window_days
+
+    def simulate(self,
+                 trades: pd.DataFrame,
+                 stop_loss: Union[float, Sequence[float]],
+                 take_profit: Union[float, Sequence[float]],
+                 price_basis: str = 'close') -> pd.DataFrame:
+        """
+        模擬整批交易的出場
+
+        Args:
+            trades: 需含 stock_id、entry_date (YYYY-MM-DD)、entry_price
+            stop_loss: 停損比例（正數；可為每筆交易各自的陣列）
+            take_profit: 停利比例（可為陣列）
+            price_basis: 'close' 以收盤價判斷（與逐日收盤檢查相同）；
+                         'high_low' 以盤中最高 / 最低價判斷觸價，並以觸價價格出場
+
+        Returns:
+            與 trades 同順序的 DataFrame，欄位見 RESULT_COLUMNS；
+            持有期間價格不足2筆時 exit_reason 為 'no_data'
+        """
+        if trades.empty:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+
+        n = len(trades)
+        width = self.holding_days + 1
+        entry_prices = trades['entry_price'].to_numpy(dtype=float)
+        stop_loss = np.broadcast_to(np.asarray(stop_loss, dtype=float), (n,))
+        take_profit = np.broadcast_to(np.asarray(take_profit, dtype=float), (n,))
+
+        bars = self._load_bars(trades, width)
+        exists = bars['exists']
+        bar_count = exists.sum(axis=1)
+
+        if price_basis == 'high_low':
+            exit_idx, reasons, exit_prices, max_returns, min_returns = self._first_touch_high_low(
+                bars, entry_prices, stop_loss, take_profit)
+        else:
+            exit_idx, reasons, exit_prices, max_returns, min_returns = self._first_touch_close(
+                bars, entry_prices, stop_loss, take_profit)
+
+        no_data = bar_count < 2
+        exit_dates = bars['dates'][np.arange(n), exit_idx]
+
+        result = pd.DataFrame({
+            'stock_id': trades['stock_id'].to_numpy(),
+            'entry_date': trades['entry_date'].to_numpy(),
+            'entry_price': entry_prices,
+            'exit_date': np.where(no_data, None, exit_dates),
+            'exit_price': np.where(no_data, np.nan, exit_prices),
+            'exit_reason': np.where(no_data, 'no_data', reasons),
+            'holding_days': np.where(no_data, 0, exit_idx),
+            'max_return_20d': np.where(no_data, np.nan, max_returns),
+            'min_return_20d': np.where(no_data, np.nan, min_returns),
+        })
+        return result
+
+    def _load_bars(self, trades: pd.DataFrame, width: int) -> dict:
+        """每檔股票讀取一次日線，排成 (交易數, width) 的價格矩陣（不足處為 NaN）"""
+        n = len(trades)
+        dates = np.full((n, width), None, dtype=object)
+        exists = np.zeros((n, width), dtype=bool)
+        prices = {col: np.full((n, width), np.nan) for col in ('open', 'high', 'low', 'close')}
+
+        entry_ts = pd.to_datetime(trades['entry_date']).to_numpy(dtype='datetime64[ns]')
+        end_ts = entry_ts + np.timedelta64(self.window_days, 'D')
+
+        for stock_id, positions in trades.groupby('stock_id', sort=False).indices.items():
+            start = pd.Timestamp(entry_ts[positions].min()).strftime('%Y-%m-%d')
+            end = pd.Timestamp(end_ts[positions].max()).strftime('%Y-%m-%d')
+
+            try:
+                price_df = self.dm.get_stock_prices(stock_id, start, end)
+            except Exception as e:
+                logger.warning(f"獲取 {stock_id} 價格序列失敗: {e}")
+                continue
+            if price_df is None or price_df.empty or 'close' not in price_df.columns:
+                continue
+
+            price_df = price_df.sort_values('date')
+            stock_dates = pd.to_datetime(price_df['date']).to_numpy(dtype='datetime64[ns]')
+            date_strings = pd.to_datetime(price_df['date']).dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+            columns = {col: pd.to_numeric(price_df[col], errors='coerce').to_numpy(dtype=float)
+                       if col in price_df.columns else np.full(len(price_df), np.nan)
+                       for col in prices}
+
+            lo = np.searchsorted(stock_dates, entry_ts[positions], side='left')
+            hi = np.searchsorted(stock_dates, end_ts[positions], side='right')
+
+            for row, start_idx, stop_idx in zip(positions, lo, hi):
+                count = min(stop_idx - start_idx, width)
+                if count <= 0:
+                    continue
+                dates[row, :count] = date_strings[start_idx:start_idx + count]
+                exists[row, :count] = True
+                for col, values in columns.items():
+                    prices[col][row, :count] = values[start_idx:start_idx + count]
+
+        return {'dates': dates, 'exists': exists, **prices}
+
+    def _first_touch_close(self, bars: dict, entry_prices: np.ndarray,
+                           stop_loss: np.ndarray, take_profit: np.ndarray):
+        """以收盤價逐日檢查：停利優先於停損，最多持有 holding_days 個交易日"""
+        exists = bars['exists'][:, 1:]
+        returns = (bars['close'][:, 1:] - entry_prices[:, None]) / entry_prices[:, None]
+
+        hit_tp = returns >= take_profit[:, None]
+        hit_sl = returns <= -stop_loss[:, None]
+        expired = exists & (np.arange(1, exists.shape[1] + 1) >= self.holding_days)
+
+        exit_idx, reasons = self._resolve_exit(exists, hit_tp, hit_sl, expired)
+        rows = np.arange(len(entry_prices))
+        exit_prices = bars['close'][rows, exit_idx]
+
+        held = self._held_mask(exists, exit_idx)
+        # 逐日收盤的最大 / 最小報酬（略過缺值，起始為0）
+        max_returns = np.fmax.reduce(np.where(held, returns, -np.inf), axis=1, initial=0.0)
+        min_returns = np.fmin.reduce(np.where(held, returns, np.inf), axis=1, initial=0.0)
+        return exit_idx, reasons, exit_prices, max_returns, min_returns
+
+    def _first_touch_high_low(self, bars: dict, entry_prices: np.ndarray,
+                              stop_loss: np.ndarray, take_profit: np.ndarray):
+        """
+        以盤中最高 / 最低價檢查觸價
+
+        同一交易日同時觸及停利與停損時無法得知先後，保守視為先停損；
+        開盤即跳空越過價位時以開盤價出場。
+        """
+        exists = bars['exists'][:, 1:]
+        entry = entry_prices[:, None]
+        tp_level = entry * (1 + take_profit[:, None])
+        sl_level = entry * (1 - stop_loss[:, None])
+
+        high = bars['high'][:, 1:]
+        low = bars['low'][:, 1:]
+        opens = bars['open'][:, 1:]
+        closes = bars['close'][:, 1:]
+
+        hit_tp = high >= tp_level
+        hit_sl = low <= sl_level
+        # 同日同時觸及時以停損處理
+        hit_tp = hit_tp & ~hit_sl
+        expired = exists & (np.arange(1, exists.shape[1] + 1) >= self.holding_days)
+
+        exit_idx, reasons = self._resolve_exit(exists, hit_tp, hit_sl, expired)
+        rows = np.arange(len(entry_prices))
+        col = exit_idx - 1
+
+        exit_open = opens[rows, col]
+        tp_price = np.where(exit_open >= tp_level[:, 0], exit_open, tp_level[:, 0])
+        sl_price = np.where(exit_open <= sl_level[:, 0], exit_open, sl_level[:, 0])
+        exit_prices = np.select(
+            [reasons == 'take_profit', reasons == 'stop_loss'],
+            [tp_price, sl_price],
+            default=closes[rows, col]
+        )
+
+        held = self._held_mask(exists, exit_idx)
+        max_returns = np.fmax.reduce(np.where(held, (high - entry) / entry, -np.inf), axis=1, initial=0.0)
+        min_returns = np.fmin.reduce(np.where(held, (low - entry) / entry, np.inf), axis=1, initial=0.0)
+        return exit_idx, reasons, exit_prices, max_returns, min_returns
+
+    @staticmethod
+    def _resolve_exit(exists: np.ndarray, hit_tp: np.ndarray, hit_sl: np.ndarray, expired: np.ndarray):
+        """找出第一個出場事件；皆未觸發時以最後一個交易日出場"""
+        event = hit_tp | hit_sl | expired
+        has_event = event.any(axis=1)
+        first = event.argmax(axis=1)
+        rows = np.arange(exists.shape[0])
+
+        last_bar = np.maximum(exists.sum(axis=1), 1)
+        exit_idx = np.where(has_event, first + 1, last_bar)
+
+        reasons = np.where(
+            has_event & hit_tp[rows, first], 'take_profit',
+            np.where(has_event & hit_sl[rows, first], 'stop_loss', 'normal')
+        ).astype(object)
+        return exit_idx, reasons
+
+    @staticmethod
+    def _held_mask(exists: np.ndarray, exit_idx: np.ndarray) -> np.ndarray:
+        """持有期間（第1個交易日到出場日，含）的遮罩"""
+        return exists & (np.arange(1, exists.shape[1] + 1)[None, :] <= exit_idx[:, None])
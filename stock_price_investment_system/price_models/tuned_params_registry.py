@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+股價預測與投資建議系統 - 已調優參數註冊表
+Stock Price Investment System - Tuned Parameters Registry
+
+tuned_stocks_registry.csv 仍是唯一的資料來源（CLI 與手動編輯都沿用），本模組在
+行程內保留解析後的索引：
+- 讀取：以檔案 (mtime, size) 判斷是否需要重新載入，參數字串只解析一次，
+  (stock_id, model_type) 與 stock_id 的最佳記錄皆為 O(1) 查詢
+- 寫入：以鎖檔互斥「讀取 → 更新 → 寫入暫存檔 → os.replace」，
+  多個平行調優行程同時寫入也不會互相覆蓋或產生半寫入的檔案
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+from contextlib import contextmanager
+from pathlib import Path
+import ast
+import logging
+import math
+import os
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_stock_id(stock_id: Any) -> str:
+    """統一股票代碼格式（CSV 讀回時數字代碼會變成整數，與原比較方式一致）"""
+    if isinstance(stock_id, float) and stock_id.is_integer():
+        return str(int(stock_id))
+    try:
+        return str(int(stock_id))
+    except (TypeError, ValueError):
+        return str(stock_id).strip()
+
+
+class TunedParamsRegistry:
+    """已調優參數註冊表（記憶體索引 + 檔案鎖更新）"""
+
+    def __init__(self, registry_file: Path, lock_timeout: float = 30.0, stale_lock_seconds: float = 120.0):
+        """
+        初始化註冊表
+
+        Args:
+            registry_file: tuned_stocks_registry.csv 路徑
+            lock_timeout: 等待鎖檔的最長秒數
+            stale_lock_seconds: 鎖檔超過此秒數視為殘留（寫入行程異常結束）並移除
+        """
+        self.registry_file = Path(registry_file)
+        self.lock_file = self.registry_file.with_name(self.registry_file.name + '.lock')
+        self.lock_timeout = lock_timeout
+        self.stale_lock_seconds = stale_lock_seconds
+
+        self._lock = threading.RLock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._df = pd.DataFrame()
+        # (stock_id, model_type) -> 最佳記錄；stock_id -> 最佳記錄
+        self._best_by_model: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._best_by_stock: Dict[str, Dict[str, Any]] = {}
+
+    # ------------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------------
+    def get_dataframe(self) -> pd.DataFrame:
+        """取得註冊表內容（與 pd.read_csv 讀取結果相同的副本）"""
+        with self._lock:
+            self._refresh()
+            return self._df.copy()
+
+    def get_best_params(self, stock_id: str, model_type: str) -> Optional[Dict[str, Any]]:
+        """取得 (stock_id, model_type) 分數最高的成功記錄參數"""
+        with self._lock:
+            self._refresh()
+            record = self._best_by_model.get((normalize_stock_id(stock_id), model_type))
+        return self._record_params(record)
+
+    def get_best_model_and_params(self, stock_id: str) -> Optional[Dict[str, Any]]:
+        """取得該股票所有模型中分數最高的成功記錄"""
+        with self._lock:
+            self._refresh()
+            record = self._best_by_stock.get(normalize_stock_id(stock_id))
+
+        params = self._record_params(record)
+        if params is None:
+            return None
+
+        return {
+            'model_type': record['model_type'],
+            'params': params,
+            'score': record['score'],
+            'success': True
+        }
+
+    def _record_params(self, record: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if record is None:
+            return None
+        if record['params'] is None:
+            logger.error(f"解析參數字串失敗: {record['params_str']}")
+            return None
+        return dict(record['params'])
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.registry_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """檔案有變動（或首次讀取）時重新載入並重建索引"""
+        signature = self._file_signature()
+        if signature is not None and signature == self._signature:
+            return
+
+        if signature is None:
+            df = pd.DataFrame()
+        else:
+            try:
+                df = pd.read_csv(self.registry_file, encoding='utf-8-sig')
+            except Exception as e:
+                logger.warning(f"讀取已調優股票註冊表失敗: {e}")
+                df = pd.DataFrame()
+
+        self._set_dataframe(df, signature)
+
+    def _set_dataframe(self, df: pd.DataFrame, signature: Optional[Tuple[int, int]]):
+        self._df = df
+        self._signature = signature
+        self._best_by_model = {}
+        self._best_by_stock = {}
+
+        if df.empty or not {'股票代碼', '模型類型', '最佳分數', '是否成功', '最佳參數'}.issubset(df.columns):
+            return
+
+        for row in df[df['是否成功'] == '成功'].to_dict('records'):
+            score = row['最佳分數']
+            if score is None or (isinstance(score, float) and math.isnan(score)):
+                continue
+
+            stock_id = normalize_stock_id(row['股票代碼'])
+            model_type = row['模型類型']
+            record = {
+                'model_type': model_type,
+                'score': float(score),
+                'params_str': row['最佳參數'],
+                'params': self._parse_params(row['最佳參數'])
+            }
+
+            # 同分時保留先出現者（與 DataFrame.idxmax 相同）
+            current = self._best_by_model.get((stock_id, model_type))
+            if current is None or record['score'] > current['score']:
+                self._best_by_model[(stock_id, model_type)] = record
+            current = self._best_by_stock.get(stock_id)
+            if current is None or record['score'] > current['score']:
+                self._best_by_stock[stock_id] = record
+
+    @staticmethod
+    def _parse_params(params_str: Any) -> Optional[Dict[str, Any]]:
+        try:
+            params = ast.literal_eval(params_str)
+        except Exception:
+            return None
+        return params if isinstance(params, dict) else None
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+    def upsert(self, record: Dict[str, Any]) -> bool:
+        """
+        新增或更新一筆 (股票代碼, 模型類型) 記錄
+
+        在鎖內重新讀取檔案後再合併，並以暫存檔 + os.replace 原子性寫回
+
+        Returns:
+            True 表示更新既有記錄，False 表示新增
+        """
+        with self._lock, self._file_lock():
+            # 持有鎖後一律重新讀取，避免漏掉其他行程剛寫入的內容
+            self._signature = None
+            self._refresh()
+            df = self._df.copy()
+
+            stock_id = normalize_stock_id(record['股票代碼'])
+            if not df.empty and {'股票代碼', '模型類型'}.issubset(df.columns):
+                mask = (df['股票代碼'].map(normalize_stock_id) == stock_id) & \
+                       (df['模型類型'] == record['模型類型'])
+            else:
+                mask = pd.Series(False, index=df.index)
+
+            existed = bool(mask.any())
+            if existed:
+                for col, val in record.items():
+                    if col not in df.columns:
+                        df[col] = None
+                    df[col] = df[col].astype(object)
+                    df.loc[mask, col] = val
+            else:
+                df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
+
+            self._write(df)
+            return existed
+
+    def _write(self, df: pd.DataFrame):
+        self.registry_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.registry_file.with_name(f"{self.registry_file.name}.{os.getpid()}.tmp")
+        df.to_csv(tmp_file, index=False, encoding='utf-8-sig')
+        os.replace(tmp_file, self.registry_file)
+        # 重新讀回，使記憶體內容（含欄位型別）與其他行程讀到的一致
+        self._signature = None
+        self._refresh()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """跨行程互斥鎖（以 O_EXCL 建立鎖檔，Windows / Linux 皆適用）"""
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + self.lock_timeout
+
+        while True:
+            try:
+                fd = os.open(str(self.lock_file), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_file.stat().st_mtime > self.stale_lock_seconds:
+                        logger.warning(f"移除殘留的註冊表鎖檔: {self.lock_file}")
+                        self.lock_file.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"等待註冊表鎖檔逾時: {self.lock_file}")
+                time.sleep(0.05)
+
+        try:
+            yield
+        finally:
+            try:
+                self.lock_file.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_registries: Dict[str, TunedParamsRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_tuned_params_registry(registry_file: Path) -> TunedParamsRegistry:
+    """取得指定註冊表檔案的共用實例（同一行程內共用索引）"""
+    key = str(Path(registry_file).resolve())
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = TunedParamsRegistry(registry_file)
+            _registries[key] = registry
+        return registry
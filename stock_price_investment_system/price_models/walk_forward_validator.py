@@ -6,9 +6,11 @@ Stock Price Investment System - Walk-forward Validator
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import logging
+import os
 from pathlib import Path
 import json
 
@@ -18,6 +20,21 @@ from ..config.settings import get_config
 
 logger = logging.getLogger(__name__)
 
+# 子行程內的驗證器副本（由 _init_worker 設定）
+_worker_validator = None
+
+
+def _init_worker(validator: 'WalkForwardValidator'):
+    """行程池初始化：每個子行程保留一份驗證器"""
+    global _worker_validator
+    _worker_validator = validator
+
+
+def _run_stock_unit_in_worker(stock_id: str, fold_info: Dict[str, str], fold_idx: int) -> Dict[str, Any]:
+    """在子行程中執行單一 (fold, 股票) 單元"""
+    return _worker_validator._run_stock_unit(stock_id, fold_info, fold_idx)
+
+
 class WalkForwardValidator:
     """Walk-forward驗證器 - 實作內層滾動驗證"""
 
@@ -93,7 +110,9 @@ class WalkForwardValidator:
                       test_window_months: int = None,
                       stride_months: int = None,
                       models_to_use: Optional[List[str]] = None,
-                      override_models: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+                      override_models: Optional[Dict[str, Dict[str, Any]]] = None,
+                      n_jobs: Optional[int] = None,
+                      progress_callback: Optional[Callable[[int, int, int, str], None]] = None) -> Dict[str, Any]:
         """
         執行Walk-forward驗證
 
@@ -108,6 +127,8 @@ class WalkForwardValidator:
             train_window_months: 訓練視窗月數
             test_window_months: 測試視窗月數
             stride_months: 步長月數
+            n_jobs: 平行行程數（None 時依設定檔 walkforward.n_jobs，-1 使用全部CPU，1 為循序執行）
+            progress_callback: 每完成一個 (fold, 股票) 單元呼叫一次 callback(完成數, 總數, fold_idx, stock_id)
 
         Returns:
             驗證結果字典
@@ -133,15 +154,32 @@ class WalkForwardValidator:
 
         # 執行每個fold
         self.fold_results = []
+        n_jobs = self._resolve_n_jobs(n_jobs, len(folds) * len(stock_ids))
+        total_units = len(folds) * len(stock_ids)
+        completed = [0]
+
+        def report_progress(fold_idx: int, stock_id: str):
+            completed[0] += 1
+            if progress_callback:
+                progress_callback(completed[0], total_units, fold_idx, stock_id)
+
+        if n_jobs > 1:
+            logger.info(f"以 {n_jobs} 個行程平行執行 {total_units} 個 (fold, 股票) 單元")
+            fold_results = self._run_folds_parallel(stock_ids, folds, n_jobs, report_progress)
+        else:
+            fold_results = None
 
         for fold_idx, fold_info in enumerate(folds):
             logger.info(f"Processing fold {fold_idx + 1}/{len(folds)}")
             logger.info(f"Train: {fold_info['train_start']} to {fold_info['train_end']}")
             logger.info(f"Test: {fold_info['test_start']} to {fold_info['test_end']}")
 
-            fold_result = self._run_single_fold(
-                stock_ids, fold_info, fold_idx
-            )
+            if fold_results is not None:
+                fold_result = fold_results[fold_idx]
+            else:
+                fold_result = self._run_single_fold(
+                    stock_ids, fold_info, fold_idx, progress=report_progress
+                )
 
             if fold_result['success']:
                 self.fold_results.append(fold_result)
@@ -158,6 +196,56 @@ class WalkForwardValidator:
         logger.info(f"Walk-forward validation completed: {len(self.fold_results)} successful folds")
         return summary
 
+    def _resolve_n_jobs(self, n_jobs: Optional[int], unit_count: int) -> int:
+        """解析平行行程數（不超過單元數）"""
+        if n_jobs is None:
+            n_jobs = self.wf_config.get('n_jobs', 1)
+        if n_jobs is None or n_jobs == 0:
+            n_jobs = 1
+        elif n_jobs < 0:
+            n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+        return max(1, min(int(n_jobs), unit_count))
+
+    def _run_folds_parallel(self,
+                            stock_ids: List[str],
+                            folds: List[Dict[str, str]],
+                            n_jobs: int,
+                            progress: Callable[[int, str], None]) -> List[Dict[str, Any]]:
+        """
+        以行程池平行執行所有 (fold, 股票) 單元，再依 fold / 股票順序合併
+
+        每個子行程持有自己的驗證器副本；DataManager 每次查詢各自開啟SQLite連線，
+        股價快取也在子行程內重建，行程之間不共用任何連線。
+        """
+        unit_results: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+        with ProcessPoolExecutor(max_workers=n_jobs,
+                                 initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            futures = {}
+            for fold_idx, fold_info in enumerate(folds):
+                for stock_idx, stock_id in enumerate(stock_ids):
+                    future = executor.submit(_run_stock_unit_in_worker, stock_id, fold_info, fold_idx)
+                    futures[future] = (fold_idx, stock_idx)
+
+            for future in as_completed(futures):
+                fold_idx, stock_idx = futures[future]
+                stock_id = stock_ids[stock_idx]
+                try:
+                    unit_results[(fold_idx, stock_idx)] = future.result()
+                except Exception as e:
+                    logger.error(f"Error in fold {fold_idx} for stock {stock_id}: {e}")
+                    unit_results[(fold_idx, stock_idx)] = {'success': False, 'stock_id': stock_id, 'error': str(e)}
+                progress(fold_idx, stock_id)
+
+        return [
+            self._merge_fold_units(
+                [unit_results[(fold_idx, stock_idx)] for stock_idx in range(len(stock_ids))],
+                fold_info, fold_idx
+            )
+            for fold_idx, fold_info in enumerate(folds)
+        ]
+
     def _generate_folds(self,
                        start_date: str,
                        end_date: str,
@@ -202,93 +290,105 @@ class WalkForwardValidator:
     def _run_single_fold(self,
                         stock_ids: List[str],
                         fold_info: Dict[str, str],
-                        fold_idx: int) -> Dict[str, Any]:
+                        fold_idx: int,
+                        progress: Callable[[int, str], None] = None) -> Dict[str, Any]:
         """執行單個fold - 改為每檔股票獨立建模"""
-        try:
-            logger.info(f"Fold {fold_idx}: 開始為 {len(stock_ids)} 檔股票建立獨立模型")
+        logger.info(f"Fold {fold_idx}: 開始為 {len(stock_ids)} 檔股票建立獨立模型")
 
-            # 儲存每檔股票的模型和結果
-            stock_models = {}
-            fold_trades = []
-            stock_performance = {}
-
-            # 為每檔股票建立獨立模型
-            for stock_id in stock_ids:
-                logger.debug(f"Fold {fold_idx}: 處理股票 {stock_id}")
-
-                # 生成該股票的訓練資料
-                train_features, train_targets = self.feature_engineer.generate_training_dataset(
-                    [stock_id],  # 只訓練單一股票
-                    fold_info['train_start'],
-                    fold_info['train_end'],
-                    target_periods=[20],
-                    frequency='monthly'
-                )
+        unit_results = []
+        for stock_id in stock_ids:
+            unit_results.append(self._run_stock_unit(stock_id, fold_info, fold_idx))
+            if progress:
+                progress(fold_idx, stock_id)
 
-                if train_features.empty or train_targets.empty:
-                    logger.debug(f"股票 {stock_id} 無訓練資料，跳過")
-                    continue
+        return self._merge_fold_units(unit_results, fold_info, fold_idx)
 
-                # 檢查最小樣本數
-                if len(train_features) < self.wf_config['min_training_samples']:
-                    logger.debug(f"股票 {stock_id} 訓練樣本不足 ({len(train_features)} < {self.wf_config['min_training_samples']})，跳過")
-                    continue
-
-                # 訓練該股票的獨立模型（使用該股票專屬的最佳參數）
-                # 決定使用的模型清單
-                model_types = self.models_to_use or [self.config['model']['primary_model']]
-
-                # 檢查是否使用自動選擇最佳模型
-                if model_types == ['auto_best']:
-                    # 自動選擇該股票的最佳模型和參數
-                    from .hyperparameter_tuner import HyperparameterTuner
-                    best_model_info = HyperparameterTuner.get_stock_best_model_and_params(stock_id)
+    def _run_stock_unit(self,
+                        stock_id: str,
+                        fold_info: Dict[str, str],
+                        fold_idx: int) -> Dict[str, Any]:
+        """
+        執行單一 (fold, 股票) 單元：生成訓練資料、逐模型訓練並回測測試期
 
-                    if best_model_info and best_model_info['success']:
-                        model_types = [best_model_info['model_type']]
-                        logger.debug(f"股票 {stock_id} 自動選擇最佳模型: {best_model_info['model_type']}, 分數: {best_model_info['score']:.4f}")
-                    else:
-                        # 如果沒有調優記錄，回退到主模型
-                        model_types = [self.config['model']['primary_model']]
-                        logger.debug(f"股票 {stock_id} 無調優記錄，使用主模型: {model_types[0]}")
-
-                # 對每一種模型類型都訓練一次（各自一套模型）
-                for mtype in model_types:
-                    params_override = None
-
-                    # 優先使用該股票專屬的最佳參數
-                    from .hyperparameter_tuner import HyperparameterTuner
-                    stock_best_params = HyperparameterTuner.get_stock_best_params(stock_id, mtype)
-
-                    if stock_best_params:
-                        params_override = stock_best_params
-                        logger.debug(f"股票 {stock_id} 使用專屬最佳參數 {mtype}: {params_override}")
-                    elif self.override_models and mtype in self.override_models:
-                        params_override = self.override_models[mtype]
-                        logger.debug(f"股票 {stock_id} 使用通用最佳參數 {mtype}: {params_override}")
-                    else:
-                        logger.debug(f"股票 {stock_id} 使用預設參數 {mtype}")
+        各單元互不相依，可在子行程中獨立執行（見 run_validation 的 n_jobs）
 
-                    predictor = self.predictor_class(self.feature_engineer, model_type=mtype, override_params=params_override)
-                    train_result = predictor.train(train_features, train_targets)
+        Returns:
+            {'success', 'stock_id', 'trained_models', 'trades'} 或含 'error' 的失敗結果
+        """
+        try:
+            logger.debug(f"Fold {fold_idx}: 處理股票 {stock_id}")
+            stock_models = {}
 
-                    if not train_result['success']:
-                        logger.debug(f"股票 {stock_id} 模型 {mtype} 訓練失敗: {train_result.get('error', 'Unknown')}")
-                        continue
+            # 生成該股票的訓練資料
+            train_features, train_targets = self.feature_engineer.generate_training_dataset(
+                [stock_id],  # 只訓練單一股票
+                fold_info['train_start'],
+                fold_info['train_end'],
+                target_periods=[20],
+                frequency='monthly'
+            )
 
-                    # 儲存模型（以 (stock_id, model_type) 做 key）
-                    stock_models[(stock_id, mtype)] = predictor
-                    logger.debug(f"股票 {stock_id} 模型 {mtype} 訓練成功，樣本數: {train_result['training_samples']}")
+            if train_features.empty or train_targets.empty:
+                logger.debug(f"股票 {stock_id} 無訓練資料，跳過")
+                return {'success': True, 'stock_id': stock_id, 'trained_models': 0, 'trades': []}
+
+            # 檢查最小樣本數
+            if len(train_features) < self.wf_config['min_training_samples']:
+                logger.debug(f"股票 {stock_id} 訓練樣本不足 ({len(train_features)} < {self.wf_config['min_training_samples']})，跳過")
+                return {'success': True, 'stock_id': stock_id, 'trained_models': 0, 'trades': []}
+
+            # 訓練該股票的獨立模型（使用該股票專屬的最佳參數）
+            # 決定使用的模型清單
+            model_types = self.models_to_use or [self.config['model']['primary_model']]
+
+            # 檢查是否使用自動選擇最佳模型
+            if model_types == ['auto_best']:
+                # 自動選擇該股票的最佳模型和參數
+                from .hyperparameter_tuner import HyperparameterTuner
+                best_model_info = HyperparameterTuner.get_stock_best_model_and_params(stock_id)
+
+                if best_model_info and best_model_info['success']:
+                    model_types = [best_model_info['model_type']]
+                    logger.debug(f"股票 {stock_id} 自動選擇最佳模型: {best_model_info['model_type']}, 分數: {best_model_info['score']:.4f}")
+                else:
+                    # 如果沒有調優記錄，回退到主模型
+                    model_types = [self.config['model']['primary_model']]
+                    logger.debug(f"股票 {stock_id} 無調優記錄，使用主模型: {model_types[0]}")
+
+            # 對每一種模型類型都訓練一次（各自一套模型）
+            for mtype in model_types:
+                params_override = None
+
+                # 優先使用該股票專屬的最佳參數
+                from .hyperparameter_tuner import HyperparameterTuner
+                stock_best_params = HyperparameterTuner.get_stock_best_params(stock_id, mtype)
+
+                if stock_best_params:
+                    params_override = stock_best_params
+                    logger.debug(f"股票 {stock_id} 使用專屬最佳參數 {mtype}: {params_override}")
+                elif self.override_models and mtype in self.override_models:
+                    params_override = self.override_models[mtype]
+                    logger.debug(f"股票 {stock_id} 使用通用最佳參數 {mtype}: {params_override}")
+                else:
+                    logger.debug(f"股票 {stock_id} 使用預設參數 {mtype}")
+
+                predictor = self.predictor_class(self.feature_engineer, model_type=mtype, override_params=params_override)
+                train_result = predictor.train(train_features, train_targets)
 
                 if not train_result['success']:
-                    logger.debug(f"股票 {stock_id} 模型訓練失敗: {train_result.get('error', 'Unknown')}")
+                    logger.debug(f"股票 {stock_id} 模型 {mtype} 訓練失敗: {train_result.get('error', 'Unknown')}")
                     continue
 
+                # 儲存模型（以 (stock_id, model_type) 做 key）
+                stock_models[(stock_id, mtype)] = predictor
+                logger.debug(f"股票 {stock_id} 模型 {mtype} 訓練成功，樣本數: {train_result['training_samples']}")
+
+            if train_result['success']:
                 # 儲存模型
                 stock_models[stock_id] = predictor
                 logger.debug(f"股票 {stock_id} 模型訓練成功，樣本數: {train_result['training_samples']}")
-
-            logger.info(f"Fold {fold_idx}: 成功訓練 {len(stock_models)} 檔股票的模型")
+            else:
+                logger.debug(f"股票 {stock_id} 模型訓練失敗: {train_result.get('error', 'Unknown')}")
 
             # 在測試期間進行預測和回測
             backtest_result = self._run_fold_backtest_individual(
@@ -297,21 +397,56 @@ class WalkForwardValidator:
 
             return {
                 'success': True,
-                'fold_idx': fold_idx,
-                'fold_info': fold_info,
-                'trained_stocks': len(stock_models),
-                'backtest_result': backtest_result
+                'stock_id': stock_id,
+                'trained_models': len(stock_models),
+                'trades': backtest_result['trades']
             }
 
         except Exception as e:
-            logger.error(f"Error in fold {fold_idx}: {e}")
+            logger.error(f"Error in fold {fold_idx} for stock {stock_id}: {e}")
+            return {'success': False, 'stock_id': stock_id, 'error': str(e)}
+
+    def _merge_fold_units(self,
+                          unit_results: List[Dict[str, Any]],
+                          fold_info: Dict[str, str],
+                          fold_idx: int) -> Dict[str, Any]:
+        """
+        依股票清單順序合併單一fold的各單元結果
+
+        交易先依股票順序串接，再以進場日期穩定排序，與逐檔循序執行時
+        「日期 → 股票 → 模型」的順序一致，因此平行與循序結果相同。
+        """
+        failed = [unit for unit in unit_results if not unit['success']]
+        if failed:
             return {
                 'success': False,
-                'error': str(e),
+                'error': failed[0].get('error', 'Unknown error'),
                 'fold_idx': fold_idx,
                 'fold_info': fold_info
             }
 
+        trained_stocks = sum(unit['trained_models'] for unit in unit_results)
+        logger.info(f"Fold {fold_idx}: 成功訓練 {trained_stocks} 檔股票的模型")
+
+        fold_trades = [trade for unit in unit_results for trade in unit['trades']]
+        fold_trades.sort(key=lambda trade: trade['entry_date'])
+        stock_performance = self._aggregate_stock_performance(fold_trades)
+
+        backtest_result = {
+            'trades': fold_trades,
+            'stock_performance': stock_performance,
+            'metrics': self._calculate_fold_metrics(fold_trades, stock_performance),
+            'total_trades': len(fold_trades)
+        }
+
+        return {
+            'success': True,
+            'fold_idx': fold_idx,
+            'fold_info': fold_info,
+            'trained_stocks': trained_stocks,
+            'backtest_result': backtest_result
+        }
+
     def _run_fold_backtest_individual(self,
                                      stock_models: Dict[str, StockPricePredictor],
                                      fold_info: Dict[str, str],
@@ -329,7 +464,6 @@ class WalkForwardValidator:
         )
 
         fold_trades = []
-        stock_performance = {}
 
         # 獲取選股門檻
         selection_rules = get_config('selection')['selection_rules']
@@ -364,7 +498,7 @@ class WalkForwardValidator:
                         )
 
                         if actual_return is not None:
-                            trade_info = {
+                            fold_trades.append({
                                 'fold_idx': fold_idx,
                                 'stock_id': stock_id,
                                 'model_type': model_type,
@@ -372,31 +506,15 @@ class WalkForwardValidator:
                                 'predicted_return': predicted_return,
                                 'actual_return': actual_return,
                                 'holding_days': 20
-                            }
-
-                            fold_trades.append(trade_info)
-
-                            # 更新股票績效統計（仍以股票聚合，但在交易中保留模型資訊）
-                            if stock_id not in stock_performance:
-                                stock_performance[stock_id] = {
-                                    'trades': [],
-                                    'total_trades': 0,
-                                    'winning_trades': 0,
-                                    'total_return': 0
-                                }
-
-                            stock_perf = stock_performance[stock_id]
-                            stock_perf['trades'].append(trade_info)
-                            stock_perf['total_trades'] += 1
-                            stock_perf['total_return'] += actual_return
-
-                            if actual_return > 0:
-                                stock_perf['winning_trades'] += 1
+                            })
 
                 except Exception as e:
                     logger.debug(f"股票 {stock_id} 預測失敗: {e}")
                     continue
 
+        # 更新股票績效統計（仍以股票聚合，但在交易中保留模型資訊）
+        stock_performance = self._aggregate_stock_performance(fold_trades)
+
         # 計算fold績效指標
         fold_metrics = self._calculate_fold_metrics(fold_trades, stock_performance)
 
@@ -407,6 +525,32 @@ class WalkForwardValidator:
             'total_trades': len(fold_trades)
         }
 
+    def _aggregate_stock_performance(self, trades: List[Dict]) -> Dict[str, Dict[str, Any]]:
+        """依交易順序彙總每檔股票的績效統計"""
+        stock_performance = {}
+
+        for trade_info in trades:
+            stock_id = trade_info['stock_id']
+            actual_return = trade_info['actual_return']
+
+            if stock_id not in stock_performance:
+                stock_performance[stock_id] = {
+                    'trades': [],
+                    'total_trades': 0,
+                    'winning_trades': 0,
+                    'total_return': 0
+                }
+
+            stock_perf = stock_performance[stock_id]
+            stock_perf['trades'].append(trade_info)
+            stock_perf['total_trades'] += 1
+            stock_perf['total_return'] += actual_return
+
+            if actual_return > 0:
+                stock_perf['winning_trades'] += 1
+
+        return stock_performance
+
     def _calculate_actual_return(self,
                                stock_id: str,
                                entry_date: str,
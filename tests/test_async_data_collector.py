@@ -0,0 +1,148 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.services.async_data_collector import AsyncFinMindDataCollector, QuotaExceededError, TokenBucket
+
+
+class _StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self.fail_once = {"2317"}     # 第一次回 503，測試重試
+        self.quota_exceeded = set()   # 回 402
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            with state.lock:
+                state.requests.append(params)
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            time.sleep(0.05)
+            with state.lock:
+                state.in_flight -= 1
+                stock_id = params.get("data_id")
+                if stock_id in state.quota_exceeded:
+                    status, body = 402, {"msg": "quota"}
+                elif stock_id in state.fail_once:
+                    state.fail_once.discard(stock_id)
+                    status, body = 503, {"msg": "busy"}
+                else:
+                    status, body = 200, {"data": _rows(params)}
+
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def _rows(params):
+    if params["dataset"] == "TaiwanStockPrice":
+        return [{"date": f"2024-01-0{d}", "stock_id": params["data_id"], "Trading_Volume": 1000,
+                 "Trading_money": 10000, "open": 10, "max": 11, "min": 9, "close": 10.5,
+                 "spread": 0.5, "Trading_turnover": 10} for d in (2, 3, 4)]
+    return [{"date": "2024-01-05", "stock_id": params["data_id"], "CashEarningsDistribution": 1.0,
+             "StockEarningsDistribution": 0.0}]
+
+
+@pytest.fixture
+def stub_server():
+    state = _StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/api/v4/data", state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _stocks():
+    stocks = [{"stock_id": sid, "is_etf": False} for sid in ["2330", "2317", "2454", "2412", "1301", "2882"]]
+    stocks.append({"stock_id": "0050", "is_etf": True})
+    return stocks
+
+
+def test_collect_batch_data_runs_concurrently_and_retries(stub_server):
+    url, state = stub_server
+    collector = AsyncFinMindDataCollector(url, api_token="t", max_concurrency=4,
+                                          rate_limiter=TokenBucket(100, 100), backoff_base=0.01)
+
+    result = asyncio.run(collector.collect_batch_data(_stocks(), "2024-01-01", "2024-01-31"))
+
+    assert list(result["price_data"]) == [s["stock_id"] for s in _stocks()]
+    assert all(len(df) == 3 for df in result["price_data"].values())
+    assert list(result["dividend_data"]) == ["0050"]
+    assert 1 < state.max_in_flight <= 4
+    assert all(r["token"] == "t" for r in state.requests)
+    # 7 檔股價 + 1 次配息 + 1 次重試
+    assert len(state.requests) == collector.request_count == 9
+
+
+def test_quota_error_stops_batch(stub_server):
+    url, state = stub_server
+    state.quota_exceeded.add("2454")
+    collector = AsyncFinMindDataCollector(url, rate_limiter=TokenBucket(100, 0.01), backoff_base=0.01)
+
+    with pytest.raises(QuotaExceededError, match="API請求限制"):
+        asyncio.run(collector.collect_batch_data(_stocks(), "2024-01-01", "2024-01-31"))
+    assert collector.rate_limiter.available < 1
+
+
+def test_collector_can_be_reused_across_event_loops(stub_server):
+    url, state = stub_server
+    bucket = TokenBucket(1, 1000)
+    collector = AsyncFinMindDataCollector(url, max_concurrency=1, rate_limiter=bucket, backoff_base=0.01)
+
+    async def fetch_all():
+        # 同時等待，讓鎖與 Semaphore 實際綁定到目前的事件迴圈
+        return await asyncio.gather(*(collector._make_request("TaiwanStockPrice", sid, "2024-01-01", "2024-01-31")
+                                      for sid in ("2330", "2454", "2412")))
+
+    for _ in range(2):
+        results = asyncio.run(fetch_all())
+        assert all(len(r["data"]) == 3 for r in results)
+    assert collector.request_count == 6
+
+
+def test_token_bucket_spreads_requests_over_refill_rate():
+    bucket = TokenBucket(capacity=3, refill_per_second=40)
+
+    async def take(n):
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(take(11))
+    # 前 3 次立即取得，其餘 8 次以每秒 40 個補充
+    assert 0.18 <= elapsed < 1.0
+
+
+def test_hourly_quota_bucket_never_exceeds_quota():
+    for quota in (300, 600):
+        bucket = TokenBucket.for_hourly_quota(quota)
+        assert bucket.capacity + bucket.rate * 3600 <= quota
+        assert bucket.capacity + bucket.rate * 3600 >= quota - 11
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.bulk_upsert import FINMIND_COLUMN_MAPS, bulk_upsert_dataframe
+from app.utils.simple_database import SimpleDatabaseManager
+
+PRICE_COLUMNS = ['stock_id', 'date', 'open_price', 'high_price', 'low_price', 'close_price',
+                 'volume', 'trading_money', 'trading_turnover', 'spread']
+
+
+def _finmind_prices(stock_ids, dates, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for stock_id in stock_ids:
+        for date in dates:
+            close = float(rng.uniform(50, 150))
+            rows.append({'date': date.strftime('%Y-%m-%d'), 'stock_id': stock_id,
+                         'Trading_Volume': int(rng.integers(1000, 10 ** 6)),
+                         'Trading_money': int(rng.integers(10 ** 5, 10 ** 8)),
+                         'open': close - 1, 'max': close + 2, 'min': close - 2, 'close': close,
+                         'spread': 0.5, 'Trading_turnover': int(rng.integers(10, 1000))})
+    return pd.DataFrame(rows)
+
+
+def _reference_insert(conn, df):
+    """原本逐筆 INSERT OR REPLACE 的寫法"""
+    for _, row in df.iterrows():
+        conn.execute("""
+            INSERT OR REPLACE INTO stock_prices
+            (stock_id, date, open_price, high_price, low_price, close_price,
+             volume, trading_money, trading_turnover, spread)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (row['stock_id'], row['date'], row['open'], row['max'], row['min'], row['close'],
+              row['Trading_Volume'], row['Trading_money'], row['Trading_turnover'], row['spread']))
+    conn.commit()
+
+
+def _table(conn):
+    return pd.read_sql_query(f"SELECT {', '.join(PRICE_COLUMNS)} FROM stock_prices ORDER BY stock_id, date", conn)
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "prices.db"))
+    manager.create_tables()
+    return manager
+
+
+def test_bulk_upsert_matches_row_by_row_insert(db, tmp_path):
+    dates = pd.bdate_range("2024-01-01", periods=40)
+    first = _finmind_prices(["2330", "2317", "8299"], dates)
+    second = _finmind_prices(["2330", "2317", "8299"], pd.bdate_range("2024-02-01", periods=40), seed=1)
+
+    with db.connection() as conn:
+        r1 = bulk_upsert_dataframe(conn, 'stock_prices', first, column_map=FINMIND_COLUMN_MAPS['stock_prices'],
+                                   batch_size=7)
+        r2 = bulk_upsert_dataframe(conn, 'stock_prices', second, column_map=FINMIND_COLUMN_MAPS['stock_prices'],
+                                   batch_size=7)
+        bulk = _table(conn)
+
+    overlap = len(set(first['date']) & set(second['date'])) * 3
+    assert r1 == {'inserted': 120, 'updated': 0, 'skipped': 0, 'invalid': 0, 'total': 120}
+    assert r2 == {'inserted': 120 - overlap, 'updated': overlap, 'skipped': 0, 'invalid': 0, 'total': 120}
+
+    reference_db = SimpleDatabaseManager(str(tmp_path / "reference.db"))
+    reference_db.create_tables()
+    with reference_db.connection() as conn:
+        _reference_insert(conn, first)
+        _reference_insert(conn, second)
+        reference = _table(conn)
+
+    pd.testing.assert_frame_equal(bulk, reference)
+
+
+def test_unchanged_duplicate_and_invalid_rows_are_skipped(db):
+    df = _finmind_prices(["2330"], pd.bdate_range("2024-01-01", periods=10))
+    assert db.bulk_upsert('stock_prices', df, column_map=FINMIND_COLUMN_MAPS['stock_prices'])['inserted'] == 10
+
+    with db.connection() as conn:
+        created = dict(conn.execute("SELECT date, created_at FROM stock_prices").fetchall())
+
+    again = df.copy()
+    again.loc[0, 'close'] += 1
+    again.loc[1, 'close'] = np.nan                                  # NOT NULL 欄位缺值
+    again = pd.concat([again, again.iloc[[5]]], ignore_index=True)   # 同批重複鍵
+    again['date'] = pd.to_datetime(again['date'])                    # datetime 欄位寫回 YYYY-MM-DD
+
+    result = db.bulk_upsert('stock_prices', again, column_map=FINMIND_COLUMN_MAPS['stock_prices'])
+    assert result == {'inserted': 0, 'updated': 1, 'skipped': 9, 'invalid': 1, 'total': 11}
+
+    with db.connection() as conn:
+        rows = conn.execute("SELECT date, close_price, created_at FROM stock_prices ORDER BY date").fetchall()
+    assert len(rows) == 10
+    assert rows[0][1] == pytest.approx(df.loc[0, 'close'] + 1)
+    assert {date: created_at for date, _, created_at in rows} == created
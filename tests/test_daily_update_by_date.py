@@ -0,0 +1,127 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import json
+import sqlite3
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("tqdm")
+import scripts.collect_daily_update as daily_update
+from app.utils.simple_database import SimpleDatabaseManager
+from config import Config
+
+MARKET = ["2330", "2317", "8299", "0050", "03001P"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests = []
+    refuse_by_date = False
+    refuse_dates = ()
+    holidays = ()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        type(self).requests.append(params)
+        status = 200
+        if "data_id" not in params and (self.refuse_by_date or params["start_date"] in self.refuse_dates):
+            # FinMind 拒絕請求時回傳 HTTP 4xx
+            status = 400
+            body = {"msg": "Your level is register. Please update your user level.", "status": 400}
+        else:
+            day = date.fromisoformat(params["start_date"])
+            ids = [params["data_id"]] if "data_id" in params else MARKET
+            closed = day.weekday() >= 5 or day.isoformat() in self.holidays
+            body = {"msg": "success", "status": 200, "data": [] if closed else [
+                {"date": day.isoformat(), "stock_id": sid, "Trading_Volume": 1000, "Trading_money": 50000,
+                 "open": 10.0, "max": 11.0, "min": 9.0, "close": 10.0 + day.day / 10, "spread": 0.1,
+                 "Trading_turnover": 20} for sid in ids]}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def collector(tmp_path, monkeypatch):
+    _Handler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    db_path = tmp_path / "daily.db"
+    db = SimpleDatabaseManager(str(db_path))
+    db.create_tables()
+    with db.connection() as conn:
+        conn.executemany("INSERT INTO stocks (stock_id, stock_name, market, is_etf) VALUES (?, ?, 'TWSE', ?)",
+                         [("2330", "台積電", 0), ("2317", "鴻海", 0), ("8299", "群聯", 0), ("0050", "元大台灣50", 1)])
+        conn.execute("INSERT INTO stock_prices (stock_id, date, open_price, high_price, low_price, close_price, volume)"
+                     " VALUES ('2330', '2024-03-01', 1, 1, 1, 1, 1)")
+        conn.commit()
+
+    monkeypatch.setattr(Config, "DATABASE_PATH", str(db_path))
+    monkeypatch.setattr(Config, "FINMIND_API_URL", f"http://127.0.0.1:{server.server_address[1]}/api/v4/data")
+    monkeypatch.setattr(daily_update, "project_root", tmp_path)
+
+    instance = daily_update.DailyUpdateCollector()
+    instance.today = date(2024, 3, 8)
+    try:
+        yield instance, db_path
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_by_date_mode_makes_one_request_per_trading_day(collector):
+    instance, db_path = collector
+    instance.collect_stock_prices()
+
+    # 2024-03-02 ~ 03-08：週末不請求，5 個交易日各一次
+    assert [r["start_date"] for r in _Handler.requests] == [f"2024-03-0{d}" for d in (4, 5, 6, 7, 8)]
+    assert all("data_id" not in r for r in _Handler.requests)
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT stock_id, COUNT(*), MAX(date) FROM stock_prices GROUP BY stock_id").fetchall()
+    conn.close()
+    # 只寫入股價收集清單中的股票（不含 ETF 與權證）
+    assert rows == [("2317", 5, "2024-03-08"), ("2330", 6, "2024-03-08"), ("8299", 5, "2024-03-08")]
+    assert instance.stats["stock_prices"] == 15
+    assert instance.stats["updated_stocks"] == {"2330", "2317", "8299"}
+
+
+def test_by_date_mode_falls_back_when_api_refuses(collector, monkeypatch):
+    instance, _ = collector
+    monkeypatch.setattr(_Handler, "refuse_by_date", True)
+    fallback = []
+    monkeypatch.setattr(instance, "_collect_stock_prices_per_stock", fallback.append)
+
+    instance.collect_stock_prices()
+    assert len(_Handler.requests) == 1
+    assert fallback == [date(2024, 3, 4)]
+
+
+def test_refused_day_is_not_skipped(collector, monkeypatch):
+    instance, db_path = collector
+    # 03-05 為成功但無資料的休市日；03-06 請求被拒絕，需由逐檔收集補上
+    monkeypatch.setattr(_Handler, "holidays", ("2024-03-05",))
+    monkeypatch.setattr(_Handler, "refuse_dates", ("2024-03-06",))
+    fallback = []
+    monkeypatch.setattr(instance, "_collect_stock_prices_per_stock", fallback.append)
+
+    instance.collect_stock_prices()
+    assert [r["start_date"] for r in _Handler.requests] == ["2024-03-04", "2024-03-05", "2024-03-06"]
+    assert fallback == [date(2024, 3, 6)]
+
+    conn = sqlite3.connect(db_path)
+    dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM stock_prices ORDER BY date")]
+    conn.close()
+    assert dates == ["2024-03-01", "2024-03-04"]
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import threading
+import time
+
+from scripts.daily_update_pipeline import DailyUpdatePipeline, PipelineStage
+
+
+class _Collector:
+    last_quota_error_at = None
+
+
+class _WaitManager:
+    def __init__(self):
+        self.calls = 0
+
+    def smart_wait_for_api_reset(self):
+        self.calls += 1
+        time.sleep(0.05)
+
+
+def _stocks(*ids):
+    return [{'stock_id': stock_id} for stock_id in ids]
+
+
+def test_concurrent_stages_share_one_quota_wait():
+    collector = _Collector()
+    wait_manager = _WaitManager()
+    lines = []
+    pipeline = DailyUpdatePipeline(collector, wait_manager=wait_manager, max_workers=2, output=lines.append)
+    barrier = threading.Barrier(2)
+    seen = {'revenue': [], 'statements': []}
+
+    def make_process(key):
+        def process(stock):
+            seen[key].append(stock['stock_id'])
+            if len(seen[key]) == 1:
+                # 兩個階段的第一次請求都遇到 402，且收集腳本吞掉了例外
+                barrier.wait()
+                collector.last_quota_error_at = time.time()
+                barrier.wait()
+                return 0
+            return 10
+        return process
+
+    stages = [PipelineStage(" [月營收]", 'monthly_revenues', _stocks('2330', '2317'), make_process('revenue')),
+              PipelineStage(" [財務報表]", 'financial_statements', _stocks('2330'), make_process('statements'))]
+    results = pipeline.run_concurrently([(stage.name, lambda stage=stage: pipeline.run_stage(stage))
+                                         for stage in stages])
+
+    assert wait_manager.calls == 1
+    assert seen == {'revenue': ['2330', '2330', '2317'], 'statements': ['2330', '2330']}
+    revenue, statements = results[" [月營收]"], results[" [財務報表]"]
+    assert (revenue.saved, revenue.processed, revenue.failed) == (20, 2, [])
+    assert (statements.saved, statements.processed) == (10, 1)
+    assert revenue.quota_waits + statements.quota_waits == 1
+    assert " [月營收] [2/2] 2317 +10 筆" in lines
+
+
+def test_stage_records_failures_and_streams_progress():
+    lines = []
+    pipeline = DailyUpdatePipeline(_Collector(), wait_manager=_WaitManager(), output=lines.append)
+
+    def process(stock):
+        if stock['stock_id'] == '9999':
+            raise ValueError('bad data')
+        return 3
+
+    result = pipeline.run_stage(PipelineStage("[除權除息]", 'dividend_results', _stocks('2330', '9999'), process))
+
+    assert result.saved == 3
+    assert result.failed == [('9999', 'bad data')]
+    assert lines[1:3] == ["[除權除息] [1/2] 2330 +3 筆", "[除權除息] [2/2] 9999 失敗: bad data"]
+
+
+def test_run_concurrently_reports_task_errors():
+    pipeline = DailyUpdatePipeline(_Collector(), output=lambda line: None)
+    done = []
+
+    def broken():
+        raise RuntimeError('boom')
+
+    results = pipeline.run_concurrently([('ok', lambda: 1), ('broken', broken)],
+                                        on_done=lambda name, error: done.append((name, error is None)))
+
+    assert results['ok'] == 1 and isinstance(results['broken'], RuntimeError)
+    assert sorted(done) == [('broken', False), ('ok', True)]
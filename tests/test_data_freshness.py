@@ -0,0 +1,52 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pandas as pd
+
+from app.utils.bulk_upsert import bulk_upsert_dataframe
+from app.utils.data_freshness import describe_completeness, find_stale_stocks, rebuild_data_freshness
+from app.utils.simple_database import SimpleDatabaseManager
+
+TODAY = date(2024, 6, 20)
+
+
+def _seed(conn):
+    conn.executemany("INSERT INTO stock_prices (stock_id, date, open_price, high_price, low_price, close_price, volume) "
+                     "VALUES (?, ?, 100, 100, 100, 100, 1000)",
+                     [('2330', '2024-06-18'), ('2330', '2024-06-19'), ('2317', '2024-05-31')])
+    conn.executemany("INSERT INTO monthly_revenues (stock_id, revenue_year, revenue_month, revenue) VALUES (?, ?, ?, 1)",
+                     [('2330', 2024, 4), ('2330', 2024, 5), ('2317', 2024, 5)])
+    conn.executemany("INSERT INTO financial_statements (stock_id, date, eps) VALUES (?, '2024-03-31', 1)",
+                     [('2330',), ('2317',)])
+    conn.executemany("INSERT INTO dividend_policies (stock_id, date, year, announcement_date) VALUES (?, ?, '112', ?)",
+                     [('2330', '2024-02-01', '2024-02-06'), ('2317', '2024-03-01', None)])
+    conn.execute("INSERT INTO stock_scores (stock_id, total_score, analysis_date) VALUES ('2330', 80, '2024-06-10')")
+    conn.commit()
+
+
+def test_stale_report_and_incremental_update_after_save(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "stock.db"))
+    manager.create_tables()
+    with manager.connection() as conn:
+        _seed(conn)
+        assert rebuild_data_freshness(conn) == 9
+
+        report = find_stale_stocks(conn, ['2330', '2317', '1101'], today=TODAY)
+        assert '2330' not in report
+        assert report['2317'] == ['股價資料(過舊:20天前)', '潛力股分析(無資料)']
+        assert len(report['1101']) == 5
+
+        # 經由 bulk_upsert 寫入後只重新彙總受影響的股票
+        prices = pd.DataFrame({'stock_id': ['2317', '2317'], 'date': ['2024-06-18', '2024-06-19'],
+                               'open_price': 50.0, 'high_price': 52.0, 'low_price': 49.0,
+                               'close_price': [50.0, 51.0], 'volume': 1000})
+        bulk_upsert_dataframe(conn, 'stock_prices', prices)
+        assert conn.execute("SELECT record_count, latest_date FROM data_freshness "
+                            "WHERE stock_id = '2317' AND table_name = 'stock_prices'").fetchone() == (3, '2024-06-19')
+        assert find_stale_stocks(conn, ['2317'], today=TODAY) == {'2317': ['潛力股分析(無資料)']}
+
+    assert describe_completeness('2317', '鴻海', ['潛力股分析(無資料)']) == (
+        False, "2317(鴻海) 需更新: 潛力股分析(無資料) (完整度: 80.0%)")
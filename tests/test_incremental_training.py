@@ -0,0 +1,45 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+_sys.path.insert(0, _os.path.abspath(_os.path.dirname(__file__)))
+
+import pandas as pd
+
+from stock_price_investment_system.price_models.incremental_training import IncrementalTrainingCache
+from stock_price_investment_system.price_models.stock_price_predictor import StockPricePredictor
+from test_panel_features import create_feature_db, build_feature_engineer
+
+
+def test_incremental_dataset_matches_full_rebuild(tmp_path):
+    fe = build_feature_engineer(create_feature_db(tmp_path))
+    cache = IncrementalTrainingCache(fe)
+
+    for month_end in pd.date_range("2021-01-01", "2021-06-30", freq="M"):
+        as_of = month_end.strftime("%Y-%m-%d")
+        inc_features, inc_targets = cache.get_training_dataset("8299", "2019-01-01", as_of)
+        full_features, full_targets = fe.generate_training_dataset(["8299"], "2019-01-01", as_of)
+
+        pd.testing.assert_frame_equal(inc_features, full_features.reset_index(drop=True))
+        pd.testing.assert_frame_equal(inc_targets, full_targets.reset_index(drop=True))
+
+    # 較早的終點取快取子集合
+    early_features, _ = cache.get_training_dataset("8299", "2019-01-01", "2020-12-31")
+    full_early, _ = fe.generate_training_dataset(["8299"], "2019-01-01", "2020-12-31")
+    pd.testing.assert_frame_equal(early_features, full_early.reset_index(drop=True))
+
+
+def test_warm_start_keeps_existing_trees(tmp_path):
+    fe = build_feature_engineer(create_feature_db(tmp_path))
+    features, targets = fe.generate_training_dataset(["2330"], "2018-01-01", "2021-06-30")
+
+    predictor = StockPricePredictor(fe, model_type="xgboost", override_params={"n_estimators": 10, "n_jobs": 1})
+    assert predictor.train(features, targets)["success"]
+    assert predictor.model.get_booster().num_boosted_rounds() == 10
+
+    assert predictor.train(features, targets, warm_start=True, warm_start_rounds=5)["success"]
+    assert predictor.model.get_booster().num_boosted_rounds() == 15
+    assert predictor.model.get_params()["n_estimators"] == 10
+
+    # 關閉接續訓練時重新擬合
+    assert predictor.train(features, targets)["success"]
+    assert predictor.model.get_booster().num_boosted_rounds() == 10
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import pandas as pd
+
+from app.services.query_service import StockQueryService
+from app.utils.bulk_upsert import bulk_upsert_dataframe
+from app.utils.simple_database import SimpleDatabaseManager
+
+
+def _prices(rows):
+    return pd.DataFrame(rows, columns=['stock_id', 'date', 'close_price', 'spread', 'volume']).assign(
+        open_price=lambda d: d['close_price'], high_price=lambda d: d['close_price'],
+        low_price=lambda d: d['close_price'], trading_money=lambda d: d['close_price'] * d['volume'])
+
+
+def _live_service(manager):
+    service = StockQueryService(manager)
+    service._summary_ready = False  # 直接查詢 stock_prices
+    return service
+
+
+def test_summary_tables_match_live_queries_after_incremental_writes(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "stock.db"))
+    manager.create_tables()
+    with manager.connection() as conn:
+        conn.executemany("INSERT INTO stocks (stock_id, stock_name, market, is_active) VALUES (?, ?, 'TWSE', ?)",
+                         [('2330', '台積電', 1), ('2317', '鴻海', 1), ('1101', '台泥', 1), ('9999', '下市', 0)])
+        conn.commit()
+        bulk_upsert_dataframe(conn, 'stock_prices', _prices([
+            ('2330', '2024-06-18', 900.0, 5.0, 1000), ('2317', '2024-06-18', 150.0, -1.0, 3000),
+            ('1101', '2024-06-18', 40.0, 0.0, 500), ('9999', '2024-06-18', 10.0, 1.0, 99999),
+            ('2330', '2024-06-19', 910.0, 10.0, 2000), ('2317', '2024-06-19', 149.0, -1.0, 4000)]))
+
+    service = StockQueryService(manager)
+    live = _live_service(manager)
+
+    def assert_same():
+        assert service.get_market_summary() == live.get_market_summary()
+        for kind in ('gain', 'loss'):
+            assert ([(r['stock_id'], r['change_percent']) for r in service.get_top_performers(5, kind)] ==
+                    [(r['stock_id'], r['change_percent']) for r in live.get_top_performers(5, kind)])
+        assert ([r['stock_id'] for r in service.get_volume_leaders(5)] ==
+                [r['stock_id'] for r in live.get_volume_leaders(5)])
+        ids = ['2330', '2317', '1101', '9999']
+        assert ([(r['stock_id'], r['date'], r['close_price']) for r in service.get_multiple_latest_prices(ids)] ==
+                [(r['stock_id'], r['date'], r['close_price']) for r in live.get_multiple_latest_prices(ids)])
+
+    # 第一次查詢時建立彙總表
+    assert_same()
+    assert service.get_market_summary()['summary']['up_stocks'] == 1
+
+    # 經由 bulk_upsert 寫入新交易日與修正舊資料後增量更新
+    with manager.connection() as conn:
+        bulk_upsert_dataframe(conn, 'stock_prices', _prices([
+            ('1101', '2024-06-19', 41.0, 1.0, 800), ('2330', '2024-06-20', 905.0, -5.0, 2500),
+            ('2317', '2024-06-18', 150.0, 0.0, 3000)]))
+        assert conn.execute("SELECT up_stocks, down_stocks, flat_stocks FROM daily_market_summary "
+                            "WHERE date = '2024-06-18'").fetchone() == (1, 0, 2)
+        assert conn.execute("SELECT date FROM latest_prices WHERE stock_id = '1101'").fetchone() == ('2024-06-19',)
+    assert service.get_market_summary()['latest_date'] == '2024-06-20'
+    assert_same()
+
+
+def test_direct_writes_are_caught_up_on_latest_date(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "stock.db"))
+    manager.create_tables()
+    with manager.connection() as conn:
+        conn.executemany("INSERT INTO stocks (stock_id, stock_name, market, is_active) VALUES (?, ?, 'TWSE', 1)",
+                         [('2330', '台積電'), ('2317', '鴻海')])
+        conn.commit()
+        bulk_upsert_dataframe(conn, 'stock_prices', _prices([('2330', '2024-06-18', 900.0, 5.0, 1000),
+                                                              ('2317', '2024-06-18', 150.0, -1.0, 3000)]))
+    service = StockQueryService(manager)
+    assert service.get_market_summary()['latest_date'] == '2024-06-18'
+
+    # 不經 bulk_upsert 直接寫入（例如 SimpleDatabaseManager.bulk_insert）
+    manager.bulk_insert('stock_prices', [
+        {'stock_id': '2330', 'date': '2024-06-19', 'open_price': 910.0, 'high_price': 910.0,
+         'low_price': 910.0, 'close_price': 910.0, 'volume': 2000, 'spread': 10.0}])
+
+    summary = service.get_market_summary()
+    assert summary == _live_service(manager).get_market_summary()
+    assert (summary['latest_date'], summary['summary']['up_stocks']) == ('2024-06-19', 1)
+    latest = {r['stock_id']: r['date'] for r in service.get_multiple_latest_prices(['2330', '2317'])}
+    assert latest == {'2330': '2024-06-19', '2317': '2024-06-18'}
@@ -0,0 +1,69 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from stock_price_investment_system.data.data_manager import DataManager
+from stock_price_investment_system.data.price_data import PriceDataManager
+from stock_price_investment_system.data.revenue_integration import RevenueIntegration
+from stock_price_investment_system.price_models.feature_engineering import FeatureEngineer
+
+
+def create_feature_db(tmp_path):
+    db_path = Path(tmp_path) / "taiwan_stock_test.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE stock_prices (
+            stock_id TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume INTEGER
+        );
+        CREATE TABLE monthly_revenues (
+            stock_id TEXT, revenue_year INTEGER, revenue_month INTEGER, revenue INTEGER
+        );
+        """
+    )
+    rng = np.random.default_rng(7)
+    price_rows = []
+    revenue_rows = []
+    # 2330 有完整歷史；8299 晚上市，涵蓋短視窗與無資料月份
+    for sid, start in [("2330", "2017-01-02"), ("8299", "2019-06-03")]:
+        days = pd.bdate_range(start, "2021-12-31")
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(days))))
+        for d, c in zip(days, close):
+            price_rows.append((sid, d.strftime("%Y-%m-%d"), c * 0.99, c * 1.02, c * 0.98, c,
+                               int(rng.integers(1_000, 50_000))))
+        for m in pd.period_range(start[:7], "2021-12", freq="M"):
+            revenue_rows.append((sid, m.year, m.month, int(rng.integers(1_000_000, 9_000_000))))
+    conn.executemany("INSERT INTO stock_prices VALUES (?,?,?,?,?,?,?)", price_rows)
+    conn.executemany("INSERT INTO monthly_revenues VALUES (?,?,?,?)", revenue_rows)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def build_feature_engineer(db_path):
+    dm = DataManager(db_path=db_path, use_price_cache=False)
+    ri = RevenueIntegration(dm)
+    # 不依賴外部 EPS 預測系統
+    ri.revenue_predictor = None
+    ri.eps_predictor = None
+    return FeatureEngineer(data_manager=dm, price_manager=PriceDataManager(dm), revenue_integration=ri)
+
+
+def test_panel_training_dataset_matches_row_mode(tmp_path):
+    fe = build_feature_engineer(create_feature_db(tmp_path))
+    args = (["2330", "8299", "0000"], "2018-06-01", "2021-10-31")
+
+    row_features, row_targets = fe.generate_training_dataset(*args, target_periods=[20], mode="row")
+    panel_features, panel_targets = fe.generate_training_dataset(*args, target_periods=[20], mode="panel")
+
+    assert not row_features.empty
+    assert list(panel_features.columns) == list(row_features.columns)
+    assert list(panel_targets.columns) == list(row_targets.columns)
+    pd.testing.assert_frame_equal(panel_features, row_features, check_exact=False, rtol=1e-9, atol=1e-9)
+    pd.testing.assert_frame_equal(panel_targets, row_targets, check_exact=False, rtol=1e-9, atol=1e-12)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+_sys.path.insert(0, _os.path.abspath(_os.path.dirname(__file__)))
+
+import pandas as pd
+import pytest
+
+from stock_price_investment_system.config.settings import OUTPUT_CONFIG
+from stock_price_investment_system.price_models.hyperparameter_tuner import HyperparameterTuner
+from stock_price_investment_system.price_models.stock_price_predictor import StockPricePredictor
+from test_panel_features import create_feature_db, build_feature_engineer
+
+PERIODS = ("2018-01-01", "2020-12-31", "2021-01-01", "2021-10-31")
+
+
+@pytest.fixture
+def tuner(tmp_path, monkeypatch):
+    monkeypatch.setitem(OUTPUT_CONFIG['paths'], 'models', tmp_path / "models")
+    tuner = HyperparameterTuner(build_feature_engineer(create_feature_db(tmp_path)))
+    tuner.param_grids['xgboost'] = {
+        'max_depth': [2, 4],
+        'learning_rate': [0.05, 0.2],
+        'n_estimators': [15, 30],
+    }
+    return tuner
+
+
+def test_parallel_tuning_matches_sequential(tuner, tmp_path):
+    sequential = tuner.tune_single_stock("2330", "xgboost", *PERIODS, max_combinations=8, n_jobs=1)
+    parallel = tuner.tune_single_stock("2330", "xgboost", *PERIODS, max_combinations=8, n_jobs=2)
+
+    assert sequential['success'] and sequential['successful_combinations'] == 8
+    assert parallel['best_params'] == sequential['best_params']
+    assert parallel['best_score'] == sequential['best_score']
+    assert parallel['all_results'] == sequential['all_results']
+
+    # 與逐一建立預測器訓練 / 評估的結果一致
+    fe = tuner.feature_engineer
+    train_features, train_targets = fe.generate_training_dataset(["2330"], PERIODS[0], PERIODS[1], target_periods=[20])
+    test_features, test_targets = fe.generate_training_dataset(["2330"], PERIODS[2], PERIODS[3], target_periods=[20])
+    predictor = StockPricePredictor(fe, 'xgboost')
+    predictor.model = tuner._create_model_with_params('xgboost', sequential['best_params'])
+    train_result = predictor.train(train_features, train_targets)
+    score, _ = tuner._evaluate_on_test_set(predictor, test_features, test_targets, "2330")
+    assert score == sequential['best_score']
+    best = max(sequential['all_results'], key=lambda r: r['test_score'])
+    assert best['train_metrics'] == train_result['validation_metrics']
+
+    csv_files = list((tmp_path / "models" / "hyperparameter_tuning").glob("tuning_2330_*.csv"))
+    assert csv_files and len(pd.read_csv(csv_files[0], encoding='utf-8-sig')) == 8
+
+
+def test_successive_halving_prunes_candidates(tuner):
+    result = tuner.tune_single_stock("2330", "xgboost", *PERIODS, max_combinations=8, successive_halving=True)
+
+    assert result['success']
+    assert result['total_combinations'] == 8
+    assert result['pruned_combinations'] == 8 - result['successful_combinations'] - result['failed_combinations']
+    assert result['pruned_combinations'] > 0
+    survivors = [r for r in result['all_results'] if r['success']]
+    assert result['best_params'] == max(survivors, key=lambda r: r['test_score'])['parameters']
+    assert all(r['error_message'].startswith('提前淘汰') for r in result['all_results'] if r['pruned'])
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.utils.parquet_snapshot import SnapshotReader, export_snapshots
+from stock_price_investment_system.data.data_manager import DataManager
+
+
+def _create_db(tmp_path):
+    db_path = Path(tmp_path) / "taiwan_stock_test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE stock_prices (
+            stock_id TEXT, date TEXT, open_price REAL, high_price REAL, low_price REAL,
+            close_price REAL, volume INTEGER, UNIQUE(stock_id, date))
+    """)
+    conn.execute("""
+        CREATE TABLE monthly_revenues (
+            stock_id TEXT, revenue_year INTEGER, revenue_month INTEGER, revenue REAL,
+            revenue_growth_yoy REAL, UNIQUE(stock_id, revenue_year, revenue_month))
+    """)
+    rows = []
+    for i, sid in enumerate(("2330", "2317")):
+        for d in pd.bdate_range("2022-12-01", "2024-02-29"):
+            px = 100.0 + i * 10 + d.day
+            rows.append((sid, d.strftime("%Y-%m-%d"), px, px + 1, px - 1, px + 0.5, 1000 + d.day))
+    conn.executemany("INSERT INTO stock_prices VALUES (?,?,?,?,?,?,?)", rows)
+    conn.executemany("INSERT INTO monthly_revenues VALUES (?,?,?,?,NULL)",
+                     [("2330", year, month, 1000.0 * month) for year in (2023, 2024) for month in range(1, 13)])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_incremental_export_rewrites_changed_years_only(tmp_path):
+    db_path = _create_db(tmp_path)
+    snapshot_dir = tmp_path / "snapshots"
+
+    first = export_snapshots(db_path, snapshot_dir, tables=["stock_prices", "monthly_revenues"])
+    assert first["stock_prices"]["written"] == 3
+    assert first["monthly_revenues"]["written"] == 2
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE stock_prices SET close_price = 1 WHERE stock_id = '2330' AND date = '2024-02-01'")
+    conn.commit()
+    conn.close()
+
+    second = export_snapshots(db_path, snapshot_dir, tables=["stock_prices", "monthly_revenues"])
+    assert (second["stock_prices"]["written"], second["stock_prices"]["skipped"]) == (1, 2)
+    assert second["monthly_revenues"]["skipped"] == 2
+
+    reader = SnapshotReader(snapshot_dir)
+    assert reader.available("stock_prices") and not reader.available("balance_sheets")
+    df = reader.read_table("stock_prices", stock_ids=["2330"], start_date="2024-02-01", end_date="2024-02-01")
+    assert df["close_price"].tolist() == [1.0]
+    revenue = reader.read_table("monthly_revenues", start_date="2023-11-01", end_date="2024-02-29")
+    assert list(zip(revenue["revenue_year"], revenue["revenue_month"])) == [(2023, 11), (2023, 12), (2024, 1), (2024, 2)]
+
+
+def test_data_manager_reads_snapshot_like_sqlite(tmp_path):
+    db_path = _create_db(tmp_path)
+    export_snapshots(db_path, tmp_path / "snapshots")
+
+    plain = DataManager(db_path=db_path, use_price_cache=False, use_snapshot=False)
+    snap = DataManager(db_path=db_path, use_price_cache=False, use_snapshot=True)
+    snap.enable_snapshot(tmp_path / "snapshots")
+
+    for start, end in [("2023-12-20", "2024-01-10"), (None, None)]:
+        expected = plain.get_stock_prices("2317", start, end)
+        actual = snap.get_stock_prices("2317", start, end)
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+    pd.testing.assert_frame_equal(plain.get_monthly_revenue("2330", "2023-06-01", "2024-03-01"),
+                                  snap.get_monthly_revenue("2330", "2023-06-01", "2024-03-01"),
+                                  check_dtype=False)
+
+
+def test_in_place_updates_are_reexported(tmp_path):
+    db_path = _create_db(tmp_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE financial_statements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, stock_id TEXT, date TEXT, type TEXT, value REAL,
+            origin_name TEXT, created_at TIMESTAMP, UNIQUE(stock_id, date, type))
+    """)
+    conn.executemany("INSERT INTO financial_statements (stock_id, date, type, value, origin_name) "
+                     "VALUES ('2330', ?, ?, ?, ?)",
+                     [("2023-03-31", "Revenue", 100.0, "營收"), ("2023-03-31", "EPS", 1.5, "每股盈餘"),
+                      ("2024-03-31", "Revenue", 120.0, "營收")])
+    conn.commit()
+    snapshot_dir = tmp_path / "snapshots"
+    tables = ["monthly_revenues", "financial_statements"]
+    export_snapshots(db_path, snapshot_dir, tables=tables)
+
+    # 筆數與 rowid 不變的原地更新：成長率 UPDATE、ON CONFLICT DO UPDATE 改寫文字欄
+    conn.execute("UPDATE monthly_revenues SET revenue_growth_yoy = 12.5 WHERE revenue_year = 2024 AND revenue_month = 2")
+    conn.execute("UPDATE financial_statements SET origin_name = '營業收入' WHERE date = '2023-03-31' AND type = 'Revenue'")
+    conn.commit()
+    conn.close()
+
+    second = export_snapshots(db_path, snapshot_dir, tables=tables)
+    assert (second["monthly_revenues"]["written"], second["monthly_revenues"]["skipped"]) == (1, 1)
+    assert (second["financial_statements"]["written"], second["financial_statements"]["skipped"]) == (1, 1)
+    assert export_snapshots(db_path, snapshot_dir, tables=tables)["financial_statements"]["written"] == 0
+
+    reader = SnapshotReader(snapshot_dir)
+    revenue = reader.read_table("monthly_revenues", start_date="2024-02-01", end_date="2024-02-29")
+    assert revenue["revenue_growth_yoy"].tolist() == [12.5]
+    statements = reader.read_table("financial_statements", end_date="2023-12-31")
+    assert set(statements["origin_name"]) == {"營業收入", "每股盈餘"}
@@ -0,0 +1,82 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from stock_price_investment_system.data.data_manager import DataManager
+from stock_price_investment_system.data.price_cache import PricePanelCache, clear_shared_price_caches
+
+
+def create_price_db(tmp_path, stocks=("2330", "2317"), days=60):
+    db_path = Path(tmp_path) / "taiwan_stock_test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE stock_prices (
+            stock_id TEXT, date TEXT,
+            open_price REAL, high_price REAL, low_price REAL, close_price REAL,
+            volume INTEGER
+        )
+        """
+    )
+    rows = []
+    for i, sid in enumerate(stocks):
+        for d in pd.bdate_range("2024-01-01", periods=days):
+            px = 100.0 + i * 10 + d.day
+            rows.append((sid, d.strftime("%Y-%m-%d"), px, px + 1, px - 1, px + 0.5, 1000 + d.day))
+    conn.executemany("INSERT INTO stock_prices VALUES (?,?,?,?,?,?,?)", rows)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_cached_prices_match_sqlite(tmp_path):
+    clear_shared_price_caches()
+    db_path = create_price_db(tmp_path)
+    plain = DataManager(db_path=db_path, use_price_cache=False)
+    cached = DataManager(db_path=db_path, use_price_cache=True)
+
+    for start, end in [("2024-01-05", "2024-02-10"), ("2024-01-06", "2024-01-06"), (None, None)]:
+        expected = plain.get_stock_prices("2330", start, end)
+        actual = cached.get_stock_prices("2330", start, end)
+        assert len(expected) == len(actual)
+        assert (expected["date"].values == actual["date"].values).all()
+        for col in ["open", "high", "low", "close", "volume"]:
+            assert (expected[col].astype(float).values == actual[col].values).all()
+
+    assert cached.get_close_price("2330", "2024-01-08") == plain.get_close_price("2330", "2024-01-08")
+    # 週末無交易資料
+    assert cached.get_close_price("2330", "2024-01-06") is None
+
+    stats = cached.price_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] >= 4
+
+
+def test_lru_eviction_respects_memory_limit():
+    frames = {
+        sid: pd.DataFrame({
+            "date": pd.bdate_range("2020-01-01", periods=1000),
+            "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1.0,
+        })
+        for sid in ["A", "B", "C"]
+    }
+    # 每檔約 47KB，上限 0.1MB 只能容納兩檔
+    cache = PricePanelCache(lambda sid: frames[sid], max_memory_mb=0.1)
+    cache.get_series("A")
+    cache.get_series("B")
+    cache.get_series("A")
+    cache.get_series("C")
+
+    stats = cache.stats()
+    assert stats["stocks"] == 2
+    assert stats["evictions"] == 1
+    # B 為最久未使用，應被淘汰
+    cache.get_series("A")
+    assert cache.stats()["hits"] == 2
+    cache.get_series("B")
+    assert cache.stats()["misses"] == 4
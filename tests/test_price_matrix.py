@@ -0,0 +1,108 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import pickle
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.price_matrix import PriceMatrix, build_price_matrix, get_default_matrix_dir
+from stock_price_investment_system.data.data_manager import DataManager
+
+
+def _insert_prices(db_path, stock_ids, dates):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_prices (
+            stock_id TEXT, date TEXT, open_price REAL, high_price REAL, low_price REAL,
+            close_price REAL, volume INTEGER, UNIQUE(stock_id, date))
+    """)
+    rows = []
+    for i, sid in enumerate(stock_ids):
+        for d in dates:
+            px = 100.1 + i * 10 + d.day
+            rows.append((sid, d.strftime("%Y-%m-%d"), px, px + 1, px - 1, px + 0.3, 30_000_001 + d.day))
+    conn.executemany("INSERT OR REPLACE INTO stock_prices VALUES (?,?,?,?,?,?,?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def test_incremental_build_appends_days_and_stocks(tmp_path):
+    db_path = Path(tmp_path) / "taiwan_stock_test.db"
+    _insert_prices(db_path, ["2330", "2317"], pd.bdate_range("2024-01-01", "2024-03-29"))
+    first = build_price_matrix(db_path)
+    matrix_dir = get_default_matrix_dir(db_path)
+    assert (first["days"], first["stocks"]) == (65, 2)
+
+    # 新交易日與新股票附加在最後，既有欄位置不變
+    _insert_prices(db_path, ["2330", "2317", "1101"], pd.bdate_range("2024-04-01", "2024-04-12"))
+    second = build_price_matrix(db_path)
+    assert (second["new_days"], second["new_stocks"]) == (10, 1)
+
+    matrix = PriceMatrix(matrix_dir)
+    assert matrix.stocks.tolist() == ["2317", "2330", "1101"]
+    assert matrix.field("close").shape == (75, 3)
+    assert isinstance(matrix.field("close"), np.memmap)
+    assert matrix.value_at("2330", "2024-01-02", "close") == 102.4
+    assert matrix.value_at("1101", "2024-03-29") is None
+    assert matrix.value_at("2317", "2024-04-06") is None  # 週末
+    assert matrix.value_at("2317", "2024-04-12", "volume") == 30_000_013
+
+    panel = matrix.panel(["1101", "9999"], "2024-04-10", "2024-04-12")
+    assert panel.shape == (3, 2) and panel["9999"].isna().all()
+
+    restored = pickle.loads(pickle.dumps(matrix))
+    assert restored.value_at("1101", "2024-04-12") == matrix.value_at("1101", "2024-04-12")
+
+
+def test_data_manager_reads_matrix_like_sqlite(tmp_path):
+    db_path = Path(tmp_path) / "taiwan_stock_test.db"
+    _insert_prices(db_path, ["2330", "2317"], pd.bdate_range("2023-12-01", "2024-02-29"))
+    build_price_matrix(db_path)
+
+    plain = DataManager(db_path=db_path, use_price_cache=False, use_price_matrix=False)
+    mapped = DataManager(db_path=db_path, use_price_cache=False, use_price_matrix=False)
+    assert mapped.enable_price_matrix(get_default_matrix_dir(db_path)) is not None
+
+    for start, end in [("2023-12-20", "2024-01-10"), (None, None)]:
+        pd.testing.assert_frame_equal(plain.get_stock_prices("2317", start, end),
+                                      mapped.get_stock_prices("2317", start, end), check_dtype=False)
+    assert mapped.get_close_price("2330", "2024-02-01") == pytest.approx(plain.get_close_price("2330", "2024-02-01"))
+
+    # 矩陣落後資料庫時改查資料庫
+    _insert_prices(db_path, ["2330"], pd.bdate_range("2024-03-01", "2024-03-05"))
+    assert mapped.get_close_price("2330", "2024-03-04") == plain.get_close_price("2330", "2024-03-04")
+
+
+def test_incremental_build_refills_backfilled_history(tmp_path):
+    db_path = Path(tmp_path) / "taiwan_stock_test.db"
+    _insert_prices(db_path, ["2330", "2317"], pd.bdate_range("2024-01-01", "2024-03-29"))
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM stock_prices WHERE stock_id = '2317' AND date = '2024-01-15'")
+    conn.commit()
+    conn.close()
+    build_price_matrix(db_path)
+
+    # 新收集股票的完整歷史、舊缺口回補，並新增兩個交易日
+    _insert_prices(db_path, ["1101"], pd.bdate_range("2024-01-01", "2024-04-02"))
+    _insert_prices(db_path, ["2317"], [pd.Timestamp("2024-01-15")])
+    _insert_prices(db_path, ["2330", "2317"], pd.bdate_range("2024-04-01", "2024-04-02"))
+    result = build_price_matrix(db_path)
+    assert (result["new_days"], result["new_stocks"], result["refilled_stocks"]) == (2, 1, 2)
+
+    plain = DataManager(db_path=db_path, use_price_cache=False, use_price_matrix=False)
+    mapped = DataManager(db_path=db_path, use_price_cache=False, use_price_matrix=False)
+    mapped.enable_price_matrix(get_default_matrix_dir(db_path))
+    for stock_id in ("1101", "2317", "2330"):
+        pd.testing.assert_frame_equal(plain.get_stock_prices(stock_id, None, None),
+                                      mapped.get_stock_prices(stock_id, None, None), check_dtype=False)
+    assert len(mapped.get_stock_prices("1101", None, None)) == 67
+    assert mapped.get_close_price("1101", "2024-01-02") == pytest.approx(102.4)
+    assert mapped.get_close_price("2317", "2024-01-15") == pytest.approx(plain.get_close_price("2317", "2024-01-15"))
+
+    # 歷史未變動時不重新讀取
+    assert build_price_matrix(db_path)["refilled_stocks"] == 0
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import json
+
+from scripts.progress_manager import ProgressManager, TaskStatus, TaskType
+
+STOCKS = [{'stock_id': '2330', 'stock_name': '台積電'},
+          {'stock_id': '2317', 'stock_name': '鴻海'},
+          {'stock_id': '2454', 'stock_name': '聯發科'}]
+
+
+def test_update_progress_and_pending_stocks(tmp_path):
+    manager = ProgressManager(str(tmp_path))
+    task_id = manager.create_task(TaskType.COMPREHENSIVE, '批次收集', STOCKS, {'start_date': '2024-01-01'})
+
+    manager.update_stock_progress(task_id, '2330', TaskStatus.IN_PROGRESS, completed_datasets=['stock_prices'])
+    manager.update_stock_progress(task_id, '2330', TaskStatus.IN_PROGRESS, completed_datasets=['stock_prices'],
+                                  failed_datasets=['cash_flow'], error_message='無資料')
+    manager.update_stock_progress(task_id, '2330', TaskStatus.COMPLETED)
+    manager.update_stock_progress(task_id, '2317', TaskStatus.FAILED, error_message='HTTP 500')
+
+    stock = manager.get_stock_progress(task_id, '2330')
+    assert stock.completed_datasets == ['stock_prices']
+    assert stock.failed_datasets == ['cash_flow']
+    assert stock.retry_count == 1 and stock.status == TaskStatus.COMPLETED
+
+    task = manager.load_task_progress(task_id)
+    assert (task.completed_stocks, task.failed_stocks, task.status) == (1, 1, TaskStatus.IN_PROGRESS)
+    assert task.parameters == {'start_date': '2024-01-01'}
+    assert list(task.stock_progress) == ['2330', '2317', '2454']
+    assert manager.get_pending_stocks(task_id) == [STOCKS[1], STOCKS[2]]
+
+    manager.update_stock_progress(task_id, '2454', TaskStatus.COMPLETED)
+    assert manager.list_tasks()[0]['status'] == TaskStatus.COMPLETED.value
+
+    manager.reset_task(task_id)
+    task = manager.load_task_progress(task_id)
+    assert (task.completed_stocks, task.status) == (0, TaskStatus.NOT_STARTED)
+    assert len(manager.get_pending_stocks(task_id)) == 3
+
+    manager.delete_task(task_id)
+    assert manager.list_tasks() == []
+
+
+def test_legacy_json_progress_is_imported(tmp_path):
+    legacy = {'tasks': {'comprehensive_20240101_000000': {
+        'task_id': 'comprehensive_20240101_000000', 'task_type': 'comprehensive', 'task_name': '舊任務',
+        'status': 'in_progress', 'total_stocks': 2, 'completed_stocks': 1, 'failed_stocks': 0,
+        'skipped_stocks': 0, 'start_time': '2024-01-01T00:00:00', 'last_updated': '2024-01-01T01:00:00',
+        'end_time': None, 'parameters': {'test_mode': False},
+        'stock_progress': {
+            '2330': {'stock_id': '2330', 'stock_name': '台積電', 'status': 'completed',
+                     'completed_datasets': ['stock_prices'], 'failed_datasets': [],
+                     'last_updated': '2024-01-01T01:00:00', 'retry_count': 0, 'error_message': None},
+            '2317': {'stock_id': '2317', 'stock_name': '鴻海', 'status': 'not_started',
+                     'completed_datasets': [], 'failed_datasets': [], 'last_updated': '2024-01-01T00:00:00'},
+        }}}}
+    (tmp_path / 'collection_progress.json').write_text(json.dumps(legacy, ensure_ascii=False), encoding='utf-8')
+
+    manager = ProgressManager(str(tmp_path))
+    tasks = manager.list_tasks()
+    assert [t['task_id'] for t in tasks] == ['comprehensive_20240101_000000']
+    assert manager.get_pending_stocks('comprehensive_20240101_000000') == [{'stock_id': '2317', 'stock_name': '鴻海'}]
+
+    # 已匯入的任務不會被再次匯入覆蓋
+    manager.update_stock_progress('comprehensive_20240101_000000', '2317', TaskStatus.COMPLETED)
+    assert ProgressManager(str(tmp_path)).import_json() == 0
+    task = ProgressManager(str(tmp_path)).load_task_progress('comprehensive_20240101_000000')
+    assert (task.completed_stocks, task.status) == (2, TaskStatus.COMPLETED)
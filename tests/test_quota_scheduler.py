@@ -0,0 +1,163 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.services.data_collector import FinMindDataCollector
+from app.utils.simple_database import SimpleDatabaseManager
+from scripts.quota_scheduler import CollectionJob, JobStatus, QuotaScheduler, RequestLedger, build_default_handlers
+from scripts.smart_wait import SmartWaitManager
+
+
+class _FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return _FakeClock()
+
+
+def test_ledger_next_slot_is_when_oldest_request_expires(tmp_path, clock):
+    ledger = RequestLedger(tmp_path / 'state.db', requests_per_hour=13, clock=clock)  # 額度 3
+    for offset in (0, 100, 200):
+        ledger.record('TaiwanStockPrice', '2330', requested_at=clock.now + offset)
+    clock.now += 300
+
+    assert ledger.used() == 3
+    assert ledger.next_available() == pytest.approx(clock.now - 300 + 3600)
+    # 再 3 次請求：依序等第 1、2、3 筆過期
+    assert ledger.estimate_completion(3) == pytest.approx(3600 + 200 - 300)
+
+
+def test_ledger_mark_exhausted_blocks_until_window_expires(tmp_path, clock):
+    ledger = RequestLedger(tmp_path / 'state.db', requests_per_hour=600, clock=clock)
+    ledger.record(requested_at=clock.now - 1000)
+
+    until = ledger.mark_exhausted()
+    assert until == pytest.approx(clock.now - 1000 + 3600)
+    assert ledger.seconds_until_available() == pytest.approx(2600)
+
+
+def test_scheduler_runs_by_priority_and_waits_for_exact_slot(tmp_path, clock):
+    calls = []
+
+    def handler(job):
+        calls.append((job.dataset, job.data_id))
+        return 1
+
+    scheduler = QuotaScheduler(tmp_path / 'state.db', requests_per_hour=12,
+                               handlers={'TaiwanStockPrice': handler, 'TaiwanStockDividend': handler},
+                               clock=clock, sleep=clock.sleep)
+    scheduler.enqueue('TaiwanStockDividend', '2330', '2024-01-01')
+    scheduler.enqueue_many('TaiwanStockPrice', ['2330', '2317'], '2024-01-01')
+    assert not scheduler.enqueue('TaiwanStockPrice', '2330', '2024-01-01')
+
+    status = scheduler.status()
+    assert status['queue_depth'] == 3
+    assert status['pending_by_dataset'] == {'TaiwanStockPrice': 2, 'TaiwanStockDividend': 1}
+
+    summary = scheduler.run()
+    assert summary['done'] == 3
+    # 股價優先；額度 2 次用完後只等到第一筆請求滿一小時
+    assert calls == [('TaiwanStockPrice', '2330'), ('TaiwanStockPrice', '2317'), ('TaiwanStockDividend', '2330')]
+    assert clock.slept == [pytest.approx(3600)]
+    assert scheduler.status()['status_counts'][JobStatus.DONE.value] == 3
+
+
+def test_scheduler_requeues_on_quota_error_and_resumes_after_restart(tmp_path, clock):
+    state_db = tmp_path / 'state.db'
+    attempts = {'count': 0}
+
+    def flaky(job):
+        attempts['count'] += 1
+        if attempts['count'] == 1:
+            raise Exception('API請求限制: 402 Client Error: Payment Required')
+        if job.data_id == '9999':
+            raise ValueError('bad data')
+        return 5
+
+    scheduler = QuotaScheduler(state_db, requests_per_hour=600, handlers={'TaiwanStockPrice': flaky},
+                               max_attempts=2, clock=clock, sleep=clock.sleep)
+    scheduler.enqueue_many('TaiwanStockPrice', ['2330', '9999'], '2024-01-01')
+
+    # 模擬中斷：取出一個工作後行程結束
+    scheduler._next_job()
+    restarted = QuotaScheduler(state_db, requests_per_hour=600, handlers={'TaiwanStockPrice': flaky},
+                               max_attempts=2, clock=clock, sleep=clock.sleep)
+    assert restarted.status()['queue_depth'] == 2
+
+    summary = restarted.run()
+    assert summary == {'done': 1, 'failed': 1, 'retried': 2, 'waited_seconds': 3600}
+    # 402 之後等待一個窗口，且不計入嘗試次數
+    assert clock.slept == [pytest.approx(3600)]
+    counts = restarted.status()['status_counts']
+    assert counts[JobStatus.DONE.value] == 1 and counts[JobStatus.FAILED.value] == 1
+
+
+def test_smart_wait_uses_ledger_instead_of_fixed_period(tmp_path, clock):
+    ledger = RequestLedger(tmp_path / 'state.db', requests_per_hour=600, clock=clock)
+    ledger.record(requested_at=clock.now - 3000)
+
+    manager = SmartWaitManager(api_reset_minutes=70, ledger=ledger)
+    manager.reset_execution_timer()
+    assert manager.get_remaining_wait_minutes() == pytest.approx(10)
+
+
+
+def test_global_wait_manager_shares_collection_ledger(tmp_path, monkeypatch):
+    import scripts.smart_wait as smart_wait
+    from config import Config
+
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'taiwan_stock.db'))
+    monkeypatch.setattr(smart_wait, '_global_wait_manager', None)
+    monkeypatch.setattr(smart_wait, '_global_request_ledger', None)
+
+    # 直接以 requests 呼叫的收集程式記錄到與 collect_daily_update 相同的帳本
+    smart_wait.record_api_request('TaiwanStockDividendResult', '2330')
+    manager = smart_wait.get_smart_wait_manager()
+    assert manager.ledger is smart_wait.get_request_ledger()
+    assert manager.ledger.db_path == str(tmp_path / 'collection_scheduler.db')
+    assert manager.ledger.used() == 1
+    assert 55 < manager.get_remaining_wait_minutes() <= 60
+
+def test_default_handlers_cover_statement_datasets(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'stock.db')
+    manager = SimpleDatabaseManager(db_path)
+    with manager.connection() as conn:
+        # 財報收集腳本使用 scripts/expand_database.py 的長表格式
+        for table in ('financial_statements', 'balance_sheets'):
+            conn.execute(f"""CREATE TABLE {table} (stock_id TEXT NOT NULL, date DATE NOT NULL, type TEXT NOT NULL,
+                              value REAL, origin_name TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                              UNIQUE(stock_id, date, type))""")
+        conn.execute("""CREATE TABLE financial_ratios (stock_id TEXT NOT NULL, date DATE NOT NULL, gross_margin REAL,
+                          operating_margin REAL, net_margin REAL, debt_ratio REAL, current_ratio REAL,
+                          created_at TIMESTAMP, UNIQUE(stock_id, date))""")
+        conn.commit()
+    rows = [{'date': '2024-03-31', 'stock_id': '2330', 'type': t, 'value': v, 'origin_name': t}
+            for t, v in (('Revenue', 1000.0), ('GrossProfit', 500.0), ('IncomeAfterTaxes', 200.0))]
+    monkeypatch.setattr(FinMindDataCollector, '_make_request',
+                        lambda self, dataset, data_id, start_date, end_date: {'data': rows})
+
+    handlers = build_default_handlers(db_path, 'http://finmind.invalid', '')
+    assert {'TaiwanStockFinancialStatements', 'TaiwanStockBalanceSheet'} <= set(handlers)
+
+    job = CollectionJob(1, 'TaiwanStockFinancialStatements', '2330', '2024-01-01', '2024-06-30', 2)
+    assert handlers['TaiwanStockFinancialStatements'](job) == 3
+    assert handlers['TaiwanStockBalanceSheet'](job) == 3
+
+    with manager.connection(read_only=True) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM financial_statements").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM balance_sheets").fetchone()[0] == 3
+        ratios = conn.execute("SELECT gross_margin, net_margin FROM financial_ratios").fetchall()
+    assert ratios == [(50.0, 20.0)]
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from app.utils.revenue_growth import recompute_revenue_growth
+
+
+def _make_db(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE monthly_revenues (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, stock_id TEXT NOT NULL,
+            revenue_year INTEGER NOT NULL, revenue_month INTEGER NOT NULL, revenue REAL NOT NULL,
+            revenue_growth_mom REAL, revenue_growth_yoy REAL,
+            UNIQUE(stock_id, revenue_year, revenue_month))
+    """)
+    conn.executemany("INSERT INTO monthly_revenues (stock_id, revenue_year, revenue_month, revenue) "
+                     "VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def _growth(conn, stock_id, year, month):
+    return conn.execute("SELECT revenue_growth_mom, revenue_growth_yoy FROM monthly_revenues "
+                        "WHERE stock_id = ? AND revenue_year = ? AND revenue_month = ?",
+                        (stock_id, year, month)).fetchone()
+
+
+def test_recompute_matches_row_by_row_growth():
+    rng = np.random.default_rng(0)
+    months = [(year, month) for year in (2022, 2023, 2024) for month in range(1, 13)]
+    rows = [(stock_id, year, month, float(rng.integers(1, 10 ** 6)))
+            for stock_id in ('2317', '2330') for year, month in months]
+    conn = _make_db(rows)
+
+    assert recompute_revenue_growth(conn) == len(rows)
+
+    revenues = {(s, y, m): r for s, y, m, r in rows}
+    for stock_id, year, month, revenue in rows:
+        prev = revenues.get((stock_id, year - (month == 1), 12 if month == 1 else month - 1))
+        last_year = revenues.get((stock_id, year - 1, month))
+        mom, yoy = _growth(conn, stock_id, year, month)
+        assert mom == (pytest.approx((revenue - prev) / prev * 100) if prev else None)
+        assert yoy == (pytest.approx((revenue - last_year) / last_year * 100) if last_year else None)
+
+
+def test_watermark_and_missing_months():
+    conn = _make_db([('2330', 2023, 5, 100.0), ('2330', 2024, 3, 80.0),
+                     ('2330', 2024, 5, 150.0), ('2330', 2024, 6, 120.0), ('2317', 2024, 6, 50.0)])
+
+    assert recompute_revenue_growth(conn, since='2024-05') == 3
+    assert _growth(conn, '2330', 2024, 3) == (None, None)
+    # 2024/04 缺資料，月增率不與 2024/03 比較
+    assert _growth(conn, '2330', 2024, 5) == (None, pytest.approx(50.0))
+    assert _growth(conn, '2330', 2024, 6) == (pytest.approx(-20.0), None)
+
+    conn.execute("UPDATE monthly_revenues SET revenue = 200 WHERE stock_id = '2330' AND revenue_year = 2024 "
+                 "AND revenue_month = 5")
+    assert recompute_revenue_growth(conn, stock_ids=['2330'], since=(2024, 5)) == 2
+    assert _growth(conn, '2330', 2024, 6) == (pytest.approx(-40.0), None)
+
+
+def test_recollecting_overlapping_window_keeps_first_month_growth(tmp_path, monkeypatch):
+    revenue_script = pytest.importorskip("scripts.collect_monthly_revenue")
+
+    db_path = str(tmp_path / 'stock.db')
+    conn = sqlite3.connect(db_path)
+    # scripts/expand_database.py 的 monthly_revenues 結構
+    conn.execute("""
+        CREATE TABLE monthly_revenues (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, stock_id TEXT NOT NULL, date DATE NOT NULL, country TEXT,
+            revenue BIGINT, revenue_month INTEGER, revenue_year INTEGER,
+            revenue_growth_mom REAL, revenue_growth_yoy REAL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(stock_id, revenue_year, revenue_month))
+    """)
+    revenues = {(2023, 4): 100.0, (2024, 3): 120.0, (2024, 4): 150.0, (2024, 5): 180.0}
+    conn.executemany("INSERT INTO monthly_revenues (stock_id, date, revenue, revenue_year, revenue_month) "
+                     "VALUES ('2330', ?, ?, ?, ?)",
+                     [(f"{y}-{m + 1:02d}-01", r, y, m) for (y, m), r in revenues.items() if (y, m) != (2024, 5)])
+    conn.commit()
+    recompute_revenue_growth(conn)
+    assert _growth(conn, '2330', 2024, 4) == (pytest.approx(25.0), pytest.approx(50.0))
+
+    # 從 2024-05-01 重新收集：第一筆為 2024/04 營收（INSERT OR REPLACE 會清空其成長率）
+    fetched = [{'stock_id': '2330', 'date': f"2024-{m + 1:02d}-01", 'country': 'Taiwan',
+                'revenue': revenues[(2024, m)], 'revenue_year': 2024, 'revenue_month': m} for m in (4, 5)]
+    monkeypatch.setattr(revenue_script.Config, 'DATABASE_PATH', db_path)
+    monkeypatch.setattr(revenue_script.FinMindDataCollector, '_make_request',
+                        lambda self, dataset, data_id, start_date, end_date: {'data': fetched})
+    monkeypatch.setattr(revenue_script.time, 'sleep', lambda seconds: None)
+
+    total_saved, failed = revenue_script.collect_monthly_revenue_batch(
+        [{'stock_id': '2330'}], '2024-05-01', '2024-06-30')
+    assert (total_saved, failed) == (2, [])
+    assert _growth(conn, '2330', 2024, 4) == (pytest.approx(25.0), pytest.approx(50.0))
+    assert _growth(conn, '2330', 2024, 5) == (pytest.approx(20.0), None)
+    conn.close()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import sqlite3
+import threading
+import warnings
+
+import pandas as pd
+import pytest
+
+from app.utils.sqlite_pool import SQLitePool, get_sqlite_pool
+from app.utils.simple_database import SimpleDatabaseManager
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "pool.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (k INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"v{i}") for i in range(10)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_connections_are_reused_with_wal_and_pragmas(db_path):
+    pool = SQLitePool(db_path)
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+    conn.row_factory = sqlite3.Row
+    conn.execute("INSERT INTO t VALUES (100, 'uncommitted')")
+    conn.close()
+    conn.close()  # 重複歸還不影響連線池
+
+    again = pool.acquire()
+    assert again is conn
+    assert again.row_factory is None
+    assert again.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 10
+    again.close()
+    pool.close_all()
+
+
+def test_read_only_connections_reject_writes(db_path):
+    pool = SQLitePool(db_path)
+    with pool.connection(read_only=True, row_factory=sqlite3.Row) as conn:
+        assert conn.execute("SELECT v FROM t WHERE k = 3").fetchone()["v"] == "v3"
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO t VALUES (200, 'x')")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            assert len(pd.read_sql_query("SELECT * FROM t", conn)) == 10
+    pool.close_all()
+
+
+def test_readers_are_not_blocked_by_open_write_transaction(db_path):
+    pool = SQLitePool(db_path, timeout=1)
+    writer = pool.acquire()
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO t VALUES (300, 'pending')")
+
+    counts, errors = [], []
+
+    def read():
+        try:
+            with pool.connection(read_only=True) as conn:
+                counts.append(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0])
+        except Exception as e:  # pragma: no cover - 失敗時顯示原因
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.commit()
+    writer.close()
+
+    assert not errors
+    assert counts == [10] * 4
+    with pool.connection(read_only=True) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 11
+    pool.close_all()
+
+
+def test_simple_database_manager_uses_shared_pool(db_path):
+    db = SimpleDatabaseManager(str(db_path))
+    conn = db.get_connection()
+    conn.execute("INSERT INTO t VALUES (400, 'x')")
+    conn.commit()
+    conn.close()
+
+    assert db.get_table_count("t") == 11
+    assert db.get_connection() is conn
+    assert get_sqlite_pool(str(db_path)) is get_sqlite_pool(db_path)
+
+    backup = db_path.with_name("backup.db")
+    db.backup_database(str(backup))
+    check = sqlite3.connect(backup)
+    assert check.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 11
+    check.close()
+    db.close()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+from app.services.query_service import StockQueryService
+from app.utils.simple_database import SimpleDatabaseManager
+from app.utils.stock_search import PrefixTrie
+
+
+def _ids(results):
+    return [row['stock_id'] for row in results]
+
+
+def test_prefix_trie_returns_shorter_keys_first():
+    trie = PrefixTrie()
+    for key in ('2330', '23', '2303', '2317'):
+        trie.insert(key, key)
+    assert trie.search('23') == ['23', '2303', '2317', '2330']
+    assert trie.search('233') == ['2330']
+    assert trie.search('9') == []
+
+
+def test_search_ranks_prefixes_and_follows_stock_writes(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "stock.db"))
+    manager.create_tables()
+    with manager.connection() as conn:
+        conn.executemany("INSERT INTO stocks (stock_id, stock_name, market, industry, is_active) VALUES (?, ?, 'TWSE', ?, ?)",
+                         [('2330', '台積電', '半導體業', 1), ('2303', '聯電', '半導體業', 1),
+                          ('2317', '鴻海', '其他電子業', 1), ('9999', '台積測試', '半導體業', 0)])
+        conn.commit()
+
+    service = StockQueryService(manager)
+    assert _ids(service.search_stocks('23')) == ['2303', '2317', '2330']
+    assert _ids(service.search_stocks('台積')) == ['2330']
+    assert _ids(service.search_stocks('積電')) == ['2330']
+    assert _ids(service.search_stocks('半導體')) == ['2303', '2330']
+    assert service.search_stocks('  ') == []
+
+    # stocks 的新增、取代、刪除由觸發器同步到 FTS5 索引與前綴樹
+    with manager.connection() as conn:
+        conn.execute("INSERT OR REPLACE INTO stocks (stock_id, stock_name, market, industry, is_active) "
+                     "VALUES ('2317', '鴻海精密', 'TWSE', '其他電子業', 1)")
+        conn.execute("INSERT INTO stocks (stock_id, stock_name, market, is_active) VALUES ('3711', '日月光投控', 'TWSE', 1)")
+        conn.execute("DELETE FROM stocks WHERE stock_id = '2303'")
+        conn.commit()
+        assert conn.execute("SELECT COUNT(*) FROM stocks_fts").fetchone()[0] == 4
+
+    assert _ids(service.search_stocks('海精密')) == ['2317']
+    assert _ids(service.search_stocks('日月')) == ['3711']
+    assert _ids(service.search_stocks('半導體')) == ['2330']
+    assert service.search_stocks('2330')[0]['stock_name'] == '台積電'
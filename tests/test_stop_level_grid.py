@@ -0,0 +1,94 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import ast
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_price_investment_system.price_models.stop_level_grid import StopLevelGrid
+
+
+def _reference(trades_df, stop_loss, take_profit):
+    """逐筆模擬（原本 _simulate_stop_levels 的邏輯）"""
+    simulated = []
+    for _, trade in trades_df.iterrows():
+        max_return = trade.get('max_return_20d', trade.get('max_return', 0))
+        min_return = trade.get('min_return_20d', trade.get('min_return', 0))
+        original_return = trade.get('actual_return', 0)
+        if max_return >= take_profit:
+            simulated_return, exit_reason = take_profit, 'take_profit'
+        elif min_return <= -stop_loss:
+            simulated_return, exit_reason = -stop_loss, 'stop_loss'
+        else:
+            simulated_return, exit_reason = original_return, 'normal'
+        costs = trade.get('transaction_costs', {})
+        if isinstance(costs, str):
+            try:
+                costs = ast.literal_eval(costs)
+            except Exception:
+                costs = {}
+        cost_rate = costs.get('total_cost_rate', 0.007) if isinstance(costs, dict) else 0.007
+        simulated.append({'simulated_return': simulated_return - cost_rate, 'exit_reason': exit_reason})
+    df = pd.DataFrame(simulated)
+    cumulative = (1 + df['simulated_return']).cumprod()
+    running_max = cumulative.expanding().max()
+    return {
+        'winning_trades': len(df[df['simulated_return'] > 0]),
+        'win_rate': len(df[df['simulated_return'] > 0]) / len(df),
+        'avg_return': df['simulated_return'].mean(),
+        'total_return': df['simulated_return'].sum(),
+        'max_drawdown': abs(((cumulative - running_max) / running_max).min()),
+        'exit_reasons': df['exit_reason'].value_counts().to_dict(),
+        'simulated_returns': df['simulated_return'].tolist(),
+    }
+
+
+def _make_trades(n, seed=3):
+    rng = np.random.default_rng(seed)
+    actual = rng.normal(0.01, 0.08, n)
+    costs = [{'total_cost_rate': 0.006}, "{'total_cost_rate': 0.0058}", 'broken', None]
+    return pd.DataFrame({
+        'stock_id': [str(2300 + i % 7) for i in range(n)],
+        'entry_date': pd.date_range('2024-01-01', periods=n, freq='D').strftime('%Y-%m-%d'),
+        'actual_return': actual,
+        'max_return_20d': np.maximum(actual, 0) + np.abs(rng.normal(0.03, 0.05, n)),
+        'min_return_20d': np.minimum(actual, 0) - np.abs(rng.normal(0.03, 0.05, n)),
+        'transaction_costs': [costs[i % len(costs)] for i in range(n)],
+    })
+
+
+def test_grid_matches_per_pair_simulation():
+    trades = _make_trades(80)
+    trades.loc[5, 'actual_return'] = np.nan
+    stop_losses = [0.02, 0.05, 0.10, 0.20]
+    take_profits = [0.05, 0.10, 0.30]
+
+    results = StopLevelGrid(trades).results(stop_losses, take_profits)
+
+    for i, sl in enumerate(stop_losses):
+        for j, tp in enumerate(take_profits):
+            expected = _reference(trades, sl, tp)
+            result = results[i][j]
+            assert result['total_trades'] == len(trades)
+            assert result['winning_trades'] == expected['winning_trades']
+            assert result['win_rate'] == expected['win_rate']
+            assert result['exit_reasons'] == expected['exit_reasons']
+            for key in ('avg_return', 'total_return', 'max_drawdown'):
+                assert result[key] == pytest.approx(expected[key], rel=1e-12)
+            np.testing.assert_allclose(
+                [t['simulated_return'] for t in result['simulated_trades']], expected['simulated_returns'], rtol=1e-12)
+            assert [t['stock_id'] for t in result['simulated_trades']] == trades['stock_id'].tolist()
+
+
+def test_fine_grid_is_fast():
+    trades = _make_trades(2000)
+    levels = [k / 100 for k in range(1, 31)]
+
+    start = time.perf_counter()
+    grid = StopLevelGrid(trades).simulate(levels, levels)
+    assert time.perf_counter() - start < 1.0
+    assert grid['total_return'].shape == (30, 30)
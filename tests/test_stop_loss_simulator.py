@@ -0,0 +1,100 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+_sys.path.insert(0, _os.path.abspath(_os.path.dirname(__file__)))
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_price_investment_system.data.data_manager import DataManager
+from stock_price_investment_system.price_models.stop_loss_simulator import StopLossTradeSimulator
+from test_panel_features import create_feature_db
+
+
+def _reference_exit(dm, stock_id, entry_date, entry_price, stop_loss, take_profit):
+    """逐日收盤檢查（原本 _simulate_stop_loss_trade 的邏輯）"""
+    end = (datetime.strptime(entry_date, '%Y-%m-%d') + timedelta(days=30)).strftime('%Y-%m-%d')
+    df = dm.get_stock_prices(stock_id, entry_date, end)
+    price_data = [(d.strftime('%Y-%m-%d'), float(c)) for d, c in zip(df['date'], df['close'])]
+    if len(price_data) < 2:
+        return None
+    max_return = min_return = 0
+    exit_date = exit_price = None
+    exit_reason = 'normal'
+    for i, (date, price) in enumerate(price_data[1:], 1):
+        daily_return = (price - entry_price) / entry_price
+        max_return = max(max_return, daily_return)
+        min_return = min(min_return, daily_return)
+        if daily_return >= take_profit:
+            exit_date, exit_price, exit_reason = date, price, 'take_profit'
+            break
+        if daily_return <= -stop_loss:
+            exit_date, exit_price, exit_reason = date, price, 'stop_loss'
+            break
+        if i >= 20:
+            exit_date, exit_price, exit_reason = date, price, 'normal'
+            break
+    if not exit_date:
+        exit_date, exit_price = price_data[-1]
+    holding_days = len([d for d, _ in price_data if d <= exit_date]) - 1
+    return exit_date, exit_price, exit_reason, holding_days, max_return, min_return
+
+
+@pytest.fixture
+def dm(tmp_path):
+    return DataManager(db_path=create_feature_db(tmp_path), use_price_cache=False)
+
+
+def _trades(dm):
+    rng = np.random.default_rng(11)
+    rows = []
+    for stock_id in ["2330", "8299", "0000"]:
+        for entry in pd.date_range("2019-05-01", "2021-12-28", freq="9D"):
+            entry_date = entry.strftime('%Y-%m-%d')
+            price = dm.get_close_price(stock_id, entry_date)
+            rows.append({'stock_id': stock_id, 'entry_date': entry_date,
+                         'entry_price': price if price else 100.0 * rng.uniform(0.8, 1.2)})
+    return pd.DataFrame(rows)
+
+
+def test_batched_close_exits_match_daily_walk(dm):
+    trades = _trades(dm)
+    calls = []
+    original = dm.get_stock_prices
+    dm.get_stock_prices = lambda *args, **kwargs: calls.append(args[0]) or original(*args, **kwargs)
+
+    result = StopLossTradeSimulator(dm).simulate(trades, stop_loss=0.05, take_profit=0.08)
+    assert sorted(calls) == ["0000", "2330", "8299"]
+    dm.get_stock_prices = original
+
+    assert list(result['entry_date']) == list(trades['entry_date'])
+    assert set(result['exit_reason']) >= {'take_profit', 'stop_loss', 'normal', 'no_data'}
+    for trade, (_, row) in zip(trades.to_dict('records'), result.iterrows()):
+        expected = _reference_exit(dm, trade['stock_id'], trade['entry_date'], trade['entry_price'], 0.05, 0.08)
+        if expected is None:
+            assert row['exit_reason'] == 'no_data'
+            continue
+        exit_date, exit_price, exit_reason, holding_days, max_return, min_return = expected
+        assert (row['exit_date'], row['exit_reason'], row['holding_days']) == (exit_date, exit_reason, holding_days)
+        assert row['exit_price'] == exit_price
+        assert row['max_return_20d'] == max_return
+        assert row['min_return_20d'] == min_return
+
+
+def test_high_low_basis_exits_at_touched_level(dm):
+    trades = _trades(dm)
+    result = StopLossTradeSimulator(dm).simulate(trades, stop_loss=0.05, take_profit=0.08, price_basis='high_low')
+    close_result = StopLossTradeSimulator(dm).simulate(trades, stop_loss=0.05, take_profit=0.08)
+
+    traded = result[result['exit_reason'] != 'no_data']
+    assert (traded['holding_days'] <= 20).all()
+    tp = traded[traded['exit_reason'] == 'take_profit']
+    assert not tp.empty and (tp['exit_price'] >= tp['entry_price'] * 1.08 - 1e-9).all()
+    sl = traded[traded['exit_reason'] == 'stop_loss']
+    assert not sl.empty and (sl['exit_price'] <= sl['entry_price'] * 0.95 + 1e-9).all()
+    # 盤中觸價不會晚於收盤觸價
+    both = (result['exit_reason'] != 'no_data')
+    assert (result.loc[both, 'holding_days'] <= close_result.loc[both, 'holding_days']).all()
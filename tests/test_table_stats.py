@@ -0,0 +1,90 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import pandas as pd
+
+from app.services.query_service import StockQueryService
+from app.utils.bulk_upsert import bulk_upsert_dataframe
+from app.utils.simple_database import SimpleDatabaseManager
+from app.utils.table_stats import (STATS_TABLES, load_table_stats, record_stock_write, refresh_table_stats,
+                                   snapshot_stock_stats)
+
+
+def _prices(rows):
+    return pd.DataFrame(rows, columns=['stock_id', 'date', 'close_price']).assign(
+        open_price=lambda d: d['close_price'], high_price=lambda d: d['close_price'],
+        low_price=lambda d: d['close_price'], volume=1000)
+
+
+def _stats_without_times(conn):
+    return {table: {k: v for k, v in row.items() if k not in ('last_updated', 'refreshed_at')}
+            for table, row in load_table_stats(conn).items()}
+
+
+def test_incremental_writes_match_full_refresh(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "stock.db"))
+    manager.create_tables()
+    with manager.connection() as conn:
+        conn.executemany("INSERT INTO stocks (stock_id, stock_name, market) VALUES (?, ?, 'TWSE')",
+                         [('2330', '台積電'), ('2317', '鴻海')])
+        conn.commit()
+        bulk_upsert_dataframe(conn, 'stock_prices', _prices([('2330', '2024-06-18', 900.0),
+                                                              ('2330', '2024-06-19', 910.0)]))
+
+    # 第一次讀取時完整計算
+    service = StockQueryService(manager)
+    stats = service.get_database_stats()
+    assert (stats['stocks_count'], stats['stock_prices_count']) == (2, 2)
+    assert (stats['earliest_date'], stats['latest_date']) == ('2024-06-18', '2024-06-19')
+
+    with manager.connection() as conn:
+        # 更新既有資料、新增較早日期與新股票
+        bulk_upsert_dataframe(conn, 'stock_prices', _prices([('2330', '2024-06-19', 915.0),
+                                                              ('2330', '2024-06-17', 890.0),
+                                                              ('2317', '2024-06-20', 150.0)]))
+        bulk_upsert_dataframe(conn, 'monthly_revenues', pd.DataFrame({
+            'stock_id': ['2330', '2330', '2317'], 'revenue_year': [2023, 2024, 2024],
+            'revenue_month': [12, 5, 5], 'revenue': [1.0, 2.0, 3.0]}))
+        incremental = _stats_without_times(conn)
+
+        refresh_table_stats(conn)
+        assert incremental == _stats_without_times(conn)
+
+    prices = incremental['stock_prices']
+    assert (prices['row_count'], prices['distinct_stocks']) == (4, 2)
+    assert (prices['min_date'], prices['max_date']) == ('2024-06-17', '2024-06-20')
+    assert incremental['monthly_revenues']['min_date'] == '2023-12'
+    assert set(incremental) == set(STATS_TABLES)
+
+
+def test_direct_insert_or_replace_writes_match_full_refresh(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "stock.db"))
+    manager.create_tables()
+    with manager.connection() as conn:
+        bulk_upsert_dataframe(conn, 'stock_prices', _prices([('2330', '2024-06-18', 900.0)]))
+        bulk_upsert_dataframe(conn, 'monthly_revenues', pd.DataFrame({
+            'stock_id': ['2330'], 'revenue_year': [2024], 'revenue_month': [4], 'revenue': [1.0]}))
+        refresh_table_stats(conn)
+
+    # SimpleDatabaseManager.bulk_insert：取代既有一筆、新增一筆與一檔新股票
+    manager.bulk_insert('stock_prices', [
+        {'stock_id': sid, 'date': day, 'open_price': 1.0, 'high_price': 1.0, 'low_price': 1.0, 'close_price': 1.0,
+         'volume': 100}
+        for sid, day in (('2330', '2024-06-18'), ('2330', '2024-06-19'), ('2317', '2024-06-17'))])
+
+    # 收集腳本的逐筆 INSERT OR REPLACE
+    with manager.connection() as conn:
+        stats = snapshot_stock_stats(conn, 'monthly_revenues', ['2330'])
+        conn.executemany("INSERT OR REPLACE INTO monthly_revenues (stock_id, revenue_year, revenue_month, revenue) "
+                         "VALUES ('2330', 2024, ?, ?)", [(4, 2.0), (5, 3.0)])
+        conn.commit()
+        assert record_stock_write(conn, stats)
+
+        incremental = _stats_without_times(conn)
+        refresh_table_stats(conn)
+        assert incremental == _stats_without_times(conn)
+
+    prices = incremental['stock_prices']
+    assert (prices['row_count'], prices['distinct_stocks'], prices['min_date']) == (3, 2, '2024-06-17')
+    assert (incremental['monthly_revenues']['row_count'], incremental['monthly_revenues']['max_date']) == (2, '2024-05')
@@ -0,0 +1,66 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from app.utils.technical_indicators import (compute_indicators, indicator_columns, load_indicator_frame,
+                                            update_indicators, update_stock_indicators)
+
+PARAMS = {'MA': [5, 10, 20, 60], 'EMA': [12, 26], 'RSI': [14], 'MACD': [12, 26, 9],
+          'BOLLINGER': [20, 2], 'KD': [9, 3, 3]}
+
+
+def _prices(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    return pd.DataFrame({'stock_id': '2330', 'date': pd.bdate_range('2022-01-03', periods=n).strftime('%Y-%m-%d'),
+                         'open_price': close, 'high_price': close * 1.01, 'low_price': close * 0.99,
+                         'close_price': close, 'volume': 1000})
+
+
+def test_incremental_update_matches_full_computation():
+    prices = _prices()
+    conn = sqlite3.connect(':memory:')
+    prices.iloc[:300].to_sql('stock_prices', conn, index=False)
+    assert update_stock_indicators(conn, '2330', PARAMS) == 300
+    assert update_stock_indicators(conn, '2330', PARAMS) == 0
+
+    for start in range(300, 400, 7):
+        prices.iloc[start:start + 7].to_sql('stock_prices', conn, index=False, if_exists='append')
+        assert update_indicators(conn, PARAMS)['stocks'] == 1
+
+    columns = indicator_columns(PARAMS)
+    stored = pd.read_sql_query("SELECT * FROM stock_indicators ORDER BY date", conn)
+    expected = compute_indicators(prices, PARAMS)
+    np.testing.assert_allclose(stored[columns].to_numpy(float), expected[columns].to_numpy(float),
+                               rtol=1e-9, equal_nan=True)
+
+    # 與儀表板原本的 pandas 計算一致
+    close = prices['close_price']
+    np.testing.assert_allclose(stored['MACD_signal'], (close.ewm(span=12).mean() - close.ewm(span=26).mean())
+                               .ewm(span=9).mean(), rtol=1e-9)
+    np.testing.assert_allclose(stored['BB_upper'], close.rolling(20).mean() + close.rolling(20).std() * 2,
+                               rtol=1e-9, equal_nan=True)
+
+    frame = load_indicator_frame(conn, '2330', PARAMS, start_date='2023-06-01')
+    assert frame['date'].min() >= pd.Timestamp('2023-06-01') and frame['MA60'].notna().all()
+
+
+def test_corrected_history_triggers_full_recompute():
+    prices = _prices(120)
+    conn = sqlite3.connect(':memory:')
+    prices.iloc[:100].to_sql('stock_prices', conn, index=False)
+    update_stock_indicators(conn, '2330', PARAMS)
+
+    conn.execute("UPDATE stock_prices SET close_price = close_price * 2 WHERE date = ?", (prices['date'][99],))
+    prices.loc[99, 'close_price'] *= 2
+    prices.iloc[100:].to_sql('stock_prices', conn, index=False, if_exists='append')
+    assert update_stock_indicators(conn, '2330', PARAMS) == 120
+
+    stored = pd.read_sql_query("SELECT MA5, K FROM stock_indicators ORDER BY date", conn)
+    expected = compute_indicators(prices, PARAMS)
+    np.testing.assert_allclose(stored.to_numpy(float), expected[['MA5', 'K']].to_numpy(float), equal_nan=True)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import sqlite3
+
+from app.utils.trading_calendar import TradingCalendar, _weekdays_between
+
+# 2024-02-05 ~ 2024-02-23：2/8~2/14 為春節休市
+TRADING_DAYS = ['2024-02-05', '2024-02-06', '2024-02-07', '2024-02-15', '2024-02-16',
+                '2024-02-19', '2024-02-20', '2024-02-21', '2024-02-22', '2024-02-23']
+
+
+def _make_db(tmp_path, prices, stock_ids=('1101', '2317', '2330')):
+    db_path = tmp_path / 'stock.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE stocks (stock_id TEXT PRIMARY KEY, is_active BOOLEAN DEFAULT TRUE)")
+    conn.execute("CREATE TABLE stock_prices (stock_id TEXT, date TEXT, close_price REAL, UNIQUE(stock_id, date))")
+    conn.executemany("INSERT INTO stocks (stock_id) VALUES (?)", [(s,) for s in stock_ids])
+    conn.executemany("INSERT INTO stock_prices VALUES (?, ?, 1.0)", prices)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_calendar_skips_holidays_and_finds_missing_ranges(tmp_path):
+    prices = [(stock_id, date) for stock_id in ('1101', '2317', '2330') for date in TRADING_DAYS]
+    prices.remove(('2330', '2024-02-07'))
+    prices.remove(('2330', '2024-02-15'))
+    prices.remove(('2330', '2024-02-21'))
+    prices = [p for p in prices if p[0] != '2317' or p[1] < '2024-02-22']
+    calendar = TradingCalendar(_make_db(tmp_path, prices))
+
+    assert calendar.trading_days('2024-02-01', '2024-02-29')[:3] == ['2024-02-01', '2024-02-02', '2024-02-05']
+    assert calendar.trading_days('2024-02-05', '2024-02-23') == TRADING_DAYS
+    assert not calendar.is_trading_day('2024-02-12') and calendar.is_trading_day('2024-02-26')
+    assert calendar.count_trading_days('2024-02-05', '2024-02-16') == 5
+    assert calendar.next_trading_day('2024-02-07') == '2024-02-15'
+    assert calendar.next_trading_day('2024-02-22', 3) == '2024-02-27'
+
+    ranges = calendar.find_missing_ranges('2024-02-05', '2024-02-23')
+    # 春節前後的缺漏視為連續的同一個區間
+    assert ranges == {'2317': [('2024-02-22', '2024-02-23')],
+                      '2330': [('2024-02-07', '2024-02-15'), ('2024-02-21', '2024-02-21')]}
+    assert calendar.find_missing_ranges('2024-02-05', '2024-02-23', ['1101']) == {}
+
+
+def test_refresh_picks_up_newly_collected_dates(tmp_path):
+    db_path = _make_db(tmp_path, [('2330', date) for date in TRADING_DAYS[:3]])
+    calendar = TradingCalendar(db_path)
+    assert calendar.coverage == ('2024-02-05', '2024-02-07')
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO stock_prices VALUES ('2330', ?, 1.0)", [(d,) for d in TRADING_DAYS[3:]])
+    conn.commit()
+    conn.close()
+
+    assert calendar.refresh() == len(TRADING_DAYS)
+    assert calendar.next_trading_day('2024-02-07') == '2024-02-15'
+    persisted = sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM trading_calendar WHERE is_trading = 1")
+    assert persisted.fetchone()[0] == len(TRADING_DAYS)
+
+
+def test_partially_collected_days_stay_trading_days(tmp_path):
+    stock_ids = [str(1000 + i) for i in range(40)]
+    days = _weekdays_between('2024-01-02', '2024-03-29')
+    holiday, partial, latest = '2024-01-15', '2024-02-07', days[-1]
+    prices = [(stock_id, date) for stock_id in stock_ids for date in days
+              if date not in (holiday, partial, latest)]
+    prices.append(('1000', holiday))   # 單一股票的錯誤資料不應讓假日成為交易日
+    prices += [(stock_id, partial) for stock_id in stock_ids[:10]]   # 中斷的收集
+    prices += [(stock_id, latest) for stock_id in stock_ids[:1]]     # 最新一天只收集到一檔
+    calendar = TradingCalendar(_make_db(tmp_path, prices, stock_ids))
+
+    assert not calendar.is_trading_day(holiday)
+    assert calendar.is_trading_day(partial) and calendar.is_trading_day(latest)
+    assert calendar.find_missing_ranges(days[0], latest, ['1019', '1000']) == {
+        '1019': [(partial, partial), (latest, latest)]}
@@ -0,0 +1,57 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from stock_price_investment_system.price_models.tuned_params_registry import TunedParamsRegistry
+
+
+def _record(stock_id, model_type, score, params, success='成功'):
+    return {
+        '股票代碼': stock_id, '模型類型': model_type, '最佳分數': score, '是否成功': success,
+        '調優時間': '2025-01-01T00:00:00', '最佳參數': str(params), '成功組合數': 1, '總組合數': 1,
+    }
+
+
+def _upsert(args):
+    registry_file, stock_id = args
+    TunedParamsRegistry(registry_file).upsert(_record(stock_id, 'xgboost', 0.5, {'max_depth': 3}))
+
+
+def test_lookups_follow_file_changes(tmp_path):
+    registry_file = tmp_path / "tuned_stocks_registry.csv"
+    pd.DataFrame([
+        _record('2330', 'xgboost', 0.6, {'max_depth': 3}),
+        _record('2330', 'lightgbm', 0.7, {'max_depth': 6}),
+        _record('2330', 'lightgbm', 0.9, {'max_depth': 9}, success='失敗'),
+        _record('00878', 'xgboost', 0.55, {'n_estimators': 50}),
+    ]).to_csv(registry_file, index=False, encoding='utf-8-sig')
+
+    registry = TunedParamsRegistry(registry_file)
+    assert registry.get_best_params('2330', 'xgboost') == {'max_depth': 3}
+    assert registry.get_best_params('00878', 'xgboost') == {'n_estimators': 50}
+    assert registry.get_best_params('2330', 'random_forest') is None
+    assert registry.get_best_model_and_params('2330') == {
+        'model_type': 'lightgbm', 'params': {'max_depth': 6}, 'score': 0.7, 'success': True}
+    pd.testing.assert_frame_equal(registry.get_dataframe(), pd.read_csv(registry_file, encoding='utf-8-sig'))
+
+    # 其他行程更新檔案後自動重新載入
+    assert TunedParamsRegistry(registry_file).upsert(_record('2330', 'xgboost', 0.8, {'max_depth': 12}))
+    assert registry.get_best_params('2330', 'xgboost') == {'max_depth': 12}
+    assert registry.get_best_model_and_params('2330')['model_type'] == 'xgboost'
+    assert len(registry.get_dataframe()) == 4
+
+
+def test_concurrent_upserts_keep_every_record(tmp_path):
+    registry_file = tmp_path / "tuned_stocks_registry.csv"
+    stock_ids = [str(1000 + i) for i in range(24)]
+
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_upsert, [(registry_file, sid) for sid in stock_ids]))
+
+    df = pd.read_csv(registry_file, encoding='utf-8-sig')
+    assert sorted(df['股票代碼'].astype(str)) == stock_ids
+    assert not list(tmp_path.glob("*.lock")) and not list(tmp_path.glob("*.tmp"))
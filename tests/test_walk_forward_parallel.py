@@ -0,0 +1,41 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+_sys.path.insert(0, _os.path.abspath(_os.path.dirname(__file__)))
+
+from stock_price_investment_system.price_models.walk_forward_validator import WalkForwardValidator
+from test_panel_features import create_feature_db, build_feature_engineer
+
+
+def _run(fe, n_jobs, progress=None):
+    validator = WalkForwardValidator(fe)
+    summary = validator.run_validation(
+        ["2330", "8299"], "2018-01-01", "2021-12-31",
+        train_window_months=24, test_window_months=6, stride_months=6,
+        models_to_use=["xgboost"],
+        override_models={"xgboost": {"n_estimators": 10, "n_jobs": 1}},
+        n_jobs=n_jobs, progress_callback=progress,
+    )
+    return summary
+
+
+def test_parallel_validation_matches_sequential(tmp_path):
+    fe = build_feature_engineer(create_feature_db(tmp_path))
+
+    sequential = _run(fe, n_jobs=1)
+    progress = []
+    parallel = _run(fe, n_jobs=2, progress=lambda done, total, fold_idx, stock_id: progress.append((done, total)))
+
+    assert sequential['fold_count'] == parallel['fold_count'] > 0
+    assert sequential['total_trades'] == parallel['total_trades'] > 0
+    assert list(sequential['stock_statistics']) == list(parallel['stock_statistics'])
+
+    for seq_fold, par_fold in zip(sequential['fold_results'], parallel['fold_results']):
+        assert seq_fold['fold_idx'] == par_fold['fold_idx']
+        assert seq_fold['trained_stocks'] == par_fold['trained_stocks']
+        assert seq_fold['backtest_result']['trades'] == par_fold['backtest_result']['trades']
+        assert list(seq_fold['backtest_result']['stock_performance']) == list(par_fold['backtest_result']['stock_performance'])
+
+    total_units = parallel['fold_count'] * 2
+    assert [done for done, _ in progress] == list(range(1, total_units + 1))
+    assert all(total == total_units for _, total in progress)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import os as _os, sys as _sys
+_sys.path.insert(0, _os.path.abspath(_os.path.join(_os.path.dirname(__file__), '..')))
+
+import pytest
+
+pytest.importorskip("flask")
+
+import web_app
+from app.utils.response_cache import ResponseCache
+from app.utils.simple_database import SimpleDatabaseManager
+from app.utils.revenue_growth import recompute_revenue_growth
+from app.utils.stock_payloads import get_data_version, load_stock_detail, rebuild_stock_details
+from app.utils.table_stats import ensure_table_stats, refresh_table_stats
+
+
+def _create_db(tmp_path):
+    manager = SimpleDatabaseManager(str(tmp_path / "stock.db"))
+    manager.create_tables()
+    with manager.connection() as conn:
+        # Web 介面使用 expand_database 的評分表欄位
+        conn.execute("DROP TABLE stock_scores")
+        conn.execute("""
+            CREATE TABLE stock_scores (
+                stock_id TEXT, analysis_date DATE, financial_health_score REAL, growth_score REAL,
+                dividend_score REAL, total_score REAL, grade TEXT, score_details TEXT, created_at TIMESTAMP,
+                UNIQUE(stock_id, analysis_date))
+        """)
+        conn.executemany("INSERT INTO stocks (stock_id, stock_name, market, is_etf) VALUES (?, ?, 'TWSE', 0)",
+                         [('2330', '台積電'), ('2317', '鴻海')])
+        conn.execute("INSERT INTO stock_scores VALUES ('2330', '2024-06-01', 80, 70, 60, 75, 'A', '{}', '2024-06-01 18:00:00')")
+        conn.executemany("INSERT INTO monthly_revenues (stock_id, revenue_year, revenue, revenue_month) VALUES ('2330', 2024, ?, ?)",
+                         [(1e9 * m, m) for m in range(1, 5)])
+        conn.commit()
+    return manager
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    manager = _create_db(tmp_path)
+    monkeypatch.setattr(web_app, '_db_manager', manager)
+    monkeypatch.setattr(web_app, 'response_cache', ResponseCache())
+    web_app.data_version.invalidate()
+    yield web_app.app.test_client(), manager
+    web_app.data_version.invalidate()
+
+
+def test_stock_detail_uses_cache_and_etag(client):
+    client, manager = client
+    with manager.connection() as conn:
+        assert rebuild_stock_details(conn) == 1
+        stored_version = conn.execute("SELECT data_version FROM stock_detail_payloads").fetchone()[0]
+        assert stored_version == get_data_version(conn)
+
+    first = client.get('/api/stock/2330')
+    assert first.status_code == 200
+    assert first.get_json()['score_info'][1] == 'A'
+    assert len(first.get_json()['monthly_revenue']) == 4
+    etag = first.headers['ETag']
+
+    assert client.get('/api/stock/2330', headers={'If-None-Match': etag}).status_code == 304
+    assert web_app.response_cache.hits == 1
+
+    # 新的評分寫入後資料版本改變，快取與預先組成的資料都失效
+    with manager.connection() as conn:
+        conn.execute("INSERT INTO stock_scores VALUES ('2330', '2024-07-01', 90, 90, 90, 90, 'A+', '{}', '2024-07-01 18:00:00')")
+        conn.commit()
+    web_app.data_version.invalidate()
+
+    second = client.get('/api/stock/2330', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.get_json()['score_info'][1] == 'A+'
+    assert second.headers['ETag'] != etag
+
+    ranking = client.get('/api/rankings').get_json()
+    assert [row['grade'] for row in ranking] == ['A+', 'A']
+
+
+def test_direct_writes_change_data_version(tmp_path):
+    # 收集程式以 INSERT OR REPLACE 直接寫入，未經 bulk_upsert 也沒有 table_stats
+    manager = _create_db(tmp_path)
+    with manager.connection() as conn:
+        assert rebuild_stock_details(conn) == 1
+        version = get_data_version(conn)
+
+        conn.execute("INSERT OR REPLACE INTO monthly_revenues (stock_id, revenue_year, revenue_month, revenue) "
+                     "VALUES ('2330', 2024, 5, 5e9)")
+        conn.commit()
+        assert get_data_version(conn) != version
+        assert len(load_stock_detail(conn, '2330')['monthly_revenue']) == 5
+
+        # 取代既有月份（筆數不變）也會改變版本
+        version = get_data_version(conn)
+        conn.execute("INSERT OR REPLACE INTO monthly_revenues (stock_id, revenue_year, revenue_month, revenue) "
+                     "VALUES ('2330', 2024, 5, 6e9)")
+        conn.commit()
+        assert get_data_version(conn) != version
+        assert load_stock_detail(conn, '2330')['monthly_revenue'][0][2] == 6e9
+
+
+def test_growth_recompute_changes_data_version(tmp_path):
+    manager = _create_db(tmp_path)
+    with manager.connection() as conn:
+        conn.execute("INSERT INTO monthly_revenues (stock_id, revenue_year, revenue_month, revenue) "
+                     "VALUES ('2330', 2023, 4, 2e9)")
+        conn.commit()
+        ensure_table_stats(conn)
+        refresh_table_stats(conn)
+        assert rebuild_stock_details(conn) == 1
+        assert load_stock_detail(conn, '2330')['monthly_revenue'][0][3] is None
+
+        # 成長率以就地 UPDATE 重算，筆數與 rowid 都不變
+        version = get_data_version(conn)
+        recompute_revenue_growth(conn)
+        assert get_data_version(conn) != version
+        assert load_stock_detail(conn, '2330')['monthly_revenue'][0][3] == pytest.approx(100.0)
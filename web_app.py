@@ -2,12 +2,15 @@
 # -*- coding: utf-8 -*-
 """
 台股潛力股分析Web介面
+
+頁面與 JSON API 的回應依資料版本快取（Config.CACHE_DEFAULT_TIMEOUT 秒內有效），
+並附 ETag，瀏覽器或反向代理以 If-None-Match 重新驗證時內容未變動回傳 304。
 """
 
 import sys
 import os
 import json
-from datetime import datetime
+import threading
 from flask import Flask, render_template, request, jsonify
 
 # 添加專案根目錄到 Python 路徑
@@ -15,23 +18,56 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
 from app.utils.simple_database import SimpleDatabaseManager as DatabaseManager
+from app.utils.response_cache import ExpiringValue, ResponseCache
+from app.utils.stock_payloads import get_data_version, load_stock_detail
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'taiwan_stock_analysis_2025'
 
+_db_manager = None
+_db_manager_lock = threading.Lock()
+
 def get_db_manager():
-    """獲取資料庫管理器"""
-    return DatabaseManager(Config.DATABASE_PATH)
+    """獲取資料庫管理器（行程內共用，連線來自連線池）"""
+    global _db_manager
+    with _db_manager_lock:
+        if _db_manager is None:
+            _db_manager = DatabaseManager(Config.DATABASE_PATH)
+        return _db_manager
 
-@app.route('/')
-def index():
-    """首頁 - 潛力股排行榜"""
-    db_manager = get_db_manager()
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # 獲取潛力股排行榜
+def _load_data_version():
+    with get_db_manager().connection(read_only=True) as conn:
+        return get_data_version(conn)
+
+response_cache = ResponseCache(max_entries=Config.WEB_CACHE_MAX_ENTRIES, ttl_seconds=Config.CACHE_DEFAULT_TIMEOUT)
+data_version = ExpiringValue(_load_data_version, ttl_seconds=Config.WEB_DATA_VERSION_CHECK_SECONDS)
+
+def cached_response(key, render):
+    """
+    回傳快取的回應（未命中時呼叫 render 產生 (body, mimetype)）
+
+    快取依資料版本失效；回應附 ETag，If-None-Match 相符時回傳 304
+    """
+    version = data_version.get()
+    entry = response_cache.get(key, version)
+    if entry is None:
+        body, mimetype = render(version)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        entry = response_cache.put(key, version, body, mimetype)
+
+    response = app.response_class(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
+
+def json_body(data):
+    return json.dumps(data, ensure_ascii=False, default=str), 'application/json'
+
+def query_top_stocks():
+    """潛力股排行榜（前20名）"""
+    with get_db_manager().connection(read_only=True) as conn:
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT ss.stock_id, s.stock_name, ss.total_score, ss.grade,
                    ss.financial_health_score, ss.growth_score, ss.dividend_score,
@@ -41,7 +77,7 @@ def index():
             ORDER BY ss.total_score DESC
             LIMIT 20
         """)
-        
+
         top_stocks = []
         for row in cursor.fetchall():
             top_stocks.append({
@@ -54,160 +90,17 @@ def index():
                 'dividend_score': row[6],
                 'analysis_date': row[7]
             })
-        
-        return render_template('index.html', top_stocks=top_stocks)
-        
-    except Exception as e:
-        return f"資料庫錯誤: {e}"
-    finally:
-        conn.close()
-
-@app.route('/stock/<stock_id>')
-def stock_detail(stock_id):
-    """股票詳細分析頁面"""
-    db_manager = get_db_manager()
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # 基本資訊
-        cursor.execute("SELECT stock_name, market FROM stocks WHERE stock_id = ?", (stock_id,))
-        basic_info = cursor.fetchone()
-        
-        if not basic_info:
-            return "股票不存在"
-        
-        # 評分資訊
-        cursor.execute("""
-            SELECT total_score, grade, financial_health_score, growth_score, 
-                   dividend_score, score_details, analysis_date
-            FROM stock_scores 
-            WHERE stock_id = ?
-            ORDER BY analysis_date DESC
-            LIMIT 1
-        """, (stock_id,))
-        
-        score_info = cursor.fetchone()
-        
-        # 財務比率
-        cursor.execute("""
-            SELECT date, gross_margin, operating_margin, net_margin, debt_ratio, current_ratio
-            FROM financial_ratios 
-            WHERE stock_id = ?
-            ORDER BY date DESC
-            LIMIT 8
-        """, (stock_id,))
-        
-        financial_ratios = cursor.fetchall()
-        
-        # 月營收成長
-        cursor.execute("""
-            SELECT revenue_year, revenue_month, revenue, revenue_growth_yoy
-            FROM monthly_revenues 
-            WHERE stock_id = ?
-            ORDER BY revenue_year DESC, revenue_month DESC
-            LIMIT 12
-        """, (stock_id,))
-        
-        monthly_revenue = cursor.fetchall()
-        
-        # 股利政策
-        cursor.execute("""
-            SELECT year, cash_earnings_distribution, cash_statutory_surplus,
-                   cash_ex_dividend_trading_date
-            FROM dividend_policies 
-            WHERE stock_id = ?
-            ORDER BY year DESC
-            LIMIT 5
-        """, (stock_id,))
-        
-        dividend_data = cursor.fetchall()
-        
-        # EPS預估 (使用之前的邏輯)
-        eps_prediction = predict_eps_for_web(cursor, stock_id, monthly_revenue, financial_ratios)
-        
-        stock_data = {
-            'stock_id': stock_id,
-            'stock_name': basic_info[0],
-            'market': basic_info[1],
-            'score_info': score_info,
-            'financial_ratios': financial_ratios,
-            'monthly_revenue': monthly_revenue,
-            'dividend_data': dividend_data,
-            'eps_prediction': eps_prediction
-        }
-        
-        return render_template('stock_detail.html', stock=stock_data)
-        
-    except Exception as e:
-        return f"資料庫錯誤: {e}"
-    finally:
-        conn.close()
+        return top_stocks
 
-def predict_eps_for_web(cursor, stock_id, monthly_revenue, financial_ratios):
-    """為Web介面預估EPS"""
-    if not monthly_revenue or len(monthly_revenue) < 3:
-        return None
-    
-    try:
-        # 最近3個月營收
-        recent_revenue = sum([row[2] for row in monthly_revenue[:3]])
-        
-        # 計算歷史平均淨利率
-        net_margins = [row[3] for row in financial_ratios if row[3] is not None]
-        if not net_margins:
-            return None
-        
-        avg_net_margin = sum(net_margins) / len(net_margins)
-        
-        # 預估淨利
-        predicted_net_income = recent_revenue * (avg_net_margin / 100)
-        
-        # 獲取歷史EPS來推估股數
-        cursor.execute("""
-            SELECT value FROM financial_statements 
-            WHERE stock_id = ? AND type = 'EPS' AND value > 0
-            ORDER BY date DESC LIMIT 4
-        """, (stock_id,))
-        
-        eps_history = [row[0] for row in cursor.fetchall()]
-        
-        if eps_history:
-            # 使用歷史EPS推估股數
-            cursor.execute("""
-                SELECT value FROM financial_statements 
-                WHERE stock_id = ? AND type = 'IncomeAfterTaxes'
-                ORDER BY date DESC LIMIT 4
-            """, (stock_id,))
-            
-            net_income_history = [row[0] for row in cursor.fetchall()]
-            
-            if net_income_history and len(eps_history) == len(net_income_history):
-                avg_shares = sum([ni/eps for ni, eps in zip(net_income_history, eps_history) if eps > 0]) / len(eps_history)
-                predicted_eps = predicted_net_income / avg_shares if avg_shares > 0 else None
-            else:
-                predicted_eps = None
-        else:
-            predicted_eps = None
-        
-        return {
-            'quarterly_revenue': recent_revenue / 1000000000,  # 轉換為億元
-            'avg_net_margin': avg_net_margin,
-            'predicted_net_income': predicted_net_income / 1000000000,  # 轉換為億元
-            'predicted_eps': predicted_eps
-        }
-        
-    except Exception as e:
-        return None
+def query_stock_detail(stock_id, version):
+    """股票詳細資料（讀取分析後預先組成的資料）"""
+    with get_db_manager().connection() as conn:
+        return load_stock_detail(conn, stock_id, version)
 
-@app.route('/api/stocks')
-def api_stocks():
-    """API: 獲取股票清單"""
-    db_manager = get_db_manager()
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    try:
+def query_stock_list():
+    """股票清單（依評分排序前50檔）"""
+    with get_db_manager().connection(read_only=True) as conn:
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT s.stock_id, s.stock_name, ss.total_score, ss.grade
             FROM stocks s
@@ -216,7 +109,7 @@ def api_stocks():
             ORDER BY ss.total_score DESC NULLS LAST
             LIMIT 50
         """)
-        
+
         stocks = []
         for row in cursor.fetchall():
             stocks.append({
@@ -225,13 +118,65 @@ def api_stocks():
                 'total_score': row[2],
                 'grade': row[3]
             })
-        
-        return jsonify(stocks)
-        
+        return stocks
+
+@app.route('/')
+def index():
+    """首頁 - 潛力股排行榜"""
+    try:
+        return cached_response('page:index', lambda version: (
+            render_template('index.html', top_stocks=query_top_stocks()), 'text/html'))
+
+    except Exception as e:
+        return f"資料庫錯誤: {e}"
+
+@app.route('/stock/<stock_id>')
+def stock_detail(stock_id):
+    """股票詳細分析頁面"""
+    def render(version):
+        stock_data = query_stock_detail(stock_id, version)
+        if not stock_data:
+            return "股票不存在", 'text/html'
+        return render_template('stock_detail.html', stock=stock_data), 'text/html'
+
+    try:
+        return cached_response(f'page:stock:{stock_id}', render)
+
+    except Exception as e:
+        return f"資料庫錯誤: {e}"
+
+@app.route('/api/stocks')
+def api_stocks():
+    """API: 獲取股票清單"""
+    try:
+        return cached_response('api:stocks', lambda version: json_body(query_stock_list()))
+
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/rankings')
+def api_rankings():
+    """API: 潛力股排行榜"""
+    try:
+        return cached_response('api:rankings', lambda version: json_body(query_top_stocks()))
+
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+@app.route('/api/stock/<stock_id>')
+def api_stock_detail(stock_id):
+    """API: 股票詳細資料"""
+    def render(version):
+        stock_data = query_stock_detail(stock_id, version)
+        if not stock_data:
+            return json_body({'error': '股票不存在'})
+        return json_body(stock_data)
+
+    try:
+        return cached_response(f'api:stock:{stock_id}', render)
+
     except Exception as e:
         return jsonify({'error': str(e)})
-    finally:
-        conn.close()
 
 if __name__ == '__main__':
     # 確保templates目錄存在